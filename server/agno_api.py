@@ -1,4 +1,5 @@
 import base64
+import functools
 import hashlib
 import json
 import os
@@ -6,12 +7,13 @@ import uuid
 import time
 from mimetypes import guess_type
 from pathlib import Path
-from typing import Any, Dict, Iterator, List, Optional, Union, Literal
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union, Literal
 
 import dotenv
-from fastapi import FastAPI, UploadFile, File
+from fastapi import FastAPI, UploadFile, File, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel, Field
 
 from agno.agent import Agent
@@ -22,8 +24,17 @@ from agno.team import Team
 from agno.models.openai import OpenAIChat
 from agno.models.openai.responses import OpenAIResponses
 
+from batch_executor import TaskOutcome, default_budget, run_all, run_concurrently
+from campaign_jobs import CampaignManager
+from fast_json import FastJSONResponse, sse_event
+from interview_history import SUMMARY_FIELD
+from llm_scheduler import BATCH, SDK_MAX_RETRIES, install_llm_clients, llm_priority, scheduler_stats
+from llm_usage import usage_summary
+from persona_io import spool_file
+from persona_store import PersonaStore
+from transcript_archive import TranscriptArchive
 from rag_store import RagStore
-from tag_store import get_doc_tags, load_tag_store, set_custom_tags, set_doc_tags
+from tag_store import get_doc_tags, get_doc_tags_many, load_tag_store, set_custom_tags, set_doc_tags
 
 
 # Robust .env loader to avoid parser crashes on some environments.
@@ -37,6 +48,7 @@ def _safe_load_env() -> None:
 
 
 _safe_load_env()
+install_llm_clients()
 
 TEAM_INSTRUCTIONS = [
     "你是企業金融 RM（Relationship Manager）授信報告助理，專精於企業授信分析、風險評估與金融市場研究。",
@@ -191,12 +203,14 @@ def get_model(
             reasoning=reasoning_opts or None,
             reasoning_effort=DEFAULT_REASONING_EFFORT or None,
             reasoning_summary=DEFAULT_REASONING_SUMMARY or None,
+            max_retries=SDK_MAX_RETRIES,
         )
 
     kwargs: Dict[str, Any] = {
         "id": model_name,
         "api_key": api_key,
         "reasoning_effort": DEFAULT_REASONING_EFFORT,
+        "max_retries": SDK_MAX_RETRIES,
     }
     # Vision inputs are passed via Agent.run(images=...), no extra request params needed.
 
@@ -902,6 +916,7 @@ app.add_middleware(
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
 
 SSE_HEADERS = {
@@ -942,6 +957,18 @@ async def health():
     return {"ok": True}
 
 
+@app.get("/api/llm_usage")
+async def get_llm_usage():
+    """各 agent 的 token 用量與 prompt cache 命中（程序啟動後累計）"""
+    return {"usage": usage_summary()}
+
+
+@app.get("/api/llm_scheduler")
+async def get_llm_scheduler():
+    """各模型的速率限制狀態：上限、排隊中的請求、重試與 429 次數"""
+    return {"models": scheduler_stats()}
+
+
 @app.get("/api/tags")
 async def get_tags():
     store = load_tag_store()
@@ -964,7 +991,9 @@ async def update_tags(req: TagUpdateRequest):
 async def get_preloaded_documents():
     """獲取預加載的文檔列表"""
     documents = []
-    for doc_id, stored in rag_store.docs.items():
+    stored_docs = list(rag_store.docs.values())
+    tags_by_key = get_doc_tags_many(stored.content_hash or stored.id for stored in stored_docs)
+    for stored in stored_docs:
         tag_key = stored.content_hash or stored.id
         documents.append(
             {
@@ -972,7 +1001,7 @@ async def get_preloaded_documents():
                 "name": stored.name,
                 "type": stored.type,
                 "pages": stored.pages or "-",
-                "tags": get_doc_tags(tag_key),
+                "tags": tags_by_key.get(tag_key, []),
                 "tag_key": tag_key,
                 "status": stored.status,
                 "message": stored.message,
@@ -1050,6 +1079,7 @@ async def get_preloaded_documents():
         return {"documents": []}
 
     results = []
+    tags_by_key = load_tag_store().get("docs", {})
     for file_path in docs_dir.glob("*.pdf"):
         try:
             data = file_path.read_bytes()
@@ -1061,7 +1091,7 @@ async def get_preloaded_documents():
                     "name": stored.name,
                     "type": stored.type,
                     "pages": stored.pages or "-",
-                    "tags": get_doc_tags(tag_key),
+                    "tags": list(tags_by_key.get(tag_key, [])),
                     "tag_key": tag_key,
                     "status": stored.status,
                     "message": stored.message,
@@ -1108,11 +1138,11 @@ async def generate_artifacts(req: ArtifactRequest):
                             "status": "running",
                             "eta": "進行中",
                         }
-                        yield f"data: {json.dumps({'routing_update': routing_update})}\n\n"
+                        yield sse_event({'routing_update': routing_update})
                         for event in response:
                             trace_event = map_event_to_trace_event(event)
                             if trace_event:
-                                yield f"data: {json.dumps({'trace_event': trace_event})}\n\n"
+                                yield sse_event({'trace_event': trace_event})
 
                             reasoning_text = extract_reasoning_text(event)
                             if reasoning_text:
@@ -1122,7 +1152,7 @@ async def generate_artifacts(req: ArtifactRequest):
                             if not content:
                                 continue
                             accumulated += content
-                            yield f"data: {json.dumps({'chunk': content})}\n\n"
+                            yield sse_event({'chunk': content})
 
                         final_data = build_empty_response(
                             accumulated
@@ -1138,11 +1168,11 @@ async def generate_artifacts(req: ArtifactRequest):
                         ]
                         if reasoning_fragments:
                             final_data["reasoning_summary"] = build_reasoning_summary(reasoning_fragments)
-                        yield f"data: {json.dumps(final_data)}\n\n"
+                        yield sse_event(final_data)
                     except Exception as exc:
                         error_response = build_empty_response(f"處理過程中發生錯誤：{str(exc)}")
-                        yield f"data: {json.dumps(error_response)}\n\n"
-                    yield f"data: {json.dumps({'done': True})}\n\n"
+                        yield sse_event(error_response)
+                    yield sse_event({'done': True})
 
                 return StreamingResponse(
                     generate_smalltalk_sse(),
@@ -1179,7 +1209,7 @@ async def generate_artifacts(req: ArtifactRequest):
                             "eta": "進行中",
                         }
                         if update_routing_log(routing_log, ocr_start):
-                            yield f"data: {json.dumps({'routing_update': ocr_start})}\n\n"
+                            yield sse_event({'routing_update': ocr_start})
                         ocr_updates = run_ocr_for_documents(req.documents)
                         ocr_done = {
                             "id": "ocr",
@@ -1188,7 +1218,7 @@ async def generate_artifacts(req: ArtifactRequest):
                             "eta": "完成",
                         }
                         if update_routing_log(routing_log, ocr_done):
-                            yield f"data: {json.dumps({'routing_update': ocr_done})}\n\n"
+                            yield sse_event({'routing_update': ocr_done})
 
                     ensure_inline_documents_indexed(req.documents)
                     doc_ids = [
@@ -1217,7 +1247,7 @@ async def generate_artifacts(req: ArtifactRequest):
                         "eta": "進行中",
                     }
                     if update_routing_log(routing_log, run_start):
-                        yield f"data: {json.dumps({'routing_update': run_start})}\n\n"
+                        yield sse_event({'routing_update': run_start})
 
                     response = team.run(
                         prompt,
@@ -1232,7 +1262,7 @@ async def generate_artifacts(req: ArtifactRequest):
                         routing_update = build_routing_update(event, routing_state)
                         if routing_update:
                             if update_routing_log(routing_log, routing_update):
-                                yield f"data: {json.dumps({'routing_update': routing_update})}\n\n"
+                                yield sse_event({'routing_update': routing_update})
 
                         reasoning_text = extract_reasoning_text(event)
                         if reasoning_text:
@@ -1240,13 +1270,13 @@ async def generate_artifacts(req: ArtifactRequest):
 
                         trace_event = map_event_to_trace_event(event)
                         if trace_event:
-                            yield f"data: {json.dumps({'trace_event': trace_event})}\n\n"
+                            yield sse_event({'trace_event': trace_event})
 
                         content = extract_stream_text(event)
                         if not content:
                             continue
                         accumulated += content
-                        yield f"data: {json.dumps({'chunk': content})}\n\n"
+                        yield sse_event({'chunk': content})
 
                     run_done = {
                         "id": "run-main",
@@ -1255,7 +1285,7 @@ async def generate_artifacts(req: ArtifactRequest):
                         "eta": "完成",
                     }
                     if update_routing_log(routing_log, run_done):
-                        yield f"data: {json.dumps({'routing_update': run_done})}\n\n"
+                        yield sse_event({'routing_update': run_done})
 
                     # Parse and send final complete message
                     if accumulated:
@@ -1274,15 +1304,15 @@ async def generate_artifacts(req: ArtifactRequest):
                         )
                         if research_doc:
                             final_data["documents_append"] = [research_doc]
-                        yield f"data: {json.dumps(final_data)}\n\n"
+                        yield sse_event(final_data)
                     else:
                         # No content accumulated, send fallback response
                         fallback = build_empty_response("抱歉，我無法完成這個請求。請稍後再試。")
-                        yield f"data: {json.dumps(fallback)}\n\n"
+                        yield sse_event(fallback)
                 except Exception as exc:
                     error_response = build_empty_response(f"處理過程中發生錯誤：{str(exc)}")
-                    yield f"data: {json.dumps(error_response)}\n\n"
-                yield f"data: {json.dumps({'done': True})}\n\n"
+                    yield sse_event(error_response)
+                yield sse_event({'done': True})
 
             return StreamingResponse(
                 generate_sse(),
@@ -1344,42 +1374,70 @@ async def generate_artifacts(req: ArtifactRequest):
 # ========== PPV (Psychometric Persona Vector) API Endpoints ==========
 # Import PPV modules
 from extraction_agent import extract_ppv
-from impersonation_agent import chat_with_digital_twin
+from impersonation_agent import achat_with_digital_twin
 from generator_agent import generate_diverse_personas
 from ppv_schema import PPVInstance
 
 # PPV Database configuration
 PPV_DB_FILE = Path("server/personas.json")
+ppv_store = PersonaStore(PPV_DB_FILE, history_field="interview_history")
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """判斷 If-None-Match 標頭是否命中目前的 ETag（忽略 weak 前綴）"""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in [tag[2:] if tag.startswith("W/") else tag for tag in candidates]
+
+
+def collection_response(store: PersonaStore, request: Request, include_archived: bool = False) -> Response:
+    """回傳整個 persona 集合；客戶端版本未過期時回 304，不傳送內容"""
+    etag, body = store.snapshot(include_archived)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def collection_changes_response(store: PersonaStore, since: int) -> FastJSONResponse:
+    """回傳自 since 版本之後變更的 persona 與訪談記錄"""
+    changes = store.changes_since(since)
+    return FastJSONResponse(changes, headers={"ETag": store.etag(), "Cache-Control": "no-cache"})
+
+
+def collection_export_response(store: PersonaStore) -> StreamingResponse:
+    """以 NDJSON 串流匯出整個集合（含已封存的訪談記錄）"""
+    return StreamingResponse(
+        store.export_ndjson(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{store.name}.ndjson"'},
+    )
+
+
+async def collection_import(store: PersonaStore, request: Request, replace: bool) -> Union[Dict[str, Any], JSONResponse]:
+    """把請求內容（NDJSON）先寫入暫存檔，再以串流方式合併進集合"""
+    with spool_file() as f:
+        async for chunk in request.stream():
+            f.write(chunk)
+        try:
+            stats = await run_in_threadpool(store.import_ndjson, f, replace)
+        except ValueError as e:
+            return JSONResponse({"error": f"NDJSON 格式錯誤: {e}"}, status_code=400)
+    return {"status": "imported", **stats}
+
 
 def load_ppv_db() -> List[PPVInstance]:
     """從 JSON 檔案讀取所有客戶資料"""
-    if not PPV_DB_FILE.exists():
-        return []
     try:
-        with open(PPV_DB_FILE, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            return [PPVInstance(**item) for item in data]
+        return [PPVInstance(**item) for item in ppv_store.load()]
     except Exception as e:
         print(f"讀取 PPV 資料庫失敗: {e}")
         return []
 
 def save_ppv_db(new_personas: List[PPVInstance]):
-    """將新生成的客戶寫入 JSON 檔案 (更新模式)"""
-    all_data = load_ppv_db()
-
-    # 建立一個 ID 對照表 (Dictionary)
-    data_map = {p.id: p for p in all_data}
-
-    # 更新或新增資料
-    for p in new_personas:
-        data_map[p.id] = p  # 如果 ID 存在就覆蓋 (更新)，不存在就新增
-
-    # 轉回 List 並存檔
-    updated_list = list(data_map.values())
-
-    with open(PPV_DB_FILE, "w", encoding="utf-8") as f:
-        json_data = [p.model_dump() for p in updated_list]
-        json.dump(json_data, f, ensure_ascii=False, indent=2)
+    """將新生成的客戶寫入 JSON 檔案 (更新模式，ID 存在就覆蓋，不存在就新增)"""
+    ppv_store.save_many([p.model_dump() for p in new_personas])
 
 # Request models for PPV APIs
 class ExtractRequest(BaseModel):
@@ -1412,9 +1470,9 @@ def api_update_persona(persona: PPVInstance):
 
 # --- API 3: 數位孿生對話 (Phase 3) ---
 @app.post("/api/chat_with_twin")
-def api_chat_with_twin(request: ChatRequest):
+async def api_chat_with_twin(request: ChatRequest):
     try:
-        response_text = chat_with_digital_twin(
+        response_text = await achat_with_digital_twin(
             request.ppv_profile,
             request.user_query,
             request.context_data
@@ -1438,69 +1496,101 @@ def api_generate_personas(req: GenerateRequest):
 
 # --- API 5: 取得/刪除 歷史客戶資料 (Persistence) ---
 @app.get("/api/personas")
-def api_get_personas():
-    return load_ppv_db()
+def api_get_personas(request: Request):
+    return collection_response(ppv_store, request)
+
+@app.get("/api/personas/changes")
+def api_get_persona_changes(since: int = 0):
+    """增量同步：只回傳 since 版本之後變更的客戶資料"""
+    return collection_changes_response(ppv_store, since)
+
+@app.get("/api/personas/export")
+def api_export_personas():
+    """以 NDJSON 串流匯出所有客戶資料"""
+    return collection_export_response(ppv_store)
+
+@app.post("/api/personas/import")
+async def api_import_personas(request: Request, replace: bool = False):
+    """匯入 NDJSON（依 id 覆蓋 / 新增；replace=1 時只保留匯入的資料）"""
+    return await collection_import(ppv_store, request, replace)
 
 @app.delete("/api/personas")
 def api_clear_personas():
-    if PPV_DB_FILE.exists():
-        os.remove(PPV_DB_FILE)
+    ppv_store.clear()
     return {"status": "cleared"}
 
 @app.delete("/api/personas/{persona_id}")
 def api_delete_persona(persona_id: str):
     """刪除單一 persona"""
-    all_data = load_ppv_db()
-    filtered = [p for p in all_data if p.id != persona_id]
-
-    if len(filtered) == len(all_data):
+    if not ppv_store.delete(persona_id):
         return JSONResponse({"error": "Persona not found"}, status_code=404)
 
-    # 重新寫入檔案
-    with open(PPV_DB_FILE, "w", encoding="utf-8") as f:
-        json_data = [p.model_dump() for p in filtered]
-        json.dump(json_data, f, ensure_ascii=False, indent=2)
-
     return {"status": "deleted", "id": persona_id}
 
 
 # ========== Vietnam Interview API Endpoints ==========
-from vietnam_interview_agent import interview_vietnam_persona, interview_vietnam_persona_observer
+from vietnam_interview_agent import ainterview_vietnam_persona, ainterview_vietnam_persona_observer, interview_vietnam_persona
+from url_fetcher import URLContext, aclose_async_clients, extract_and_fetch_urls
 from vietnam_generator_agent import generate_vietnam_personas
 from vietnam_analysis_agent import analyze_interview_responses
 from vietnam_classifier_agent import classify_responses, classify_responses_multi_dimension
 import datetime
 
 VIETNAM_DB_FILE = Path("server/vietnam_personas.json")
+VIETNAM_ARCHIVE_DIR = Path("server/archive/vietnam_personas")
+vietnam_store = PersonaStore(VIETNAM_DB_FILE, archive=TranscriptArchive(VIETNAM_ARCHIVE_DIR))
+# 所有批量訪談共用的 token 預算（BATCH_INTERVIEW_TPM 未設定時為 None，不限制）
+batch_token_budget = default_budget()
 
-def load_vietnam_db() -> List[Dict[str, Any]]:
-    """從 JSON 檔案讀取越南訪談資料"""
-    if not VIETNAM_DB_FILE.exists():
-        return []
-    try:
-        with open(VIETNAM_DB_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except Exception as e:
-        print(f"讀取越南資料庫失敗: {e}")
-        return []
+def load_vietnam_db(include_archived: bool = False) -> List[Dict[str, Any]]:
+    """從 JSON 檔案讀取越南訪談資料（include_archived=True 時讀回已封存的訪談記錄）"""
+    return vietnam_store.load(include_archived)
 
 def save_vietnam_db(persona: Dict[str, Any]):
     """儲存/更新越南訪談資料"""
-    all_data = load_vietnam_db()
-    data_map = {p.get('id'): p for p in all_data}
-    data_map[persona.get('id')] = persona
-    with open(VIETNAM_DB_FILE, "w", encoding="utf-8") as f:
-        json.dump(list(data_map.values()), f, ensure_ascii=False, indent=2)
+    vietnam_store.save(persona)
 
 class VietnamInterviewRequest(BaseModel):
     persona: Dict[str, Any]
     question: str
     subQuestions: List[str] = []
 
+class ArchiveRequest(BaseModel):
+    personaIds: Optional[List[str]] = None
+
 @app.get("/api/vietnam_personas")
-def api_get_vietnam_personas():
-    """取得所有越南訪談記錄"""
-    return load_vietnam_db()
+def api_get_vietnam_personas(request: Request, include_archived: bool = False):
+    """取得所有越南訪談記錄（支援 ETag / If-None-Match；include_archived=1 讀回已封存的訪談記錄）"""
+    return collection_response(vietnam_store, request, include_archived)
+
+@app.get("/api/vietnam_personas/changes")
+def api_get_vietnam_persona_changes(since: int = 0):
+    """增量同步：只回傳 since 版本之後變更的受訪者與訪談記錄"""
+    return collection_changes_response(vietnam_store, since)
+
+@app.get("/api/vietnam_personas/export")
+def api_export_vietnam_personas():
+    """以 NDJSON 串流匯出所有越南訪談記錄"""
+    return collection_export_response(vietnam_store)
+
+@app.post("/api/vietnam_personas/import")
+async def api_import_vietnam_personas(request: Request, replace: bool = False):
+    """匯入 NDJSON 越南訪談記錄"""
+    return await collection_import(vietnam_store, request, replace)
+
+@app.post("/api/vietnam_personas/archive")
+def api_archive_vietnam_personas(req: ArchiveRequest):
+    """將已完成受訪者的訪談記錄移到壓縮冷儲存（未指定 personaIds 時封存所有 isCompleted 的受訪者）"""
+    archived = vietnam_store.archive_completed(req.personaIds)
+    return {"status": "archived", "count": len(archived), "ids": archived}
+
+@app.get("/api/vietnam_personas/{persona_id}/history")
+def api_get_vietnam_persona_history(persona_id: str):
+    """取得單一受訪者的完整訪談記錄（含已封存部分）"""
+    history = vietnam_store.history(persona_id)
+    if history is None:
+        return JSONResponse({"error": "Persona not found"}, status_code=404)
+    return FastJSONResponse({"id": persona_id, "interviewHistory": history})
 
 @app.post("/api/vietnam_personas")
 def api_save_vietnam_persona(persona: Dict[str, Any]):
@@ -1511,27 +1601,30 @@ def api_save_vietnam_persona(persona: Dict[str, Any]):
 @app.delete("/api/vietnam_personas/{persona_id}")
 def api_delete_vietnam_persona(persona_id: str):
     """刪除單一越南訪談記錄"""
-    all_data = load_vietnam_db()
-    filtered = [p for p in all_data if p.get('id') != persona_id]
-    with open(VIETNAM_DB_FILE, "w", encoding="utf-8") as f:
-        json.dump(filtered, f, ensure_ascii=False, indent=2)
+    vietnam_store.delete(persona_id)
     return {"status": "deleted", "id": persona_id}
 
 @app.delete("/api/vietnam_personas")
 def api_clear_vietnam_personas():
     """清除所有越南訪談記錄"""
-    if VIETNAM_DB_FILE.exists():
-        os.remove(VIETNAM_DB_FILE)
+    vietnam_store.clear()
     return {"status": "cleared"}
 
+def persist_history_summary(store: PersonaStore, persona_id: Any) -> Callable[[Dict[str, Any]], None]:
+    """背景更新好的歷史摘要寫回受訪者（只更新摘要欄位；受訪者不在集合中時略過）"""
+    def persist(summary: Dict[str, Any]) -> None:
+        store.append_history(str(persona_id), [], {SUMMARY_FIELD: summary})
+    return persist
+
 @app.post("/api/vietnam_interview")
-def api_vietnam_interview(request: VietnamInterviewRequest):
-    """使用 AI 模擬越南受訪者回答"""
+async def api_vietnam_interview(request: VietnamInterviewRequest):
+    """使用 AI 模擬越南受訪者回答（歷史摘要在背景更新並保存，不拖慢回答）"""
     try:
-        response_text = interview_vietnam_persona(
+        response_text = await ainterview_vietnam_persona(
             request.persona,
             request.question,
-            request.subQuestions
+            request.subQuestions,
+            on_summary=persist_history_summary(vietnam_store, request.persona.get('id')),
         )
         return {"response": response_text}
     except Exception as e:
@@ -1593,87 +1686,292 @@ class BatchInterviewRequest(BaseModel):
     topicTag: Optional[str] = None  # 主題標籤
 
 
+def persona_display_name(persona: Dict[str, Any]) -> str:
+    return f"{persona.get('lastName', '')} {'先生' if persona.get('gender') == 'Male' else '小姐'}"
+
+
+def run_batch_interview_one(persona: Dict[str, Any], request: BatchInterviewRequest, url_context: URLContext) -> Dict[str, Any]:
+    """訪談單一受訪者，回傳結果與新的訪談記錄（尚未儲存）；url_context 為整批共用、已抓取好的網址內容"""
+    persona_id = persona.get('id')
+    # 批量訪談排在互動請求之後（在執行緒池內設定，ContextVar 不會自動帶入）
+    with llm_priority(BATCH):
+        response_text = interview_vietnam_persona(
+            persona,
+            request.question,
+            request.subQuestions,
+            url_context=url_context,
+            raise_on_error=True,  # 失敗的受訪者回報 success: False，不保存錯誤訊息
+        )
+
+    # 建立訪談記錄
+    new_record = {
+        "sectionId": "batch",
+        "questionId": f"batch_{datetime.datetime.now().strftime('%Y%m%d%H%M%S')}_{persona_id}",
+        "question": request.question,
+        "answer": response_text,
+        "timestamp": datetime.datetime.now().isoformat(),
+        "topicTag": request.topicTag if request.topicTag else None
+    }
+
+    return {
+        "personaId": persona_id,
+        "personaName": persona_display_name(persona),
+        "success": True,
+        "response": response_text,
+        "record": new_record
+    }
+
+
+def batch_history_update(persona: Dict[str, Any], result: Dict[str, Any]) -> Tuple[str, List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    成功訪談要寫入的內容 (persona_id, [新記錄], 更新欄位)，交給 vietnam_store.append_history_many
+
+    只接上新記錄（不把訪談期間讀到的舊 persona 整筆存回），同時保存訪談時更新的歷史摘要
+    """
+    fields = {"updatedAt": datetime.datetime.now().isoformat()}
+    if SUMMARY_FIELD in persona:
+        fields[SUMMARY_FIELD] = persona[SUMMARY_FIELD]
+    return persona.get('id'), [result["record"]], fields
+
+
+def batch_interview_outcome(outcome: TaskOutcome) -> Dict[str, Any]:
+    """把執行器的結果轉成 API 回傳格式（失敗者只記錄錯誤）"""
+    persona = outcome.item
+    if outcome.ok:
+        print(f"  ✓ {persona.get('lastName', persona.get('id'))} 回答完成 ({outcome.elapsed:.1f}s)")
+        return outcome.value
+    print(f"  ✗ {persona.get('id')} 訪談失敗: {outcome.error}")
+    return {
+        "personaId": persona.get('id'),
+        "success": False,
+        "error": str(outcome.error)
+    }
+
+
+def prepare_batch_interview(request: BatchInterviewRequest):
+    """
+    找出要訪談的受訪者
+
+    Returns:
+        (results, tasks)：results 依 personaIds 順序預留位置（找不到的受訪者已填入錯誤），
+        tasks 為 (index, persona) 清單
+    """
+    # 只讀取要訪談的受訪者；已封存的訪談記錄一併讀回，prompt 與歷史摘要才會包含先前的回答
+    persona_map: Dict[str, Optional[Dict[str, Any]]] = {}
+    for persona_id in request.personaIds:
+        if persona_id not in persona_map:
+            persona_map[persona_id] = vietnam_store.get(persona_id, include_archived=True)
+
+    results: List[Optional[Dict[str, Any]]] = [None] * len(request.personaIds)
+    tasks = []
+    for index, persona_id in enumerate(request.personaIds):
+        persona = persona_map.get(persona_id)
+        if not persona:
+            results[index] = {
+                "personaId": persona_id,
+                "success": False,
+                "error": "找不到此受訪者"
+            }
+        else:
+            tasks.append((index, persona))
+    return results, tasks
+
+
 @app.post("/api/vietnam_batch_interview")
 def api_vietnam_batch_interview(request: BatchInterviewRequest):
-    """批量訪談 - 讓多位受訪者同時回答同一問題"""
+    """批量訪談 - 讓多位受訪者同時回答同一問題（並行執行，最後一次寫入）"""
     try:
         print(f"📢 批量訪談請求: {len(request.personaIds)} 位受訪者, 問題: {request.question[:50]}...")
 
-        # 載入所有 persona
-        all_personas = load_vietnam_db()
-        persona_map = {p.get('id'): p for p in all_personas}
-
-        results = []
-        for persona_id in request.personaIds:
-            persona = persona_map.get(persona_id)
-            if not persona:
-                results.append({
-                    "personaId": persona_id,
-                    "success": False,
-                    "error": "找不到此受訪者"
-                })
-                continue
+        results, tasks = prepare_batch_interview(request)
+        # 網址內容只跟題目有關：整批只抓取一次，每位受訪者的 prompt 直接使用
+        url_context = extract_and_fetch_urls(request.question, request.subQuestions)
 
-            try:
-                # 呼叫 AI 訪談
-                response_text = interview_vietnam_persona(
-                    persona,
-                    request.question,
-                    request.subQuestions
-                )
-
-                # 建立訪談記錄
-                new_record = {
-                    "sectionId": "batch",
-                    "questionId": f"batch_{datetime.datetime.now().strftime('%Y%m%d%H%M%S')}_{persona_id}",
-                    "question": request.question,
-                    "answer": response_text,
-                    "timestamp": datetime.datetime.now().isoformat(),
-                    "topicTag": request.topicTag if request.topicTag else None
-                }
+        updates = []
+        outcomes = run_all(
+            [persona for _, persona in tasks],
+            lambda persona: run_batch_interview_one(persona, request, url_context),
+            budget=batch_token_budget,
+        )
+        for (index, persona), outcome in zip(tasks, outcomes):
+            results[index] = batch_interview_outcome(outcome)
+            if outcome.ok:
+                updates.append(batch_history_update(persona, outcome.value))
 
-                # 更新 persona 的訪談記錄
-                if "interviewHistory" not in persona:
-                    persona["interviewHistory"] = []
-                persona["interviewHistory"].append(new_record)
-                persona["updatedAt"] = datetime.datetime.now().isoformat()
-
-                # 儲存更新
-                save_vietnam_db(persona)
-
-                results.append({
-                    "personaId": persona_id,
-                    "personaName": f"{persona.get('lastName', '')} {'先生' if persona.get('gender') == 'Male' else '小姐'}",
-                    "success": True,
-                    "response": response_text,
-                    "record": new_record
-                })
-                print(f"  ✓ {persona.get('lastName', persona_id)} 回答完成")
-
-            except Exception as e:
-                print(f"  ✗ {persona_id} 訪談失敗: {e}")
-                results.append({
-                    "personaId": persona_id,
-                    "success": False,
-                    "error": str(e)
-                })
+        # 所有成功的訪談記錄一次接到受訪者目前的資料之後（不會覆蓋訪談期間的其他修改）
+        if updates:
+            vietnam_store.append_history_many(updates)
 
         success_count = sum(1 for r in results if r.get('success'))
         print(f"📢 批量訪談完成: {success_count}/{len(request.personaIds)} 成功")
 
-        return {
+        return FastJSONResponse({
             "question": request.question,
             "topicTag": request.topicTag,
             "totalRequested": len(request.personaIds),
             "successCount": success_count,
             "results": results
-        }
+        })
 
     except Exception as e:
         print(f"批量訪談錯誤: {e}")
         return JSONResponse({"error": str(e)}, status_code=500)
 
 
+@app.post("/api/vietnam_batch_interview/stream")
+def api_vietnam_batch_interview_stream(request: BatchInterviewRequest):
+    """
+    批量訪談（SSE 串流版）
+
+    每位受訪者完成時立即送出 `batch_result`（含目前的成功 / 失敗數），
+    全部完成後送出 `done` 與總結；成功的訪談記錄在結束時（或連線中斷時）一次接到受訪者目前的資料之後。
+    模型呼叫失敗的受訪者（run_batch_interview_one 以 raise_on_error 呼叫）計為失敗，不會寫入。
+    """
+    print(f"📢 批量訪談（串流）: {len(request.personaIds)} 位受訪者, 問題: {request.question[:50]}...")
+    results, tasks = prepare_batch_interview(request)
+    total = len(request.personaIds)
+
+    def generate_sse():
+        updates = []
+        success_count = 0
+        failure_count = 0
+
+        def progress_event(index: int, result: Dict[str, Any]) -> bytes:
+            return sse_event({'batch_result': {
+                **result,
+                "index": index,
+                "completed": success_count + failure_count,
+                "successCount": success_count,
+                "failureCount": failure_count,
+                "totalRequested": total,
+            }})
+
+        try:
+            yield sse_event({'batch_start': {
+                "question": request.question,
+                "topicTag": request.topicTag,
+                "totalRequested": total,
+            }})
+            for index, result in enumerate(results):
+                if result is not None:
+                    failure_count += 1
+                    yield progress_event(index, result)
+
+            url_context = extract_and_fetch_urls(request.question, request.subQuestions)
+            outcomes = run_concurrently(
+                [persona for _, persona in tasks],
+                lambda persona: run_batch_interview_one(persona, request, url_context),
+                budget=batch_token_budget,
+            )
+            for outcome in outcomes:
+                index = tasks[outcome.index][0]
+                result = batch_interview_outcome(outcome)
+                results[index] = result
+                if outcome.ok:
+                    updates.append(batch_history_update(outcome.item, outcome.value))
+                    success_count += 1
+                else:
+                    failure_count += 1
+                yield progress_event(index, result)
+
+            print(f"📢 批量訪談（串流）完成: {success_count}/{total} 成功")
+            yield sse_event({
+                'done': True,
+                "question": request.question,
+                "topicTag": request.topicTag,
+                "totalRequested": total,
+                "successCount": success_count,
+                "failureCount": failure_count,
+                "results": results,
+            })
+        except Exception as exc:
+            print(f"批量訪談（串流）錯誤: {exc}")
+            yield sse_event({'error': str(exc)})
+            yield sse_event({'done': True})
+        finally:
+            # 客戶端中途斷線時，已完成的訪談也會保存
+            if updates:
+                vietnam_store.append_history_many(updates)
+
+    return StreamingResponse(
+        generate_sse(),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+    )
+
+
+# ========== Interview Campaigns (背景訪談活動) ==========
+class CampaignQuestion(BaseModel):
+    question: str
+    subQuestions: List[str] = []
+    topicTag: Optional[str] = None
+
+
+class CampaignRequest(BaseModel):
+    """訪談活動：一組受訪者 × 一份問卷，在伺服器端背景執行"""
+    personaIds: List[str]
+    questions: List[CampaignQuestion]
+    name: Optional[str] = None
+
+
+CAMPAIGN_DIR = Path("server/campaigns")
+campaign_manager = CampaignManager(
+    # 模型呼叫失敗時拋出，該題記為 failed（之後可重試），不會把錯誤訊息存成回答
+    vietnam_store, functools.partial(interview_vietnam_persona, raise_on_error=True), CAMPAIGN_DIR,
+    budget=batch_token_budget, prefetch_fn=extract_and_fetch_urls,
+)
+
+
+@app.on_event("startup")
+async def resume_campaigns():
+    """重啟後繼續執行中斷的訪談活動"""
+    campaign_manager.resume_incomplete()
+
+
+@app.on_event("shutdown")
+async def close_url_fetcher_clients():
+    """關閉網址抓取的 AsyncClient 與連線"""
+    await aclose_async_clients()
+
+
+@app.post("/api/vietnam_campaigns")
+def api_create_vietnam_campaign(req: CampaignRequest):
+    """建立並開始訪談活動"""
+    if not req.personaIds or not req.questions:
+        return JSONResponse({"error": "personaIds 與 questions 不可為空"}, status_code=400)
+    print(f"📋 訪談活動: {len(req.personaIds)} 位受訪者 × {len(req.questions)} 題")
+    return campaign_manager.create(req.personaIds, [q.model_dump() for q in req.questions], name=req.name)
+
+
+@app.get("/api/vietnam_campaigns")
+def api_list_vietnam_campaigns():
+    """列出所有訪談活動與進度"""
+    return campaign_manager.list()
+
+
+@app.get("/api/vietnam_campaigns/{job_id}")
+def api_get_vietnam_campaign(job_id: str):
+    """取得訪談活動進度（含每位受訪者每一題的狀態）"""
+    job = campaign_manager.get(job_id)
+    if job is None:
+        return JSONResponse({"error": "Campaign not found"}, status_code=404)
+    return FastJSONResponse(job)
+
+
+@app.post("/api/vietnam_campaigns/{job_id}/{action}")
+def api_control_vietnam_campaign(job_id: str, action: Literal["pause", "resume", "cancel"]):
+    """暫停 / 繼續 / 取消訪談活動（進行中的題目會先完成並保存）"""
+    handlers = {
+        "pause": campaign_manager.pause,
+        "resume": campaign_manager.start,
+        "cancel": campaign_manager.cancel,
+    }
+    summary = handlers[action](job_id)
+    if summary is None:
+        return JSONResponse({"error": "Campaign not found"}, status_code=404)
+    return summary
+
+
 @app.post("/api/vietnam_analysis")
 def api_vietnam_analysis(request: AnalysisRequest):
     """分析多位受訪者對同一問題的回答"""
@@ -1781,30 +2079,50 @@ def api_vietnam_semantic_group(request: SemanticGroupRequest):
 
 # ========== Vietnam Interview 2 API Endpoints (Independent Copy) ==========
 VIETNAM2_DB_FILE = Path("server/vietnam2_personas.json")
+VIETNAM2_ARCHIVE_DIR = Path("server/archive/vietnam2_personas")
+vietnam2_store = PersonaStore(VIETNAM2_DB_FILE, archive=TranscriptArchive(VIETNAM2_ARCHIVE_DIR))
 
-def load_vietnam2_db() -> List[Dict[str, Any]]:
+def load_vietnam2_db(include_archived: bool = False) -> List[Dict[str, Any]]:
     """從 JSON 檔案讀取越南訪談資料 (副本)"""
-    if not VIETNAM2_DB_FILE.exists():
-        return []
-    try:
-        with open(VIETNAM2_DB_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except Exception as e:
-        print(f"讀取越南2資料庫失敗: {e}")
-        return []
+    return vietnam2_store.load(include_archived)
 
 def save_vietnam2_db(persona: Dict[str, Any]):
     """儲存/更新越南訪談資料 (副本)"""
-    all_data = load_vietnam2_db()
-    data_map = {p.get('id'): p for p in all_data}
-    data_map[persona.get('id')] = persona
-    with open(VIETNAM2_DB_FILE, "w", encoding="utf-8") as f:
-        json.dump(list(data_map.values()), f, ensure_ascii=False, indent=2)
+    vietnam2_store.save(persona)
 
 @app.get("/api/vietnam2_personas")
-def api_get_vietnam2_personas():
-    """取得所有越南訪談記錄 (副本)"""
-    return load_vietnam2_db()
+def api_get_vietnam2_personas(request: Request, include_archived: bool = False):
+    """取得所有越南訪談記錄 (副本，支援 ETag / If-None-Match)"""
+    return collection_response(vietnam2_store, request, include_archived)
+
+@app.get("/api/vietnam2_personas/changes")
+def api_get_vietnam2_persona_changes(since: int = 0):
+    """增量同步 (副本)"""
+    return collection_changes_response(vietnam2_store, since)
+
+@app.get("/api/vietnam2_personas/export")
+def api_export_vietnam2_personas():
+    """以 NDJSON 串流匯出所有越南訪談記錄 (副本)"""
+    return collection_export_response(vietnam2_store)
+
+@app.post("/api/vietnam2_personas/import")
+async def api_import_vietnam2_personas(request: Request, replace: bool = False):
+    """匯入 NDJSON 越南訪談記錄 (副本)"""
+    return await collection_import(vietnam2_store, request, replace)
+
+@app.post("/api/vietnam2_personas/archive")
+def api_archive_vietnam2_personas(req: ArchiveRequest):
+    """將已完成受訪者的訪談記錄移到壓縮冷儲存 (副本)"""
+    archived = vietnam2_store.archive_completed(req.personaIds)
+    return {"status": "archived", "count": len(archived), "ids": archived}
+
+@app.get("/api/vietnam2_personas/{persona_id}/history")
+def api_get_vietnam2_persona_history(persona_id: str):
+    """取得單一受訪者的完整訪談記錄 (副本)"""
+    history = vietnam2_store.history(persona_id)
+    if history is None:
+        return JSONResponse({"error": "Persona not found"}, status_code=404)
+    return FastJSONResponse({"id": persona_id, "interviewHistory": history})
 
 @app.post("/api/vietnam2_personas")
 def api_save_vietnam2_persona(persona: Dict[str, Any]):
@@ -1815,28 +2133,25 @@ def api_save_vietnam2_persona(persona: Dict[str, Any]):
 @app.delete("/api/vietnam2_personas/{persona_id}")
 def api_delete_vietnam2_persona(persona_id: str):
     """刪除單一越南訪談記錄 (副本)"""
-    all_data = load_vietnam2_db()
-    filtered = [p for p in all_data if p.get('id') != persona_id]
-    with open(VIETNAM2_DB_FILE, "w", encoding="utf-8") as f:
-        json.dump(filtered, f, ensure_ascii=False, indent=2)
+    vietnam2_store.delete(persona_id)
     return {"status": "deleted", "id": persona_id}
 
 @app.delete("/api/vietnam2_personas")
 def api_clear_vietnam2_personas():
     """清除所有越南訪談記錄 (副本)"""
-    if VIETNAM2_DB_FILE.exists():
-        os.remove(VIETNAM2_DB_FILE)
+    vietnam2_store.clear()
     return {"status": "cleared"}
 
 @app.post("/api/vietnam2_interview")
-def api_vietnam2_interview(request: VietnamInterviewRequest):
+async def api_vietnam2_interview(request: VietnamInterviewRequest):
     """使用 AI 生成第三方觀察者視角的訪談記錄 (Observer Notes)"""
     try:
         # 使用第三方觀察者視角輸出
-        response_text = interview_vietnam_persona_observer(
+        response_text = await ainterview_vietnam_persona_observer(
             request.persona,
             request.question,
-            request.subQuestions
+            request.subQuestions,
+            on_summary=persist_history_summary(vietnam2_store, request.persona.get('id')),
         )
         return {"response": response_text}
     except Exception as e:
@@ -1948,7 +2263,7 @@ def api_ppv_diversity(request: DiversityAnalysisRequest):
     try:
         print(f"📊 收到 PPV 多樣性分析請求: {len(request.personas)} personas")
         metrics = analyze_persona_diversity(request.personas, request.entropy_threshold)
-        return metrics
+        return FastJSONResponse(metrics)
     except Exception as e:
         print(f"PPV 分析錯誤: {e}")
         return JSONResponse({"error": str(e)}, status_code=500)
@@ -1973,7 +2288,7 @@ def api_vietnam_ppv_diversity():
             return {"error": "No personas found"}
         print(f"📊 分析 Vietnam personas 多樣性: {len(personas)} personas")
         metrics = analyze_persona_diversity(personas)
-        return metrics
+        return FastJSONResponse(metrics)
     except Exception as e:
         print(f"Vietnam PPV 分析錯誤: {e}")
         return JSONResponse({"error": str(e)}, status_code=500)
@@ -1987,7 +2302,7 @@ def api_vietnam2_ppv_diversity():
             return {"error": "No personas found"}
         print(f"📊 分析 Observer Notes personas 多樣性: {len(personas)} personas")
         metrics = analyze_persona_diversity(personas)
-        return metrics
+        return FastJSONResponse(metrics)
     except Exception as e:
         print(f"Observer Notes PPV 分析錯誤: {e}")
         return JSONResponse({"error": str(e)}, status_code=500)
@@ -2013,7 +2328,7 @@ def api_all_ppv_diversity():
             "total": len(all_personas)
         }
 
-        return metrics
+        return FastJSONResponse(metrics)
     except Exception as e:
         print(f"All PPV 分析錯誤: {e}")
         return JSONResponse({"error": str(e)}, status_code=500)
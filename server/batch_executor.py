@@ -0,0 +1,121 @@
+"""
+批量訪談執行器
+在有限的並行度與 token 速率預算內同時執行多位受訪者的訪談：
+- 並行度上限：BATCH_INTERVIEW_CONCURRENCY（預設 8）
+- token 預算：BATCH_INTERVIEW_TPM（每分鐘 token 數，0 表示不限制）
+- 每位受訪者的錯誤互相隔離，單一失敗不影響其他人
+"""
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Generic, Iterable, Iterator, List, Optional, TypeVar
+
+MAX_CONCURRENCY = int(os.getenv("BATCH_INTERVIEW_CONCURRENCY", "8"))
+TOKENS_PER_MINUTE = int(os.getenv("BATCH_INTERVIEW_TPM", "0"))
+# 單次訪談的預估 token（persona prompt + 回答上限），用於預算扣除
+TOKENS_PER_CALL = int(os.getenv("BATCH_INTERVIEW_TOKENS_PER_CALL", "4000"))
+
+T = TypeVar("T")
+
+
+class TokenBudget:
+    """每分鐘 token 數的 token bucket；acquire 會等到預算足夠為止"""
+
+    def __init__(self, tokens_per_minute: int) -> None:
+        self.capacity = float(tokens_per_minute)
+        self.rate = tokens_per_minute / 60.0
+        self._available = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._available = min(self.capacity, self._available + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, tokens: int) -> float:
+        """扣除 tokens（超過容量時以容量計），回傳等待的秒數"""
+        tokens = min(float(tokens), self.capacity)
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self._available >= tokens:
+                    self._available -= tokens
+                    return waited
+                delay = (tokens - self._available) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+def default_budget() -> Optional[TokenBudget]:
+    return TokenBudget(TOKENS_PER_MINUTE) if TOKENS_PER_MINUTE > 0 else None
+
+
+@dataclass
+class TaskOutcome(Generic[T]):
+    """單一工作的結果：index 為輸入順序，成功時 value 有值，失敗時 error 有值"""
+    index: int
+    item: T
+    value: Any = None
+    error: Optional[BaseException] = None
+    elapsed: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def run_concurrently(
+    items: Iterable[T],
+    fn: Callable[[T], Any],
+    max_concurrency: int = MAX_CONCURRENCY,
+    budget: Optional[TokenBudget] = None,
+    tokens_per_call: int = TOKENS_PER_CALL,
+    should_stop: Optional[Callable[[], bool]] = None,
+) -> Iterator[TaskOutcome[T]]:
+    """
+    以有限並行度執行 fn(item)，依完成順序逐一產生 TaskOutcome
+
+    - fn 拋出的例外會被收進 TaskOutcome.error，不會中斷其他工作
+    - 有 budget 時，每個工作開始前先扣除 tokens_per_call
+    - should_stop() 回傳 True 後不再送出新工作（已開始的會跑完）
+    """
+    items = list(items)
+    if not items:
+        return
+
+    def call(index: int, item: T) -> TaskOutcome[T]:
+        if budget is not None:
+            budget.acquire(tokens_per_call)
+        start = time.perf_counter()
+        try:
+            return TaskOutcome(index, item, value=fn(item), elapsed=time.perf_counter() - start)
+        except Exception as e:
+            return TaskOutcome(index, item, error=e, elapsed=time.perf_counter() - start)
+
+    workers = max(1, min(max_concurrency, len(items)))
+    pending: Dict[Future, int] = {}
+    next_index = 0
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch") as pool:
+        while next_index < len(items) or pending:
+            # 只維持 workers 個進行中的工作，停止時可以立刻不再送出
+            while next_index < len(items) and len(pending) < workers:
+                if should_stop is not None and should_stop():
+                    next_index = len(items)
+                    break
+                pending[pool.submit(call, next_index, items[next_index])] = next_index
+                next_index += 1
+            if not pending:
+                break
+            done, _ = wait(list(pending.keys()), return_when=FIRST_COMPLETED)
+            for future in done:
+                pending.pop(future)
+                yield future.result()
+
+
+def run_all(items: Iterable[T], fn: Callable[[T], Any], **kwargs: Any) -> List[TaskOutcome[T]]:
+    """執行全部工作，依輸入順序回傳結果"""
+    return sorted(run_concurrently(items, fn, **kwargs), key=lambda outcome: outcome.index)
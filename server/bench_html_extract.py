@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+HTML 轉文字效能測試
+以 tests/fixtures/html 的頁面（依保險公司行銷頁面的結構產生：大型選單、內嵌狀態 JSON 與追蹤碼、
+保障表、FAQ、舊式表格版面、前端框架殼、很長的條款頁）比較 html_extract 各 backend：
+- bs4：原本的實作（BeautifulSoup + html.parser），作為基準
+- stream：標準庫 HTMLParser 串流解析
+- lxml / selectolax：C 實作（有安裝時）
+
+用法：
+    python server/bench_html_extract.py [--dir PATH] [--rounds N] [--max-length N]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import html_extract  # noqa: E402
+
+
+def bench(fn, rounds):
+    fn()  # warm-up
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - start) / rounds * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTML extraction benchmark")
+    parser.add_argument("--dir", default=str(Path(__file__).parent / "tests" / "fixtures" / "html"))
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--max-length", type=int, default=2000)
+    args = parser.parse_args()
+
+    backends = html_extract.available_backends()
+    pages = sorted(Path(args.dir).glob("*.html"))
+    print(f"📦 {len(pages)} pages, backends: {', '.join(backends)}, "
+          f"auto = {html_extract.resolve_backend('auto')}, max_length: {args.max_length}\n")
+    print(f"  {'page':<26} {'KB':>6}" + "".join(f"{name:>13}" for name in backends) + "   (ms/op)")
+
+    totals = {name: 0.0 for name in backends}
+    for path in pages:
+        html = path.read_text(encoding="utf-8")
+        # 正確性：各 backend 取出的標題與內容需一致
+        expected = html_extract.extract_page(html, args.max_length, "stream")
+        row = f"  {path.name:<26} {len(html.encode('utf-8')) / 1024:6.0f}"
+        for name in backends:
+            assert html_extract.extract_page(html, args.max_length, name) == expected, f"{name} mismatch on {path.name}"
+            elapsed = bench(lambda: html_extract.extract_page(html, args.max_length, name), args.rounds)
+            totals[name] += elapsed
+            row += f"{elapsed:13.2f}"
+        print(row)
+
+    print(f"  {'total':<33}" + "".join(f"{totals[name]:13.2f}" for name in backends))
+    if "bs4" in totals:
+        print()
+        for name in backends:
+            if name != "bs4":
+                print(f"✓ {name} speedup vs bs4: {totals['bs4'] / totals[name]:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+JSON 序列化效能測試
+以真實的 vietnam_personas.json 比較：
+1. FastAPI 預設路徑（jsonable_encoder + Starlette JSONResponse 的 json.dumps）
+2. 標準 json.dumps
+3. fast_json.dumps（orjson，未安裝時等同標準 json）
+4. PersonaStore 的版本快取（同一版本重複請求）
+
+用法：
+    python server/bench_json_serialization.py [--file PATH] [--rounds N]
+"""
+import argparse
+import json
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import fast_json  # noqa: E402
+from persona_store import PersonaStore  # noqa: E402
+
+try:
+    from fastapi.encoders import jsonable_encoder
+except ImportError:
+    jsonable_encoder = None
+
+
+def starlette_render(data):
+    return json.dumps(data, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def bench(label, fn, rounds):
+    fn()  # warm-up
+    size = 0
+    start = time.perf_counter()
+    for _ in range(rounds):
+        size = len(fn())
+    elapsed = time.perf_counter() - start
+    per_op_ms = elapsed / rounds * 1000
+    throughput = size * rounds / elapsed / (1024 * 1024) if elapsed else float("inf")
+    print(f"  {label:<38} {per_op_ms:9.3f} ms/op   {throughput:9.1f} MB/s   {size / 1024:8.1f} KB")
+    return per_op_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description="JSON serialization benchmark")
+    parser.add_argument("--file", default=str(Path(__file__).parent / "vietnam_personas.json"))
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args()
+
+    path = Path(args.file)
+    data = json.loads(path.read_text(encoding="utf-8"))
+    print(f"📦 {path.name}: {len(data)} personas, {path.stat().st_size / 1024:.1f} KB on disk")
+    print(f"   orjson available: {fast_json.ORJSON_AVAILABLE}, rounds: {args.rounds}\n")
+
+    # 正確性：輸出需可還原為相同資料，且不轉義非 ASCII 字元
+    encoded = fast_json.dumps(data)
+    assert json.loads(encoded) == data, "fast_json round-trip mismatch"
+    assert any(ord(ch) > 127 for ch in encoded.decode("utf-8")), "non-ASCII text was escaped"
+
+    results = {}
+    if jsonable_encoder is not None:
+        results["fastapi"] = bench(
+            "FastAPI default (jsonable_encoder)", lambda: starlette_render(jsonable_encoder(data)), args.rounds
+        )
+    results["stdlib"] = bench("json.dumps (Starlette render)", lambda: starlette_render(data), args.rounds)
+    results["fast"] = bench("fast_json.dumps", lambda: fast_json.dumps(data), args.rounds)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store_path = Path(tmp) / path.name
+        shutil.copy(path, store_path)
+        store = PersonaStore(store_path)
+        store.encoded_body()
+        results["cached"] = bench("PersonaStore cached body", store.encoded_body, args.rounds)
+
+    print("\n📊 SSE events (1000 small chunks):")
+    chunk = {"chunk": "Tôi thường mua bảo hiểm du lịch 旅遊險"}
+    bench("json.dumps SSE", lambda: b"".join(
+        f"data: {json.dumps(chunk)}\n\n".encode("utf-8") for _ in range(1000)), max(1, args.rounds // 5))
+    bench("fast_json.sse_event", lambda: b"".join(
+        fast_json.sse_event(chunk) for _ in range(1000)), max(1, args.rounds // 5))
+
+    baseline = results.get("fastapi", results["stdlib"])
+    print(f"\n✓ fast_json speedup vs baseline: {baseline / results['fast']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+url_fetcher 效能測試（離線，使用 html_fixture_server 的 corpus）
+每個頁面分別量測：
+- static：一般 HTTP 抓取 + 擷取（fetch_url_content）
+- playwright：瀏覽器池渲染 + 擷取（fetch_url_with_playwright；未安裝 Playwright / Chromium 時略過）
+- 擷取 CPU：只跑 html_extract（不含網路）
+並回報內容長度與品質（manifest 的 expect 命中比例 recall、reject 出現次數 noise）。
+最後以 fetch_multiple_urls 量測整組頁面：cold（清空快取）與 warm（快取命中 / 304 重新驗證）。
+
+用法：
+    python server/bench_url_fetcher.py [--latency-ms 80] [--rounds 5] [--max-length 2000] [--no-playwright] [--json out.json]
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import html_extract  # noqa: E402
+import url_fetcher  # noqa: E402
+from html_fixture_server import DEFAULT_CORPUS, FixtureServer  # noqa: E402
+from url_cache import get_url_cache  # noqa: E402
+
+
+def timed(fn, rounds):
+    result = fn()  # warm-up（建立連線、啟動瀏覽器）
+    start = time.perf_counter()
+    for _ in range(rounds):
+        result = fn()
+    return result, (time.perf_counter() - start) / rounds * 1000
+
+
+def playwright_ready(url):
+    if not url_fetcher.PLAYWRIGHT_AVAILABLE:
+        return "Playwright 未安裝"
+    result = url_fetcher.fetch_url_with_playwright(url, wait_time=0)
+    return None if result["success"] else result["error"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="url_fetcher benchmark on the offline fixture corpus")
+    parser.add_argument("--dir", default=str(DEFAULT_CORPUS))
+    parser.add_argument("--latency-ms", type=float, default=80.0)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--max-length", type=int, default=2000)
+    parser.add_argument("--no-playwright", action="store_true")
+    parser.add_argument("--json", help="把結果寫成 JSON（CI 比較用）")
+    args = parser.parse_args()
+
+    report = {"latencyMs": args.latency_ms, "maxLength": args.max_length,
+              "parser": html_extract.resolve_backend(), "pages": [], "sets": {}}
+    with FixtureServer(Path(args.dir), latency_ms=args.latency_ms) as server:
+        skip_playwright = "--no-playwright" if args.no_playwright else playwright_ready(server.url(server.pages[0]))
+        print(f"📄 {len(server.pages)} pages, latency {args.latency_ms:.0f} ms, parser {report['parser']}, "
+              f"playwright: {'skipped (' + skip_playwright + ')' if skip_playwright else 'on'}\n")
+        print(f"  {'page':<26} {'path':<10} {'ms':>8} {'cpu ms':>8} {'chars':>6} {'recall':>7} {'noise':>6}")
+
+        for page in server.pages:
+            url = server.url(page)
+            html = (Path(args.dir) / page.file).read_text(encoding="utf-8")
+            _, cpu_ms = timed(lambda: html_extract.extract_page(html, args.max_length), args.rounds)
+            paths = [("static", lambda: url_fetcher.fetch_url_content(url, args.max_length))]
+            if not skip_playwright:
+                paths.append(("playwright", lambda: url_fetcher.fetch_url_with_playwright(url, args.max_length)))
+            for name, fetch in paths:
+                result, elapsed = timed(fetch, args.rounds)
+                quality = page.quality(result["content"])
+                row = {"page": page.file, "path": name, "ms": round(elapsed, 2),
+                       "cpuMs": round(cpu_ms, 2) if name == "static" else None,
+                       "chars": len(result["content"]), **quality}
+                report["pages"].append(row)
+                cpu = f"{cpu_ms:8.2f}" if name == "static" else f"{'':>8}"
+                print(f"  {page.file:<26} {name:<10} {elapsed:8.1f} {cpu} {row['chars']:6d} "
+                      f"{quality['recall']:7.2f} {quality['noise']:6d}{'  (JS)' if page.js_rendered else ''}")
+
+        # 整組頁面（同一題目中的多個網址）：同時抓取 + 快取
+        urls = [server.url(page) for page in server.pages]
+        use_playwright = not skip_playwright
+        print(f"\n📦 fetch_multiple_urls ({len(urls)} URLs, use_playwright={use_playwright}):")
+        for label in ("cold", "warm"):
+            if label == "cold":
+                get_url_cache().clear()
+            server.reset_stats()
+            start = time.perf_counter()
+            results = url_fetcher.fetch_multiple_urls(urls, args.max_length, use_playwright=use_playwright)
+            elapsed = (time.perf_counter() - start) * 1000
+            requests = server.stats()
+            full = sum(counts["full"] for counts in requests.values())
+            not_modified = sum(counts["notModified"] for counts in requests.values())
+            recall = sum(page.quality(r["content"])["recall"] for page, r in zip(server.pages, results)) / len(urls)
+            report["sets"][label] = {"ms": round(elapsed, 1), "fullResponses": full, "notModified": not_modified,
+                                     "meanRecall": round(recall, 3)}
+            print(f"  {label:<5} {elapsed:8.1f} ms   full responses {full}, 304 {not_modified}, mean recall {recall:.2f}")
+        report["cache"] = get_url_cache().stats()
+        print(f"  cache: {report['cache']}")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"\n✓ 結果已寫入 {args.json}")
+
+
+if __name__ == "__main__":
+    main()
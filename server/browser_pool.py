@@ -0,0 +1,231 @@
+"""
+Playwright 瀏覽器池
+url_fetcher 原本每個 URL 都重新啟動一次 Chromium（數秒），載入後再固定等 3 秒；改為程序內常駐一個瀏覽器：
+- 專用執行緒跑 event loop 與 playwright.async_api，同步 / 非同步呼叫端都把工作交給它
+  （Playwright 物件不能跨執行緒使用，同時也讓多個頁面可以並行載入）
+- 最多 URL_FETCHER_BROWSER_PAGES 組 context + page 重複使用，也就是同時最多這麼多頁面在載入
+- 每組導航 URL_FETCHER_PAGE_MAX_USES 次後關閉重建，避免記憶體與 cookie 累積
+- 取用前做健康檢查：瀏覽器斷線就重新啟動，page 已關閉或導航失敗就丟棄重建
+- 載入到 domcontentloaded 後最多再等 wait_ms 讓網路靜止（networkidle），提早靜止就不再等待
+- 不下載圖片、字型與影音（只需要頁面文字）
+"""
+import asyncio
+import atexit
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+# Playwright 為可選依賴
+try:
+    from playwright.async_api import TimeoutError as PlaywrightTimeoutError, async_playwright
+    PLAYWRIGHT_AVAILABLE = True
+except ImportError:
+    PLAYWRIGHT_AVAILABLE = False
+
+POOL_SIZE = int(os.getenv("URL_FETCHER_BROWSER_PAGES", "4"))
+MAX_USES = int(os.getenv("URL_FETCHER_PAGE_MAX_USES", "50"))
+NAVIGATION_TIMEOUT_MS = 15000
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+BLOCKED_RESOURCES = {"image", "media", "font"}
+
+
+@dataclass
+class PageSnapshot:
+    url: str  # 轉址後的最終 URL
+    title: str
+    html: str
+    elapsed: float  # 取用頁面 + 載入的秒數
+    headers: Dict[str, str] = field(default_factory=dict)  # 主文件的 response headers（快取驗證用）
+
+
+class _Slot:
+    """一組可重複使用的 context + page"""
+
+    def __init__(self, context: Any, page: Any, generation: int) -> None:
+        self.context = context
+        self.page = page
+        self.generation = generation  # 建立時的瀏覽器世代；瀏覽器重啟後舊的 slot 一律丟棄
+        self.uses = 0
+
+
+async def _block_heavy_resources(route: Any) -> None:
+    if route.request.resource_type in BLOCKED_RESOURCES:
+        await route.abort()
+    else:
+        await route.continue_()
+
+
+class BrowserPool:
+    def __init__(self, size: int = POOL_SIZE, max_uses: int = MAX_USES) -> None:
+        self.size = max(1, size)
+        self.max_uses = max(1, max_uses)
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        # 以下只在 pool 的 event loop 中使用
+        self._slots = asyncio.Semaphore(self.size)
+        self._idle: List[_Slot] = []
+        self._playwright: Any = None
+        self._browser: Any = None
+        self._generation = 0
+        self._stats = {"launches": 0, "navigations": 0, "failures": 0, "recycled": 0, "discarded": 0}
+
+    # ---------- event loop ----------
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                ready = threading.Event()
+
+                def run() -> None:
+                    asyncio.set_event_loop(loop)
+                    loop.call_soon(ready.set)
+                    loop.run_forever()
+
+                self._thread = threading.Thread(target=run, name="browser-pool", daemon=True)
+                self._thread.start()
+                ready.wait()
+                self._loop = loop
+            return self._loop
+
+    # ---------- 瀏覽器與頁面 ----------
+
+    async def _ensure_browser(self) -> Any:
+        if self._browser is not None and self._browser.is_connected():
+            return self._browser
+        if self._browser is not None:
+            print("  ⚠️ [BrowserPool] 瀏覽器已斷線，重新啟動")
+        if self._playwright is None:
+            self._playwright = await async_playwright().start()
+        self._browser = await self._playwright.chromium.launch(headless=True)
+        self._generation += 1
+        self._stats["launches"] += 1
+        return self._browser
+
+    def _healthy(self, slot: _Slot) -> bool:
+        return slot.generation == self._generation and slot.uses < self.max_uses and not slot.page.is_closed()
+
+    async def _close_slot(self, slot: _Slot) -> None:
+        try:
+            await slot.context.close()
+        except Exception:
+            pass  # 瀏覽器已斷線時 context 也已經不在了
+
+    async def _acquire(self) -> _Slot:
+        await self._slots.acquire()
+        try:
+            browser = await self._ensure_browser()
+            while self._idle:
+                slot = self._idle.pop()
+                if self._healthy(slot):
+                    return slot
+                self._stats["recycled" if slot.uses >= self.max_uses else "discarded"] += 1
+                await self._close_slot(slot)
+            context = await browser.new_context(
+                viewport={'width': 1280, 'height': 800},
+                locale='vi-VN',  # 越南語環境
+                user_agent=USER_AGENT,
+            )
+            await context.route("**/*", _block_heavy_resources)
+            page = await context.new_page()
+            page.set_default_timeout(NAVIGATION_TIMEOUT_MS)
+            return _Slot(context, page, self._generation)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    async def _release(self, slot: _Slot, ok: bool) -> None:
+        slot.uses += 1
+        try:
+            if ok and self._healthy(slot):
+                self._idle.append(slot)
+            else:
+                self._stats["recycled" if ok else "discarded"] += 1
+                await self._close_slot(slot)
+        finally:
+            self._slots.release()
+
+    async def _fetch(self, url: str, wait_ms: int, timeout_ms: int) -> PageSnapshot:
+        started = time.perf_counter()
+        slot = await self._acquire()
+        ok = False
+        try:
+            page = slot.page
+            response = await page.goto(url, wait_until='domcontentloaded', timeout=timeout_ms)
+            if wait_ms > 0:
+                try:
+                    await page.wait_for_load_state('networkidle', timeout=wait_ms)
+                except PlaywrightTimeoutError:
+                    pass  # 有輪詢或追蹤碼的頁面可能永遠不會 networkidle，DOM 已經可用
+            snapshot = PageSnapshot(
+                page.url, await page.title(), await page.content(), time.perf_counter() - started,
+                headers=dict(response.headers) if response is not None else {},
+            )
+            ok = True
+            self._stats["navigations"] += 1
+            return snapshot
+        except BaseException:
+            self._stats["failures"] += 1
+            raise
+        finally:
+            await self._release(slot, ok)
+
+    # ---------- 公開介面 ----------
+
+    def fetch(self, url: str, wait_ms: int = 3000, timeout_ms: int = NAVIGATION_TIMEOUT_MS) -> PageSnapshot:
+        """載入頁面並回傳渲染後的 HTML（可從任何執行緒呼叫）"""
+        if not PLAYWRIGHT_AVAILABLE:
+            raise RuntimeError("Playwright 未安裝")
+        future = asyncio.run_coroutine_threadsafe(self._fetch(url, wait_ms, timeout_ms), self._ensure_loop())
+        return future.result()
+
+    async def afetch(self, url: str, wait_ms: int = 3000, timeout_ms: int = NAVIGATION_TIMEOUT_MS) -> PageSnapshot:
+        """fetch 的非同步版本（等待時不佔用呼叫端的執行緒）"""
+        if not PLAYWRIGHT_AVAILABLE:
+            raise RuntimeError("Playwright 未安裝")
+        future = asyncio.run_coroutine_threadsafe(self._fetch(url, wait_ms, timeout_ms), self._ensure_loop())
+        return await asyncio.wrap_future(future)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._stats, "size": self.size, "idlePages": len(self._idle)}
+
+    async def _shutdown(self) -> None:
+        while self._idle:
+            await self._close_slot(self._idle.pop())
+        if self._browser is not None:
+            try:
+                await self._browser.close()
+            except Exception:
+                pass
+            self._browser = None
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+
+    def close(self) -> None:
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is None:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._shutdown(), loop).result(timeout=10)
+        except Exception as e:
+            print(f"  ⚠️ [BrowserPool] 關閉失敗: {e}")
+        loop.call_soon_threadsafe(loop.stop)
+
+
+_pool: Optional[BrowserPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_browser_pool() -> BrowserPool:
+    """程序內共用的瀏覽器池（第一次使用時才啟動瀏覽器）"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = BrowserPool()
+            atexit.register(_pool.close)
+        return _pool
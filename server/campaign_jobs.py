@@ -0,0 +1,375 @@
+"""
+訪談活動（campaign）背景工作
+一組受訪者 × 一份問卷（含 subQuestions），在伺服器端並行執行：
+- 每答完一題就寫入受訪者資料並更新 checkpoint（campaigns/<job_id>.json）
+- 當機或重啟後可從 checkpoint 繼續；訪談記錄以 questionId 去重，不會重複提問
+- 支援暫停 / 繼續 / 取消與進度查詢
+- 受訪者之間並行（BATCH_INTERVIEW_CONCURRENCY），同一受訪者的問題依序進行（後面的回答會參考前面的記錄）
+- LLM 請求以 batch 優先等級送出，不會擠掉使用者正在等待的互動請求（見 llm_scheduler）
+- 有 prefetch_fn 時，每題的網址內容在分派給受訪者之前先抓取一次，以 url_context 傳給 interview_fn
+- interview_fn 失敗時需拋出例外（不要回傳錯誤訊息文字），該題記為 failed；已完成的工作再次 start 時重試失敗的題目
+- 回答以 PersonaStore.append_history 接到受訪者最新的資料之後，不會覆蓋其他地方同時做的修改
+"""
+import datetime
+import json
+import os
+import threading
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from batch_executor import MAX_CONCURRENCY, TOKENS_PER_CALL, TokenBudget, run_concurrently
+from llm_scheduler import BATCH, llm_priority
+from interview_history import SUMMARY_FIELD
+from persona_store import PersonaStore
+
+InterviewFn = Callable[..., str]  # (persona, question, sub_questions[, url_context=...]) -> answer；失敗時拋出
+# (question, sub_questions) -> url_context（題目層級、與受訪者無關的內容）
+PrefetchFn = Callable[[str, List[str]], Any]
+
+# 工作狀態
+PENDING = "pending"
+RUNNING = "running"
+PAUSED = "paused"
+CANCELLED = "cancelled"
+COMPLETED = "completed"
+FAILED = "failed"
+FINISHED_STATES = {CANCELLED, COMPLETED, FAILED}
+
+
+def _now() -> str:
+    return datetime.datetime.now().isoformat()
+
+
+def _question_id(job_id: str, question_index: int) -> str:
+    return f"campaign_{job_id}_{question_index}"
+
+
+class CampaignManager:
+    """管理某個 persona 集合上的所有訪談活動"""
+
+    def __init__(
+        self,
+        store: PersonaStore,
+        interview_fn: InterviewFn,
+        directory: Path,
+        budget: Optional[TokenBudget] = None,
+        max_concurrency: int = MAX_CONCURRENCY,
+        prefetch_fn: Optional[PrefetchFn] = None,
+    ) -> None:
+        self.store = store
+        self.interview_fn = interview_fn
+        self.prefetch_fn = prefetch_fn
+        self.directory = Path(directory)
+        self.budget = budget
+        self.max_concurrency = max_concurrency
+        self._lock = threading.RLock()
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._threads: Dict[str, threading.Thread] = {}
+        self._load_jobs()
+
+    # ---------- checkpoint ----------
+
+    def _job_path(self, job_id: str) -> Path:
+        return self.directory / f"{job_id}.json"
+
+    def _load_jobs(self) -> None:
+        if not self.directory.exists():
+            return
+        for path in sorted(self.directory.glob("*.json")):
+            try:
+                job = json.loads(path.read_text(encoding="utf-8"))
+            except Exception as e:
+                print(f"讀取 campaign checkpoint 失敗 {path.name}: {e}")
+                continue
+            if isinstance(job, dict) and job.get("id"):
+                self._jobs[job["id"]] = job
+
+    def _checkpoint(self, job: Dict[str, Any]) -> None:
+        """呼叫端需持有 self._lock"""
+        job["updatedAt"] = _now()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self._job_path(job["id"])
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        tmp_path.write_text(json.dumps(job, ensure_ascii=False, indent=2), encoding="utf-8")
+        os.replace(tmp_path, path)
+
+    # ---------- 查詢 ----------
+
+    @staticmethod
+    def _progress(job: Dict[str, Any]) -> Dict[str, Any]:
+        total = len(job["personaIds"]) * len(job["questions"])
+        done = sum(1 for entry in job["progress"].values() if entry.get("status") == "done")
+        failed = sum(1 for entry in job["progress"].values() if entry.get("status") == "failed")
+        return {
+            "total": total,
+            "done": done,
+            "failed": failed,
+            "remaining": total - done - failed,
+            "percent": round((done + failed) / total * 100, 1) if total else 100.0,
+        }
+
+    def summary(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "id": job["id"],
+            "name": job.get("name"),
+            "status": job["status"],
+            "createdAt": job["createdAt"],
+            "updatedAt": job["updatedAt"],
+            "personaCount": len(job["personaIds"]),
+            "questionCount": len(job["questions"]),
+            "progress": self._progress(job),
+            "error": job.get("error"),
+        }
+
+    def list(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [self.summary(job) for job in self._jobs.values()]
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """完整工作狀態（含每位受訪者每一題的結果）"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            return {**json.loads(json.dumps(job)), **self.summary(job)}
+
+    # ---------- 控制 ----------
+
+    def create(
+        self,
+        persona_ids: List[str],
+        questions: List[Dict[str, Any]],
+        name: Optional[str] = None,
+        start: bool = True,
+    ) -> Dict[str, Any]:
+        """
+        建立訪談活動
+
+        Args:
+            persona_ids: 受訪者 id
+            questions: [{"question": str, "subQuestions": [str], "topicTag": str | None}]
+            name: 顯示名稱
+            start: 建立後立即開始
+        """
+        job_id = uuid.uuid4().hex[:12]
+        job = {
+            "id": job_id,
+            "name": name,
+            "status": PENDING,
+            "personaIds": list(dict.fromkeys(persona_ids)),
+            "questions": [
+                {
+                    "question": q["question"],
+                    "subQuestions": list(q.get("subQuestions") or []),
+                    "topicTag": q.get("topicTag"),
+                }
+                for q in questions
+            ],
+            "progress": {},
+            "createdAt": _now(),
+            "updatedAt": _now(),
+            "error": None,
+        }
+        with self._lock:
+            self._jobs[job_id] = job
+            self._checkpoint(job)
+        if start:
+            self.start(job_id)
+        return self.summary(job)
+
+    def start(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """開始或繼續執行；已結束但有失敗題目（或未完成）的工作重試這些題目，取消的工作不會重新執行"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            progress = self._progress(job)
+            if job["status"] == CANCELLED or (
+                job["status"] in FINISHED_STATES and not progress["failed"] and not progress["remaining"]
+            ):
+                return self.summary(job)
+            thread = self._threads.get(job_id)
+            job["status"] = RUNNING
+            job["error"] = None
+            self._checkpoint(job)
+            if thread is None or not thread.is_alive():
+                thread = threading.Thread(target=self._run, args=(job_id,), name=f"campaign-{job_id}", daemon=True)
+                self._threads[job_id] = thread
+                thread.start()
+            return self.summary(job)
+
+    def pause(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self._set_status(job_id, PAUSED)
+
+    def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self._set_status(job_id, CANCELLED)
+
+    def _set_status(self, job_id: str, status: str) -> Optional[Dict[str, Any]]:
+        # 進行中的題目會跑完並保存，之後不再開始新的題目
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            if job["status"] not in FINISHED_STATES:
+                job["status"] = status
+                self._checkpoint(job)
+            return self.summary(job)
+
+    def resume_incomplete(self) -> List[str]:
+        """重啟後繼續執行中斷的工作（暫停中的維持暫停）"""
+        with self._lock:
+            job_ids = [job_id for job_id, job in self._jobs.items() if job["status"] in (PENDING, RUNNING)]
+        for job_id in job_ids:
+            print(f"▶ 繼續訪談活動 {job_id}")
+            self.start(job_id)
+        return job_ids
+
+    # ---------- 執行 ----------
+
+    def _should_stop(self, job_id: str) -> bool:
+        with self._lock:
+            return self._jobs[job_id]["status"] != RUNNING
+
+    def _prefetch(self, questions: List[Dict[str, Any]]) -> List[Any]:
+        """每題的 url_context 只抓取一次（不寫入 checkpoint，繼續執行時重新抓取）"""
+        if self.prefetch_fn is None:
+            return [None] * len(questions)
+        contexts = []
+        for question in questions:
+            try:
+                contexts.append(self.prefetch_fn(question["question"], question["subQuestions"]))
+            except Exception as e:
+                print(f"  ⚠️ campaign 網址預先抓取失敗，改由各受訪者自行抓取: {e}")
+                contexts.append(None)
+        return contexts
+
+    def _run(self, job_id: str) -> None:
+        with self._lock:
+            job = self._jobs[job_id]
+            persona_ids = list(job["personaIds"])
+            questions = list(job["questions"])
+        try:
+            url_contexts = self._prefetch(questions)
+            previous = None
+            while True:
+                outcomes = run_concurrently(
+                    persona_ids,
+                    lambda persona_id: self._run_persona(job_id, persona_id, url_contexts),
+                    max_concurrency=self.max_concurrency,
+                    should_stop=lambda: self._should_stop(job_id),
+                )
+                for outcome in outcomes:
+                    if not outcome.ok:
+                        print(f"  ✗ campaign {job_id} / {outcome.item}: {outcome.error}")
+                with self._lock:
+                    if job["status"] != RUNNING:
+                        # 暫停 / 取消：之後的 start 會開新的執行緒
+                        self._threads.pop(job_id, None)
+                        return
+                    progress = self._progress(job)
+                    if progress["remaining"] == 0:
+                        job["status"] = COMPLETED
+                        self._checkpoint(job)
+                        self._threads.pop(job_id, None)
+                        print(f"✓ 訪談活動 {job_id} 完成: {progress}")
+                        return
+                    if (progress["done"], progress["failed"]) == previous:
+                        # 一整輪沒有任何進展：不再重跑同一批題目
+                        raise RuntimeError(f"訪談活動沒有進展（剩餘 {progress['remaining']} 題）")
+                    previous = (progress["done"], progress["failed"])
+                # 暫停後又在這一輪結束前被繼續：再跑一輪剩下的題目
+        except Exception as e:
+            with self._lock:
+                job["status"] = FAILED
+                job["error"] = str(e)
+                self._checkpoint(job)
+                self._threads.pop(job_id, None)
+            print(f"訪談活動 {job_id} 失敗: {e}")
+
+    def _run_persona(self, job_id: str, persona_id: str, url_contexts: List[Any]) -> None:
+        """依序回答一位受訪者尚未完成的題目，每題完成後保存；意外錯誤時把尚未完成的題目記為 failed"""
+        with self._lock:
+            job = self._jobs[job_id]
+            questions = list(job["questions"])
+            pending = [
+                idx for idx in range(len(questions))
+                if job["progress"].get(f"{persona_id}|{idx}", {}).get("status") != "done"
+            ]
+        if not pending:
+            return
+        try:
+            self._answer_pending(job_id, persona_id, questions, pending, url_contexts)
+        except Exception as e:
+            with self._lock:
+                for idx in pending:
+                    entry = job["progress"].get(f"{persona_id}|{idx}", {})
+                    if entry.get("status") != "done":
+                        job["progress"][f"{persona_id}|{idx}"] = {"status": "failed", "error": str(e)}
+                self._checkpoint(job)
+            raise
+
+    def _answer_pending(
+        self,
+        job_id: str,
+        persona_id: str,
+        questions: List[Dict[str, Any]],
+        pending: List[int],
+        url_contexts: List[Any],
+    ) -> None:
+        with self._lock:
+            job = self._jobs[job_id]
+        persona = self.store.get(persona_id, include_archived=True)
+        if persona is None:
+            with self._lock:
+                for idx in pending:
+                    job["progress"][f"{persona_id}|{idx}"] = {"status": "failed", "error": "找不到此受訪者"}
+                self._checkpoint(job)
+            return
+
+        history = persona.setdefault("interviewHistory", [])
+        answered = {record.get("questionId") for record in history}
+        for idx in pending:
+            if self._should_stop(job_id):
+                return
+            key = f"{persona_id}|{idx}"
+            question = questions[idx]
+            question_id = _question_id(job_id, idx)
+            if question_id in answered:
+                # 上次已寫入記錄但 checkpoint 尚未更新就中斷
+                with self._lock:
+                    job["progress"][key] = {"status": "done", "recovered": True}
+                    self._checkpoint(job)
+                continue
+
+            if self.budget is not None:
+                self.budget.acquire(TOKENS_PER_CALL)
+            try:
+                extra = {} if url_contexts[idx] is None else {"url_context": url_contexts[idx]}
+                with llm_priority(BATCH):
+                    answer = self.interview_fn(persona, question["question"], question["subQuestions"], **extra)
+            except Exception as e:
+                with self._lock:
+                    job["progress"][key] = {"status": "failed", "error": str(e)}
+                    self._checkpoint(job)
+                continue
+
+            record = {
+                "sectionId": "campaign",
+                "questionId": question_id,
+                "question": question["question"],
+                "answer": answer,
+                "timestamp": _now(),
+                "topicTag": question.get("topicTag"),
+                "campaignId": job_id,
+            }
+            # 本地副本供後面的題目參考；寫入時接到受訪者最新的資料之後（歷史摘要一併保存）
+            history.append(record)
+            fields = {"updatedAt": _now()}
+            if SUMMARY_FIELD in persona:
+                fields[SUMMARY_FIELD] = persona[SUMMARY_FIELD]
+            if self.store.append_history(persona_id, [record], fields) is None:
+                raise RuntimeError("受訪者已被刪除")
+            with self._lock:
+                job["progress"][key] = {"status": "done"}
+                self._checkpoint(job)
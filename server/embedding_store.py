@@ -0,0 +1,175 @@
+"""
+embedding 持久快取
+同一份問卷每次語義分組都要重新計算 embedding，RAG 文件重新上傳也一樣；改為跨程序共用的儲存：
+- key 為 (model, sha256(text))，語義比對器、RagStore、pdf_rag 共用同一份
+- 底層為 SQLite（標準庫），向量以 float32 blob 儲存（OpenAI 回傳的本來就是 float32，不損失精度）
+- 前面有一層 LRU（EMBEDDING_STORE_CACHE_SIZE 筆），常用的問題不必讀檔
+- EMBEDDING_STORE_PATH 設為空字串時只使用記憶體（不寫檔）
+
+讀寫都以 get_many / put_many 批次進行；get_or_embed 只把沒有快取的文字（去重後）交給 embed_fn。
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+from array import array
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+DEFAULT_PATH = os.getenv("EMBEDDING_STORE_PATH", str(Path(__file__).parent / "embedding_cache.sqlite3"))
+CACHE_SIZE = int(os.getenv("EMBEDDING_STORE_CACHE_SIZE", "4096"))
+
+# 未快取的文字 -> 對應的 embedding（失敗的項目回傳空 list，不寫入）
+EmbedFn = Callable[[List[str]], List[List[float]]]
+
+
+def text_key(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _pack(vector: Sequence[float]) -> bytes:
+    return array("f", vector).tobytes()
+
+
+def _unpack(blob: bytes) -> List[float]:
+    vector = array("f")
+    vector.frombytes(blob)
+    return vector.tolist()
+
+
+class EmbeddingStore:
+    """(model, text) -> embedding；thread-safe"""
+
+    def __init__(self, path: Optional[str] = DEFAULT_PATH, cache_size: int = CACHE_SIZE) -> None:
+        self.path = path or None
+        self._lock = threading.Lock()
+        # LRU 存放 float32 bytes（1536 維約 6 KB），取出時才轉成 list
+        self._cache: "OrderedDict[Tuple[str, str], bytes]" = OrderedDict()
+        self._cache_size = cache_size
+        self._db: Optional[sqlite3.Connection] = None
+        self._stats = {"hits": 0, "diskHits": 0, "misses": 0, "stored": 0}
+        if self.path:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")  # 多個程序同時讀寫
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                " model TEXT NOT NULL, key TEXT NOT NULL, vector BLOB NOT NULL,"
+                " PRIMARY KEY (model, key)) WITHOUT ROWID"
+            )
+
+    def _remember(self, cache_key: Tuple[str, str], blob: bytes) -> None:
+        self._cache[cache_key] = blob
+        self._cache.move_to_end(cache_key)
+        while len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+
+    def get_many(self, model: str, texts: Sequence[str]) -> Dict[str, List[float]]:
+        """回傳已儲存的 {text: embedding}；沒有的文字不在結果中"""
+        found: Dict[str, List[float]] = {}
+        pending: Dict[str, str] = {}  # key -> text
+        with self._lock:
+            for text in dict.fromkeys(texts):
+                cache_key = (model, text_key(text))
+                blob = self._cache.get(cache_key)
+                if blob is not None:
+                    self._cache.move_to_end(cache_key)
+                    found[text] = _unpack(blob)
+                    self._stats["hits"] += 1
+                else:
+                    pending[cache_key[1]] = text
+            if pending and self._db is not None:
+                keys = list(pending)
+                # SQLite 單一查詢的參數數量有上限，分批查詢
+                for start in range(0, len(keys), 500):
+                    batch = keys[start:start + 500]
+                    rows = self._db.execute(
+                        f"SELECT key, vector FROM embeddings WHERE model = ? AND key IN ({','.join('?' * len(batch))})",
+                        [model, *batch],
+                    ).fetchall()
+                    for key, blob in rows:
+                        self._remember((model, key), blob)
+                        found[pending.pop(key)] = _unpack(blob)
+                        self._stats["diskHits"] += 1
+            self._stats["misses"] += len(pending)
+        return found
+
+    def put_many(self, model: str, items: Dict[str, Sequence[float]]) -> None:
+        """儲存 {text: embedding}；空向量（取得失敗）略過"""
+        rows = [(model, text_key(text), _pack(vector)) for text, vector in items.items() if vector]
+        if not rows:
+            return
+        with self._lock:
+            for _, key, blob in rows:
+                self._remember((model, key), blob)
+            if self._db is not None:
+                self._db.executemany("INSERT OR REPLACE INTO embeddings (model, key, vector) VALUES (?, ?, ?)", rows)
+            self._stats["stored"] += len(rows)
+
+    def get_or_embed(self, model: str, texts: Sequence[str], embed_fn: EmbedFn) -> List[List[float]]:
+        """
+        依輸入順序回傳 embedding；沒有快取的文字去重後一次交給 embed_fn，結果寫回儲存區
+
+        embed_fn 失敗的項目（空 list）原樣回傳，不寫入，下次會重新計算
+        """
+        found = self.get_many(model, texts)
+        missing = [text for text in dict.fromkeys(texts) if text not in found]
+        if missing:
+            computed = dict(zip(missing, embed_fn(missing)))
+            self.put_many(model, computed)
+            found.update(computed)
+        return [found.get(text, []) for text in texts]
+
+    def clear(self, model: Optional[str] = None) -> None:
+        """清除快取（model 為 None 時清除全部）"""
+        with self._lock:
+            if model is None:
+                self._cache.clear()
+            else:
+                for cache_key in [k for k in self._cache if k[0] == model]:
+                    del self._cache[cache_key]
+            if self._db is not None:
+                if model is None:
+                    self._db.execute("DELETE FROM embeddings")
+                else:
+                    self._db.execute("DELETE FROM embeddings WHERE model = ?", (model,))
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["cached"] = len(self._cache)
+            if self._db is not None:
+                stats["persisted"] = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            return stats
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+_store: Optional[EmbeddingStore] = None
+_store_lock = threading.Lock()
+
+
+def get_embedding_store() -> EmbeddingStore:
+    """程序內共用的 EmbeddingStore（依 EMBEDDING_STORE_PATH）"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            try:
+                _store = EmbeddingStore()
+            except sqlite3.Error as e:
+                print(f"  ⚠️ 無法開啟 embedding 快取檔 {DEFAULT_PATH}：{e}，改為只使用記憶體")
+                _store = EmbeddingStore(path=None)
+        return _store
+
+
+def set_embedding_store(store: Optional[EmbeddingStore]) -> None:
+    """替換共用的 EmbeddingStore（測試用；None 時下次依設定重新建立）"""
+    global _store
+    with _store_lock:
+        _store = store
@@ -2,6 +2,7 @@ import os
 from dotenv import load_dotenv
 from agno.agent import Agent
 from agno.models.openai import OpenAIChat
+from llm_scheduler import SDK_MAX_RETRIES
 from ppv_schema import PPVInstance, MetaInfo
 
 # 載入 .env
@@ -9,7 +10,7 @@ load_dotenv()
 
 # --- 定義 Agno Agent (取代原本的 System Prompt 字串) ---
 extraction_agent = Agent(
-    model=OpenAIChat(id="gpt-4o-2024-08-06"), # 指定支援結構化輸出的模型
+    model=OpenAIChat(id="gpt-4o-2024-08-06", max_retries=SDK_MAX_RETRIES), # 指定支援結構化輸出的模型
     description="You are an expert psychometrician and data analyst specializing in 'Psychometric Persona Vectors' (PPV).",
     instructions=[
         "Your task is to analyze the provided casual conversation logs of a user and infer their psychometric profile.",
@@ -0,0 +1,75 @@
+"""
+快速 JSON 序列化
+大型回應（persona 集合、多樣性指標、批量訪談結果）與 SSE 事件共用的編碼器
+- 優先使用 orjson（可選依賴，C 實作），未安裝時退回標準 json
+- 一律輸出 UTF-8 原文，越南文 / 中文不會被轉成 \\uXXXX
+"""
+import json
+from typing import Any
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    orjson = None
+    ORJSON_AVAILABLE = False
+
+try:
+    from starlette.responses import JSONResponse as _JSONResponse
+except ImportError:  # pragma: no cover - 只在沒有 FastAPI 的腳本環境發生
+    _JSONResponse = None
+
+_ORJSON_OPTIONS = (
+    orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY if ORJSON_AVAILABLE else 0
+)
+
+
+def _default(obj: Any) -> Any:
+    """處理標準型別以外的物件（pydantic model、numpy 數值、set 等）"""
+    if hasattr(obj, "model_dump"):
+        return obj.model_dump()
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    if hasattr(obj, "tolist"):
+        return obj.tolist()
+    if hasattr(obj, "item"):
+        return obj.item()
+    if hasattr(obj, "isoformat"):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(obj: Any) -> bytes:
+    """序列化為緊湊的 UTF-8 JSON bytes"""
+    if ORJSON_AVAILABLE:
+        try:
+            return orjson.dumps(obj, default=_default, option=_ORJSON_OPTIONS)
+        except (TypeError, orjson.JSONEncodeError):
+            # 例如超過 64-bit 的整數：交給標準 json 處理
+            pass
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
+
+
+def loads(data: Any) -> Any:
+    if ORJSON_AVAILABLE:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def sse_event(payload: Any) -> bytes:
+    """組成一筆 SSE `data:` 事件"""
+    return b"data: " + dumps(payload) + b"\n\n"
+
+
+if _JSONResponse is not None:
+
+    class FastJSONResponse(_JSONResponse):
+        """
+        直接以 fast_json 編碼的 JSONResponse
+
+        注意：endpoint 需直接 `return FastJSONResponse(data)`，
+        若只設定 response_class，FastAPI 仍會先跑一次 jsonable_encoder。
+        """
+
+        def render(self, content: Any) -> bytes:
+            return dumps(content)
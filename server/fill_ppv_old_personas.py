@@ -4,11 +4,18 @@ Script to fill in extended PPV fields for 58 old personas in vietnam_personas.js
 Generates diverse values based on existing persona traits (big5, occupation, age, etc.)
 """
 
+import argparse
 import json
 import random
 import hashlib
 from pathlib import Path
 
+from persona_io import iter_json_array, write_json_array
+
+EXTENDED_FIELDS = ["hexaco", "disc", "mbti", "enneagram", "time_preference",
+                   "regulatory_focus", "decision_style", "language_style",
+                   "emotion_profile", "social_profile", "behavioral_indicators"]
+
 # Seed for reproducibility based on persona ID
 def get_seed(persona_id: str) -> int:
     return int(hashlib.md5(persona_id.encode()).hexdigest()[:8], 16)
@@ -263,14 +270,47 @@ def fill_extended_ppv(persona: dict) -> dict:
 
     return persona
 
+def main_stream(personas_path: Path):
+    """串流版本：逐筆讀取、補欄位、逐筆寫出，記憶體用量與資料筆數無關"""
+    stats = {"updated": 0}
+    sample = {}
+
+    def filled():
+        for persona in iter_json_array(personas_path):
+            if isinstance(persona, dict) and "hexaco" not in persona:
+                fill_extended_ppv(persona)
+                stats["updated"] += 1
+                print(f"  Updated: {persona.get('id', 'unknown')}")
+                if not sample:
+                    sample.update({field: persona[field] for field in EXTENDED_FIELDS if field in persona})
+                    sample["id"] = persona.get("id")
+            yield persona
+
+    total = write_json_array(personas_path, filled())
+    print(f"\nUpdated {stats['updated']} of {total} personas with extended PPV fields")
+    print(f"Saved updated personas to {personas_path}")
+
+    if sample:
+        print(f"\nSample persona ({sample.pop('id')}) extended fields:")
+        for field, value in sample.items():
+            print(f"  {field}: {value}")
+
 def main():
+    parser = argparse.ArgumentParser(description="Fill extended PPV fields for existing personas")
+    parser.add_argument("--file", default=str(Path(__file__).parent / "vietnam_personas.json"))
+    parser.add_argument("--stream", action="store_true", help="逐筆串流處理（大型資料集）")
+    args = parser.parse_args()
+
     # Load personas
-    personas_path = Path(__file__).parent / "vietnam_personas.json"
+    personas_path = Path(args.file)
+    if args.stream:
+        main_stream(personas_path)
+        return
 
     with open(personas_path, "r", encoding="utf-8") as f:
         personas = json.load(f)
 
-    print(f"Loaded {len(personas)} personas from vietnam_personas.json")
+    print(f"Loaded {len(personas)} personas from {personas_path.name}")
 
     # Fill in extended PPV for each persona
     updated_count = 0
@@ -293,9 +333,7 @@ def main():
     if personas:
         sample = personas[0]
         print(f"\nSample persona ({sample.get('id')}) extended fields:")
-        for field in ["hexaco", "disc", "mbti", "enneagram", "time_preference",
-                      "regulatory_focus", "decision_style", "language_style",
-                      "emotion_profile", "social_profile", "behavioral_indicators"]:
+        for field in EXTENDED_FIELDS:
             if field in sample:
                 print(f"  {field}: {sample[field]}")
 
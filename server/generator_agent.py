@@ -2,12 +2,13 @@ import os
 from typing import List
 from dotenv import load_dotenv
 from openai import OpenAI
+from llm_scheduler import SDK_MAX_RETRIES, llm_http_client
 from pydantic import BaseModel, Field
 from ppv_schema import PPVInstance
 
 # 載入環境變數
 load_dotenv()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"), http_client=llm_http_client(), max_retries=SDK_MAX_RETRIES)
 
 # --- 定義一個容器，讓 AI 一次回傳多個人 ---
 class BatchPPVResponse(BaseModel):
@@ -0,0 +1,331 @@
+"""
+網頁 HTML → 純文字
+url_fetcher 的靜態抓取與 Playwright 路徑共用。原本用 BeautifulSoup + html.parser 建完整的樹、逐一 decompose
+再依序嘗試多個 selector，大型保險公司行銷頁面每頁要花數百毫秒 CPU；改為可替換的 backend：
+- selectolax（lexbor，C 實作）> lxml（libxml2）> stream（標準庫 HTMLParser 串流解析，不建樹），依序選用已安裝的；
+  URL_FETCHER_HTML_PARSER 可指定（auto / selectolax / lxml / stream / bs4）
+- 文字收集超過 max_length 就停止；stream 在 <main> 收滿或結束後就不再解析後面的 HTML
+- bs4 為原本的實作，保留作為效能比較的基準（bench_html_extract.py）
+
+所有 backend 規則相同：去掉 REMOVED_TAGS，依 CONTENT_SELECTORS 的順序找主要內容區（都沒有時用 body），
+每段文字去頭尾空白、一行一段。
+"""
+import os
+from dataclasses import dataclass
+from html.parser import HTMLParser
+from typing import Callable, Dict, List, Optional
+
+# C 實作的解析器皆為可選依賴
+try:
+    from selectolax.lexbor import LexborHTMLParser
+    SELECTOLAX_AVAILABLE = True
+except ImportError:
+    SELECTOLAX_AVAILABLE = False
+
+try:
+    from lxml import etree
+    from lxml import html as lxml_html
+    LXML_AVAILABLE = True
+except ImportError:
+    LXML_AVAILABLE = False
+
+try:
+    from bs4 import BeautifulSoup
+    BS4_AVAILABLE = True
+except ImportError:
+    BS4_AVAILABLE = False
+
+REMOVED_TAGS = ('script', 'style', 'nav', 'footer', 'header', 'aside', 'iframe', 'noscript')
+# 主要內容區，越前面優先
+CONTENT_SELECTORS = ('main', 'article', '[role="main"]', '.main-content', '.content', '#content', '.article-body', '.page-content')
+# 沒有內容、也不會有結束標籤的元素
+VOID_TAGS = frozenset((
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'param', 'source', 'track', 'wbr',
+))
+STREAM_CHUNK = 16 * 1024
+
+BACKEND = os.getenv("URL_FETCHER_HTML_PARSER", "auto")
+
+
+@dataclass
+class ExtractedPage:
+    title: str
+    text: str  # 最多 max_length 字
+    truncated: bool  # 原文超過 max_length
+
+
+class _TextBudget:
+    """依序收集文字行，長度超過 max_length 就不再收"""
+
+    def __init__(self, max_length: int) -> None:
+        self.max_length = max_length
+        self.lines: List[str] = []
+        self.size = -1  # '\n'.join(lines) 的長度
+
+    @property
+    def full(self) -> bool:
+        return self.size > self.max_length
+
+    def add(self, text: str) -> bool:
+        """加入一段文字；已經收滿時回傳 False"""
+        for line in text.split('\n'):
+            line = line.strip()
+            if line:
+                self.lines.append(line)
+                self.size += len(line) + 1
+                if self.full:
+                    return False
+        return True
+
+    def page(self, title: str) -> ExtractedPage:
+        text = '\n'.join(self.lines)
+        return ExtractedPage(title, text[:self.max_length], len(text) > self.max_length)
+
+
+# ---------- selectolax ----------
+
+def _extract_selectolax(html: str, max_length: int) -> ExtractedPage:
+    tree = LexborHTMLParser(html)
+    title_node = tree.css_first('title')
+    title = title_node.text(strip=True) if title_node is not None else ''
+    tree.strip_tags(list(REMOVED_TAGS))
+
+    root = None
+    for selector in CONTENT_SELECTORS:
+        root = tree.css_first(selector)
+        if root is not None:
+            break
+    if root is None:
+        root = tree.body or tree.root
+
+    budget = _TextBudget(max_length)
+    if root is not None:
+        for node in root.traverse(include_text=True):
+            if node.tag == '-text' and not budget.add(node.text(deep=False)):
+                break
+    return budget.page(title)
+
+
+# ---------- lxml ----------
+
+def _selector_xpath(selector: str) -> str:
+    if selector.startswith('.'):
+        return f'(//*[contains(concat(" ", normalize-space(@class), " "), " {selector[1:]} ")])[1]'
+    if selector.startswith('#'):
+        return f'(//*[@id="{selector[1:]}"])[1]'
+    if selector.startswith('['):
+        name, _, value = selector[1:-1].partition('=')
+        return f'(//*[@{name}="{value.strip(chr(34))}"])[1]'
+    return f'(//{selector})[1]'
+
+
+if LXML_AVAILABLE:
+    _LXML_SELECTORS = [etree.XPath(_selector_xpath(selector)) for selector in CONTENT_SELECTORS]
+
+
+def _extract_lxml(html: str, max_length: int) -> ExtractedPage:
+    # 以 bytes 解析：str 帶有 XML 編碼宣告時 lxml 會拒絕
+    doc = lxml_html.document_fromstring(html.encode('utf-8'), parser=lxml_html.HTMLParser(encoding='utf-8'))
+    title_node = doc.find('.//title')
+    title = ''.join(part.strip() for part in title_node.itertext()) if title_node is not None else ''
+    etree.strip_elements(doc, etree.Comment, *REMOVED_TAGS, with_tail=False)
+
+    root = None
+    for xpath in _LXML_SELECTORS:
+        found = xpath(doc)
+        if found:
+            root = found[0]
+            break
+    if root is None:
+        root = doc.find('body')
+        if root is None:
+            root = doc
+
+    budget = _TextBudget(max_length)
+    for text in root.itertext():
+        if not budget.add(text):
+            break
+    return budget.page(title)
+
+
+# ---------- stream（標準庫，不建樹） ----------
+
+def _selector_matcher(selector: str) -> Callable[[str, Dict[str, Optional[str]]], bool]:
+    if selector.startswith('.'):
+        name = selector[1:]
+        return lambda tag, attrs: name in (attrs.get('class') or '').split()
+    if selector.startswith('#'):
+        name = selector[1:]
+        return lambda tag, attrs: attrs.get('id') == name
+    if selector.startswith('['):
+        attr, _, value = selector[1:-1].partition('=')
+        value = value.strip('"')
+        return lambda tag, attrs: attrs.get(attr) == value
+    return lambda tag, attrs: tag == selector
+
+
+_STREAM_MATCHERS = [_selector_matcher(selector) for selector in CONTENT_SELECTORS]
+
+
+class _StreamExtractor(HTMLParser):
+    """
+    邊解析邊收集文字：body 與每個 selector 第一個符合的元素各一份，最後取優先順序最高的
+    最優先的 <main> 已結束或收滿時 done = True，呼叫端不必再餵後面的 HTML
+    """
+
+    def __init__(self, max_length: int) -> None:
+        super().__init__(convert_charrefs=True)
+        self.max_length = max_length
+        self.body = _TextBudget(max_length)
+        self.regions: List[Optional[_TextBudget]] = [None] * len(CONTENT_SELECTORS)
+        self.region_depth = [0] * len(CONTENT_SELECTORS)  # 開始時的 stack 深度；0 表示已結束
+        self.stack: List[str] = []
+        self.skip_depth: Optional[int] = None  # 位於 REMOVED_TAGS 內時為該元素的深度
+        self.title: Optional[str] = None
+        self.in_title = False
+        self.pending: List[str] = []  # 同一段文字可能分成多次 handle_data
+        self.done = False
+
+    def _flush(self) -> None:
+        if not self.pending:
+            return
+        text = ''.join(self.pending)
+        self.pending.clear()
+        if self.in_title:
+            self.title = (self.title or '') + text
+            return
+        if self.skip_depth is not None:
+            return
+        if not self.body.full:
+            self.body.add(text)
+        for index, region in enumerate(self.regions):
+            if region is not None and self.region_depth[index] and not region.full:
+                region.add(text)
+        main = self.regions[0]
+        if main is not None and main.full:
+            self.done = True
+
+    def handle_data(self, data: str) -> None:
+        if not self.done:
+            self.pending.append(data)
+
+    def handle_starttag(self, tag: str, attrs: List) -> None:
+        self._flush()
+        if tag in VOID_TAGS:
+            return
+        self.stack.append(tag)
+        if self.skip_depth is not None:
+            return
+        depth = len(self.stack)
+        if tag in REMOVED_TAGS:
+            self.skip_depth = depth
+            return
+        if tag == 'title' and self.title is None:
+            self.in_title = True
+            return
+        attributes = dict(attrs)
+        for index, matches in enumerate(_STREAM_MATCHERS):
+            if self.regions[index] is None and matches(tag, attributes):
+                self.regions[index] = _TextBudget(self.max_length)
+                self.region_depth[index] = depth
+
+    def handle_startendtag(self, tag: str, attrs: List) -> None:
+        self._flush()  # <br/> 等自行結束的標籤沒有內容
+
+    def handle_endtag(self, tag: str) -> None:
+        self._flush()
+        if tag not in self.stack:
+            return  # 沒有對應開始標籤的結束標籤
+        # 一併關閉中間沒有結束標籤的元素（<p>、<li> 等）
+        while self.stack.pop() != tag:
+            pass
+        depth = len(self.stack)
+        if self.skip_depth is not None and depth < self.skip_depth:
+            self.skip_depth = None
+        if tag == 'title':
+            self.in_title = False
+        for index, start in enumerate(self.region_depth):
+            if start > depth:
+                self.region_depth[index] = 0
+        if self.regions[0] is not None and not self.region_depth[0]:
+            self.done = True
+
+    def result(self) -> ExtractedPage:
+        self._flush()
+        title = (self.title or '').strip()
+        for region in self.regions:
+            if region is not None:
+                return region.page(title)
+        return self.body.page(title)
+
+
+def _extract_stream(html: str, max_length: int) -> ExtractedPage:
+    parser = _StreamExtractor(max_length)
+    for start in range(0, len(html), STREAM_CHUNK):
+        parser.feed(html[start:start + STREAM_CHUNK])
+        if parser.done:
+            break
+    else:
+        parser.close()
+    return parser.result()
+
+
+# ---------- bs4（原本的實作，效能基準） ----------
+
+def _extract_bs4(html: str, max_length: int) -> ExtractedPage:
+    soup = BeautifulSoup(html, 'html.parser')
+    title_tag = soup.find('title')
+    title = title_tag.get_text(strip=True) if title_tag else ''
+    for tag in soup(list(REMOVED_TAGS)):
+        tag.decompose()
+
+    main_content = None
+    for selector in CONTENT_SELECTORS:
+        main_content = soup.select_one(selector)
+        if main_content:
+            break
+    if not main_content:
+        main_content = soup.find('body') or soup
+
+    budget = _TextBudget(max_length)
+    budget.add(main_content.get_text(separator='\n', strip=True))
+    return budget.page(title)
+
+
+_BACKENDS: Dict[str, Callable[[str, int], ExtractedPage]] = {}
+if SELECTOLAX_AVAILABLE:
+    _BACKENDS['selectolax'] = _extract_selectolax
+if LXML_AVAILABLE:
+    _BACKENDS['lxml'] = _extract_lxml
+_BACKENDS['stream'] = _extract_stream
+if BS4_AVAILABLE:
+    _BACKENDS['bs4'] = _extract_bs4
+
+
+def available_backends() -> List[str]:
+    """已安裝的 backend，auto 時選用第一個"""
+    return list(_BACKENDS)
+
+
+def resolve_backend(name: Optional[str] = None) -> str:
+    name = name or BACKEND
+    if name == 'auto':
+        return available_backends()[0]
+    if name not in _BACKENDS:
+        print(f"  ⚠️ HTML 解析器 {name} 未安裝，改用 {available_backends()[0]}")
+        return available_backends()[0]
+    return name
+
+
+def extract_page(html: str, max_length: int, backend: Optional[str] = None) -> ExtractedPage:
+    """
+    取出網頁標題與主要內容的純文字
+
+    Args:
+        html: 網頁 HTML
+        max_length: 內容最大長度（字元數），超過時 truncated = True
+        backend: 指定解析器；None 時依 URL_FETCHER_HTML_PARSER（預設 auto）
+    """
+    if not html.strip():
+        return ExtractedPage('', '', False)
+    return _BACKENDS[resolve_backend(backend)](html, max_length)
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+離線網頁 fixture server（url_fetcher 的測試與效能測試用，不需要網路）
+依 manifest.json 把錄製好的頁面掛在固定路徑上：
+- 每個頁面回傳 ETag 與 manifest 指定的 Cache-Control，支援 If-None-Match（304），可測試 url_cache 的重新驗證
+- --latency-ms / --jitter-ms 模擬網路延遲
+- jsRendered 的頁面內容由 JavaScript 產生，只有 Playwright 路徑抓得到
+- GET /__stats 回傳各路徑的請求數（完整回應 / 304）
+
+manifest 格式（tests/fixtures/html/manifest.json）：
+    {"pages": [{"file": "x.html", "path": "/x", "cacheControl": "max-age=0", "jsRendered": false,
+                "expect": ["應出現在擷取結果中的文字"], "reject": ["不應出現的雜訊（選單、頁尾、script）"]}]}
+
+用法：
+    python server/html_fixture_server.py serve --port 8791 --latency-ms 80
+    python server/html_fixture_server.py record https://example.com/travel --path /example/travel --expect "旅遊險"
+"""
+import argparse
+import hashlib
+import http.server
+import json
+import random
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+
+DEFAULT_CORPUS = Path(__file__).parent / "tests" / "fixtures" / "html"
+
+
+@dataclass
+class FixturePage:
+    file: str
+    path: str
+    cache_control: Optional[str] = None
+    js_rendered: bool = False
+    expect: List[str] = field(default_factory=list)
+    reject: List[str] = field(default_factory=list)
+
+    def quality(self, content: str) -> Dict[str, float]:
+        """擷取結果的品質：expect 命中比例與 reject 出現次數"""
+        found = sum(1 for phrase in self.expect if phrase in content)
+        return {
+            "recall": found / len(self.expect) if self.expect else 1.0,
+            "noise": sum(1 for phrase in self.reject if phrase in content),
+        }
+
+
+def load_corpus(directory: Path = DEFAULT_CORPUS) -> List[FixturePage]:
+    manifest = json.loads((Path(directory) / "manifest.json").read_text(encoding="utf-8"))
+    return [
+        FixturePage(
+            file=page["file"],
+            path=page["path"],
+            cache_control=page.get("cacheControl"),
+            js_rendered=page.get("jsRendered", False),
+            expect=list(page.get("expect", [])),
+            reject=list(page.get("reject", [])),
+        )
+        for page in manifest["pages"]
+    ]
+
+
+class FixtureServer:
+    """在背景執行緒提供 corpus 頁面；可當作 context manager 使用"""
+
+    def __init__(
+        self,
+        directory: Path = DEFAULT_CORPUS,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ) -> None:
+        self.directory = Path(directory)
+        self.pages = load_corpus(self.directory)
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self._bodies: Dict[str, bytes] = {}
+        self._etags: Dict[str, str] = {}
+        for page in self.pages:
+            body = (self.directory / page.file).read_bytes()
+            self._bodies[page.path] = body
+            self._etags[page.path] = f'"{hashlib.sha1(body).hexdigest()[:16]}"'
+        self._by_path = {page.path: page for page in self.pages}
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self._server = http.server.ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def url(self, page: FixturePage) -> str:
+        return self.base_url + page.path
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {path: dict(counts) for path, counts in self._stats.items()}
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self._stats.clear()
+
+    def _count(self, path: str, kind: str) -> None:
+        with self._lock:
+            counts = self._stats.setdefault(path, {"full": 0, "notModified": 0})
+            counts[kind] += 1
+
+    def _delay(self) -> None:
+        delay = self.latency_ms + (random.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0.0)
+        if delay > 0:
+            time.sleep(delay / 1000)
+
+    def _handler(self):
+        server = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive，與真實網站一樣可重用連線
+
+            def do_GET(self):
+                path = self.path.split("?", 1)[0].split("#", 1)[0]
+                if path == "/__stats":
+                    return self._send(200, json.dumps(server.stats()).encode(), "application/json")
+                page = server._by_path.get(path)
+                if page is None:
+                    return self._send(404, b"<html><body>Not Found</body></html>")
+                server._delay()
+                etag = server._etags[path]
+                extra = {"ETag": etag}
+                if page.cache_control:
+                    extra["Cache-Control"] = page.cache_control
+                if self.headers.get("If-None-Match") == etag:
+                    server._count(path, "notModified")
+                    return self._send(304, b"", headers=extra)
+                server._count(path, "full")
+                self._send(200, server._bodies[path], headers=extra)
+
+            def _send(self, status, body, content_type="text/html; charset=utf-8", headers=None):
+                self.send_response(status)
+                if status != 304:
+                    self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                if body:
+                    self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> "FixtureServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="html-fixtures", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "FixtureServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+def record(url: str, path: str, directory: Path, expect: List[str], reject: List[str], render: bool) -> None:
+    """錄製一個頁面（靜態 HTML，或 --render 時為 Playwright 渲染後的 HTML）並加入 manifest"""
+    sys.path.insert(0, str(Path(__file__).parent))
+    import httpx
+    from url_fetcher import BROWSER_HEADERS
+
+    if render:
+        from browser_pool import get_browser_pool
+        snapshot = get_browser_pool().fetch(url)
+        html, headers = snapshot.html, snapshot.headers
+    else:
+        response = httpx.get(url, headers=BROWSER_HEADERS, follow_redirects=True, timeout=15)
+        response.raise_for_status()
+        html, headers = response.text, dict(response.headers)
+
+    directory = Path(directory)
+    file_name = path.strip("/").replace("/", "_") + ".html"
+    (directory / file_name).write_text(html, encoding="utf-8")
+    manifest_path = directory / "manifest.json"
+    manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+    entry = {"file": file_name, "path": path, "source": url, "expect": expect, "reject": reject}
+    cache_control = {k.lower(): v for k, v in headers.items()}.get("cache-control")
+    if cache_control:
+        entry["cacheControl"] = cache_control
+    manifest["pages"] = [page for page in manifest["pages"] if page["path"] != path] + [entry]
+    manifest_path.write_text(json.dumps(manifest, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+    print(f"✓ 已錄製 {url} → {file_name}（{len(html) / 1024:.0f} KB）")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline HTML fixture server")
+    sub = parser.add_subparsers(dest="command", required=True)
+    serve = sub.add_parser("serve")
+    serve.add_argument("--dir", default=str(DEFAULT_CORPUS))
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8791)
+    serve.add_argument("--latency-ms", type=float, default=0.0)
+    serve.add_argument("--jitter-ms", type=float, default=0.0)
+    rec = sub.add_parser("record")
+    rec.add_argument("url")
+    rec.add_argument("--path", required=True, help="fixture server 上的路徑")
+    rec.add_argument("--dir", default=str(DEFAULT_CORPUS))
+    rec.add_argument("--expect", action="append", default=[])
+    rec.add_argument("--reject", action="append", default=[])
+    rec.add_argument("--render", action="store_true", help="以 Playwright 渲染後再儲存")
+    args = parser.parse_args()
+
+    if args.command == "record":
+        record(args.url, args.path, Path(args.dir), args.expect, args.reject, args.render)
+        return
+
+    server = FixtureServer(Path(args.dir), args.latency_ms, args.jitter_ms, args.host, args.port)
+    print(f"📄 {len(server.pages)} pages on {server.base_url}")
+    for page in server.pages:
+        print(f"   {server.url(page)}{'  (JS)' if page.js_rendered else ''}")
+    server.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,15 @@
-from typing import Optional
+from typing import Optional, Tuple
 from dotenv import load_dotenv
 from agno.agent import Agent
 from agno.models.openai import OpenAIChat
 from ppv_schema import PPVInstance
+from llm_scheduler import SDK_MAX_RETRIES
+from llm_usage import prompt_cache_key, record_usage
 
 load_dotenv()
 
-def chat_with_digital_twin(ppv_data: PPVInstance, user_query: str, context_data: Optional[str] = None) -> str:
-    """
-    使用 Agno 動態建立一個「分身 Agent」來回答問題。
-    
-    參數:
-    - ppv_data: 人格資料 (JSON)
-    - user_query: 使用者問的問題 (例如: "你會想買嗎？")
-    - context_data: [新功能] 產品文案、新聞或情境描述 (例如: "這是一張年費1000元的卡...")
-    """
+def _build_twin_call(ppv_data: PPVInstance, user_query: str, context_data: Optional[str]) -> Tuple[Agent, str]:
+    """建立分身 Agent 與 user message（同步 / 非同步版本共用）"""
     
     # 1. 準備人格資料（這是 Agent 內部參考用的完整資料）
     ppv_json = ppv_data.model_dump_json(indent=2)
@@ -75,30 +70,67 @@ def chat_with_digital_twin(ppv_data: PPVInstance, user_query: str, context_data:
     ]
 
     # 3. [優化重點] 注入情境資料 (Context Injection)
+    # 情境資料每次不同，放在 user message；instructions 只有人格資料，同一分身每次完全相同（可命中 prompt cache）
+    message = user_query
     if context_data:
-        instructions.append("---")
-        instructions.append(f"# PRODUCT INFO (you're seeing this for the first time):\n{context_data}")
-        instructions.append("")
-        instructions.append("**HOW TO REACT**:")
-        instructions.append("- First reaction: Show natural surprise/curiosity based on YOUR personality")
-        instructions.append("- Focus on what YOU care about (price? safety? what friends think?)")
-        instructions.append("- React DIFFERENTLY each time - don't use the same words!")
-        instructions.append("- If something confuses you, express it YOUR way (not everyone says '我不懂')")
+        message = "\n".join([
+            f"# PRODUCT INFO (you're seeing this for the first time):\n{context_data}",
+            "",
+            "**HOW TO REACT**:",
+            "- First reaction: Show natural surprise/curiosity based on YOUR personality",
+            "- Focus on what YOU care about (price? safety? what friends think?)",
+            "- React DIFFERENTLY each time - don't use the same words!",
+            "- If something confuses you, express it YOUR way (not everyone says '我不懂')",
+            "---",
+            user_query,
+        ])
 
     print(f"🎭 [Agno] Twin ({ppv_data.id}) 正在思考: {user_query}")
 
     # 4. 建立 Agent
     twin_agent = Agent(
-        model=OpenAIChat(id="gpt-4o", temperature=0.9), # 高溫度增加變化性
+        model=OpenAIChat(
+            id="gpt-4o",
+            temperature=0.9,  # 高溫度增加變化性
+            request_params=prompt_cache_key("digital_twin", ppv_data.id),
+            max_retries=SDK_MAX_RETRIES,
+        ),
         description="You are a real person being interviewed. Be natural and unique.",
         instructions=instructions,
         markdown=False
     )
+    return twin_agent, message
+
+
+def chat_with_digital_twin(ppv_data: PPVInstance, user_query: str, context_data: Optional[str] = None) -> str:
+    """
+    使用 Agno 動態建立一個「分身 Agent」來回答問題。
+    
+    參數:
+    - ppv_data: 人格資料 (JSON)
+    - user_query: 使用者問的問題 (例如: "你會想買嗎？")
+    - context_data: [新功能] 產品文案、新聞或情境描述 (例如: "這是一張年費1000元的卡...")
+    """
+    twin_agent, message = _build_twin_call(ppv_data, user_query, context_data)
 
     try:
         # 5. 執行對話
-        response = twin_agent.run(user_query, stream=False)
+        response = twin_agent.run(message, stream=False)
+        record_usage("digital_twin", response)
+        return response.content
+    except Exception as e:
+        print(f"❌ 對話失敗: {e}")
+        return "（沈默...系統發生錯誤）"
+
+
+async def achat_with_digital_twin(ppv_data: PPVInstance, user_query: str, context_data: Optional[str] = None) -> str:
+    """chat_with_digital_twin 的非同步版本（等待模型回應時不佔用執行緒）"""
+    twin_agent, message = _build_twin_call(ppv_data, user_query, context_data)
+
+    try:
+        response = await twin_agent.arun(message, stream=False)
+        record_usage("digital_twin", response)
         return response.content
     except Exception as e:
         print(f"❌ 對話失敗: {e}")
-        return "（沈默...系統發生錯誤）"
\ No newline at end of file
+        return "（沈默...系統發生錯誤）"
@@ -0,0 +1,358 @@
+"""
+訪談歷史的 prompt 視窗
+不再把最近 5 筆原始問答整段塞進 prompt（話多的受訪者每筆可達 600 字）：
+- 最近 INTERVIEW_HISTORY_TURNS 筆原始問答，總長度不超過 INTERVIEW_HISTORY_TOKENS
+- 更早的問答折疊成一段滾動摘要，快取在 persona 的 historySummary 欄位
+  （{"text", "count", "digest", "updatedAt"}：摘要涵蓋前 count 筆，digest 用來確認這些記錄沒被改過）
+- 移出視窗、尚未摘要的問答累積到 INTERVIEW_SUMMARY_EVERY 筆才增量更新摘要（舊摘要 + 新移出的問答）；
+  未達門檻前以舊摘要加上這幾筆的擷取式重點代替，不呼叫模型
+- 傳入 on_summary 時（互動式訪談），摘要在背景更新並交給 on_summary 保存到 persona，
+  本次請求不等待摘要模型；未傳入時（批量 / 活動）照舊同步更新 persona[historySummary]
+"""
+import datetime
+import asyncio
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional, Tuple, Union
+
+from llm_scheduler import SDK_MAX_RETRIES
+from llm_usage import estimate_tokens, record_usage
+
+HISTORY_TURNS = int(os.getenv("INTERVIEW_HISTORY_TURNS", "5"))
+HISTORY_TOKEN_BUDGET = int(os.getenv("INTERVIEW_HISTORY_TOKENS", "1200"))
+SUMMARY_MAX_CHARS = int(os.getenv("INTERVIEW_SUMMARY_CHARS", "400"))
+SUMMARY_MODEL = os.getenv("INTERVIEW_SUMMARY_MODEL", "gpt-4o-mini")
+SUMMARY_EVERY = int(os.getenv("INTERVIEW_SUMMARY_EVERY", "4"))
+SUMMARY_FIELD = "historySummary"
+
+_TRUNCATED = "…（略）"
+
+Summarizer = Callable[[str, List[Dict[str, Any]]], str]
+AsyncSummarizer = Callable[[str, List[Dict[str, Any]]], Awaitable[str]]
+# 背景更新好的摘要（persona[historySummary] 的新值）-> 保存
+SummarySink = Callable[[Dict[str, Any]], None]
+
+
+def format_turn(record: Dict[str, Any]) -> str:
+    return f"Q: {record.get('question', '')}\nA: {record.get('answer', '')}\n\n"
+
+
+def _truncate_turn(record: Dict[str, Any], budget: int) -> str:
+    """單筆問答就超過預算時，截斷回答"""
+    text = format_turn(record)
+    answer = str(record.get('answer', ''))
+    while answer and estimate_tokens(text) > budget:
+        answer = answer[: len(answer) * 3 // 4]
+        text = f"Q: {record.get('question', '')}\nA: {answer}{_TRUNCATED}\n\n"
+    return text
+
+
+def _digest(history: List[Dict[str, Any]]) -> str:
+    h = hashlib.md5()
+    for record in history:
+        h.update(json.dumps([record.get('question'), record.get('answer')], ensure_ascii=False).encode("utf-8"))
+    return h.hexdigest()
+
+
+class HistoryContext(NamedTuple):
+    summary: str  # 較早問答的摘要（沒有時為空字串）
+    recent: Tuple[str, ...]  # 最近幾筆原始問答（已格式化，由舊到新）
+
+
+def select_recent(
+    history: List[Dict[str, Any]],
+    turns: int = HISTORY_TURNS,
+    budget: int = HISTORY_TOKEN_BUDGET,
+) -> Tuple[int, List[str]]:
+    """由新到舊挑選原始問答直到筆數或 token 預算用完；回傳 (視窗起點 index, 格式化後的問答)"""
+    picked: List[str] = []
+    used = 0
+    start = len(history)
+    for index in range(len(history) - 1, max(-1, len(history) - 1 - turns), -1):
+        text = format_turn(history[index])
+        tokens = estimate_tokens(text)
+        if used + tokens > budget:
+            if not picked:
+                # 最新一筆一定保留（必要時截斷）
+                picked.append(_truncate_turn(history[index], budget))
+                start = index
+            break
+        picked.append(text)
+        used += tokens
+        start = index
+    picked.reverse()
+    return start, picked
+
+
+# ---------- 摘要 ----------
+
+def _extractive_summary(previous: str, records: List[Dict[str, Any]]) -> str:
+    """模型無法使用時的備援：保留每題開頭的重點，超過長度時捨棄最舊的內容"""
+    lines = [previous] if previous else []
+    for record in records:
+        answer = str(record.get('answer', '')).replace("\n", " ")
+        lines.append(f"- {record.get('question', '')}：{answer[:60]}{'…' if len(answer) > 60 else ''}")
+    text = "\n".join(lines)
+    return text[-SUMMARY_MAX_CHARS:]
+
+
+def _summary_agent(previous: str, records: List[Dict[str, Any]]):
+    """建立摘要用的 Agent 與 prompt（同步 / 非同步版本共用）"""
+    from agno.agent import Agent
+    from agno.models.openai import OpenAIChat
+
+    turns = "".join(format_turn(record) for record in records)
+    prompt = (
+        f"# EXISTING SUMMARY:\n{previous or '（無）'}\n\n"
+        f"# NEW INTERVIEW ANSWERS:\n{turns}\n"
+        "Update the summary."
+    )
+    agent = Agent(
+        model=OpenAIChat(
+            id=SUMMARY_MODEL, temperature=0.2, max_tokens=SUMMARY_MAX_CHARS * 2, max_retries=SDK_MAX_RETRIES,
+        ),
+        description="You maintain a running summary of one interviewee's answers in a user research interview.",
+        instructions=[
+            "Merge the new answers into the existing summary. Write in Traditional Chinese.",
+            f"Keep it under {SUMMARY_MAX_CHARS} characters.",
+            "Keep concrete facts the interviewee stated (destinations, brands, prices, amounts, bad experiences),",
+            "their attitudes and opinions, and any commitments or contradictions.",
+            "Drop greetings, filler, and the interviewer's wording. Output only the summary.",
+        ],
+        markdown=False,
+    )
+    return agent, prompt
+
+
+def _summary_text(response: Any) -> Optional[str]:
+    record_usage("history_summary", response)
+    text = (response.content or "").strip()
+    return text[:SUMMARY_MAX_CHARS * 2] if text else None
+
+
+def summarize_turns(previous: str, records: List[Dict[str, Any]]) -> str:
+    """把新移出視窗的問答併入既有摘要（LLM，失敗時改用擷取式摘要）"""
+    agent, prompt = _summary_agent(previous, records)
+    try:
+        text = _summary_text(agent.run(prompt, stream=False))
+        if text:
+            return text
+    except Exception as e:
+        print(f"⚠️ 訪談摘要失敗，改用擷取式摘要: {e}")
+    return _extractive_summary(previous, records)
+
+
+async def asummarize_turns(previous: str, records: List[Dict[str, Any]]) -> str:
+    """summarize_turns 的非同步版本"""
+    agent, prompt = _summary_agent(previous, records)
+    try:
+        text = _summary_text(await agent.arun(prompt, stream=False))
+        if text:
+            return text
+    except Exception as e:
+        print(f"⚠️ 訪談摘要失敗，改用擷取式摘要: {e}")
+    return _extractive_summary(previous, records)
+
+
+# 同一段歷史的摘要在程序內共用（前端每次送來的 persona 不一定帶有 historySummary）
+_SUMMARY_CACHE_SIZE = 1024
+_summary_cache: "OrderedDict[Tuple[str, int, str], str]" = OrderedDict()
+_summary_lock = threading.Lock()
+
+
+def _cache_get(key: Tuple[str, int, str]) -> Optional[str]:
+    with _summary_lock:
+        text = _summary_cache.get(key)
+        if text is not None:
+            _summary_cache.move_to_end(key)
+        return text
+
+
+def _cache_put(key: Tuple[str, int, str], text: str) -> None:
+    with _summary_lock:
+        _summary_cache[key] = text
+        while len(_summary_cache) > _SUMMARY_CACHE_SIZE:
+            _summary_cache.popitem(last=False)
+
+
+def _cached_summary(persona: Dict[str, Any], history: List[Dict[str, Any]]) -> Tuple[str, int]:
+    """persona 上仍然有效的摘要：(text, 涵蓋筆數)；沒有時為 ("", 0)"""
+    cached = persona.get(SUMMARY_FIELD)
+    if isinstance(cached, dict):
+        count = cached.get("count")
+        if isinstance(count, int) and 0 < count <= len(history) and cached.get("digest") == _digest(history[:count]):
+            return str(cached.get("text", "")), count
+    return "", 0
+
+
+class _PendingSummary(NamedTuple):
+    """需要（增量）更新摘要時的參數"""
+    key: Tuple[str, int, str]
+    previous: str
+    records: List[Dict[str, Any]]
+    start: int
+    digest: str
+    recent: Tuple[str, ...]
+
+
+def _plan_history(
+    persona: Dict[str, Any], turns: int, budget: int
+) -> Union[HistoryContext, _PendingSummary]:
+    """不需呼叫 summarizer 就能完成時回傳 HistoryContext，否則回傳待更新的摘要參數"""
+    history = persona.get('interviewHistory') or []
+    start, recent = select_recent(history, turns, budget)
+    if start == 0:
+        return HistoryContext("", tuple(recent))
+
+    summary, covered = _cached_summary(persona, history)
+    if covered >= start:
+        # 摘要已涵蓋部分視窗內的問答（例如預算變大）：不重複列出
+        return HistoryContext(summary, tuple(recent[covered - start:]))
+
+    digest = _digest(history[:start])
+    key = (str(persona.get('id', persona.get('lastName', ''))), start, digest)
+    # 增量更新：只把上次摘要之後、這次移出視窗的問答併入
+    return _PendingSummary(key, summary, history[covered:start], start, digest, tuple(recent))
+
+
+def _summary_entry(pending: _PendingSummary, text: str) -> Dict[str, Any]:
+    return {
+        "text": text,
+        "count": pending.start,
+        "digest": pending.digest,
+        "updatedAt": datetime.datetime.now().isoformat(),
+    }
+
+
+def _store_summary(persona: Dict[str, Any], pending: _PendingSummary, text: str) -> HistoryContext:
+    _cache_put(pending.key, text)
+    persona[SUMMARY_FIELD] = _summary_entry(pending, text)
+    return HistoryContext(text, pending.recent)
+
+
+def _stopgap(pending: _PendingSummary) -> HistoryContext:
+    """摘要尚未更新時：舊摘要 + 尚未摘要問答的擷取式重點（不呼叫模型，也不改動 persona）"""
+    extract = _extractive_summary("", pending.records)
+    summary = f"{pending.previous}\n{extract}" if pending.previous else extract
+    return HistoryContext(summary, pending.recent)
+
+
+# 背景更新中的摘要（同一段歷史只更新一次）
+_inflight: set = set()
+_background_tasks: set = set()
+
+
+def _claim(key: Tuple[str, int, str]) -> bool:
+    with _summary_lock:
+        if key in _inflight:
+            return False
+        _inflight.add(key)
+        return True
+
+
+def _release(key: Tuple[str, int, str]) -> None:
+    with _summary_lock:
+        _inflight.discard(key)
+
+
+def _refresh_in_background(pending: _PendingSummary, summarizer: Summarizer, on_summary: SummarySink) -> None:
+    if not _claim(pending.key):
+        return
+
+    def run() -> None:
+        try:
+            text = summarizer(pending.previous, pending.records)
+            _cache_put(pending.key, text)
+            on_summary(_summary_entry(pending, text))
+        except Exception as e:
+            print(f"⚠️ 背景更新訪談摘要失敗: {e}")
+        finally:
+            _release(pending.key)
+
+    threading.Thread(target=run, name="history-summary", daemon=True).start()
+
+
+def _arefresh_in_background(pending: _PendingSummary, summarizer: AsyncSummarizer, on_summary: SummarySink) -> None:
+    if not _claim(pending.key):
+        return
+
+    async def run() -> None:
+        try:
+            text = await summarizer(pending.previous, pending.records)
+            _cache_put(pending.key, text)
+            await asyncio.to_thread(on_summary, _summary_entry(pending, text))
+        except Exception as e:
+            print(f"⚠️ 背景更新訪談摘要失敗: {e}")
+        finally:
+            _release(pending.key)
+
+    # event loop 只保留 task 的弱參照，執行完之前自行保留
+    task = asyncio.get_running_loop().create_task(run())
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+def build_history_context(
+    persona: Dict[str, Any],
+    summarizer: Summarizer = summarize_turns,
+    turns: int = HISTORY_TURNS,
+    budget: int = HISTORY_TOKEN_BUDGET,
+    refresh_every: int = SUMMARY_EVERY,
+    on_summary: Optional[SummarySink] = None,
+) -> HistoryContext:
+    """
+    組出 prompt 用的訪談歷史
+
+    - 需要更新摘要且未傳入 on_summary：同步更新 persona[historySummary]（呼叫端照常儲存 persona 即可保存）
+    - 傳入 on_summary：摘要在背景執行緒更新後交給 on_summary，本次先用舊摘要 + 擷取式重點
+    """
+    plan = _plan_history(persona, turns, budget)
+    if isinstance(plan, HistoryContext):
+        return plan
+    text = _cache_get(plan.key)
+    if text is not None:
+        return _store_summary(persona, plan, text)
+    if len(plan.records) < refresh_every:
+        return _stopgap(plan)
+    if on_summary is not None:
+        _refresh_in_background(plan, summarizer, on_summary)
+        return _stopgap(plan)
+    return _store_summary(persona, plan, summarizer(plan.previous, plan.records))
+
+
+async def abuild_history_context(
+    persona: Dict[str, Any],
+    summarizer: AsyncSummarizer = asummarize_turns,
+    turns: int = HISTORY_TURNS,
+    budget: int = HISTORY_TOKEN_BUDGET,
+    refresh_every: int = SUMMARY_EVERY,
+    on_summary: Optional[SummarySink] = None,
+) -> HistoryContext:
+    """build_history_context 的非同步版本（summarizer 為 coroutine function；背景更新以 task 執行）"""
+    plan = _plan_history(persona, turns, budget)
+    if isinstance(plan, HistoryContext):
+        return plan
+    text = _cache_get(plan.key)
+    if text is not None:
+        return _store_summary(persona, plan, text)
+    if len(plan.records) < refresh_every:
+        return _stopgap(plan)
+    if on_summary is not None:
+        _arefresh_in_background(plan, summarizer, on_summary)
+        return _stopgap(plan)
+    return _store_summary(persona, plan, await summarizer(plan.previous, plan.records))
+
+
+def format_history_context(context: HistoryContext, header: str) -> str:
+    """格式化為 prompt 段落；沒有任何歷史時回傳空字串"""
+    if not context.summary and not context.recent:
+        return ""
+    text = f"\n{header}\n"
+    if context.summary:
+        text += f"## Summary of earlier answers:\n{context.summary}\n\n"
+        if context.recent:
+            text += "## Most recent answers:\n"
+    return text + "".join(context.recent)
@@ -0,0 +1,407 @@
+"""
+LLM 請求錄製 / 重播（cassette）
+在 httpx transport 層攔截所有 OpenAI 請求，讓沒有網路、沒有 API key 額度的機器也能跑完整流程做壓測與 profiling：
+- record：照常呼叫 API，並把 request -> response（含串流事件與時間）逐筆寫入 cassette（JSONL）
+- replay：不連網，依 request 內容從 cassette 找回 response，並模擬延遲
+
+涵蓋範圍：cassette_transport() 由 llm_scheduler 組進所有 LLM 請求共用的 httpx client
+- 所有 agno 模型（OpenAIChat / OpenAIResponses，含 artifacts team）共用的全域 httpx client（install_llm_clients）
+- 直接使用 openai SDK 的模組透過 llm_http_client() 取得 http_client
+
+環境變數：
+    LLM_CASSETTE=record|replay        未設定時不啟用
+    LLM_CASSETTE_PATH                 cassette 檔（預設 server/cassettes/llm.jsonl）
+    LLM_CASSETTE_STRICT=1             replay 找不到完全相同的 request 時直接回 404（預設改用同一 endpoint 的其他錄製結果）
+    LLM_REPLAY_LATENCY_MS             固定的首位元組延遲（毫秒）；未設定時使用錄製時的實際延遲
+    LLM_REPLAY_LATENCY_SCALE          延遲倍率（預設 1.0；0 表示不等待）
+
+replay 時 openai SDK 仍要求 OPENAI_API_KEY，設定任意值即可。
+"""
+import asyncio
+import datetime
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+import httpx
+
+RECORD = "record"
+REPLAY = "replay"
+
+DEFAULT_CASSETTE_PATH = "server/cassettes/llm.jsonl"
+
+# 與 agno 預設的全域 client 相同的連線上限
+CLIENT_LIMITS = httpx.Limits(max_connections=1000, max_keepalive_connections=200)
+
+
+def _encode_body(data: bytes) -> str:
+    # surrogateescape 讓非 UTF-8 的位元組也能無損存進 JSON
+    return data.decode("utf-8", "surrogateescape")
+
+
+def _decode_body(text: str) -> bytes:
+    return text.encode("utf-8", "surrogateescape")
+
+
+def _split_events(data: bytes) -> List[bytes]:
+    """SSE 內容依事件切開（每段含結尾的空行），重播時逐事件送出"""
+    events = [part + b"\n\n" for part in data.split(b"\n\n") if part.strip()]
+    return events or [data]
+
+
+def request_key(request: httpx.Request) -> str:
+    """request 的比對 key：method + path + body（JSON 以排序後的 key 正規化），不含 host 與 header"""
+    body = request.content
+    try:
+        body = json.dumps(json.loads(body), sort_keys=True, ensure_ascii=False).encode("utf-8")
+    except ValueError:
+        pass
+    digest = hashlib.sha256(body).hexdigest()
+    return f"{request.method} {request.url.path} {digest}"
+
+
+def _endpoint(request: httpx.Request) -> str:
+    return f"{request.method} {request.url.path}"
+
+
+class Cassette:
+    """cassette 檔：JSONL，每行一組 request / response"""
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._by_key: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        self._by_endpoint: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        self._cursor: Dict[str, int] = defaultdict(int)
+        self._load()
+
+    def _load(self) -> None:
+        if not self.path.exists():
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                self._index(json.loads(line))
+
+    def _index(self, entry: Dict[str, Any]) -> None:
+        self._by_key[entry["key"]].append(entry)
+        self._by_endpoint[entry["endpoint"]].append(entry)
+
+    def __len__(self) -> int:
+        return sum(len(entries) for entries in self._by_key.values())
+
+    def append(self, entry: Dict[str, Any]) -> None:
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+            self._index(entry)
+
+    def _next(self, bucket: str, entries: List[Dict[str, Any]]) -> Dict[str, Any]:
+        # 同一 request 錄了多次時依序輪流重播
+        index = self._cursor[bucket] % len(entries)
+        self._cursor[bucket] += 1
+        return entries[index]
+
+    def lookup(self, request: httpx.Request, strict: bool = False) -> Optional[Dict[str, Any]]:
+        key = request_key(request)
+        with self._lock:
+            if self._by_key.get(key):
+                return self._next(key, self._by_key[key])
+            endpoint = _endpoint(request)
+            if not strict and self._by_endpoint.get(endpoint):
+                # prompt 含隨機內容（例如生成器）時完全比對不到，改用同一 endpoint 的錄製結果
+                return self._next(endpoint, self._by_endpoint[endpoint])
+        return None
+
+
+class _Recorder:
+    """回應內容讀完（或串流關閉）時寫入 cassette"""
+
+    def __init__(self, cassette: Cassette, request: httpx.Request, response: httpx.Response, started: float) -> None:
+        self.cassette = cassette
+        self.request = request
+        self.response = response
+        self.started = started
+        self.ttfb = time.perf_counter() - started
+        self.chunks: List[bytes] = []
+        self.saved = False
+
+    def finish(self) -> None:
+        if self.saved:
+            return
+        self.saved = True
+        body = b"".join(self.chunks)
+        content_type = self.response.headers.get("content-type", "")
+        entry: Dict[str, Any] = {
+            "key": request_key(self.request),
+            "endpoint": _endpoint(self.request),
+            "request": _encode_body(self.request.content),
+            "status": self.response.status_code,
+            "headers": {
+                name: value for name, value in self.response.headers.items()
+                if name.lower() in ("content-type", "content-encoding")
+            },
+            "ttfb": round(self.ttfb, 4),
+            "duration": round(time.perf_counter() - self.started, 4),
+            "recordedAt": datetime.datetime.now().isoformat(),
+        }
+        if content_type.startswith("text/event-stream"):
+            entry["events"] = [_encode_body(event) for event in _split_events(body)]
+        else:
+            entry["body"] = _encode_body(body)
+        self.cassette.append(entry)
+
+
+class _RecordingStream(httpx.SyncByteStream):
+    def __init__(self, stream: httpx.SyncByteStream, recorder: _Recorder) -> None:
+        self._stream = stream
+        self._recorder = recorder
+
+    def __iter__(self) -> Iterator[bytes]:
+        for chunk in self._stream:
+            self._recorder.chunks.append(chunk)
+            yield chunk
+
+    def close(self) -> None:
+        self._stream.close()
+        self._recorder.finish()
+
+
+class _AsyncRecordingStream(httpx.AsyncByteStream):
+    def __init__(self, stream: httpx.AsyncByteStream, recorder: _Recorder) -> None:
+        self._stream = stream
+        self._recorder = recorder
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        async for chunk in self._stream:
+            self._recorder.chunks.append(chunk)
+            yield chunk
+
+    async def aclose(self) -> None:
+        await self._stream.aclose()
+        self._recorder.finish()
+
+
+class _ReplayStream(httpx.SyncByteStream):
+    def __init__(self, chunks: List[bytes], delay: float) -> None:
+        self._chunks = chunks
+        self._delay = delay
+
+    def __iter__(self) -> Iterator[bytes]:
+        for i, chunk in enumerate(self._chunks):
+            if i and self._delay > 0:
+                time.sleep(self._delay)
+            yield chunk
+
+
+class _AsyncReplayStream(httpx.AsyncByteStream):
+    def __init__(self, chunks: List[bytes], delay: float) -> None:
+        self._chunks = chunks
+        self._delay = delay
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        for i, chunk in enumerate(self._chunks):
+            if i and self._delay > 0:
+                await asyncio.sleep(self._delay)
+            yield chunk
+
+
+class _CassetteMixin:
+    mode: str
+    cassette: Cassette
+    latency_ms: Optional[float]
+    latency_scale: float
+    strict: bool
+
+    def _prepare(self, request: httpx.Request) -> None:
+        if self.mode == RECORD:
+            # 錄製未壓縮的內容，重播時不必再解壓
+            request.headers["accept-encoding"] = "identity"
+
+    def _timing(self, entry: Dict[str, Any], chunk_count: int) -> Tuple[float, float]:
+        """(首位元組延遲, 串流事件間隔)，單位秒"""
+        if self.latency_ms is not None:
+            ttfb = self.latency_ms / 1000
+        else:
+            ttfb = float(entry.get("ttfb", 0.0))
+        gap = max(0.0, float(entry.get("duration", 0.0)) - float(entry.get("ttfb", 0.0)))
+        per_chunk = gap / (chunk_count - 1) if chunk_count > 1 else 0.0
+        return ttfb * self.latency_scale, per_chunk * self.latency_scale
+
+    def _replay_parts(self, request: httpx.Request) -> Tuple[Optional[Dict[str, Any]], List[bytes]]:
+        entry = self.cassette.lookup(request, strict=self.strict)
+        if entry is None:
+            return None, []
+        if "events" in entry:
+            return entry, [_decode_body(event) for event in entry["events"]]
+        return entry, [_decode_body(entry.get("body", ""))]
+
+    @staticmethod
+    def _miss(request: httpx.Request) -> httpx.Response:
+        # 回 404：openai SDK 不會重試，直接拋出 NotFoundError
+        return httpx.Response(
+            404,
+            json={"error": {
+                "message": f"cassette 中沒有此請求的錄製結果: {_endpoint(request)}",
+                "type": "cassette_miss",
+            }},
+            request=request,
+        )
+
+
+class CassetteTransport(_CassetteMixin, httpx.BaseTransport):
+    """同步 httpx transport"""
+
+    def __init__(
+        self,
+        mode: str,
+        cassette: Cassette,
+        inner: Optional[httpx.BaseTransport] = None,
+        latency_ms: Optional[float] = None,
+        latency_scale: float = 1.0,
+        strict: bool = False,
+    ) -> None:
+        self.mode = mode
+        self.cassette = cassette
+        self.inner = inner or httpx.HTTPTransport(limits=CLIENT_LIMITS)
+        self.latency_ms = latency_ms
+        self.latency_scale = latency_scale
+        self.strict = strict
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        self._prepare(request)
+        if self.mode == RECORD:
+            request.read()
+            started = time.perf_counter()
+            response = self.inner.handle_request(request)
+            recorder = _Recorder(self.cassette, request, response, started)
+            return httpx.Response(
+                response.status_code,
+                headers=response.headers,
+                stream=_RecordingStream(response.stream, recorder),
+                extensions=response.extensions,
+                request=request,
+            )
+
+        request.read()
+        entry, chunks = self._replay_parts(request)
+        if entry is None:
+            return self._miss(request)
+        ttfb, per_chunk = self._timing(entry, len(chunks))
+        if ttfb > 0:
+            time.sleep(ttfb)
+        return httpx.Response(
+            entry["status"], headers=entry["headers"], stream=_ReplayStream(chunks, per_chunk), request=request,
+        )
+
+    def close(self) -> None:
+        self.inner.close()
+
+
+class AsyncCassetteTransport(_CassetteMixin, httpx.AsyncBaseTransport):
+    """非同步 httpx transport"""
+
+    def __init__(
+        self,
+        mode: str,
+        cassette: Cassette,
+        inner: Optional[httpx.AsyncBaseTransport] = None,
+        latency_ms: Optional[float] = None,
+        latency_scale: float = 1.0,
+        strict: bool = False,
+    ) -> None:
+        self.mode = mode
+        self.cassette = cassette
+        self.inner = inner or httpx.AsyncHTTPTransport(limits=CLIENT_LIMITS)
+        self.latency_ms = latency_ms
+        self.latency_scale = latency_scale
+        self.strict = strict
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self._prepare(request)
+        if self.mode == RECORD:
+            await request.aread()
+            started = time.perf_counter()
+            response = await self.inner.handle_async_request(request)
+            recorder = _Recorder(self.cassette, request, response, started)
+            return httpx.Response(
+                response.status_code,
+                headers=response.headers,
+                stream=_AsyncRecordingStream(response.stream, recorder),
+                extensions=response.extensions,
+                request=request,
+            )
+
+        await request.aread()
+        entry, chunks = self._replay_parts(request)
+        if entry is None:
+            return self._miss(request)
+        ttfb, per_chunk = self._timing(entry, len(chunks))
+        if ttfb > 0:
+            await asyncio.sleep(ttfb)
+        return httpx.Response(
+            entry["status"], headers=entry["headers"], stream=_AsyncReplayStream(chunks, per_chunk), request=request,
+        )
+
+    async def aclose(self) -> None:
+        await self.inner.aclose()
+
+
+@dataclass
+class CassetteSettings:
+    mode: str
+    path: Path
+    strict: bool
+    latency_ms: Optional[float]
+    latency_scale: float
+
+    @classmethod
+    def from_env(cls) -> "CassetteSettings":
+        # 呼叫時才讀取環境變數：.env 在各模組 import 之後才載入
+        mode = os.getenv("LLM_CASSETTE", "").strip().lower()
+        if mode == "off":
+            mode = ""
+        if mode not in ("", RECORD, REPLAY):
+            raise ValueError(f"LLM_CASSETTE 只能是 record 或 replay，收到 {mode!r}")
+        latency_ms = os.getenv("LLM_REPLAY_LATENCY_MS", "").strip()
+        return cls(
+            mode=mode,
+            path=Path(os.getenv("LLM_CASSETTE_PATH", DEFAULT_CASSETTE_PATH)),
+            strict=os.getenv("LLM_CASSETTE_STRICT", "0") == "1",
+            latency_ms=float(latency_ms) if latency_ms else None,
+            latency_scale=float(os.getenv("LLM_REPLAY_LATENCY_SCALE", "1.0")),
+        )
+
+    def transport_kwargs(self) -> Dict[str, Any]:
+        return {"latency_ms": self.latency_ms, "latency_scale": self.latency_scale, "strict": self.strict}
+
+
+_cassettes: Dict[Path, Cassette] = {}
+_cassette_lock = threading.Lock()
+
+
+def get_cassette(path: Path) -> Cassette:
+    """同一個 cassette 檔在程序內共用一個實例（共用重播順序與寫入鎖）"""
+    path = Path(path).resolve()
+    with _cassette_lock:
+        if path not in _cassettes:
+            _cassettes[path] = Cassette(path)
+        return _cassettes[path]
+
+
+def cassette_transport(asynchronous: bool = False) -> Optional[Any]:
+    """啟用 cassette 時回傳對應的 transport（由 llm_scheduler 組進共用的 httpx client）；未啟用時回傳 None"""
+    settings = CassetteSettings.from_env()
+    if not settings.mode:
+        return None
+    transport_cls = AsyncCassetteTransport if asynchronous else CassetteTransport
+    return transport_cls(settings.mode, get_cassette(settings.path), **settings.transport_kwargs())
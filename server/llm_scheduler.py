@@ -0,0 +1,548 @@
+"""
+LLM 請求排程器
+所有 OpenAI 請求（agno 模型與直接使用 openai SDK 的模組）都經過同一個 httpx transport，在這裡統一處理速率限制與重試：
+- 每個模型一組 token bucket：每分鐘請求數（RPM）與每分鐘 token 數（TPM）
+  沒有設定時採用 API 回應 header 中的 x-ratelimit-limit-*，不設定也能跑滿帳號額度
+- 優先等級：interactive（使用者正在等的對話、單題訪談）排在 batch（批量訪談、訪談活動）前面，
+  且 batch 不會用到保留給 interactive 的最後 LLM_INTERACTIVE_RESERVE 比例額度
+- 429 / 5xx / 連線錯誤自動重試：有 Retry-After（或 retry-after-ms）時照做，否則使用 full-jitter 指數退避
+- 收到 429 時同一模型的所有請求一起暫停到 Retry-After，並暫時降低速率，之後每次成功逐步恢復
+
+token 的預估方式與 OpenAI 計算 TPM 的方式相同：輸入 token + max_tokens（未指定時用 LLM_DEFAULT_OUTPUT_TOKENS）。
+重試用完仍失敗時，原本的錯誤回應照常交給 openai SDK / agno，各模組原有的錯誤處理不變；
+回應會加上 `x-should-retry: false`，SDK 不會再自行重試（重試只在這裡進行，等待也都經過 limiter）。
+建立 OpenAI / agno client 時一律傳入 max_retries=SDK_MAX_RETRIES，連線錯誤同樣不會被 SDK 重試第二層。
+
+環境變數（.env 載入後、第一次建立 client 時讀取）：
+    LLM_RPM / LLM_TPM                          每個模型的上限（0 或未設定：採用 API 回報的上限）
+    LLM_INTERACTIVE_RESERVE                    batch 不可使用的額度比例（預設 0.1）
+    LLM_MAX_RETRIES                            最多重試次數（預設 5）
+    LLM_BACKOFF_BASE_MS / LLM_BACKOFF_MAX_MS   指數退避的基準與上限（預設 500 / 30000）
+    LLM_DEFAULT_OUTPUT_TOKENS                  請求未指定 max_tokens 時預估的輸出 token（預設 1000）
+"""
+import asyncio
+import email.utils
+import heapq
+import itertools
+import json
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import httpx
+
+from llm_cassette import CLIENT_LIMITS, CassetteSettings, cassette_transport
+from llm_usage import estimate_tokens
+
+# openai SDK / agno 模型的 max_retries：重試只由排程器處理
+SDK_MAX_RETRIES = 0
+
+INTERACTIVE = 0
+BATCH = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BATCH: "batch"}
+
+RETRY_STATUS = {408, 409, 429, 500, 502, 503, 504}
+MIN_SCALE = 0.25  # 連續 429 時速率最低降到設定值的 25%
+
+_priority: ContextVar[int] = ContextVar("llm_priority", default=INTERACTIVE)
+
+
+@contextmanager
+def llm_priority(priority: int) -> Iterator[None]:
+    """
+    範圍內發出的 LLM 請求使用指定的優先等級
+    （ContextVar 不會自動帶進執行緒池，需在工作函式內部設定）
+    """
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+@dataclass
+class SchedulerSettings:
+    rpm: int = 0
+    tpm: int = 0
+    interactive_reserve: float = 0.1
+    max_retries: int = 5
+    backoff_base: float = 0.5
+    backoff_max: float = 30.0
+    default_output_tokens: int = 1000
+
+    @classmethod
+    def from_env(cls) -> "SchedulerSettings":
+        return cls(
+            rpm=int(os.getenv("LLM_RPM", "0") or 0),
+            tpm=int(os.getenv("LLM_TPM", "0") or 0),
+            interactive_reserve=float(os.getenv("LLM_INTERACTIVE_RESERVE", "0.1")),
+            max_retries=int(os.getenv("LLM_MAX_RETRIES", "5")),
+            backoff_base=float(os.getenv("LLM_BACKOFF_BASE_MS", "500")) / 1000,
+            backoff_max=float(os.getenv("LLM_BACKOFF_MAX_MS", "30000")) / 1000,
+            default_output_tokens=int(os.getenv("LLM_DEFAULT_OUTPUT_TOKENS", "1000")),
+        )
+
+
+# ---------- 速率限制 ----------
+
+class _Bucket:
+    """每分鐘額度的 token bucket；available 可能暫時為負（API 回報的剩餘額度比本地估計少時）"""
+
+    def __init__(self, per_minute: float) -> None:
+        self.capacity = float(per_minute)
+        self.available = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now: float, scale: float) -> None:
+        rate = self.capacity / 60.0 * scale
+        self.available = min(self.capacity, self.available + (now - self.updated) * rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, floor: float, scale: float) -> float:
+        """扣除 amount 後仍不低於 floor 所需等待的秒數（amount 超過可用容量時以容量計）"""
+        amount = min(amount, self.capacity - floor)
+        missing = amount + floor - self.available
+        if missing <= 0:
+            return 0.0
+        return missing / (self.capacity / 60.0 * scale)
+
+
+class _Waiter:
+    """排隊中的請求；同步呼叫端等 Event，非同步呼叫端等 event loop 上的 Future"""
+
+    __slots__ = ("priority", "seq", "tokens", "granted", "cancelled", "event", "loop", "future")
+
+    def __init__(self, priority: int, seq: int, tokens: int, loop: Optional[asyncio.AbstractEventLoop] = None) -> None:
+        self.priority = priority
+        self.seq = seq
+        self.tokens = tokens
+        self.granted = False
+        self.cancelled = False
+        self.loop = loop
+        self.future: Optional[asyncio.Future] = loop.create_future() if loop is not None else None
+        self.event: Optional[threading.Event] = None if loop is not None else threading.Event()
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+    def grant(self) -> None:
+        self.granted = True
+        if self.future is not None:
+            self.loop.call_soon_threadsafe(_resolve, self.future)
+        else:
+            self.event.set()
+
+
+def _resolve(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+def _header_number(headers: httpx.Headers, name: str) -> Optional[float]:
+    value = headers.get(name)
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class ModelLimiter:
+    """
+    單一模型的速率限制：依優先等級與到達順序放行請求
+
+    有空餘額度且沒人排隊時直接放行；否則排隊，由背景執行緒在額度足夠時依序放行
+    """
+
+    def __init__(self, model: str, settings: SchedulerSettings) -> None:
+        self.model = model
+        self.settings = settings
+        self._cond = threading.Condition()
+        self._requests = _Bucket(settings.rpm) if settings.rpm > 0 else None
+        self._tokens = _Bucket(settings.tpm) if settings.tpm > 0 else None
+        # 環境變數設定的上限優先，不會被 API header 覆蓋
+        self._fixed_requests = self._requests is not None
+        self._fixed_tokens = self._tokens is not None
+        self._scale = 1.0
+        self._blocked_until = 0.0
+        self._waiters: List[_Waiter] = []
+        self._seq = itertools.count()
+        self._dispatcher: Optional[threading.Thread] = None
+        self._stats = {"requests": 0, "retries": 0, "rateLimited": 0, "failures": 0, "queuedSeconds": 0.0}
+
+    # --- 放行 ---
+
+    def _delay(self, waiter: _Waiter, now: float) -> float:
+        if self._blocked_until > now:
+            return self._blocked_until - now
+        delay = 0.0
+        for bucket, amount in ((self._requests, 1), (self._tokens, waiter.tokens)):
+            if bucket is None:
+                continue
+            bucket.refill(now, self._scale)
+            floor = bucket.capacity * self.settings.interactive_reserve if waiter.priority >= BATCH else 0.0
+            delay = max(delay, bucket.wait_time(amount, floor, self._scale))
+        return delay
+
+    def _dispatch(self) -> Optional[float]:
+        """（持有鎖時呼叫）放行所有可以放行的請求；回傳下一位需要等待的秒數，沒人排隊時為 None"""
+        while self._waiters:
+            waiter = self._waiters[0]
+            if waiter.cancelled:
+                heapq.heappop(self._waiters)
+                continue
+            delay = self._delay(waiter, time.monotonic())
+            if delay > 0:
+                return delay
+            heapq.heappop(self._waiters)
+            if self._requests is not None:
+                self._requests.available -= 1
+            if self._tokens is not None:
+                self._tokens.available -= min(waiter.tokens, self._tokens.capacity)
+            self._stats["requests"] += 1
+            waiter.grant()
+        return None
+
+    def _run_dispatcher(self) -> None:
+        with self._cond:
+            while True:
+                self._cond.wait(self._dispatch())
+
+    def _enqueue(self, waiter: _Waiter) -> None:
+        with self._cond:
+            heapq.heappush(self._waiters, waiter)
+            self._dispatch()
+            if waiter.granted:
+                return
+            if self._dispatcher is None:
+                self._dispatcher = threading.Thread(
+                    target=self._run_dispatcher, name=f"llm-limiter-{self.model}", daemon=True
+                )
+                self._dispatcher.start()
+            self._cond.notify_all()
+
+    def acquire(self, tokens: int, priority: int = INTERACTIVE) -> float:
+        """等到可以送出請求為止，回傳排隊的秒數"""
+        started = time.monotonic()
+        waiter = _Waiter(priority, next(self._seq), tokens)
+        self._enqueue(waiter)
+        if not waiter.granted:
+            waiter.event.wait()
+        return self._queued(started)
+
+    async def aacquire(self, tokens: int, priority: int = INTERACTIVE) -> float:
+        """acquire 的非同步版本：排隊時不佔用執行緒"""
+        started = time.monotonic()
+        waiter = _Waiter(priority, next(self._seq), tokens, loop=asyncio.get_running_loop())
+        self._enqueue(waiter)
+        if not waiter.granted:
+            try:
+                await waiter.future
+            except asyncio.CancelledError:
+                with self._cond:
+                    waiter.cancelled = True
+                raise
+        return self._queued(started)
+
+    def _queued(self, started: float) -> float:
+        waited = time.monotonic() - started
+        with self._cond:
+            self._stats["queuedSeconds"] += waited
+        return waited
+
+    # --- 回饋 ---
+
+    def observe(self, headers: httpx.Headers) -> None:
+        """依 API 回報的上限與剩餘額度調整 bucket"""
+        with self._cond:
+            now = time.monotonic()
+            for kind in ("requests", "tokens"):
+                limit = _header_number(headers, f"x-ratelimit-limit-{kind}")
+                remaining = _header_number(headers, f"x-ratelimit-remaining-{kind}")
+                bucket = self._requests if kind == "requests" else self._tokens
+                fixed = self._fixed_requests if kind == "requests" else self._fixed_tokens
+                if limit and not fixed and (bucket is None or bucket.capacity != limit):
+                    bucket = _Bucket(limit)
+                    if kind == "requests":
+                        self._requests = bucket
+                    else:
+                        self._tokens = bucket
+                if bucket is not None and remaining is not None:
+                    bucket.refill(now, self._scale)
+                    bucket.available = min(bucket.available, remaining)
+
+    def rate_limited(self, delay: float) -> None:
+        """收到 429：整個模型暫停 delay 秒並降低速率"""
+        with self._cond:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + delay)
+            self._scale = max(MIN_SCALE, self._scale * 0.7)
+            self._stats["rateLimited"] += 1
+            self._cond.notify_all()
+
+    def succeeded(self) -> None:
+        with self._cond:
+            if self._scale < 1.0:
+                self._scale = min(1.0, self._scale + 0.05)
+
+    def retried(self) -> None:
+        with self._cond:
+            self._stats["retries"] += 1
+
+    def failed(self) -> None:
+        with self._cond:
+            self._stats["failures"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            waiting: Dict[str, int] = {}
+            for waiter in self._waiters:
+                if not waiter.cancelled:
+                    name = PRIORITY_NAMES.get(waiter.priority, str(waiter.priority))
+                    waiting[name] = waiting.get(name, 0) + 1
+            return {
+                **self._stats,
+                "queuedSeconds": round(self._stats["queuedSeconds"], 3),
+                "rpm": self._requests.capacity if self._requests else None,
+                "tpm": self._tokens.capacity if self._tokens else None,
+                "rateScale": round(self._scale, 3),
+                "waiting": waiting,
+            }
+
+
+# ---------- 排程器 ----------
+
+def _collect_text(value: Any, parts: List[str]) -> None:
+    """收集 request body 中要送進模型的文字（略過 data: URL 形式的圖片）"""
+    if isinstance(value, str):
+        if not value.startswith("data:"):
+            parts.append(value)
+    elif isinstance(value, list):
+        for item in value:
+            _collect_text(item, parts)
+    elif isinstance(value, dict):
+        for item in value.values():
+            _collect_text(item, parts)
+
+
+def retry_after(headers: httpx.Headers) -> Optional[float]:
+    """Retry-After / retry-after-ms header 的秒數；沒有或無法解析時為 None"""
+    milliseconds = _header_number(headers, "retry-after-ms")
+    if milliseconds is not None:
+        return max(0.0, milliseconds / 1000)
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class LLMScheduler:
+    """依 request body 中的 model 分派到各自的 ModelLimiter，並決定重試策略"""
+
+    def __init__(self, settings: Optional[SchedulerSettings] = None) -> None:
+        self.settings = settings or SchedulerSettings()
+        self._limiters: Dict[str, ModelLimiter] = {}
+        self._lock = threading.Lock()
+
+    def limiter(self, model: str) -> ModelLimiter:
+        with self._lock:
+            if model not in self._limiters:
+                self._limiters[model] = ModelLimiter(model, self.settings)
+            return self._limiters[model]
+
+    def plan(self, request: httpx.Request) -> Tuple[Optional[ModelLimiter], int]:
+        """回傳 (limiter, 預估 token)；不是送給模型的 JSON 請求時 limiter 為 None"""
+        if request.method != "POST":
+            return None, 0
+        try:
+            body = json.loads(request.read() or b"null")
+        except (ValueError, UnicodeDecodeError):
+            return None, 0
+        if not isinstance(body, dict) or "model" not in body:
+            return None, 0
+        parts: List[str] = []
+        for key in ("messages", "input", "instructions", "tools", "response_format", "text"):
+            _collect_text(body.get(key), parts)
+        tokens = sum(estimate_tokens(part) for part in parts)
+        if not request.url.path.endswith("/embeddings"):
+            tokens += int(
+                body.get("max_tokens")
+                or body.get("max_completion_tokens")
+                or body.get("max_output_tokens")
+                or self.settings.default_output_tokens
+            )
+        return self.limiter(str(body["model"])), tokens
+
+    def backoff(self, attempt: int) -> float:
+        """full-jitter 指數退避"""
+        return random.uniform(0, min(self.settings.backoff_max, self.settings.backoff_base * 2 ** attempt))
+
+    def retry_delay(self, response: Optional[httpx.Response], attempt: int) -> Optional[float]:
+        """需要重試時回傳等待秒數；不重試時為 None（response 為 None 表示連線錯誤）"""
+        if attempt >= self.settings.max_retries:
+            return None
+        if response is None:
+            return self.backoff(attempt)
+        should_retry = response.headers.get("x-should-retry")
+        if should_retry == "false" or (should_retry != "true" and response.status_code not in RETRY_STATUS):
+            return None
+        delay = retry_after(response.headers)
+        if delay is None:
+            return self.backoff(attempt)
+        # 加一點抖動，避免同時被擋下的請求在同一瞬間一起重送
+        return min(delay, self.settings.backoff_max) + random.uniform(0, self.settings.backoff_base / 2)
+
+    def after_response(self, limiter: ModelLimiter, response: httpx.Response, attempt: int) -> Optional[float]:
+        """處理回應：回傳重試前要等待的秒數，不重試時為 None"""
+        limiter.observe(response.headers)
+        if response.status_code < 400:
+            limiter.succeeded()
+            return None
+        delay = self.retry_delay(response, attempt)
+        if delay is None:
+            limiter.failed()
+            # 交回給 SDK 的最終錯誤：不要在排程器之外再重試
+            response.headers["x-should-retry"] = "false"
+            return None
+        limiter.retried()
+        if response.status_code == 429:
+            limiter.rate_limited(delay)
+        print(f"⏳ [LLM scheduler] {limiter.model} HTTP {response.status_code}，"
+              f"{delay:.1f}s 後重試（第 {attempt + 1} 次）")
+        return delay
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            limiters = list(self._limiters.values())
+        return {limiter.model: limiter.stats() for limiter in limiters}
+
+
+class SchedulingTransport(httpx.BaseTransport):
+    def __init__(self, inner: httpx.BaseTransport, scheduler: LLMScheduler) -> None:
+        self.inner = inner
+        self.scheduler = scheduler
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        limiter, tokens = self.scheduler.plan(request)
+        if limiter is None:
+            return self.inner.handle_request(request)
+        priority = _priority.get()
+        attempt = 0
+        while True:
+            limiter.acquire(tokens, priority)
+            try:
+                response = self.inner.handle_request(request)
+            except httpx.TransportError as e:
+                delay = self.scheduler.retry_delay(None, attempt)
+                if delay is None:
+                    limiter.failed()
+                    raise
+                limiter.retried()
+                print(f"⏳ [LLM scheduler] {limiter.model} {type(e).__name__}，{delay:.1f}s 後重試")
+                time.sleep(delay)
+                attempt += 1
+                continue
+            delay = self.scheduler.after_response(limiter, response, attempt)
+            if delay is None:
+                return response
+            response.read()
+            response.close()
+            if response.status_code != 429:
+                # 429 的等待由 limiter 統一處理（整個模型一起暫停）
+                time.sleep(delay)
+            attempt += 1
+
+    def close(self) -> None:
+        self.inner.close()
+
+
+class AsyncSchedulingTransport(httpx.AsyncBaseTransport):
+    def __init__(self, inner: httpx.AsyncBaseTransport, scheduler: LLMScheduler) -> None:
+        self.inner = inner
+        self.scheduler = scheduler
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        limiter, tokens = self.scheduler.plan(request)
+        if limiter is None:
+            return await self.inner.handle_async_request(request)
+        priority = _priority.get()
+        attempt = 0
+        while True:
+            await limiter.aacquire(tokens, priority)
+            try:
+                response = await self.inner.handle_async_request(request)
+            except httpx.TransportError as e:
+                delay = self.scheduler.retry_delay(None, attempt)
+                if delay is None:
+                    limiter.failed()
+                    raise
+                limiter.retried()
+                print(f"⏳ [LLM scheduler] {limiter.model} {type(e).__name__}，{delay:.1f}s 後重試")
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            delay = self.scheduler.after_response(limiter, response, attempt)
+            if delay is None:
+                return response
+            await response.aread()
+            await response.aclose()
+            if response.status_code != 429:
+                await asyncio.sleep(delay)
+            attempt += 1
+
+    async def aclose(self) -> None:
+        await self.inner.aclose()
+
+
+# ---------- 共用 client ----------
+
+_scheduler: Optional[LLMScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> LLMScheduler:
+    """程序內共用的排程器（第一次呼叫時讀取環境變數）"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = LLMScheduler(SchedulerSettings.from_env())
+        return _scheduler
+
+
+def llm_http_client() -> httpx.Client:
+    """給直接使用 openai SDK 的模組：OpenAI(http_client=llm_http_client(), max_retries=SDK_MAX_RETRIES)"""
+    inner = cassette_transport() or httpx.HTTPTransport(limits=CLIENT_LIMITS)
+    return httpx.Client(transport=SchedulingTransport(inner, get_scheduler()), follow_redirects=True)
+
+
+def llm_async_http_client() -> httpx.AsyncClient:
+    inner = cassette_transport(asynchronous=True) or httpx.AsyncHTTPTransport(limits=CLIENT_LIMITS)
+    return httpx.AsyncClient(transport=AsyncSchedulingTransport(inner, get_scheduler()), follow_redirects=True)
+
+
+def install_llm_clients() -> None:
+    """把排程器（與啟用中的 cassette）裝到 agno 所有 OpenAI 模型共用的全域 httpx client"""
+    from agno.utils.http import set_default_async_client, set_default_sync_client
+
+    set_default_sync_client(llm_http_client())
+    set_default_async_client(llm_async_http_client())
+    settings = get_scheduler().settings
+    print(f"🚦 LLM scheduler: rpm={settings.rpm or 'auto'} tpm={settings.tpm or 'auto'} "
+          f"max_retries={settings.max_retries}")
+    cassette = CassetteSettings.from_env()
+    if cassette.mode:
+        print(f"📼 LLM cassette: {cassette.mode} ({cassette.path})")
+
+
+def scheduler_stats() -> Dict[str, Any]:
+    return get_scheduler().stats()
@@ -0,0 +1,506 @@
+#!/usr/bin/env python3
+"""
+本機 OpenAI 相容 stub server（壓測用，不花 token）
+支援程式碼實際用到的 endpoint：
+- POST /v1/chat/completions：一般 / 串流（含 stream_options.include_usage）/ structured output（response_format json_schema）
+- POST /v1/responses：一般 / 串流事件（response.created → output_text.delta → response.completed）/ text.format json_schema
+- POST /v1/embeddings：依文字產生固定的單位向量（支援 dimensions、encoding_format=base64）
+
+延遲模型（皆為 lognormal：median 與 sigma，sigma=0 表示固定值）：
+- 首個 token 延遲 --ttft-ms / --ttft-sigma
+- 輸出速度 --tokens-per-sec / --tps-sigma
+- 輸出長度 --output-tokens / --output-sigma（不超過 request 的 max_tokens）
+- 同一 system prompt 重複出現時模擬 prompt cache 命中（回報 cached_tokens）
+
+用法：
+    python server/llm_stub.py --port 8790 --ttft-ms 400 --tokens-per-sec 60
+    OPENAI_BASE_URL=http://127.0.0.1:8790/v1 OPENAI_API_KEY=sk-stub npm run dev:api
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import math
+import random
+import re
+import struct
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from fast_json import FastJSONResponse, dumps
+# 與 llm_scheduler / 用量統計使用同一個估算，stub 回報的 usage 才能直接比較
+from llm_usage import estimate_tokens
+
+# 產生回答用的詞彙（中英混合，接近實際輸出的 token 長度）
+FILLER_WORDS = [
+    "我", "覺得", "保險", "其實", "還好", "價格", "理賠", "旅遊", "比較", "朋友", "推薦", "網站",
+    "the", "coverage", "price", "claim", "travel", "policy", "maybe", "really", "think", "，", "。",
+]
+RANGE_PATTERN = re.compile(r"\((-?\d+(?:\.\d+)?)\s*-\s*(-?\d+(?:\.\d+)?)\)")
+PROMPT_CACHE_MIN_TOKENS = 1024
+PROMPT_CACHE_BLOCK = 128
+EMBEDDING_DIMENSIONS = {"text-embedding-3-large": 3072}
+
+
+@dataclass
+class StubConfig:
+    ttft_ms: float = 400.0
+    ttft_sigma: float = 0.3
+    tokens_per_sec: float = 60.0
+    tps_sigma: float = 0.2
+    output_tokens: int = 150
+    output_sigma: float = 0.4
+    embedding_ms: float = 80.0
+    error_rate: float = 0.0
+    array_items: int = 3
+    seed: Optional[int] = None
+
+
+def lognormal(rng: random.Random, median: float, sigma: float) -> float:
+    if sigma <= 0 or median <= 0:
+        return max(0.0, median)
+    return rng.lognormvariate(math.log(median), sigma)
+
+
+class PromptCacheSimulator:
+    """記錄看過的 system prompt；同一前綴再出現時，以 128 token 為單位回報快取命中"""
+
+    def __init__(self, size: int = 4096) -> None:
+        self._seen: "OrderedDict[str, None]" = OrderedDict()
+        self._size = size
+        self._lock = threading.Lock()
+
+    def cached_tokens(self, prefix: str) -> int:
+        tokens = estimate_tokens(prefix)
+        if tokens < PROMPT_CACHE_MIN_TOKENS:
+            return 0
+        key = hashlib.sha256(prefix.encode("utf-8")).hexdigest()
+        with self._lock:
+            hit = key in self._seen
+            self._seen[key] = None
+            self._seen.move_to_end(key)
+            while len(self._seen) > self._size:
+                self._seen.popitem(last=False)
+        return (tokens // PROMPT_CACHE_BLOCK) * PROMPT_CACHE_BLOCK if hit else 0
+
+
+class SchemaFaker:
+    """依 JSON schema 產生符合格式的假資料（structured output 用）"""
+
+    def __init__(self, rng: random.Random, array_items: int) -> None:
+        self.rng = rng
+        self.array_items = array_items
+        self._counter = 0
+
+    def generate(self, schema: Dict[str, Any], root: Optional[Dict[str, Any]] = None, name: str = "") -> Any:
+        root = root or schema
+        if "$ref" in schema:
+            return self.generate(self._resolve(schema["$ref"], root), root, name)
+        if "const" in schema:
+            return schema["const"]
+        if "enum" in schema:
+            return self.rng.choice(schema["enum"])
+        for key in ("anyOf", "oneOf"):
+            if key in schema:
+                options = [option for option in schema[key] if option.get("type") != "null"] or schema[key]
+                return self.generate(options[0], root, name)
+        if "allOf" in schema:
+            merged: Dict[str, Any] = {}
+            for part in schema["allOf"]:
+                merged.update(self._resolve(part["$ref"], root) if "$ref" in part else part)
+            return self.generate(merged, root, name)
+
+        schema_type = schema.get("type", "object" if "properties" in schema else "string")
+        if isinstance(schema_type, list):
+            schema_type = next((t for t in schema_type if t != "null"), "null")
+        if schema_type == "object":
+            return {
+                key: self.generate(value, root, key)
+                for key, value in (schema.get("properties") or {}).items()
+            }
+        if schema_type == "array":
+            count = max(schema.get("minItems", 0), min(self.array_items, schema.get("maxItems", self.array_items)))
+            return [self.generate(schema.get("items") or {}, root, name) for _ in range(count)]
+        if schema_type in ("integer", "number"):
+            low, high = self._range(schema, schema_type)
+            value = self.rng.uniform(low, high)
+            return int(round(value)) if schema_type == "integer" else round(value, 2)
+        if schema_type == "boolean":
+            return self.rng.random() < 0.5
+        if schema_type == "null":
+            return None
+        return self._string(name)
+
+    @staticmethod
+    def _resolve(ref: str, root: Dict[str, Any]) -> Dict[str, Any]:
+        node: Any = root
+        for part in ref.lstrip("#/").split("/"):
+            node = node[part]
+        return node
+
+    @staticmethod
+    def _range(schema: Dict[str, Any], schema_type: str) -> Tuple[float, float]:
+        if "minimum" in schema or "maximum" in schema:
+            return float(schema.get("minimum", 0)), float(schema.get("maximum", 100))
+        # 本專案的 schema 在 description 標註範圍，例如「開放性 (0-100)」「信心分數 (0.0-1.0)」
+        match = RANGE_PATTERN.search(schema.get("description", ""))
+        if match:
+            return float(match.group(1)), float(match.group(2))
+        return (0.0, 100.0) if schema_type == "integer" else (0.0, 1.0)
+
+    def _string(self, name: str) -> str:
+        self._counter += 1
+        if name == "id":
+            return f"stub-{uuid.uuid4().hex[:8]}"
+        if name == "version":
+            return "v1.0"
+        return f"{name or 'text'} {self._counter} " + "".join(self.rng.choice(FILLER_WORDS) for _ in range(6))
+
+
+class LLMStub:
+    def __init__(self, config: StubConfig) -> None:
+        self.config = config
+        self.rng = random.Random(config.seed)
+        self.prompt_cache = PromptCacheSimulator()
+
+    # ---------- 取樣 ----------
+
+    def sample_ttft(self) -> float:
+        return lognormal(self.rng, self.config.ttft_ms, self.config.ttft_sigma) / 1000
+
+    def sample_tps(self) -> float:
+        return max(1.0, lognormal(self.rng, self.config.tokens_per_sec, self.config.tps_sigma))
+
+    def sample_output_tokens(self, limit: Optional[int]) -> int:
+        tokens = max(1, int(lognormal(self.rng, self.config.output_tokens, self.config.output_sigma)))
+        return min(tokens, limit) if limit else tokens
+
+    def should_fail(self) -> bool:
+        return self.config.error_rate > 0 and self.rng.random() < self.config.error_rate
+
+    def words(self, count: int) -> List[str]:
+        return [self.rng.choice(FILLER_WORDS) for _ in range(count)]
+
+    def structured(self, schema: Dict[str, Any]) -> str:
+        return json.dumps(SchemaFaker(self.rng, self.config.array_items).generate(schema), ensure_ascii=False)
+
+    def usage(self, prefix: str, prompt: str, output_tokens: int) -> Tuple[int, int, int]:
+        """(prompt_tokens, cached_tokens, output_tokens)"""
+        prompt_tokens = estimate_tokens(prompt)
+        return prompt_tokens, min(prompt_tokens, self.prompt_cache.cached_tokens(prefix)), output_tokens
+
+
+def _message_text(content: Any) -> str:
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "".join(
+            part.get("text", "") if isinstance(part, dict) else str(part)
+            for part in content
+        )
+    return "" if content is None else str(content)
+
+
+def _split_prompt(messages: List[Dict[str, Any]]) -> Tuple[str, str]:
+    """(system / developer 前綴, 完整 prompt 文字)"""
+    prefix = "".join(
+        _message_text(m.get("content")) for m in messages if m.get("role") in ("system", "developer")
+    )
+    full = "".join(_message_text(m.get("content")) for m in messages)
+    return prefix, full
+
+
+def _rate_limited() -> JSONResponse:
+    return JSONResponse(
+        {"error": {"message": "stub: simulated rate limit", "type": "rate_limit_error", "code": "rate_limit_exceeded"}},
+        status_code=429,
+        headers={"retry-after-ms": "200"},
+    )
+
+
+def _sse(payload: Dict[str, Any], event: Optional[str] = None) -> bytes:
+    head = f"event: {event}\n".encode("utf-8") if event else b""
+    return head + b"data: " + dumps(payload) + b"\n\n"
+
+
+def create_app(config: StubConfig) -> FastAPI:
+    stub = LLMStub(config)
+    app = FastAPI(title="LLM Stub", version="1.0.0")
+    app.state.stub = stub
+
+    @app.get("/health")
+    async def health():
+        return {"ok": True}
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        if stub.should_fail():
+            return _rate_limited()
+        model = body.get("model", "gpt-4o")
+        prefix, prompt = _split_prompt(body.get("messages") or [])
+        limit = body.get("max_completion_tokens") or body.get("max_tokens")
+        response_format = body.get("response_format") or {}
+
+        if response_format.get("type") == "json_schema":
+            text = stub.structured((response_format.get("json_schema") or {}).get("schema") or {})
+            pieces = [text]
+            output_tokens = estimate_tokens(text)
+        elif response_format.get("type") == "json_object":
+            text = json.dumps({"result": "".join(stub.words(8))}, ensure_ascii=False)
+            pieces = [text]
+            output_tokens = estimate_tokens(text)
+        else:
+            output_tokens = stub.sample_output_tokens(limit)
+            pieces = stub.words(output_tokens)
+            text = "".join(pieces)
+        prompt_tokens, cached_tokens, output_tokens = stub.usage(prefix, prompt, output_tokens)
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": output_tokens,
+            "total_tokens": prompt_tokens + output_tokens,
+            "prompt_tokens_details": {"cached_tokens": cached_tokens},
+        }
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        created = int(time.time())
+        ttft = stub.sample_ttft()
+        tps = stub.sample_tps()
+
+        if not body.get("stream"):
+            await asyncio.sleep(ttft + output_tokens / tps)
+            return FastJSONResponse({
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": text},
+                }],
+                "usage": usage,
+            })
+
+        include_usage = bool((body.get("stream_options") or {}).get("include_usage"))
+
+        async def events() -> AsyncIterator[bytes]:
+            def chunk(delta: Dict[str, Any], finish_reason: Optional[str] = None) -> bytes:
+                return _sse({
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+                })
+
+            await asyncio.sleep(ttft)
+            yield chunk({"role": "assistant", "content": ""})
+            delay = max(1, output_tokens // len(pieces)) / tps
+            for piece in pieces:
+                yield chunk({"content": piece})
+                await asyncio.sleep(delay)
+            yield chunk({}, "stop")
+            if include_usage:
+                yield _sse({
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [],
+                    "usage": usage,
+                })
+            yield b"data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.post("/v1/responses")
+    async def responses(request: Request):
+        body = await request.json()
+        if stub.should_fail():
+            return _rate_limited()
+        model = body.get("model", "gpt-4o")
+        raw_input = body.get("input")
+        messages = raw_input if isinstance(raw_input, list) else [{"role": "user", "content": raw_input or ""}]
+        messages = [m for m in messages if isinstance(m, dict)]
+        prefix, prompt = _split_prompt(messages)
+        prefix = _message_text(body.get("instructions")) + prefix
+        prompt = _message_text(body.get("instructions")) + prompt
+
+        text_format = (body.get("text") or {}).get("format") or {}
+        if text_format.get("type") == "json_schema":
+            text = stub.structured(text_format.get("schema") or {})
+            pieces = [text]
+            output_tokens = estimate_tokens(text)
+        else:
+            output_tokens = stub.sample_output_tokens(body.get("max_output_tokens"))
+            pieces = stub.words(output_tokens)
+            text = "".join(pieces)
+        prompt_tokens, cached_tokens, output_tokens = stub.usage(prefix, prompt, output_tokens)
+
+        response_id = f"resp_{uuid.uuid4().hex[:24]}"
+        item_id = f"msg_{uuid.uuid4().hex[:24]}"
+        created = int(time.time())
+
+        def response_object(status: str, output: List[Dict[str, Any]], usage: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+            return {
+                "id": response_id,
+                "object": "response",
+                "created_at": created,
+                "model": model,
+                "status": status,
+                "output": output,
+                "parallel_tool_calls": True,
+                "tool_choice": "auto",
+                "tools": [],
+                "usage": usage,
+            }
+
+        message = {
+            "id": item_id,
+            "type": "message",
+            "role": "assistant",
+            "status": "completed",
+            "content": [{"type": "output_text", "text": text, "annotations": []}],
+        }
+        usage = {
+            "input_tokens": prompt_tokens,
+            "input_tokens_details": {"cached_tokens": cached_tokens},
+            "output_tokens": output_tokens,
+            "output_tokens_details": {"reasoning_tokens": 0},
+            "total_tokens": prompt_tokens + output_tokens,
+        }
+        ttft = stub.sample_ttft()
+        tps = stub.sample_tps()
+
+        if not body.get("stream"):
+            await asyncio.sleep(ttft + output_tokens / tps)
+            return FastJSONResponse(response_object("completed", [message], usage))
+
+        async def events() -> AsyncIterator[bytes]:
+            sequence = 0
+
+            def event(payload: Dict[str, Any]) -> bytes:
+                nonlocal sequence
+                payload["sequence_number"] = sequence
+                sequence += 1
+                return _sse(payload, payload["type"])
+
+            yield event({"type": "response.created", "response": response_object("in_progress", [], None)})
+            await asyncio.sleep(ttft)
+            yield event({
+                "type": "response.output_item.added",
+                "output_index": 0,
+                "item": {**message, "status": "in_progress", "content": []},
+            })
+            delay = max(1, output_tokens // len(pieces)) / tps
+            for piece in pieces:
+                yield event({
+                    "type": "response.output_text.delta",
+                    "item_id": item_id,
+                    "output_index": 0,
+                    "content_index": 0,
+                    "delta": piece,
+                    "logprobs": [],
+                })
+                await asyncio.sleep(delay)
+            yield event({
+                "type": "response.output_text.done",
+                "item_id": item_id,
+                "output_index": 0,
+                "content_index": 0,
+                "text": text,
+                "logprobs": [],
+            })
+            yield event({"type": "response.output_item.done", "output_index": 0, "item": message})
+            yield event({"type": "response.completed", "response": response_object("completed", [message], usage)})
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        if stub.should_fail():
+            return _rate_limited()
+        model = body.get("model", "text-embedding-3-small")
+        inputs = body.get("input")
+        if isinstance(inputs, str) or (isinstance(inputs, list) and inputs and isinstance(inputs[0], int)):
+            inputs = [inputs]
+        dimensions = body.get("dimensions") or EMBEDDING_DIMENSIONS.get(model, 1536)
+        as_base64 = body.get("encoding_format") == "base64"
+
+        data = []
+        total_tokens = 0
+        for index, item in enumerate(inputs or []):
+            text = item if isinstance(item, str) else json.dumps(item)
+            total_tokens += estimate_tokens(text)
+            vector = embedding_vector(text, dimensions)
+            data.append({
+                "object": "embedding",
+                "index": index,
+                "embedding": base64.b64encode(struct.pack(f"<{dimensions}f", *vector)).decode("ascii")
+                if as_base64 else vector,
+            })
+        await asyncio.sleep(lognormal(stub.rng, config.embedding_ms, config.ttft_sigma) / 1000)
+        return FastJSONResponse({
+            "object": "list",
+            "data": data,
+            "model": model,
+            "usage": {"prompt_tokens": total_tokens, "total_tokens": total_tokens},
+        })
+
+    return app
+
+
+def embedding_vector(text: str, dimensions: int) -> List[float]:
+    """同一段文字永遠得到同一個單位向量"""
+    rng = random.Random(hashlib.sha256(text.encode("utf-8")).digest())
+    vector = [rng.gauss(0.0, 1.0) for _ in range(dimensions)]
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+def main() -> None:
+    defaults = StubConfig()
+    parser = argparse.ArgumentParser(description="OpenAI-compatible stub server for load testing")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8790)
+    parser.add_argument("--ttft-ms", type=float, default=defaults.ttft_ms, help="首個 token 延遲中位數（毫秒）")
+    parser.add_argument("--ttft-sigma", type=float, default=defaults.ttft_sigma)
+    parser.add_argument("--tokens-per-sec", type=float, default=defaults.tokens_per_sec, help="輸出速度中位數")
+    parser.add_argument("--tps-sigma", type=float, default=defaults.tps_sigma)
+    parser.add_argument("--output-tokens", type=int, default=defaults.output_tokens, help="輸出長度中位數")
+    parser.add_argument("--output-sigma", type=float, default=defaults.output_sigma)
+    parser.add_argument("--embedding-ms", type=float, default=defaults.embedding_ms)
+    parser.add_argument("--error-rate", type=float, default=defaults.error_rate, help="回傳 429 的比例")
+    parser.add_argument("--array-items", type=int, default=defaults.array_items, help="structured output 陣列長度")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    import uvicorn
+
+    config = StubConfig(
+        ttft_ms=args.ttft_ms,
+        ttft_sigma=args.ttft_sigma,
+        tokens_per_sec=args.tokens_per_sec,
+        tps_sigma=args.tps_sigma,
+        output_tokens=args.output_tokens,
+        output_sigma=args.output_sigma,
+        embedding_ms=args.embedding_ms,
+        error_rate=args.error_rate,
+        array_items=args.array_items,
+        seed=args.seed,
+    )
+    print(f"🧪 LLM stub on http://{args.host}:{args.port}/v1 {config}")
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
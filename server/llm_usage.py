@@ -0,0 +1,72 @@
+"""
+LLM token 用量統計
+記錄每次呼叫的輸入 token 中有多少命中供應商的 prompt cache：
+- OpenAI 對 1024 tokens 以上、前綴完全相同的 prompt 自動快取，命中部分計入 cache_read_tokens
+- prompt 需把 persona 專屬的固定內容放在前面、每次不同的內容（歷史、問題、網頁內容）放在最後
+- prompt_cache_key 讓同一 persona 的請求盡量落在同一台快取主機
+"""
+import re
+import threading
+from typing import Any, Dict, Optional
+
+_CJK = re.compile(r"[\u3000-\u9fff\uac00-\ud7af\uff00-\uffef]")
+
+_lock = threading.Lock()
+_totals: Dict[str, Dict[str, int]] = {}
+
+
+def estimate_tokens(text: str) -> int:
+    """粗估 token 數：中日韓文字約一字一 token，其餘約四字元一 token"""
+    cjk = len(_CJK.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def prompt_cache_key(label: str, persona_id: Any) -> Dict[str, str]:
+    """OpenAIChat 的 request_params：同一 label + persona 共用快取路由"""
+    return {"prompt_cache_key": f"{label}:{persona_id}"}
+
+
+def record_usage(label: str, response: Any) -> Optional[Dict[str, int]]:
+    """
+    從 agent.run 的回傳記錄本次用量並印出
+
+    Returns:
+        {"inputTokens", "cachedTokens", "uncachedTokens", "outputTokens"}；沒有 metrics 時為 None
+    """
+    metrics = getattr(response, "metrics", None)
+    if metrics is None:
+        return None
+    input_tokens = getattr(metrics, "input_tokens", 0) or 0
+    cached_tokens = getattr(metrics, "cache_read_tokens", 0) or 0
+    output_tokens = getattr(metrics, "output_tokens", 0) or 0
+    usage = {
+        "inputTokens": input_tokens,
+        "cachedTokens": cached_tokens,
+        "uncachedTokens": max(0, input_tokens - cached_tokens),
+        "outputTokens": output_tokens,
+    }
+    with _lock:
+        totals = _totals.setdefault(label, {"calls": 0, **{key: 0 for key in usage}})
+        totals["calls"] += 1
+        for key, value in usage.items():
+            totals[key] += value
+
+    ratio = cached_tokens / input_tokens * 100 if input_tokens else 0.0
+    print(f"   💾 [{label}] input={input_tokens} cached={cached_tokens} "
+          f"uncached={usage['uncachedTokens']} ({ratio:.0f}% cached), output={output_tokens}")
+    return usage
+
+
+def usage_summary() -> Dict[str, Dict[str, Any]]:
+    """各 label 的累計用量與快取命中率"""
+    with _lock:
+        summary = {label: dict(totals) for label, totals in _totals.items()}
+    for totals in summary.values():
+        input_tokens = totals["inputTokens"]
+        totals["cacheHitRate"] = round(totals["cachedTokens"] / input_tokens, 4) if input_tokens else 0.0
+    return summary
+
+
+def reset_usage() -> None:
+    with _lock:
+        _totals.clear()
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+API 壓測工具
+以指定並行度對後端的主要 endpoint 送出請求，回報每個 endpoint 的延遲分佈（p50 / p95 / p99）與吞吐量。
+串流 endpoint 另外記錄首位元組時間（TTFB）。
+
+搭配 llm_stub.py 使用可以不花 token：
+    python server/llm_stub.py --port 8790 &
+    OPENAI_BASE_URL=http://127.0.0.1:8790/v1 OPENAI_API_KEY=sk-stub npm run dev:api &
+    python server/load_test.py --scenario artifacts_stream vietnam_batch_interview --concurrency 16 --requests 200
+
+注意：batch interview 與 generator 會寫入 persona 資料檔，請在資料副本上執行。
+"""
+import argparse
+import asyncio
+import json
+import math
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+
+DEFAULT_BASE_URL = "http://127.0.0.1:8787"
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """nearest-rank 百分位數"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+@dataclass
+class EndpointStats:
+    name: str
+    latencies: List[float] = field(default_factory=list)
+    ttfb: List[float] = field(default_factory=list)
+    errors: int = 0
+    status_codes: Dict[int, int] = field(default_factory=dict)
+
+    def summary(self, elapsed: float) -> Dict[str, Any]:
+        completed = len(self.latencies)
+        result = {
+            "endpoint": self.name,
+            "requests": completed + self.errors,
+            "errors": self.errors,
+            "throughput_rps": round(completed / elapsed, 2) if elapsed else 0.0,
+            "p50_ms": round(percentile(self.latencies, 50) * 1000, 1),
+            "p95_ms": round(percentile(self.latencies, 95) * 1000, 1),
+            "p99_ms": round(percentile(self.latencies, 99) * 1000, 1),
+            "max_ms": round(max(self.latencies, default=0.0) * 1000, 1),
+            "status_codes": dict(sorted(self.status_codes.items())),
+        }
+        if self.ttfb:
+            result["ttfb_p50_ms"] = round(percentile(self.ttfb, 50) * 1000, 1)
+            result["ttfb_p95_ms"] = round(percentile(self.ttfb, 95) * 1000, 1)
+        return result
+
+
+@dataclass
+class Scenario:
+    name: str
+    method: str
+    path: str
+    payload: Callable[[int], Optional[Dict[str, Any]]]
+    stream: bool = False
+
+
+ARTIFACT_MESSAGES = [
+    {"role": "user", "content": "請幫我摘要這家公司的授信風險重點，並列出三個需要追蹤的指標。"},
+]
+
+
+def build_scenarios(persona_ids: List[str], batch_size: int, generate_count: int) -> Dict[str, Scenario]:
+    def batch_payload(i: int) -> Dict[str, Any]:
+        start = (i * batch_size) % max(1, len(persona_ids))
+        ids = (persona_ids[start:] + persona_ids[:start])[:batch_size]
+        return {
+            "personaIds": ids,
+            "question": f"壓測問題 {i}：你最近一次出國買旅遊險的經驗如何？",
+            "subQuestions": ["在哪裡買的", "價格是否合理"],
+            "topicTag": "load_test",
+        }
+
+    return {
+        "artifacts": Scenario(
+            "artifacts", "POST", "/api/artifacts",
+            lambda i: {"messages": ARTIFACT_MESSAGES, "documents": [], "stream": False},
+        ),
+        "artifacts_stream": Scenario(
+            "artifacts_stream", "POST", "/api/artifacts",
+            lambda i: {"messages": ARTIFACT_MESSAGES, "documents": [], "stream": True},
+            stream=True,
+        ),
+        "vietnam_batch_interview": Scenario(
+            "vietnam_batch_interview", "POST", "/api/vietnam_batch_interview", batch_payload,
+        ),
+        "vietnam_batch_interview_stream": Scenario(
+            "vietnam_batch_interview_stream", "POST", "/api/vietnam_batch_interview/stream", batch_payload,
+            stream=True,
+        ),
+        "generate_personas": Scenario(
+            "generate_personas", "POST", "/api/generate_personas",
+            lambda i: {"hint": "台灣上班族", "count": generate_count},
+        ),
+        "generate_vietnam_personas": Scenario(
+            "generate_vietnam_personas", "POST", "/api/generate_vietnam_personas",
+            lambda i: {"hint": "胡志明市年輕上班族", "count": generate_count},
+        ),
+        "vietnam_personas": Scenario("vietnam_personas", "GET", "/api/vietnam_personas", lambda i: None),
+    }
+
+
+async def send(client: httpx.AsyncClient, scenario: Scenario, index: int, stats: EndpointStats) -> None:
+    payload = scenario.payload(index)
+    started = time.perf_counter()
+    try:
+        async with client.stream(scenario.method, scenario.path, json=payload) as response:
+            first = None
+            async for _ in response.aiter_raw():
+                if first is None:
+                    first = time.perf_counter() - started
+            elapsed = time.perf_counter() - started
+        stats.status_codes[response.status_code] = stats.status_codes.get(response.status_code, 0) + 1
+        if response.status_code >= 400:
+            stats.errors += 1
+            return
+        stats.latencies.append(elapsed)
+        if scenario.stream and first is not None:
+            stats.ttfb.append(first)
+    except httpx.HTTPError as e:
+        stats.errors += 1
+        stats.status_codes[0] = stats.status_codes.get(0, 0) + 1
+        print(f"  ✗ {scenario.name}: {type(e).__name__}: {e}", file=sys.stderr)
+
+
+async def run_scenario(
+    client: httpx.AsyncClient,
+    scenario: Scenario,
+    concurrency: int,
+    requests: int,
+    duration: Optional[float],
+) -> Dict[str, Any]:
+    stats = EndpointStats(scenario.name)
+    counter = 0
+    deadline = time.perf_counter() + duration if duration else None
+
+    def next_index() -> Optional[int]:
+        nonlocal counter
+        if deadline is not None:
+            if time.perf_counter() >= deadline:
+                return None
+        elif counter >= requests:
+            return None
+        counter += 1
+        return counter - 1
+
+    async def worker() -> None:
+        while True:
+            index = next_index()
+            if index is None:
+                return
+            await send(client, scenario, index, stats)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return stats.summary(time.perf_counter() - started)
+
+
+async def fetch_persona_ids(client: httpx.AsyncClient) -> List[str]:
+    response = await client.get("/api/vietnam_personas")
+    response.raise_for_status()
+    return [p["id"] for p in response.json() if isinstance(p, dict) and p.get("id")]
+
+
+def print_report(results: List[Dict[str, Any]]) -> None:
+    header = f"{'endpoint':<32}{'reqs':>7}{'errs':>6}{'rps':>9}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}{'ttfb p50':>10}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        ttfb = f"{r['ttfb_p50_ms']:.0f}" if "ttfb_p50_ms" in r else "-"
+        print(f"{r['endpoint']:<32}{r['requests']:>7}{r['errors']:>6}{r['throughput_rps']:>9.2f}"
+              f"{r['p50_ms']:>10.0f}{r['p95_ms']:>10.0f}{r['p99_ms']:>10.0f}{r['max_ms']:>10.0f}{ttfb:>10}")
+    print("（延遲單位：毫秒）")
+
+
+async def main_async(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    timeout = httpx.Timeout(args.timeout, connect=10.0)
+    limits = httpx.Limits(max_connections=args.concurrency * 2, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=timeout, limits=limits) as client:
+        persona_ids: List[str] = []
+        if any(name.startswith("vietnam_batch_interview") for name in args.scenario):
+            persona_ids = await fetch_persona_ids(client)
+            if not persona_ids:
+                raise SystemExit("沒有越南受訪者資料，無法執行 batch interview 壓測")
+        scenarios = build_scenarios(persona_ids, args.batch_size, args.generate_count)
+        results = []
+        for name in args.scenario:
+            print(f"▶ {name}: concurrency={args.concurrency} "
+                  f"{f'duration={args.duration}s' if args.duration else f'requests={args.requests}'}")
+            results.append(await run_scenario(client, scenarios[name], args.concurrency, args.requests, args.duration))
+        return results
+
+
+def main() -> None:
+    scenario_names = list(build_scenarios([], 1, 1).keys())
+    parser = argparse.ArgumentParser(description="Load test the API server (p50/p95/p99 + throughput per endpoint)")
+    parser.add_argument("--base-url", default=DEFAULT_BASE_URL)
+    parser.add_argument("--scenario", nargs="+", choices=scenario_names, default=["artifacts", "vietnam_batch_interview"])
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=50, help="每個 scenario 的請求數")
+    parser.add_argument("--duration", type=float, default=None, help="改以秒數為準（覆蓋 --requests）")
+    parser.add_argument("--batch-size", type=int, default=5, help="batch interview 每次的受訪者人數")
+    parser.add_argument("--generate-count", type=int, default=3, help="generator 每次生成人數")
+    parser.add_argument("--timeout", type=float, default=300.0)
+    parser.add_argument("--json", dest="json_path", default=None, help="另存結果為 JSON")
+    args = parser.parse_args()
+
+    results = asyncio.run(main_async(args))
+    print_report(results)
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
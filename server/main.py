@@ -7,17 +7,19 @@ from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field
 from dotenv import load_dotenv
+from llm_scheduler import install_llm_clients
 
 # 匯入 Agent 功能
 from extraction_agent import extract_ppv
-from impersonation_agent import chat_with_digital_twin
+from impersonation_agent import achat_with_digital_twin
 from generator_agent import generate_diverse_personas
 from ppv_schema import PPVInstance
-from vietnam_interview_agent import interview_vietnam_persona
+from vietnam_interview_agent import ainterview_vietnam_persona
 from vietnam_generator_agent import generate_vietnam_personas
 
 # 載入環境變數
 load_dotenv()
+install_llm_clients()
 
 app = FastAPI()
 
@@ -144,10 +146,10 @@ def api_update_persona(persona: PPVInstance):
 
 # --- API 2: 數位孿生對話 (Phase 3) ---
 @app.post("/api/chat_with_twin")
-def api_chat_with_twin(request: ChatRequest):
+async def api_chat_with_twin(request: ChatRequest):
     try:
         # 呼叫我們剛升級的 Agent
-        response_text = chat_with_digital_twin(
+        response_text = await achat_with_digital_twin(
             request.ppv_profile, 
             request.user_query, 
             request.context_data # ✅ 把資料傳進去
@@ -211,10 +213,10 @@ def api_clear_vietnam_personas():
     return {"status": "cleared"}
 
 @app.post("/api/vietnam_interview")
-def api_vietnam_interview(request: VietnamInterviewRequest):
+async def api_vietnam_interview(request: VietnamInterviewRequest):
     """使用 AI 模擬越南受訪者回答"""
     try:
-        response_text = interview_vietnam_persona(
+        response_text = await ainterview_vietnam_persona(
             request.persona,
             request.question,
             request.subQuestions
@@ -15,6 +15,9 @@ except Exception:
 
 from openai import OpenAI
 
+from embedding_store import get_embedding_store
+from llm_scheduler import SDK_MAX_RETRIES, llm_http_client
+
 # Simple in-memory vector store: doc_id -> list of {chunk_id, text, embedding}
 VECTOR_STORE = {}
 
@@ -54,7 +57,7 @@ def get_openai_client() -> OpenAI:
     api_key = os.getenv("OPENAI_API_KEY")
     if not api_key:
         return None
-    return OpenAI(api_key=api_key)
+    return OpenAI(api_key=api_key, http_client=llm_http_client(), max_retries=SDK_MAX_RETRIES)
 
 
 def compute_embeddings(client: OpenAI, texts: List[str]) -> List[List[float]]:
@@ -64,8 +67,12 @@ def compute_embeddings(client: OpenAI, texts: List[str]) -> List[List[float]]:
     if client is None:
         # No API key available — return empty embeddings placeholders
         return [[] for _ in texts]
-    resp = client.embeddings.create(model=model, input=texts)
-    return [item.embedding for item in resp.data]
+
+    def embed(missing: List[str]) -> List[List[float]]:
+        resp = client.embeddings.create(model=model, input=missing)
+        return [item.embedding for item in sorted(resp.data, key=lambda item: item.index)]
+
+    return get_embedding_store().get_or_embed(model, texts, embed)
 
 
 def cosine_similarity(a, b):
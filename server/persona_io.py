@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Persona 資料集的串流匯入 / 匯出
+不把整個 JSON 檔載入記憶體，峰值記憶體只與單筆 persona 大小有關：
+- iter_json_array：逐筆讀取 `[{...}, {...}]` 格式的資料檔
+- write_json_array：逐筆寫出（格式與 json.dump(indent=2) 相同），完成後原子取代
+- NDJSON（一行一筆）作為備份 / 遷移的交換格式
+- merge_ndjson：把 NDJSON 以 id 合併進資料檔（只在記憶體保留 id -> 檔案位移）
+
+用法（CLI 透過 PersonaStore 讀寫，匯出含封存的訪談記錄，--replace 會一併清掉被移除者的封存檔）：
+    python server/persona_io.py export server/vietnam_personas.json backup.ndjson
+    python server/persona_io.py import server/vietnam_personas.json backup.ndjson [--replace]
+    封存目錄預設為 <資料檔目錄>/archive/<資料檔名>（與 API 伺服器相同），可用 --archive-dir 指定
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import textwrap
+import threading
+from pathlib import Path
+from typing import IO, Any, Callable, Dict, Iterable, Iterator, Optional
+
+from fast_json import dumps
+
+CHUNK_SIZE = 64 * 1024
+SPOOL_MAX_SIZE = 8 * 1024 * 1024
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+
+
+def iter_json_array(path: Path, chunk_size: int = CHUNK_SIZE) -> Iterator[Any]:
+    """逐筆讀取最外層為陣列的 JSON 檔；檔案不存在時不產生任何資料"""
+    path = Path(path)
+    if not path.exists():
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        buf = ""
+        pos = 0
+        eof = False
+        started = False
+
+        def fill() -> bool:
+            nonlocal buf, pos, eof
+            chunk = f.read(chunk_size)
+            if not chunk:
+                eof = True
+                return False
+            buf = buf[pos:] + chunk
+            pos = 0
+            return True
+
+        while True:
+            while pos < len(buf) and (buf[pos] in _WHITESPACE or (started and buf[pos] == ",")):
+                pos += 1
+            if pos >= len(buf):
+                if not fill():
+                    if started:
+                        raise ValueError(f"{path.name}: JSON 陣列未結束")
+                    return
+                continue
+            if not started:
+                if buf[pos] != "[":
+                    raise ValueError(f"{path.name}: 最外層不是 JSON 陣列")
+                started = True
+                pos += 1
+                continue
+            if buf[pos] == "]":
+                return
+            try:
+                item, end = _decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof or not fill():
+                    raise
+                continue
+            if end == len(buf) and not eof:
+                # 數字等值可能剛好被 chunk 截斷，多讀一段再解析
+                if fill():
+                    continue
+            pos = end
+            yield item
+
+
+def write_json_array(path: Path, items: Iterable[Any]) -> int:
+    """逐筆寫出 JSON 陣列（縮排 2，與原本 json.dump 的檔案格式相同），回傳筆數"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    count = 0
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write("[")
+            for item in items:
+                f.write(",\n" if count else "\n")
+                f.write(textwrap.indent(json.dumps(item, ensure_ascii=False, indent=2), "  "))
+                count += 1
+            f.write("\n]" if count else "]")
+        os.replace(tmp_path, path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+    return count
+
+
+def ndjson_lines(items: Iterable[Any]) -> Iterator[bytes]:
+    for item in items:
+        yield dumps(item) + b"\n"
+
+
+def iter_ndjson(f: IO[bytes]) -> Iterator[Dict[str, Any]]:
+    """逐行讀取 NDJSON（略過空行與非物件的行）"""
+    for line in f:
+        line = line.strip()
+        if not line:
+            continue
+        item = json.loads(line)
+        if isinstance(item, dict):
+            yield item
+
+
+def index_ndjson(f: IO[bytes]) -> Dict[str, int]:
+    """id -> 最後一次出現的行首位移（同一 id 出現多次時以最後一筆為準）"""
+    offsets: Dict[str, int] = {}
+    f.seek(0)
+    while True:
+        offset = f.tell()
+        line = f.readline()
+        if not line:
+            break
+        line = line.strip()
+        if not line:
+            continue
+        item = json.loads(line)
+        if isinstance(item, dict):
+            offsets[str(item.get("id"))] = offset
+    return offsets
+
+
+def iter_ndjson_last(f: IO[bytes], offsets: Dict[str, int]) -> Iterator[Dict[str, Any]]:
+    """依檔案順序逐筆讀取，同一 id 只輸出最後一筆（offsets 為 index_ndjson 的結果）"""
+    f.seek(0)
+    while True:
+        offset = f.tell()
+        line = f.readline()
+        if not line:
+            break
+        if not line.strip():
+            continue
+        item = json.loads(line)
+        if isinstance(item, dict) and offsets.get(str(item.get("id"))) == offset:
+            yield item
+
+
+def _read_at(f: IO[bytes], offset: int) -> Dict[str, Any]:
+    f.seek(offset)
+    return json.loads(f.readline())
+
+
+def merge_ndjson(
+    target: Path,
+    source: IO[bytes],
+    replace: bool = False,
+    on_record: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None,
+) -> Dict[str, int]:
+    """
+    把 NDJSON 匯入 persona 資料檔
+
+    Args:
+        target: persona JSON 資料檔
+        source: 可 seek 的 NDJSON 二進位檔（例如 spool 後的暫存檔）
+        replace: True 時資料檔只保留匯入的 persona；False 時依 id 覆蓋 / 新增
+        on_record: 每筆匯入的 persona 寫入前的處理函式
+
+    Returns:
+        {"imported", "updated", "added", "kept", "total"}
+    """
+    offsets = index_ndjson(source)
+    emitted = set()
+    stats = {"imported": len(offsets), "updated": 0, "added": 0, "kept": 0, "total": 0}
+    prepare = on_record or (lambda record: record)
+
+    def merged() -> Iterator[Dict[str, Any]]:
+        # 先依原檔順序輸出（被覆蓋的換成匯入的版本），再接上新的 persona
+        for item in iter_json_array(target):
+            if not isinstance(item, dict):
+                continue
+            pid = str(item.get("id"))
+            if pid in offsets:
+                if pid in emitted:
+                    continue
+                emitted.add(pid)
+                stats["updated"] += 1
+                yield prepare(_read_at(source, offsets[pid]))
+            elif not replace:
+                stats["kept"] += 1
+                yield item
+        for item in iter_ndjson_last(source, offsets):
+            pid = str(item.get("id"))
+            if pid in emitted:
+                continue
+            emitted.add(pid)
+            stats["added"] += 1
+            yield prepare(item)
+
+    stats["total"] = write_json_array(target, merged())
+    return stats
+
+
+def default_archive_dir(path: Path) -> Path:
+    """資料檔對應的封存目錄（server/vietnam_personas.json -> server/archive/vietnam_personas）"""
+    path = Path(path)
+    return path.parent / "archive" / path.stem
+
+
+def open_store(path: Path, archive_dir: Optional[Path] = None):
+    """開啟資料檔對應的 PersonaStore；未指定 archive_dir 時，預設的封存目錄存在才掛上封存"""
+    # persona_store 匯入本模組，延後匯入避免循環
+    from persona_store import PersonaStore
+    from transcript_archive import TranscriptArchive
+
+    directory = Path(archive_dir) if archive_dir else default_archive_dir(path)
+    archive = TranscriptArchive(directory) if archive_dir or directory.exists() else None
+    return PersonaStore(Path(path), archive=archive)
+
+
+def export_ndjson(source: Path, dest: Path, archive_dir: Optional[Path] = None) -> int:
+    """資料檔 -> NDJSON（已封存的訪談記錄一併讀回）"""
+    count = 0
+    with open(dest, "wb") as f:
+        for line in open_store(source, archive_dir).export_ndjson():
+            f.write(line)
+            count += 1
+    return count
+
+
+def import_ndjson(target: Path, source: Path, replace: bool = False, archive_dir: Optional[Path] = None) -> Dict[str, int]:
+    """NDJSON -> 資料檔（依 id 合併；封存與版本資訊和 API 伺服器的匯入相同方式處理）"""
+    with open(source, "rb") as f:
+        return open_store(target, archive_dir).import_ndjson(f, replace=replace)
+
+
+def spool_file() -> IO[bytes]:
+    """上傳內容的暫存檔：小於 SPOOL_MAX_SIZE 時留在記憶體，超過才寫到磁碟"""
+    return tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Streaming persona import/export (NDJSON)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export_cmd = sub.add_parser("export", help="JSON 資料檔 -> NDJSON")
+    export_cmd.add_argument("source")
+    export_cmd.add_argument("dest")
+    export_cmd.add_argument("--archive-dir", help="訪談記錄封存目錄（預設 <資料檔目錄>/archive/<資料檔名>）")
+    import_cmd = sub.add_parser("import", help="NDJSON -> JSON 資料檔（依 id 合併）")
+    import_cmd.add_argument("target")
+    import_cmd.add_argument("source")
+    import_cmd.add_argument("--replace", action="store_true", help="只保留匯入的 persona")
+    import_cmd.add_argument("--archive-dir", help="訪談記錄封存目錄（預設 <資料檔目錄>/archive/<資料檔名>）")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        count = export_ndjson(Path(args.source), Path(args.dest), args.archive_dir)
+        print(f"✓ 匯出 {count} 筆 persona -> {args.dest}")
+    else:
+        stats = import_ndjson(Path(args.target), Path(args.source), replace=args.replace, archive_dir=args.archive_dir)
+        print(f"✓ 匯入 {stats['imported']} 筆（更新 {stats['updated']}、新增 {stats['added']}、保留 {stats['kept']}），"
+              f"共 {stats['total']} 筆 -> {args.target}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
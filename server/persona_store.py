@@ -0,0 +1,657 @@
+"""
+Persona 資料集存取層
+以 JSON 檔案為底層的 persona 集合，提供：
+- 記憶體快取（以檔案 mtime/size 判斷是否需要重新讀取）
+- 集合版本號（每次實際變更 +1），可直接作為 HTTP ETag
+- 逐筆 persona / 訪談記錄的修訂版本，支援 `since=<version>` 增量同步
+- 可選的冷儲存：已完成受訪者的訪談記錄移到 TranscriptArchive，需要時再讀回
+"""
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import IO, Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from fast_json import dumps as _encode, loads as _decode
+from persona_io import index_ndjson, iter_json_array, iter_ndjson_last, ndjson_lines
+from transcript_archive import TranscriptArchive
+
+# 設為 1 時，標記 isCompleted 的受訪者在儲存時自動封存訪談記錄
+ARCHIVE_COMPLETED = os.getenv("PERSONA_ARCHIVE_COMPLETED", "0") == "1"
+# 匯入時每批放入集合的筆數（每批只短暫持有鎖）
+IMPORT_BATCH_SIZE = int(os.getenv("PERSONA_IMPORT_BATCH_SIZE", "200"))
+
+
+def _digest(data: bytes) -> str:
+    return hashlib.md5(data).hexdigest()
+
+
+def _write_json_atomic(path: Path, data: Any, indent: Optional[int] = None) -> None:
+    """先寫入暫存檔再以 os.replace 取代，避免寫到一半的檔案被讀取"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=indent)
+    os.replace(tmp_path, path)
+
+
+class PersonaStore:
+    """
+    單一 persona 集合（例如 vietnam_personas.json）
+
+    - 讀取：`load()` / `get()` 回傳解碼後的新物件，呼叫端可自由修改
+    - 寫入：`save()` / `save_many()` / `append_history()` / `append_history_many()` / `delete()` / `clear()` / `import_ndjson()`，只有內容真的改變才會寫檔並遞增版本
+    - 版本資訊存放在旁邊的 `<name>.versions.json`，重啟後仍可延續增量同步
+    - 傳入 archive 時，已封存的 persona 在 hot 檔中只保留 `historyArchived` /
+      `archivedHistoryCount`，`include_archived=True` 才會讀回完整訪談記錄
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        history_field: str = "interviewHistory",
+        name: Optional[str] = None,
+        archive: Optional[TranscriptArchive] = None,
+        auto_archive: bool = ARCHIVE_COMPLETED,
+    ) -> None:
+        self.path = Path(path)
+        self.history_field = history_field
+        self.name = name or self.path.stem
+        self.archive = archive
+        self.auto_archive = auto_archive and archive is not None
+        self.meta_path = self.path.with_name(f"{self.path.stem}.versions.json")
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._file_sig: Optional[Tuple[int, int]] = None
+        self._records: Dict[str, Dict[str, Any]] = {}
+        self._blobs: Dict[str, bytes] = {}
+        self._history_sigs: Dict[str, List[str]] = {}
+        self._history_revs: Dict[str, List[int]] = {}
+        self._revs: Dict[str, int] = {}
+        self._deleted: Dict[str, int] = {}
+        self._version = 0
+        # 低於 floor 的 since 無法提供增量（例如版本資訊遺失），需要完整同步
+        self._floor = 0
+        self._body_cache: Dict[str, Tuple[int, bytes]] = {}
+
+    # ---------- 檔案讀寫 ----------
+
+    def _stat(self) -> Optional[Tuple[int, int]]:
+        try:
+            st = self.path.stat()
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def _read_file(self) -> List[Dict[str, Any]]:
+        if not self.path.exists():
+            return []
+        try:
+            data = _decode(self.path.read_bytes())
+        except Exception as e:
+            print(f"讀取 {self.path.name} 失敗: {e}")
+            return []
+        return [item for item in data if isinstance(item, dict)] if isinstance(data, list) else []
+
+    def _read_meta(self) -> Dict[str, Any]:
+        if not self.meta_path.exists():
+            return {}
+        try:
+            data = json.loads(self.meta_path.read_text(encoding="utf-8"))
+            return data if isinstance(data, dict) else {}
+        except Exception:
+            return {}
+
+    def _write_meta(self) -> None:
+        meta = {
+            "version": self._version,
+            "floor": self._floor,
+            "file": list(self._file_sig) if self._file_sig else None,
+            "revs": self._revs,
+            "historyRevs": self._history_revs,
+            "deleted": self._deleted,
+        }
+        try:
+            _write_json_atomic(self.meta_path, meta)
+        except OSError as e:
+            print(f"寫入 {self.meta_path.name} 失敗: {e}")
+
+    def _write_file(self) -> None:
+        if self._records:
+            _write_json_atomic(self.path, list(self._records.values()), indent=2)
+        elif self.path.exists():
+            os.remove(self.path)
+        self._file_sig = self._stat()
+        self._write_meta()
+
+    # ---------- 版本追蹤 ----------
+
+    def _history_sigs_for(self, pid: str, record: Dict[str, Any], history: Optional[List[Dict[str, Any]]]) -> List[str]:
+        """
+        逐筆訪談記錄的簽章，索引與完整訪談記錄（封存 + hot）一致
+
+        已封存的 persona 若沒有提供完整記錄，封存部分沿用舊簽章（不讀取封存檔），
+        新增的封存筆數以空字串表示「內容未知」
+        """
+        if history is None:
+            history = record.get(self.history_field) or []
+            if not isinstance(history, list):
+                history = []
+            hot = [_digest(_encode(item)) for item in history]
+            if not record.get("historyArchived"):
+                return hot
+            count = int(record.get("archivedHistoryCount") or 0)
+            old = self._history_sigs.get(pid, [])[:count]
+            return old + [""] * (count - len(old)) + hot
+        return [_digest(_encode(item)) for item in history]
+
+    def _stage(
+        self,
+        pid: str,
+        record: Dict[str, Any],
+        version: int,
+        blob: Optional[bytes] = None,
+        history: Optional[List[Dict[str, Any]]] = None,
+    ) -> bool:
+        """
+        放入一筆 persona；內容與現有相同時回傳 False
+
+        history 為已封存 persona 的完整訪談記錄（封存 + hot），剛寫入封存時由呼叫端提供
+        """
+        blob = blob if blob is not None else _encode(record)
+        sigs = self._history_sigs_for(pid, record, history)
+        old_sigs = self._history_sigs.get(pid, [])
+        old_revs = self._history_revs.get(pid, [])
+        revs = []
+        history_changed = len(sigs) != len(old_sigs)
+        for idx, sig in enumerate(sigs):
+            old_sig = old_sigs[idx] if idx < len(old_sigs) else None
+            # 任一方為未知（空字串）時視為未變更
+            if old_sig is not None and idx < len(old_revs) and (old_sig == sig or not old_sig or not sig):
+                revs.append(old_revs[idx])
+            else:
+                revs.append(version)
+                history_changed = True
+        if self._blobs.get(pid) == blob and not history_changed:
+            return False
+
+        self._records[pid] = record
+        self._blobs[pid] = blob
+        self._history_sigs[pid] = [sig or (old_sigs[idx] if idx < len(old_sigs) else "") for idx, sig in enumerate(sigs)]
+        self._history_revs[pid] = revs
+        self._revs[pid] = version
+        self._deleted.pop(pid, None)
+        return True
+
+    def _unstage(self, pid: str, version: int) -> bool:
+        if pid not in self._records:
+            return False
+        self._records.pop(pid, None)
+        self._blobs.pop(pid, None)
+        self._history_sigs.pop(pid, None)
+        self._history_revs.pop(pid, None)
+        self._revs.pop(pid, None)
+        self._deleted[pid] = version
+        return True
+
+    def _index(self, items: Iterable[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        indexed: Dict[str, Dict[str, Any]] = {}
+        for item in items:
+            indexed[str(item.get("id"))] = item
+        return indexed
+
+    def _initial_load(self) -> None:
+        items = self._index(self._read_file())
+        self._file_sig = self._stat()
+        meta = self._read_meta()
+        meta_sig = tuple(meta.get("file") or ()) or None
+        if meta and meta_sig == self._file_sig and isinstance(meta.get("revs"), dict):
+            # 版本資訊與檔案一致：沿用上次的修訂紀錄
+            self._version = int(meta.get("version", 0))
+            self._floor = int(meta.get("floor", 0))
+            revs = meta.get("revs") or {}
+            history_revs = meta.get("historyRevs") or {}
+            for pid, record in items.items():
+                self._stage(pid, record, self._version)
+                self._revs[pid] = int(revs.get(pid, self._version))
+                stored = history_revs.get(pid)
+                if isinstance(stored, list) and len(stored) == len(self._history_sigs[pid]):
+                    self._history_revs[pid] = [int(r) for r in stored]
+            self._deleted = {k: int(v) for k, v in (meta.get("deleted") or {}).items()}
+        else:
+            # 第一次啟動或檔案被外部修改：開新的版本區段，所有客戶端需完整同步
+            self._version = int(meta.get("version", 0)) + 1
+            self._floor = self._version
+            for pid, record in items.items():
+                self._stage(pid, record, self._version)
+            self._write_meta()
+        self._loaded = True
+
+    def _ensure_loaded(self) -> None:
+        if not self._loaded:
+            self._initial_load()
+            return
+        sig = self._stat()
+        if sig == self._file_sig:
+            return
+        # 檔案被其他程式（遷移腳本、手動編輯）改過：重新讀取並計算差異
+        items = self._index(self._read_file())
+        version = self._version + 1
+        changed = False
+        for pid in list(self._records.keys()):
+            if pid not in items:
+                changed = self._unstage(pid, version) or changed
+        for pid, record in items.items():
+            changed = self._stage(pid, record, version) or changed
+        self._file_sig = sig
+        if changed:
+            self._version = version
+            self._body_cache.clear()
+        self._write_meta()
+
+    # ---------- 讀取 ----------
+
+    @property
+    def version(self) -> int:
+        with self._lock:
+            self._ensure_loaded()
+            return self._version
+
+    def etag(self, variant: str = "") -> str:
+        with self._lock:
+            self._ensure_loaded()
+            suffix = f"-{variant}" if variant else ""
+            return f'"{self.name}-{self._floor}-{self._version}{suffix}"'
+
+    def _hydrate(self, persona: Dict[str, Any]) -> Dict[str, Any]:
+        """把封存的訪談記錄接回 persona（未封存者原樣回傳）"""
+        if self.archive is None or not persona.get("historyArchived"):
+            return persona
+        archived = self.archive.read(str(persona.get("id")))
+        persona[self.history_field] = archived + list(persona.get(self.history_field) or [])
+        return persona
+
+    def load(self, include_archived: bool = False) -> List[Dict[str, Any]]:
+        """回傳所有 persona（新解碼的物件，修改後需呼叫 save 才會保存）"""
+        with self._lock:
+            self._ensure_loaded()
+            blobs = list(self._blobs.values())
+        personas = [_decode(blob) for blob in blobs]
+        if include_archived:
+            personas = [self._hydrate(persona) for persona in personas]
+        return personas
+
+    def get(self, persona_id: str, include_archived: bool = False) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            self._ensure_loaded()
+            blob = self._blobs.get(persona_id)
+        if blob is None:
+            return None
+        persona = _decode(blob)
+        return self._hydrate(persona) if include_archived else persona
+
+    def history(self, persona_id: str) -> Optional[List[Dict[str, Any]]]:
+        """單一受訪者的完整訪談記錄（含封存部分）；persona 不存在時回傳 None"""
+        persona = self.get(persona_id, include_archived=True)
+        if persona is None:
+            return None
+        return list(persona.get(self.history_field) or [])
+
+    def ids(self) -> List[str]:
+        with self._lock:
+            self._ensure_loaded()
+            return list(self._records.keys())
+
+    def encoded_body(self, include_archived: bool = False) -> bytes:
+        """完整集合的 JSON bytes；同一版本只組裝一次"""
+        return self.snapshot(include_archived)[1]
+
+    def snapshot(self, include_archived: bool = False) -> Tuple[str, bytes]:
+        """同時取得 ETag 與對應版本的 JSON bytes，避免兩者之間剛好有寫入"""
+        variant = "full" if include_archived and self.archive is not None else ""
+        with self._lock:
+            self._ensure_loaded()
+            cached = self._body_cache.get(variant)
+            if not (cached and cached[0] == self._version):
+                blobs = self._blobs.values()
+                if variant:
+                    archived = self._archived_ids()
+                    blobs = [
+                        _encode(self._hydrate(_decode(blob))) if pid in archived else blob
+                        for pid, blob in self._blobs.items()
+                    ]
+                body = b"[" + b",".join(blobs) + b"]"
+                cached = (self._version, body)
+                self._body_cache[variant] = cached
+            return self.etag(variant), cached[1]
+
+    def _archived_ids(self) -> set:
+        return {pid for pid, record in self._records.items() if record.get("historyArchived")}
+
+    def changes_since(self, since: int) -> Dict[str, Any]:
+        """
+        取得自某版本之後的變更
+
+        Returns:
+            {
+                "version": 目前版本,
+                "since": 請求的版本,
+                "full": 是否為完整同步（since 過舊或不合法）,
+                "personas": 有變更的 persona（不含訪談記錄，附 historyLength / archivedCount）,
+                "interviewRecords": [{"personaId", "index", "record"}],
+                "deleted": 已刪除的 persona id,
+                "archived": full=True 時，訪談記錄只含 hot 部分的 persona id
+            }
+            historyLength 與 index 都以完整訪談記錄（封存 + hot）計算，前 archivedCount 筆位於封存；
+            只有新增 / 修改的記錄會讀取封存檔。
+            full=True 時 personas 為 hot 資料（不讀取封存）：archived 中的 persona 其 interviewHistory
+            不含封存的前 archivedHistoryCount 筆，需要時以 history() 另外取得。
+        """
+        with self._lock:
+            self._ensure_loaded()
+            version = self._version
+            if since < self._floor or since > version:
+                return {
+                    "version": version,
+                    "since": since,
+                    "full": True,
+                    "personas": [_decode(blob) for blob in self._blobs.values()],
+                    "interviewRecords": [],
+                    "deleted": [],
+                    "archived": sorted(self._archived_ids()),
+                }
+
+            changed_ids = [pid for pid, rev in self._revs.items() if rev > since]
+            blobs = {pid: self._blobs[pid] for pid in changed_ids}
+            history_revs = {pid: list(self._history_revs.get(pid, [])) for pid in changed_ids}
+            deleted = [pid for pid, rev in self._deleted.items() if rev > since]
+
+        personas = []
+        records = []
+        for pid, blob in blobs.items():
+            persona = _decode(blob)
+            history = persona.pop(self.history_field, None) or []
+            archived_count = int(persona.get("archivedHistoryCount") or 0) if persona.get("historyArchived") else 0
+            persona["historyLength"] = archived_count + len(history)
+            persona["archivedCount"] = archived_count
+            personas.append(persona)
+            indexes = [
+                idx for idx, rev in enumerate(history_revs[pid])
+                if rev > since and idx < persona["historyLength"]
+            ]
+            if indexes and indexes[0] < archived_count and self.archive is not None:
+                # 新記錄位於封存中（已封存的 persona 追加記錄時會一併寫入封存）
+                archived = self.archive.read(pid)
+                if len(archived) >= archived_count:
+                    history = archived[:archived_count] + history
+                    archived_count = 0
+            for idx in indexes:
+                if 0 <= idx - archived_count < len(history):
+                    records.append({"personaId": pid, "index": idx, "record": history[idx - archived_count]})
+
+        return {
+            "version": version,
+            "since": since,
+            "full": False,
+            "personas": personas,
+            "interviewRecords": records,
+            "deleted": deleted,
+        }
+
+    # ---------- 冷儲存 ----------
+
+    def _move_to_archive(self, pid: str, record: Dict[str, Any], history: List[Dict[str, Any]]) -> None:
+        entry = self.archive.write(pid, history)
+        record[self.history_field] = []
+        record["historyArchived"] = True
+        record["archivedHistoryCount"] = entry["count"]
+
+    def _tier(self, pid: str, record: Dict[str, Any]) -> Tuple[Dict[str, Any], Optional[List[Dict[str, Any]]]]:
+        """
+        依封存狀態整理要入庫的 persona（record 為可修改的副本）
+
+        回傳 (record, 完整訪談記錄)；本次有寫入封存時才附上完整記錄（供 _stage 計算逐筆修訂），否則為 None
+
+        - 已封存、帶回空的訪談記錄（hot 檔原樣存回）：保留封存
+        - 已封存、帶回完整訪談記錄（include_archived 讀回後再存）：以帶回的內容為準更新封存
+        - 已封存、只帶回新增的記錄（未讀回封存就 append）：接在封存內容之後
+        - 呼叫端明確設定 historyArchived=false：以帶回的記錄（可為空）為準，移除封存
+        - 未封存：isCompleted 且開啟 auto_archive 時順便封存
+        """
+        history = record.get(self.history_field) or []
+        entry = self.archive.entry(pid)
+        if entry and (record.get("historyArchived") or (not history and record.get("historyArchived") is not False)):
+            record["historyArchived"] = True
+            if history:
+                archived = self.archive.read(pid)
+                if history[:len(archived)] != archived:
+                    history = archived + history
+                if history != archived:
+                    self._move_to_archive(pid, record, history)
+                    return record, history
+            record[self.history_field] = []
+            record["archivedHistoryCount"] = entry["count"]
+            return record, None
+        if entry:
+            # 呼叫端移除了封存標記並帶回訪談記錄：以帶回的內容為準，回到 hot 檔
+            self.archive.remove(pid)
+        record.pop("historyArchived", None)
+        record.pop("archivedHistoryCount", None)
+        if self.auto_archive and record.get("isCompleted") and history:
+            self._move_to_archive(pid, record, history)
+            return record, history
+        return record, None
+
+    def archive_completed(self, persona_ids: Optional[Iterable[str]] = None) -> List[str]:
+        """
+        把已完成受訪者的訪談記錄移到冷儲存（單一次寫檔）
+
+        Args:
+            persona_ids: 指定要封存的 persona；None 表示所有 isCompleted 的受訪者
+
+        Returns:
+            本次實際封存的 persona id
+        """
+        if self.archive is None:
+            raise RuntimeError(f"{self.name} 未設定 TranscriptArchive")
+        with self._lock:
+            self._ensure_loaded()
+            wanted = set(persona_ids) if persona_ids is not None else None
+            version = self._version + 1
+            archived = []
+            for pid, blob in list(self._blobs.items()):
+                record = self._records[pid]
+                if wanted is not None and pid not in wanted:
+                    continue
+                if wanted is None and not record.get("isCompleted"):
+                    continue
+                if record.get("historyArchived") or not record.get(self.history_field):
+                    continue
+                record = _decode(blob)
+                history = record[self.history_field]
+                self._move_to_archive(pid, record, history)
+                self._stage(pid, record, version, history=history)
+                archived.append(pid)
+            if archived:
+                self._version = version
+                self._body_cache.clear()
+                self._write_file()
+            return archived
+
+    # ---------- 寫入 ----------
+
+    def save_many(self, personas: Iterable[Dict[str, Any]]) -> int:
+        """一次寫入多筆 persona（單一次寫檔），回傳新版本號"""
+        with self._lock:
+            self._ensure_loaded()
+            version = self._version + 1
+            changed = False
+            for persona in personas:
+                # 以編碼後再解碼的副本入庫，呼叫端之後修改原物件不會影響快取
+                pid = str(persona.get("id"))
+                blob = _encode(persona)
+                record = _decode(blob)
+                history = None
+                if self.archive is not None:
+                    record, history = self._tier(pid, record)
+                    blob = _encode(record)
+                changed = self._stage(pid, record, version, blob, history) or changed
+            if changed:
+                self._version = version
+                self._body_cache.clear()
+                self._write_file()
+            return self._version
+
+    def save(self, persona: Dict[str, Any]) -> int:
+        return self.save_many([persona])
+
+    def append_history(
+        self,
+        persona_id: str,
+        records: List[Dict[str, Any]],
+        fields: Optional[Dict[str, Any]] = None,
+    ) -> Optional[int]:
+        """
+        在鎖內把訪談記錄接到 persona 目前的內容之後並寫入（不會覆蓋其他地方同時做的修改）
+
+        Args:
+            persona_id: 受訪者 id
+            records: 要新增的訪談記錄
+            fields: 一併更新的欄位（例如 updatedAt）
+
+        Returns:
+            新版本號；persona 不存在時回傳 None
+        """
+        with self._lock:
+            if not self.append_history_many([(persona_id, records, fields)]):
+                return None
+            return self._version
+
+    def append_history_many(
+        self,
+        updates: Iterable[Tuple[str, List[Dict[str, Any]], Optional[Dict[str, Any]]]],
+    ) -> List[str]:
+        """
+        append_history 的批次版本：(persona_id, records, fields) 在同一次持有鎖時合併，只寫檔一次
+
+        Returns:
+            實際寫入的 persona id（已不存在的 persona 略過）
+        """
+        with self._lock:
+            self._ensure_loaded()
+            personas: Dict[str, Dict[str, Any]] = {}
+            for persona_id, records, fields in updates:
+                persona = personas.get(persona_id)
+                if persona is None:
+                    blob = self._blobs.get(persona_id)
+                    if blob is None:
+                        continue
+                    persona = personas[persona_id] = _decode(blob)
+                history = persona.get(self.history_field)
+                # 已封存的 persona 在 hot 檔中的記錄為空，_tier 會接在封存內容之後
+                persona[self.history_field] = (history if isinstance(history, list) else []) + list(records)
+                persona.update(fields or {})
+            if personas:
+                self.save_many(personas.values())
+            return list(personas)
+
+    # ---------- 串流匯入 / 匯出 ----------
+
+    def export_ndjson(self, include_archived: bool = True) -> Iterator[bytes]:
+        """直接從資料檔逐筆輸出 NDJSON（已開啟的檔案不受之後的寫入影響）"""
+        items: Iterable[Dict[str, Any]] = iter_json_array(self.path)
+        if include_archived and self.archive is not None:
+            items = (self._hydrate(item) for item in items)
+        return ndjson_lines(items)
+
+    def import_ndjson(self, source: IO[bytes], replace: bool = False, batch_size: int = IMPORT_BATCH_SIZE) -> Dict[str, int]:
+        """
+        以串流方式把 NDJSON 合併進集合（同一 id 出現多次時以最後一筆為準）
+
+        - 先完整掃過一次驗證格式（格式錯誤時拋出 ValueError，集合不變）
+        - 解碼、編碼與封存處理都在鎖外進行，每 batch_size 筆才取得鎖放入集合並遞增版本，
+          讀取端（GET / ETag）最多只等一個批次；暫存的資料量只與批次大小有關
+        - 全部放入後寫檔一次；變更的 persona 會照常出現在增量同步中
+        """
+        offsets = index_ndjson(source)
+        with self._lock:
+            self._ensure_loaded()
+            existing = set(self._records)
+        imported = set(offsets)
+        stats = {
+            "imported": len(imported),
+            "updated": len(imported & existing),
+            "added": len(imported - existing),
+            "kept": 0 if replace else len(existing - imported),
+            "total": 0,
+        }
+
+        batch: List[Tuple[str, Dict[str, Any], bytes, Optional[List[Dict[str, Any]]]]] = []
+        for item in iter_ndjson_last(source, offsets):
+            pid = str(item.get("id"))
+            record, history = self._tier(pid, item) if self.archive is not None else (item, None)
+            batch.append((pid, record, _encode(record), history))
+            if len(batch) >= batch_size:
+                self._apply_batch(batch)
+                batch = []
+        if batch:
+            self._apply_batch(batch)
+
+        with self._lock:
+            self._ensure_loaded()
+            version = self._version + 1
+            removed = False
+            if replace:
+                for pid in list(self._records.keys()):
+                    if pid not in imported:
+                        removed = self._unstage(pid, version) or removed
+            if removed:
+                self._version = version
+                self._body_cache.clear()
+            self._write_file()
+            if self.archive is not None:
+                for pid in self.archive.ids():
+                    if pid not in self._records:
+                        self.archive.remove(pid)
+            stats["total"] = len(self._records)
+        return stats
+
+    def _apply_batch(self, batch: List[Tuple[str, Dict[str, Any], bytes, Optional[List[Dict[str, Any]]]]]) -> None:
+        """把已編碼的 persona 放入集合（只更新記憶體，由呼叫端寫檔）"""
+        with self._lock:
+            self._ensure_loaded()
+            version = self._version + 1
+            changed = False
+            for pid, record, blob, history in batch:
+                changed = self._stage(pid, record, version, blob, history) or changed
+            if changed:
+                self._version = version
+                self._body_cache.clear()
+
+    def delete(self, persona_id: str) -> bool:
+        with self._lock:
+            self._ensure_loaded()
+            version = self._version + 1
+            if not self._unstage(persona_id, version):
+                return False
+            if self.archive is not None:
+                self.archive.remove(persona_id)
+            self._version = version
+            self._body_cache.clear()
+            self._write_file()
+            return True
+
+    def clear(self) -> None:
+        with self._lock:
+            self._ensure_loaded()
+            version = self._version + 1
+            changed = False
+            for pid in list(self._records.keys()):
+                changed = self._unstage(pid, version) or changed
+            if self.archive is not None:
+                self.archive.clear()
+            if changed:
+                self._version = version
+                self._body_cache.clear()
+            self._write_file()
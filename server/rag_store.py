@@ -12,6 +12,9 @@ from agno.knowledge.embedder.openai import OpenAIEmbedder
 from agno.knowledge.reader.pdf_reader import PDFReader
 from agno.knowledge.reader.text_reader import TextReader
 
+from embedding_store import get_embedding_store
+from llm_scheduler import SDK_MAX_RETRIES, llm_http_client
+
 try:
     from pypdf import PdfReader
 except Exception:  # pragma: no cover - handled at runtime
@@ -53,9 +56,23 @@ class RagStore:
         if not api_key:
             return None
         model = os.getenv("OPENAI_EMBEDDING_MODEL", "text-embedding-3-small")
-        self._embedder = OpenAIEmbedder(id=model, api_key=api_key)
+        # OpenAIEmbedder 不使用 agno 的全域 client：明確接上排程器
+        self._embedder = OpenAIEmbedder(
+            id=model,
+            api_key=api_key,
+            client_params={"http_client": llm_http_client(), "max_retries": SDK_MAX_RETRIES},
+        )
         return self._embedder
 
+    def _embed(self, texts: List[str]) -> List[List[float]]:
+        """經由共用的 embedding 快取取得向量；沒有 API key 時回傳空向量（改用關鍵字比對）"""
+        embedder = self._get_embedder()
+        if embedder is None:
+            return [[] for _ in texts]
+        return get_embedding_store().get_or_embed(
+            embedder.id, texts, lambda missing: [embedder.get_embedding(text) for text in missing]
+        )
+
     def _hash_text(self, text: str) -> str:
         return hashlib.md5(text.encode("utf-8")).hexdigest()
 
@@ -77,13 +94,11 @@ class RagStore:
             return None
 
     def _index_documents(self, stored: StoredDocument, docs: List[Document]) -> None:
-        embedder = self._get_embedder()
+        docs = [doc for doc in docs if (doc.content or "").strip()]
+        embeddings = self._embed([doc.content.strip() for doc in docs])
         chunks: List[IndexedChunk] = []
-        for doc in docs:
-            text = (doc.content or "").strip()
-            if not text:
-                continue
-            embedding = embedder.get_embedding(text) if embedder else []
+        for doc, embedding in zip(docs, embeddings):
+            text = doc.content.strip()
             metadata = dict(doc.meta_data or {})
             metadata["doc_id"] = stored.id
             metadata["doc_name"] = stored.name
@@ -162,8 +177,7 @@ class RagStore:
         if not query:
             return []
 
-        embedder = self._get_embedder()
-        query_embedding = embedder.get_embedding(query) if embedder else []
+        query_embedding = self._embed([query])[0]
         query_terms = [term.lower() for term in query.split() if term.strip()]
 
         scored = []
@@ -8,9 +8,11 @@ from typing import List, Dict, Any
 from collections import Counter
 from pathlib import Path
 
+from transcript_archive import TranscriptArchive
+
 
 def load_all_responses() -> List[Dict[str, Any]]:
-    """從 JSON 載入所有訪談回答"""
+    """從 JSON 載入所有訪談回答（含已封存的訪談記錄）"""
     db_file = Path("server/vietnam_personas.json")
     if not db_file.exists():
         return []
@@ -18,9 +20,13 @@ def load_all_responses() -> List[Dict[str, Any]]:
     with open(db_file, 'r', encoding='utf-8') as f:
         personas = json.load(f)
 
+    archive = TranscriptArchive(Path("server/archive/vietnam_personas"))
     responses = []
     for persona in personas:
-        for record in persona.get('interviewHistory', []):
+        history = persona.get('interviewHistory', [])
+        if persona.get('historyArchived'):
+            history = archive.read(str(persona.get('id'))) + history
+        for record in history:
             responses.append({
                 'persona_id': persona.get('id'),
                 'persona_name': persona.get('lastName'),
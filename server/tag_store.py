@@ -1,30 +1,109 @@
+import atexit
 import json
+import os
+import threading
+import time
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 
 
 STORE_PATH = Path(__file__).resolve().parent / "tag_store.json"
+# 兩次檢查檔案 mtime 的最短間隔（秒），期間內的讀取完全不碰磁碟
+STAT_INTERVAL = float(os.getenv("TAG_STORE_STAT_INTERVAL", "2.0"))
+# 寫入合併的延遲（秒），期間內的多次 set 只會寫一次檔
+FLUSH_DELAY = float(os.getenv("TAG_STORE_FLUSH_DELAY", "0.5"))
 
 
-def _load_store() -> Dict[str, Any]:
-    if not STORE_PATH.exists():
-        return {"docs": {}, "custom_tags": []}
+def _empty_store() -> Dict[str, Any]:
+    return {"docs": {}, "custom_tags": []}
+
+
+def _read_store(path: Path) -> Dict[str, Any]:
+    if not path.exists():
+        return _empty_store()
     try:
-        data = json.loads(STORE_PATH.read_text(encoding="utf-8"))
+        data = json.loads(path.read_text(encoding="utf-8"))
         if not isinstance(data, dict):
-            return {"docs": {}, "custom_tags": []}
+            return _empty_store()
         docs = data.get("docs") if isinstance(data.get("docs"), dict) else {}
         custom_tags = data.get("custom_tags")
         if not isinstance(custom_tags, list):
             custom_tags = []
         return {"docs": docs, "custom_tags": custom_tags}
     except Exception:
-        return {"docs": {}, "custom_tags": []}
+        return _empty_store()
+
+
+class _CachedStore:
+    """tag_store.json 的記憶體快取：載入一次、依 mtime 失效、延遲合併寫入"""
+
+    def __init__(self, path: Path, stat_interval: float = STAT_INTERVAL, flush_delay: float = FLUSH_DELAY) -> None:
+        self.path = path
+        self.stat_interval = stat_interval
+        self.flush_delay = flush_delay
+        self._lock = threading.RLock()
+        self._data: Optional[Dict[str, Any]] = None
+        self._sig: Optional[Tuple[int, int]] = None
+        self._checked_at = 0.0
+        self._dirty = False
+        self._timer: Optional[threading.Timer] = None
+
+    def _stat(self) -> Optional[Tuple[int, int]]:
+        try:
+            st = self.path.stat()
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def data(self) -> Dict[str, Any]:
+        with self._lock:
+            now = time.monotonic()
+            if self._data is None:
+                self._sig = self._stat()
+                self._data = _read_store(self.path)
+                self._checked_at = now
+            elif not self._dirty and now - self._checked_at >= self.stat_interval:
+                self._checked_at = now
+                sig = self._stat()
+                if sig != self._sig:
+                    self._sig = sig
+                    self._data = _read_store(self.path)
+            return self._data
+
+    def mark_dirty(self) -> None:
+        with self._lock:
+            self._dirty = True
+            if self.flush_delay <= 0:
+                self.flush()
+                return
+            if self._timer is None:
+                self._timer = threading.Timer(self.flush_delay, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self) -> None:
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._dirty or self._data is None:
+                return
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+            tmp_path.write_text(json.dumps(self._data, ensure_ascii=False, indent=2), encoding="utf-8")
+            os.replace(tmp_path, self.path)
+            self._sig = self._stat()
+            self._checked_at = time.monotonic()
+            self._dirty = False
+
+
+_store = _CachedStore(STORE_PATH)
+atexit.register(lambda: _store.flush())
 
 
-def _save_store(data: Dict[str, Any]) -> None:
-    STORE_PATH.parent.mkdir(parents=True, exist_ok=True)
-    STORE_PATH.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+def _load_store() -> Dict[str, Any]:
+    data = _store.data()
+    return {"docs": dict(data.get("docs", {})), "custom_tags": list(data.get("custom_tags", []))}
 
 
 def _dedupe_list(values: List[str]) -> List[str]:
@@ -39,31 +118,46 @@ def _dedupe_list(values: List[str]) -> List[str]:
 
 
 def get_doc_tags(tag_key: str) -> List[str]:
-    store = _load_store()
-    tags = store.get("docs", {}).get(tag_key, [])
-    return tags if isinstance(tags, list) else []
+    tags = _store.data().get("docs", {}).get(tag_key, [])
+    return list(tags) if isinstance(tags, list) else []
+
+
+def get_doc_tags_many(tag_keys: Iterable[str]) -> Dict[str, List[str]]:
+    """一次取得多份文件的標籤（單次快取查詢）"""
+    docs = _store.data().get("docs", {})
+    result: Dict[str, List[str]] = {}
+    for tag_key in tag_keys:
+        tags = docs.get(tag_key, [])
+        result[tag_key] = list(tags) if isinstance(tags, list) else []
+    return result
 
 
 def set_doc_tags(tag_key: str, tags: List[str]) -> None:
-    store = _load_store()
-    docs = store.get("docs", {})
-    if not isinstance(docs, dict):
-        docs = {}
-    docs[tag_key] = _dedupe_list([tag for tag in tags if isinstance(tag, str)])
-    store["docs"] = docs
-    _save_store(store)
+    with _store._lock:
+        store = _store.data()
+        docs = store.get("docs", {})
+        if not isinstance(docs, dict):
+            docs = {}
+        docs[tag_key] = _dedupe_list([tag for tag in tags if isinstance(tag, str)])
+        store["docs"] = docs
+        _store.mark_dirty()
 
 
 def get_custom_tags() -> List[str]:
-    store = _load_store()
-    tags = store.get("custom_tags", [])
-    return tags if isinstance(tags, list) else []
+    tags = _store.data().get("custom_tags", [])
+    return list(tags) if isinstance(tags, list) else []
 
 
 def set_custom_tags(tags: List[str]) -> None:
-    store = _load_store()
-    store["custom_tags"] = _dedupe_list([tag for tag in tags if isinstance(tag, str)])
-    _save_store(store)
+    with _store._lock:
+        store = _store.data()
+        store["custom_tags"] = _dedupe_list([tag for tag in tags if isinstance(tag, str)])
+        _store.mark_dirty()
+
+
+def flush() -> None:
+    """立即寫出尚未落地的標籤變更"""
+    _store.flush()
 
 
 def load_tag_store() -> Dict[str, Any]:
@@ -0,0 +1,52 @@
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from batch_executor import TokenBudget, run_all, run_concurrently  # noqa: E402
+
+
+def test_runs_in_parallel_up_to_limit_and_isolates_errors():
+    active = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def work(n):
+        nonlocal active, peak
+        with lock:
+            active += 1
+            peak = max(peak, active)
+        time.sleep(0.05)
+        with lock:
+            active -= 1
+        if n == 3:
+            raise RuntimeError("boom")
+        return n * 10
+
+    start = time.perf_counter()
+    outcomes = run_all(range(8), work, max_concurrency=4)
+    elapsed = time.perf_counter() - start
+
+    assert peak == 4
+    assert elapsed < 0.05 * 8 / 2
+    assert [o.index for o in outcomes] == list(range(8))
+    assert [o.value for o in outcomes if o.ok] == [0, 10, 20, 40, 50, 60, 70]
+    assert str(outcomes[3].error) == "boom"
+
+
+def test_should_stop_prevents_new_submissions():
+    started = []
+    outcomes = list(run_concurrently(
+        range(10), lambda n: started.append(n), max_concurrency=2, should_stop=lambda: len(started) >= 2,
+    ))
+    assert len(outcomes) < 10
+
+
+def test_token_budget_waits_for_refill():
+    budget = TokenBudget(tokens_per_minute=6000)  # 100 tokens / 秒
+    assert budget.acquire(6000) == 0.0
+    start = time.perf_counter()
+    budget.acquire(10)
+    assert 0.05 <= time.perf_counter() - start < 0.5
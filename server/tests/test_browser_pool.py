@@ -0,0 +1,59 @@
+import http.server
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("playwright")
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from browser_pool import BrowserPool  # noqa: E402
+
+PAGE = b"""<html><head><title>Static</title></head><body><main id="m">loading</main>
+<script>setTimeout(() => { document.getElementById('m').textContent = 'rendered by js'; }, 50);</script>
+</body></html>"""
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(PAGE)))
+        self.end_headers()
+        self.wfile.write(PAGE)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def page_url():
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/"
+    server.shutdown()
+
+
+def test_pages_are_reused_and_recycled(page_url):
+    pool = BrowserPool(size=2, max_uses=3)
+    try:
+        try:
+            snapshot = pool.fetch(page_url, wait_ms=1000)
+        except Exception as e:
+            if "Executable doesn't exist" in str(e):
+                pytest.skip("Chromium 未安裝（playwright install chromium）")
+            raise
+        assert snapshot.title == "Static"
+        assert "rendered by js" in snapshot.html
+
+        for _ in range(5):
+            pool.fetch(page_url, wait_ms=0)
+        stats = pool.stats()
+        # 只啟動一次瀏覽器；每個 page 用滿 3 次就重建
+        assert stats["launches"] == 1
+        assert stats["navigations"] == 6
+        assert stats["recycled"] == 2
+    finally:
+        pool.close()
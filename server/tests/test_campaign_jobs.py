@@ -0,0 +1,164 @@
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from campaign_jobs import COMPLETED, FAILED, PAUSED, CampaignManager  # noqa: E402
+from persona_store import PersonaStore  # noqa: E402
+
+QUESTIONS = [{"question": "Q1"}, {"question": "Q2", "subQuestions": ["Q2a"], "topicTag": "price"}]
+
+
+def wait_for(manager, job_id, status, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = manager.get(job_id)
+        if job["status"] == status and job_id not in manager._threads:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job did not reach {status}: {manager.get(job_id)['status']}")
+
+
+def make_store(tmp_path):
+    store = PersonaStore(tmp_path / "personas.json")
+    store.save_many([{"id": pid, "interviewHistory": []} for pid in ("a", "b", "c")])
+    return store
+
+
+def answer(persona, question, sub_questions):
+    return f"{persona['id']}:{question}:{len(persona['interviewHistory'])}"
+
+
+def test_campaign_answers_every_question_in_order(tmp_path):
+    store = make_store(tmp_path)
+    manager = CampaignManager(store, answer, tmp_path / "campaigns", max_concurrency=3)
+    job = manager.create(["a", "b", "c", "missing"], QUESTIONS)
+    done = wait_for(manager, job["id"], COMPLETED)
+
+    assert done["progress"] == {"total": 8, "done": 6, "failed": 2, "remaining": 0, "percent": 100.0}
+    history = store.get("b")["interviewHistory"]
+    assert [r["answer"] for r in history] == ["b:Q1:0", "b:Q2:1"]
+    assert history[1]["topicTag"] == "price"
+
+
+def test_paused_campaign_resumes_after_restart_without_repeating(tmp_path):
+    store = make_store(tmp_path)
+    release = threading.Event()
+    calls = []
+
+    def slow_answer(persona, question, sub_questions):
+        calls.append((persona["id"], question))
+        release.wait(5)
+        return "ok"
+
+    manager = CampaignManager(store, slow_answer, tmp_path / "campaigns", max_concurrency=1)
+    job = manager.create(["a", "b"], QUESTIONS)
+    while not calls:
+        time.sleep(0.01)
+    manager.pause(job["id"])
+    release.set()
+    paused = wait_for(manager, job["id"], PAUSED)
+    assert paused["progress"]["done"] == 1
+
+    # 模擬當機：記錄已寫入但 checkpoint 遺失這一題
+    checkpoint = tmp_path / "campaigns" / f"{job['id']}.json"
+    restarted = CampaignManager(store, slow_answer, tmp_path / "campaigns", max_concurrency=2)
+    restarted._jobs[job["id"]]["progress"].clear()
+    restarted.start(job["id"])
+    done = wait_for(restarted, job["id"], COMPLETED)
+
+    assert done["progress"]["done"] == 4
+    assert len(calls) == 4
+    assert len(store.get("a")["interviewHistory"]) == 2
+    assert checkpoint.exists()
+
+
+def test_question_urls_are_prefetched_once_per_campaign(tmp_path):
+    store = make_store(tmp_path)
+    prefetched = []
+
+    def prefetch(question, sub_questions):
+        prefetched.append(question)
+        return ([f"https://example.com/{question}"], f"<page for {question}>")
+
+    def answer_with_urls(persona, question, sub_questions, url_context=None):
+        return url_context[1]
+
+    manager = CampaignManager(store, answer_with_urls, tmp_path / "campaigns", max_concurrency=3, prefetch_fn=prefetch)
+    job = manager.create(["a", "b", "c"], QUESTIONS)
+    wait_for(manager, job["id"], COMPLETED)
+
+    assert prefetched == ["Q1", "Q2"]
+    assert [r["answer"] for r in store.get("c")["interviewHistory"]] == ["<page for Q1>", "<page for Q2>"]
+
+
+def test_failed_questions_are_recorded_and_retried_on_start(tmp_path):
+    store = make_store(tmp_path)
+    failing = {"a"}
+
+    def flaky(persona, question, sub_questions):
+        if persona["id"] in failing:
+            raise RuntimeError("Error code: 429")
+        return "ok"
+
+    manager = CampaignManager(store, flaky, tmp_path / "campaigns", max_concurrency=2)
+    job = manager.create(["a", "b"], QUESTIONS)
+    done = wait_for(manager, job["id"], COMPLETED)
+    assert done["progress"]["failed"] == 2 and done["progress"]["done"] == 2
+    assert store.get("a")["interviewHistory"] == []
+
+    failing.clear()
+    manager.start(job["id"])
+    retried = wait_for(manager, job["id"], COMPLETED)
+    assert retried["progress"] == {"total": 4, "done": 4, "failed": 0, "remaining": 0, "percent": 100.0}
+    assert len(store.get("a")["interviewHistory"]) == 2 and len(store.get("b")["interviewHistory"]) == 2
+
+
+def test_save_errors_fail_the_question_instead_of_looping(tmp_path, monkeypatch):
+    store = make_store(tmp_path)
+    calls = []
+
+    def broken_append(*args, **kwargs):
+        raise OSError("disk full")
+
+    def counting(persona, question, sub_questions):
+        calls.append(question)
+        return "ok"
+
+    monkeypatch.setattr(store, "append_history", broken_append)
+    manager = CampaignManager(store, counting, tmp_path / "campaigns", max_concurrency=1)
+    job = manager.create(["a"], QUESTIONS)
+    done = wait_for(manager, job["id"], COMPLETED)
+    assert done["progress"]["failed"] == 2
+    assert {entry["error"] for entry in manager._jobs[job["id"]]["progress"].values()} == {"disk full"}
+    assert calls == ["Q1"]
+
+    # 一整輪沒有進展時停止（不會一直重跑同一批題目）
+    monkeypatch.setattr(manager, "_run_persona", lambda *args: None)
+    manager._jobs[job["id"]]["progress"].clear()
+    manager.start(job["id"])
+    failed = wait_for(manager, job["id"], FAILED)
+    assert "沒有進展" in failed["error"]
+
+
+def test_answers_merge_with_concurrent_edits(tmp_path):
+    store = make_store(tmp_path)
+
+    def answer_and_edit(persona, question, sub_questions):
+        # 訪談進行中，其他地方（UI / 批量訪談）修改了同一位受訪者
+        current = store.get(persona["id"])
+        current["note"] = f"edited during {question}"
+        current["interviewHistory"].append({"questionId": f"ui_{question}", "answer": "UI"})
+        store.save(current)
+        return "ok"
+
+    manager = CampaignManager(store, answer_and_edit, tmp_path / "campaigns", max_concurrency=1)
+    job = manager.create(["a"], QUESTIONS)
+    wait_for(manager, job["id"], COMPLETED)
+    persona = store.get("a")
+    assert persona["note"] == "edited during Q2"
+    assert [r["questionId"] for r in persona["interviewHistory"]] == [
+        "ui_Q1", f"campaign_{job['id']}_0", "ui_Q2", f"campaign_{job['id']}_1",
+    ]
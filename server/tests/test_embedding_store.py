@@ -0,0 +1,68 @@
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from embedding_store import EmbeddingStore  # noqa: E402
+
+
+def _counting_embed(calls):
+    def embed(texts):
+        calls.append(list(texts))
+        return [[] if "失敗" in text else [float(len(text)), 0.5, -1.25] for text in texts]
+    return embed
+
+
+def test_persists_across_instances_and_dedupes(tmp_path):
+    path = str(tmp_path / "embeddings.sqlite3")
+    calls = []
+    store = EmbeddingStore(path, cache_size=8)
+    texts = ["你買過旅遊險嗎", "請概述自己的旅遊習慣", "你買過旅遊險嗎", "取得失敗"]
+    first = store.get_or_embed("m", texts, _counting_embed(calls))
+    assert calls == [["你買過旅遊險嗎", "請概述自己的旅遊習慣", "取得失敗"]]
+    assert first[0] == first[2] == [7.0, 0.5, -1.25] and first[3] == []
+    store.close()
+
+    # 重啟後：已存的直接讀檔，只重算失敗的；不同 model 不共用
+    calls.clear()
+    reopened = EmbeddingStore(path, cache_size=8)
+    assert reopened.get_or_embed("m", texts, _counting_embed(calls)) == first
+    assert calls == [["取得失敗"]]
+    assert reopened.stats()["diskHits"] == 2 and reopened.stats()["persisted"] == 2
+    reopened.get_or_embed("other-model", texts[:1], _counting_embed(calls))
+    assert calls[-1] == ["你買過旅遊險嗎"]
+
+    reopened.clear("m")
+    assert reopened.get_many("m", texts) == {}
+    assert list(reopened.get_many("other-model", texts)) == ["你買過旅遊險嗎"]
+
+
+def test_lru_front_is_bounded_and_memory_only_mode(tmp_path):
+    store = EmbeddingStore(str(tmp_path / "e.sqlite3"), cache_size=2)
+    store.put_many("m", {f"q{i}": [float(i)] for i in range(5)})
+    assert store.stats()["cached"] == 2
+    assert store.get_many("m", ["q0", "q4"]) == {"q0": [0.0], "q4": [4.0]}
+    assert store.stats()["hits"] == 1 and store.stats()["diskHits"] == 1
+
+    memory = EmbeddingStore(path=None, cache_size=2)
+    memory.put_many("m", {"a": [1.0], "b": [2.0], "c": [3.0]})
+    assert memory.get_many("m", ["a", "b", "c"]) == {"b": [2.0], "c": [3.0]}
+    assert "persisted" not in memory.stats()
+
+
+def test_concurrent_writers_share_one_file(tmp_path):
+    store = EmbeddingStore(str(tmp_path / "e.sqlite3"), cache_size=16)
+
+    def worker(n):
+        store.get_or_embed("m", [f"q{i}" for i in range(n, n + 50)], lambda texts: [[1.0, 2.0]] * len(texts))
+
+    threads = [threading.Thread(target=worker, args=(i * 25,)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert store.stats()["persisted"] == 125
+    assert store.get_many("m", ["q124"])["q124"] == pytest.approx([1.0, 2.0])
@@ -0,0 +1,50 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import html_extract  # noqa: E402
+from html_extract import available_backends, extract_page  # noqa: E402
+from url_fetcher import looks_js_rendered  # noqa: E402
+
+CORPUS = sorted((Path(__file__).parent / "fixtures" / "html").glob("*.html"))
+
+
+@pytest.mark.parametrize("backend", available_backends())
+@pytest.mark.parametrize("path", CORPUS, ids=lambda p: p.stem)
+def test_backends_agree_with_stream_extractor(path, backend):
+    html = path.read_text(encoding="utf-8")
+    # stream 只用標準庫，一定可用，作為各 backend 的比對基準
+    assert extract_page(html, 2000, backend) == extract_page(html, 2000, "stream")
+
+
+@pytest.mark.parametrize("backend", available_backends())
+def test_main_content_selection_and_truncation(backend):
+    html = (CORPUS[0].parent / "travel_product_vi.html").read_text(encoding="utf-8")
+    page = extract_page(html, 300, backend)
+    assert page.title.startswith("Bảo hiểm du lịch quốc tế")
+    assert page.text.startswith("Bảo hiểm du lịch quốc tế\nBảo vệ toàn diện")
+    assert "Sản phẩm bảo hiểm" not in page.text  # nav
+    assert "Ưu đãi 20%" not in page.text  # aside
+    assert "&amp;" not in extract_page(html, 5000, backend).text
+    assert page.truncated and len(page.text) == 300
+
+    faq = extract_page((CORPUS[0].parent / "faq_zh.html").read_text(encoding="utf-8"), 100000, backend)
+    assert faq.text.startswith("Q0：出國旅遊險") and not faq.truncated
+
+
+def test_stream_stops_after_main():
+    html = "<html><body><main><p>保費 100 元起</p></main>" + "<div>" * 5000 + "後面的內容</body></html>" * 50
+    parser = html_extract._StreamExtractor(1000)
+    parser.feed(html[:html_extract.STREAM_CHUNK])
+    assert parser.done
+    assert parser.result().text == "保費 100 元起"
+
+
+def test_spa_shell_is_detected_as_js_rendered():
+    html = (CORPUS[0].parent / "spa_shell.html").read_text(encoding="utf-8")
+    page = extract_page(html, 2000)
+    assert page.text == ""
+    assert looks_js_rendered(html, page.text)
@@ -0,0 +1,123 @@
+import asyncio
+import os
+import subprocess
+import sys
+from collections import OrderedDict
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+from agno.run.base import RunStatus
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import vietnam_interview_agent as agent_module  # noqa: E402
+from vietnam_interview_agent import InterviewError  # noqa: E402
+
+PERSONA = {"id": "p1", "lastName": "Nguyễn", "gender": "Female", "interviewHistory": []}
+NO_URLS = ([], "")
+
+
+class FakeAgent:
+    def __init__(self, response=None, exc=None):
+        self.response, self.exc = response, exc
+
+    def run(self, prompt, stream=False):
+        if self.exc:
+            raise self.exc
+        return self.response
+
+    async def arun(self, prompt, stream=False):
+        return self.run(prompt, stream)
+
+
+def _use_agent(monkeypatch, fake):
+    monkeypatch.setattr(agent_module, "_build_interview_call", lambda *args: (fake, "prompt"))
+    monkeypatch.setattr(agent_module, "_build_observer_call", lambda *args: (fake, "prompt"))
+
+
+@pytest.mark.parametrize("fake", [
+    # Agno 把模型錯誤包成 status=ERROR 的回應，不會拋出
+    FakeAgent(SimpleNamespace(status=RunStatus.error, content="Error code: 429", metrics=None)),
+    FakeAgent(exc=RuntimeError("connection reset")),
+])
+def test_failed_runs_raise_only_when_asked(monkeypatch, fake):
+    _use_agent(monkeypatch, fake)
+    assert agent_module.interview_vietnam_persona(PERSONA, "Q", [], url_context=NO_URLS) == "（抱歉，系統發生錯誤，請再試一次）"
+    assert agent_module.interview_vietnam_persona_observer(PERSONA, "Q", [], url_context=NO_URLS).startswith("（記錄失敗")
+    for interview in (agent_module.interview_vietnam_persona, agent_module.interview_vietnam_persona_observer):
+        with pytest.raises((InterviewError, RuntimeError)):
+            interview(PERSONA, "Q", [], url_context=NO_URLS, raise_on_error=True)
+    with pytest.raises((InterviewError, RuntimeError)):
+        asyncio.run(agent_module.ainterview_vietnam_persona(PERSONA, "Q", [], url_context=NO_URLS, raise_on_error=True))
+
+
+def test_successful_run_returns_content(monkeypatch):
+    _use_agent(monkeypatch, FakeAgent(SimpleNamespace(status=RunStatus.completed, content="我買過兩次", metrics=None)))
+    assert agent_module.interview_vietnam_persona(PERSONA, "Q", [], url_context=NO_URLS, raise_on_error=True) == "我買過兩次"
+
+
+PROFILE = {
+    "id": "p1", "lastName": "Nguyễn", "gender": "Female", "age": 32, "occupation": "Kế toán",
+    "timesOfOverseasTravelInsurance": 2, "purchasedBrand": ["Bao Viet"], "purchasedChannels": ["Online"],
+    "personalBackground": "常出差", "language_style": {"formality": "casual"},
+    "big5": {"openness": 0.7}, "risk_profile": "conservative",
+    "interviewHistory": [],
+}
+
+
+class CountingBuilder:
+    __name__ = "counting_builder"
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, persona):
+        self.calls += 1
+        return agent_module.PromptTemplate(("instructions",), 3, persona.get("lastName", ""))
+
+
+@pytest.fixture
+def builder(monkeypatch):
+    monkeypatch.setattr(agent_module, "_template_cache", OrderedDict())
+    return CountingBuilder()
+
+
+def test_template_cache_hits_for_same_profile(builder):
+    first = agent_module._cached_template(builder, PROFILE)
+    # 訪談記錄、進度等不在 PROFILE_FIELDS 的欄位改變：仍命中快取
+    later = {**PROFILE, "interviewHistory": [{"question": "Q", "answer": "A"}], "updatedAt": "t"}
+    assert agent_module._cached_template(builder, later) is first
+    assert agent_module._cached_template(builder, dict(PROFILE)) is first
+    assert builder.calls == 1
+
+
+@pytest.mark.parametrize("field", agent_module.PROFILE_FIELDS)
+def test_template_cache_misses_when_profile_field_changes(builder, field):
+    agent_module._cached_template(builder, PROFILE)
+    changed = {**PROFILE, field: ["changed"] if isinstance(PROFILE[field], list) else f"changed-{field}"}
+    agent_module._cached_template(builder, changed)
+    assert builder.calls == 2
+    # 欄位被移除也算不同的 profile
+    agent_module._cached_template(builder, {k: v for k, v in PROFILE.items() if k != field})
+    assert builder.calls == 3
+
+
+def test_question_rng_is_stable_across_processes():
+    question = "Bạn thường mua bảo hiểm du lịch ở đâu？"
+    expected = [agent_module._question_rng(question).random(), agent_module._question_rng(question).randint(0, 100)]
+    assert agent_module._question_rng("另一題").random() != expected[0]
+
+    code = (
+        "import sys; sys.path.insert(0, sys.argv[1]); import vietnam_interview_agent as m; "
+        "q = sys.argv[2]; print(repr([m._question_rng(q).random(), m._question_rng(q).randint(0, 100)]))"
+    )
+    server_dir = str(Path(__file__).resolve().parents[1])
+    for hash_seed in ("1", "2"):
+        # 不同的 PYTHONHASHSEED（內建 hash() 會不同）：md5 種子仍一致
+        result = subprocess.run(
+            [sys.executable, "-c", code, server_dir, question],
+            env={**os.environ, "PYTHONHASHSEED": hash_seed},
+            capture_output=True, text=True, check=True, timeout=60,
+        )
+        assert result.stdout.strip().splitlines()[-1] == repr(expected)
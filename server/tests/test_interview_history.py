@@ -0,0 +1,149 @@
+import asyncio
+import sys
+import threading
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from interview_history import (  # noqa: E402
+    SUMMARY_FIELD,
+    abuild_history_context,
+    build_history_context,
+    estimate_tokens,
+    format_history_context,
+)
+
+
+def _persona(answers):
+    return {
+        "id": "p1",
+        "interviewHistory": [{"question": f"Q{i}", "answer": answer} for i, answer in enumerate(answers)],
+    }
+
+
+class FakeSummarizer:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, previous, records):
+        self.calls.append((previous, [r["question"] for r in records]))
+        return (previous + " " if previous else "") + "+".join(r["question"] for r in records)
+
+
+def test_short_history_keeps_original_format():
+    persona = _persona(["好", "還可以"])
+    summarizer = FakeSummarizer()
+    text = format_history_context(build_history_context(persona, summarizer), "# PREVIOUS INTERVIEW RESPONSES:")
+    assert text == "\n# PREVIOUS INTERVIEW RESPONSES:\nQ: Q0\nA: 好\n\nQ: Q1\nA: 還可以\n\n"
+    assert summarizer.calls == []
+    assert SUMMARY_FIELD not in persona
+
+
+def test_summary_is_cached_and_updated_incrementally():
+    persona = _persona(["答" * 300 for _ in range(6)])
+    summarizer = FakeSummarizer()
+
+    context = build_history_context(persona, summarizer, turns=3, budget=700, refresh_every=1)
+    # 每筆約 300 tokens，預算內只放得下最近兩筆
+    assert len(context.recent) == 2
+    assert context.summary == "Q0+Q1+Q2+Q3"
+    assert sum(estimate_tokens(turn) for turn in context.recent) <= 700
+    assert persona[SUMMARY_FIELD]["count"] == 4
+
+    # 沒有新問答：直接使用 persona 上的摘要，不再呼叫 summarizer
+    build_history_context(persona, summarizer, turns=3, budget=700, refresh_every=1)
+    assert len(summarizer.calls) == 1
+
+    # 新增一筆：只把剛移出視窗的 Q4 併入舊摘要
+    persona["interviewHistory"].append({"question": "Q6", "answer": "答" * 300})
+    context = build_history_context(persona, summarizer, turns=3, budget=700, refresh_every=1)
+    assert summarizer.calls[-1] == ("Q0+Q1+Q2+Q3", ["Q4"])
+    assert context.summary == "Q0+Q1+Q2+Q3 Q4"
+    assert persona[SUMMARY_FIELD]["count"] == 5
+
+
+def test_edited_history_invalidates_summary():
+    persona = _persona(["答" * 300 for _ in range(5)])
+    summarizer = FakeSummarizer()
+    build_history_context(persona, summarizer, turns=2, budget=700, refresh_every=1)
+    persona["interviewHistory"][0]["answer"] = "改過的回答"
+    build_history_context(persona, summarizer, turns=2, budget=700, refresh_every=1)
+    assert summarizer.calls[-1] == ("", ["Q0", "Q1", "Q2"])
+
+
+def test_oversized_latest_answer_is_truncated():
+    persona = _persona(["答" * 2000])
+    context = build_history_context(persona, FakeSummarizer(), turns=3, budget=300)
+    assert len(context.recent) == 1
+    assert estimate_tokens(context.recent[0]) <= 300
+    assert "（略）" in context.recent[0]
+
+
+def test_async_build_matches_sync():
+    calls = []
+
+    async def summarizer(previous, records):
+        calls.append([r["question"] for r in records])
+        return "+".join(r["question"] for r in records)
+
+    persona = {**_persona(["答" * 300 for _ in range(5)]), "id": "async"}
+    context = asyncio.run(abuild_history_context(persona, summarizer, turns=2, budget=700, refresh_every=1))
+    assert calls == [["Q0", "Q1", "Q2"]]
+    assert context.summary == "Q0+Q1+Q2"
+    assert context.recent == build_history_context(persona, FakeSummarizer(), turns=2, budget=700, refresh_every=1).recent
+    # persona 上的摘要仍有效：不再呼叫 summarizer
+    asyncio.run(abuild_history_context(persona, summarizer, turns=2, budget=700, refresh_every=1))
+    assert len(calls) == 1
+
+
+def test_summary_refreshes_every_n_turns():
+    persona = {**_persona(["答" * 300 for _ in range(5)]), "id": "every"}
+    summarizer = FakeSummarizer()
+
+    # 移出視窗的問答未達門檻：用擷取式重點代替，不呼叫模型、不改動 persona
+    context = build_history_context(persona, summarizer, turns=2, budget=700, refresh_every=4)
+    assert summarizer.calls == []
+    assert context.summary.startswith("- Q0：") and "- Q2：" in context.summary
+    assert SUMMARY_FIELD not in persona
+
+    persona["interviewHistory"].append({"question": "Q5", "answer": "答" * 300})
+    context = build_history_context(persona, summarizer, turns=2, budget=700, refresh_every=4)
+    assert summarizer.calls == [("", ["Q0", "Q1", "Q2", "Q3"])]
+    assert context.summary == "Q0+Q1+Q2+Q3"
+
+    # 下一筆只累積在擷取式重點中，接在已保存的摘要之後
+    persona["interviewHistory"].append({"question": "Q6", "answer": "答" * 300})
+    context = build_history_context(persona, summarizer, turns=2, budget=700, refresh_every=4)
+    assert len(summarizer.calls) == 1
+    assert context.summary.startswith("Q0+Q1+Q2+Q3\n- Q4：")
+    assert persona[SUMMARY_FIELD]["count"] == 4
+
+
+def test_on_summary_refreshes_off_the_request_path():
+    persona = {**_persona(["答" * 300 for _ in range(6)]), "id": "background"}
+    release = threading.Event()
+    saved = []
+    done = threading.Event()
+
+    def slow_summarizer(previous, records):
+        release.wait(5)
+        return "+".join(r["question"] for r in records)
+
+    def on_summary(summary):
+        saved.append(summary)
+        done.set()
+
+    # 不等待摘要模型：先以擷取式重點回答，摘要在背景完成後交給 on_summary
+    context = build_history_context(persona, slow_summarizer, turns=2, budget=700, refresh_every=2, on_summary=on_summary)
+    assert context.summary.startswith("- Q0：")
+    # 同一段歷史更新中：不重複送出
+    build_history_context(persona, slow_summarizer, turns=2, budget=700, refresh_every=2, on_summary=on_summary)
+    release.set()
+    assert done.wait(5)
+    assert len(saved) == 1 and saved[0]["text"] == "Q0+Q1+Q2+Q3" and saved[0]["count"] == 4
+    assert SUMMARY_FIELD not in persona
+
+    # 保存後的 persona 直接使用摘要
+    persona[SUMMARY_FIELD] = saved[0]
+    context = build_history_context(persona, slow_summarizer, turns=2, budget=700, refresh_every=2, on_summary=on_summary)
+    assert context.summary == "Q0+Q1+Q2+Q3"
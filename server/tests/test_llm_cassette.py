@@ -0,0 +1,100 @@
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+import httpx
+import pytest
+from openai import AsyncOpenAI, NotFoundError, OpenAI
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from llm_cassette import RECORD, REPLAY, AsyncCassetteTransport, Cassette, CassetteTransport  # noqa: E402
+
+
+def _completion(content):
+    return {
+        "id": "chatcmpl-1", "object": "chat.completion", "created": 0, "model": "gpt-4o",
+        "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}],
+        "usage": {"prompt_tokens": 10, "completion_tokens": 2, "total_tokens": 12},
+    }
+
+
+def _stream_body(words):
+    events = []
+    for word in words:
+        chunk = {
+            "id": "chatcmpl-2", "object": "chat.completion.chunk", "created": 0, "model": "gpt-4o",
+            "choices": [{"index": 0, "delta": {"content": word}, "finish_reason": None}],
+        }
+        events.append(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n")
+    events.append("data: [DONE]\n\n")
+    return "".join(events).encode("utf-8")
+
+
+def _upstream(request):
+    body = json.loads(request.content)
+    if body.get("stream"):
+        return httpx.Response(200, headers={"content-type": "text/event-stream"}, content=_stream_body(["你", "好"]))
+    return httpx.Response(200, json=_completion(f"echo: {body['messages'][-1]['content']}"))
+
+
+def _client(transport):
+    return OpenAI(api_key="sk-test", base_url="http://llm.test/v1", http_client=httpx.Client(transport=transport))
+
+
+def _ask(client, text, stream=False):
+    kwargs = {"model": "gpt-4o", "messages": [{"role": "user", "content": text}]}
+    if stream:
+        return "".join(
+            chunk.choices[0].delta.content or ""
+            for chunk in client.chat.completions.create(stream=True, **kwargs)
+        )
+    return client.chat.completions.create(**kwargs).choices[0].message.content
+
+
+def test_record_then_replay_offline(tmp_path):
+    path = tmp_path / "llm.jsonl"
+    recorder = _client(CassetteTransport(RECORD, Cassette(path), inner=httpx.MockTransport(_upstream)))
+    assert _ask(recorder, "A") == "echo: A"
+    assert _ask(recorder, "B") == "echo: B"
+    assert _ask(recorder, "串流", stream=True) == "你好"
+
+    entries = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+    assert len(entries) == 3
+    assert len(entries[2]["events"]) == 3
+
+    def offline(request):
+        raise AssertionError("replay 不應連線")
+
+    cassette = Cassette(path)
+    replayer = _client(CassetteTransport(REPLAY, cassette, inner=httpx.MockTransport(offline), latency_scale=0))
+    assert _ask(replayer, "B") == "echo: B"
+    assert _ask(replayer, "A") == "echo: A"
+    assert _ask(replayer, "串流", stream=True) == "你好"
+    # 沒錄過的 request：預設改用同一 endpoint 的錄製結果
+    assert _ask(replayer, "C").startswith("echo: ")
+
+    strict = _client(CassetteTransport(REPLAY, cassette, latency_scale=0, strict=True))
+    with pytest.raises(NotFoundError):
+        _ask(strict, "C")
+
+
+def test_async_replay_uses_fixed_latency(tmp_path):
+    path = tmp_path / "llm.jsonl"
+    _ask(_client(CassetteTransport(RECORD, Cassette(path), inner=httpx.MockTransport(_upstream))), "A")
+
+    async def run():
+        transport = AsyncCassetteTransport(REPLAY, Cassette(path), latency_ms=50)
+        client = AsyncOpenAI(api_key="sk-test", base_url="http://llm.test/v1",
+                             http_client=httpx.AsyncClient(transport=transport))
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        response = await client.chat.completions.create(
+            model="gpt-4o", messages=[{"role": "user", "content": "A"}],
+        )
+        return response.choices[0].message.content, loop.time() - started
+
+    content, elapsed = asyncio.run(run())
+    assert content == "echo: A"
+    assert elapsed >= 0.05
@@ -0,0 +1,139 @@
+import asyncio
+import sys
+import threading
+import time
+from pathlib import Path
+
+import httpx
+import pytest
+from openai import BadRequestError, InternalServerError, OpenAI, RateLimitError
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from llm_scheduler import (  # noqa: E402
+    BATCH,
+    INTERACTIVE,
+    LLMScheduler,
+    ModelLimiter,
+    SchedulerSettings,
+    SchedulingTransport,
+    retry_after,
+)
+
+COMPLETION = {
+    "id": "c1", "object": "chat.completion", "created": 0, "model": "gpt-4o",
+    "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": "ok"}}],
+    "usage": {"prompt_tokens": 10, "completion_tokens": 1, "total_tokens": 11},
+}
+
+
+def _client(handler, settings):
+    scheduler = LLMScheduler(settings)
+    transport = SchedulingTransport(httpx.MockTransport(handler), scheduler)
+    client = OpenAI(api_key="sk-test", base_url="http://llm/v1", max_retries=0,
+                    http_client=httpx.Client(transport=transport))
+    return client, scheduler
+
+
+def test_retries_rate_limit_with_retry_after_and_learns_limits():
+    calls = []
+
+    def handler(request):
+        calls.append(time.monotonic())
+        if len(calls) < 3:
+            return httpx.Response(429, headers={"retry-after-ms": "50"}, json={"error": {"message": "slow down"}})
+        return httpx.Response(200, json=COMPLETION, headers={
+            "x-ratelimit-limit-requests": "500", "x-ratelimit-remaining-requests": "499",
+            "x-ratelimit-limit-tokens": "30000", "x-ratelimit-remaining-tokens": "29000",
+        })
+
+    client, scheduler = _client(handler, SchedulerSettings(backoff_base=0.01))
+    result = client.chat.completions.create(model="gpt-4o", messages=[{"role": "user", "content": "hi"}])
+    assert result.choices[0].message.content == "ok"
+    assert len(calls) == 3
+    assert calls[1] - calls[0] >= 0.05
+    stats = scheduler.stats()["gpt-4o"]
+    assert stats["retries"] == 2 and stats["rateLimited"] == 2
+    # 未設定 LLM_RPM / LLM_TPM：採用 API 回報的上限
+    assert stats["rpm"] == 500 and stats["tpm"] == 30000
+
+
+def test_gives_up_after_max_retries_and_skips_non_retryable():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        status = 503 if request.url.path.endswith("/completions") else 400
+        return httpx.Response(status, json={"error": {"message": "nope"}})
+
+    client, scheduler = _client(handler, SchedulerSettings(max_retries=2, backoff_base=0.001))
+    with pytest.raises(InternalServerError):
+        client.chat.completions.create(model="gpt-4o", messages=[{"role": "user", "content": "hi"}])
+    assert len(calls) == 3
+
+    with pytest.raises(BadRequestError):
+        client.embeddings.create(model="text-embedding-3-small", input=["a"])
+    assert len(calls) == 4
+    assert scheduler.stats()["gpt-4o"]["failures"] == 1
+
+
+def test_sdk_does_not_retry_on_top_of_the_scheduler():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(429, json={"error": {"message": "slow down"}})
+
+    scheduler = LLMScheduler(SchedulerSettings(max_retries=1, backoff_base=0.001))
+    transport = SchedulingTransport(httpx.MockTransport(handler), scheduler)
+    # SDK 預設 max_retries=2：最終的 429 帶有 x-should-retry: false，不會再重送
+    client = OpenAI(api_key="sk-test", base_url="http://llm/v1", http_client=httpx.Client(transport=transport))
+    with pytest.raises(RateLimitError) as info:
+        client.chat.completions.create(model="gpt-4o", messages=[{"role": "user", "content": "hi"}])
+    assert len(calls) == 2
+    assert info.value.response.headers["x-should-retry"] == "false"
+
+
+def test_token_estimate_includes_max_tokens():
+    scheduler = LLMScheduler(SchedulerSettings(default_output_tokens=300))
+    chat = httpx.Request("POST", "http://llm/v1/chat/completions", json={
+        "model": "gpt-4o", "max_tokens": 50, "messages": [{"role": "user", "content": "答" * 100}],
+    })
+    limiter, tokens = scheduler.plan(chat)
+    # 100 個中文字 + role + max_tokens
+    assert limiter.model == "gpt-4o" and tokens == 100 + 1 + 50
+    embeddings = httpx.Request("POST", "http://llm/v1/embeddings", json={"model": "e", "input": ["abcdabcd"]})
+    assert scheduler.plan(embeddings)[1] == 2
+    assert scheduler.plan(httpx.Request("GET", "http://llm/v1/models"))[0] is None
+    assert retry_after(httpx.Headers({"retry-after": "2"})) == 2.0
+
+
+def test_batch_cannot_use_interactive_reserve():
+    limiter = ModelLimiter("m", SchedulerSettings(tpm=60000, interactive_reserve=0.5))
+    limiter.acquire(30000, INTERACTIVE)  # 剩下的正好是保留額度
+    granted = []
+    thread = threading.Thread(target=lambda: granted.append(("batch", limiter.acquire(500, BATCH))))
+    thread.start()
+    time.sleep(0.05)
+    assert limiter.acquire(500, INTERACTIVE) < 0.05  # interactive 可以用保留額度，不必等
+    thread.join(timeout=5)
+    assert granted and granted[0][1] >= 0.3
+
+
+def test_interactive_requests_jump_the_queue():
+    async def scenario():
+        limiter = ModelLimiter("m", SchedulerSettings(tpm=600000, interactive_reserve=0))
+        await limiter.aacquire(600000)
+        order = []
+
+        async def request(name, priority):
+            await limiter.aacquire(1000, priority)
+            order.append(name)
+
+        batch = [asyncio.create_task(request(f"batch{i}", BATCH)) for i in range(3)]
+        await asyncio.sleep(0.01)
+        interactive = asyncio.create_task(request("chat", INTERACTIVE))
+        await asyncio.gather(*batch, interactive)
+        return order
+
+    assert asyncio.run(scenario())[0] == "chat"
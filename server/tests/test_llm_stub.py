@@ -0,0 +1,74 @@
+import sys
+from pathlib import Path
+from typing import List
+
+from fastapi.testclient import TestClient
+from openai import OpenAI
+from pydantic import BaseModel
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from llm_stub import StubConfig, create_app  # noqa: E402
+from llm_usage import estimate_tokens  # noqa: E402
+from load_test import percentile  # noqa: E402
+from ppv_schema import PPVInstance  # noqa: E402
+
+
+class BatchResponse(BaseModel):
+    personas: List[PPVInstance]
+
+
+def _client():
+    config = StubConfig(ttft_ms=0, tokens_per_sec=100000, output_tokens=20, embedding_ms=0, seed=1)
+    http_client = TestClient(create_app(config), base_url="http://stub")
+    return OpenAI(api_key="sk-stub", base_url="http://stub/v1", http_client=http_client)
+
+
+def test_chat_completions_and_structured_output():
+    client = _client()
+    system = "persona profile " * 400
+    messages = [{"role": "system", "content": system}, {"role": "user", "content": "你好"}]
+    first = client.chat.completions.create(model="gpt-4o", messages=messages, max_tokens=5)
+    assert first.choices[0].message.content
+    assert first.usage.completion_tokens <= 5
+    assert first.usage.prompt_tokens_details.cached_tokens == 0
+    # 與 scheduler / 用量統計相同的估算（中文一字一 token）
+    assert first.usage.prompt_tokens == estimate_tokens(system + "你好")
+    # 相同 system prompt 第二次出現：模擬 prompt cache 命中
+    second = client.chat.completions.create(model="gpt-4o", messages=messages)
+    assert second.usage.prompt_tokens_details.cached_tokens >= 1024
+
+    stream = client.chat.completions.create(
+        model="gpt-4o", messages=messages, stream=True, stream_options={"include_usage": True},
+    )
+    chunks = list(stream)
+    assert "".join(c.choices[0].delta.content or "" for c in chunks if c.choices)
+    assert chunks[-1].usage is not None
+
+    parsed = client.beta.chat.completions.parse(model="gpt-4o", messages=messages, response_format=BatchResponse)
+    personas = parsed.choices[0].message.parsed.personas
+    assert len(personas) == 3
+    assert 0 <= personas[0].big5.openness <= 100
+
+
+def test_responses_stream_and_embeddings():
+    client = _client()
+    events = list(client.responses.create(model="gpt-4o", input="hi", instructions="be brief", stream=True))
+    types = [event.type for event in events]
+    assert types[0] == "response.created" and types[-1] == "response.completed"
+    text = "".join(event.delta for event in events if event.type == "response.output_text.delta")
+    assert text == events[-1].response.output_text
+
+    result = client.embeddings.create(model="text-embedding-3-small", input=["a", "b", "a"])
+    vectors = [item.embedding for item in result.data]
+    assert len(vectors[0]) == 1536
+    assert vectors[0] == vectors[2] != vectors[1]
+    assert abs(sum(v * v for v in vectors[0]) - 1.0) < 1e-4
+
+
+def test_percentile_nearest_rank():
+    values = [float(v) for v in range(1, 101)]
+    assert percentile(values, 50) == 50.0
+    assert percentile(values, 95) == 95.0
+    assert percentile(values, 99) == 99.0
+    assert percentile([], 50) == 0.0
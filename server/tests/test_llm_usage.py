@@ -0,0 +1,23 @@
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import llm_usage  # noqa: E402
+
+
+def test_record_usage_splits_cached_tokens():
+    llm_usage.reset_usage()
+    response = SimpleNamespace(metrics=SimpleNamespace(input_tokens=2000, cache_read_tokens=1536, output_tokens=120))
+    usage = llm_usage.record_usage("vietnam_interview", response)
+    assert usage == {"inputTokens": 2000, "cachedTokens": 1536, "uncachedTokens": 464, "outputTokens": 120}
+
+    llm_usage.record_usage("vietnam_interview", SimpleNamespace(metrics=SimpleNamespace(input_tokens=1000)))
+    assert llm_usage.record_usage("digital_twin", SimpleNamespace(content="ok")) is None
+
+    summary = llm_usage.usage_summary()
+    assert summary["vietnam_interview"]["calls"] == 2
+    assert summary["vietnam_interview"]["uncachedTokens"] == 1464
+    assert summary["vietnam_interview"]["cacheHitRate"] == round(1536 / 3000, 4)
+    assert "digital_twin" not in summary
@@ -0,0 +1,127 @@
+import io
+import json
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import persona_io  # noqa: E402
+from persona_store import PersonaStore  # noqa: E402
+
+
+def write_personas(path, personas):
+    path.write_text(json.dumps(personas, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+def ndjson(*items):
+    return io.BytesIO(b"".join(json.dumps(item, ensure_ascii=False).encode("utf-8") + b"\n" for item in items))
+
+
+def test_stream_round_trip_matches_json_dump(tmp_path):
+    personas = [{"id": f"p{i}", "name": "Nguyễn 阮", "score": 12345, "tags": []} for i in range(20)]
+    source = tmp_path / "personas.json"
+    write_personas(source, personas)
+
+    assert list(persona_io.iter_json_array(source, chunk_size=7)) == personas
+
+    copy = tmp_path / "copy.json"
+    assert persona_io.write_json_array(copy, persona_io.iter_json_array(source)) == 20
+    assert copy.read_bytes() == source.read_bytes()
+
+
+def test_merge_updates_keeps_and_appends(tmp_path):
+    target = tmp_path / "personas.json"
+    write_personas(target, [{"id": "a", "v": 1}, {"id": "b", "v": 1}])
+
+    stats = persona_io.merge_ndjson(target, ndjson({"id": "c", "v": 1}, {"id": "a", "v": 2}, {"id": "a", "v": 3}))
+
+    assert json.loads(target.read_text(encoding="utf-8")) == [
+        {"id": "a", "v": 3}, {"id": "b", "v": 1}, {"id": "c", "v": 1},
+    ]
+    assert stats == {"imported": 2, "updated": 1, "added": 1, "kept": 1, "total": 3}
+
+    persona_io.merge_ndjson(target, ndjson({"id": "b", "v": 9}), replace=True)
+    assert json.loads(target.read_text(encoding="utf-8")) == [{"id": "b", "v": 9}]
+
+
+def test_store_import_bumps_version_for_changed_personas(tmp_path):
+    store = PersonaStore(tmp_path / "personas.json")
+    store.save_many([{"id": "a", "interviewHistory": []}, {"id": "b", "interviewHistory": []}])
+    since = store.version
+
+    exported = b"".join(store.export_ndjson())
+    assert [json.loads(line)["id"] for line in exported.splitlines()] == ["a", "b"]
+
+    store.import_ndjson(ndjson({"id": "b", "interviewHistory": [{"question": "Q", "answer": "A"}]}))
+    delta = store.changes_since(since)
+    assert [p["id"] for p in delta["personas"]] == ["b"]
+    assert len(delta["interviewRecords"]) == 1
+
+
+def test_store_import_applies_batches_without_blocking_readers(tmp_path):
+    store = PersonaStore(tmp_path / "personas.json")
+    store.save_many([{"id": "a", "v": 1}, {"id": "b", "v": 1}])
+    items = [{"id": "b", "v": 2}] + [{"id": f"n{i}", "v": i} for i in range(5)] + [{"id": "b", "v": 3}]
+
+    class ProbingSource(io.BytesIO):
+        """解析匯入內容時，另一個執行緒的讀取不應被鎖住"""
+        blocked = 0
+
+        def readline(self, *args):
+            reader = threading.Thread(target=store.etag)
+            reader.start()
+            reader.join(timeout=1)
+            ProbingSource.blocked += reader.is_alive()
+            return super().readline(*args)
+
+    source = ProbingSource(ndjson(*items).getvalue())
+    stats = store.import_ndjson(source, batch_size=2)
+    assert ProbingSource.blocked == 0
+    assert stats == {"imported": 6, "updated": 1, "added": 5, "kept": 1, "total": 7}
+    assert [p["id"] for p in store.load()] == ["a", "b", "n0", "n1", "n2", "n3", "n4"]
+    assert store.get("b")["v"] == 3
+    assert json.loads((tmp_path / "personas.json").read_text(encoding="utf-8")) == store.load()
+
+    # 格式錯誤：整批拒絕，集合不變
+    version = store.version
+    with pytest.raises(ValueError):
+        store.import_ndjson(io.BytesIO(b'{"id": "z"}\n{broken\n'))
+    assert store.version == version and store.get("z") is None
+
+    store.import_ndjson(ndjson({"id": "n1", "v": 9}), replace=True)
+    assert store.load() == [{"id": "n1", "v": 9}]
+
+
+def test_cli_round_trip_keeps_archived_transcripts(tmp_path):
+    from transcript_archive import TranscriptArchive
+
+    data = tmp_path / "vietnam_personas.json"
+    archive_dir = persona_io.default_archive_dir(data)
+    store = PersonaStore(data, archive=TranscriptArchive(archive_dir))
+    store.save_many([
+        {"id": "done", "isCompleted": True, "interviewHistory": [{"question": "Q0", "answer": "A0"}]},
+        {"id": "open", "interviewHistory": []},
+    ])
+    assert store.archive_completed() == ["done"]
+
+    backup = tmp_path / "backup.ndjson"
+    assert persona_io.export_ndjson(data, backup) == 2
+    exported = {item["id"]: item for item in map(json.loads, backup.read_bytes().splitlines())}
+    assert exported["done"]["interviewHistory"] == [{"question": "Q0", "answer": "A0"}]
+
+    # 匯入到新的資料檔：訪談記錄完整
+    restored = tmp_path / "restored.json"
+    persona_io.import_ndjson(restored, backup)
+    assert PersonaStore(restored).get("done")["interviewHistory"] == [{"question": "Q0", "answer": "A0"}]
+
+    # --replace 匯回原資料檔：留下的封存仍對得上，被移除者的封存檔一併清掉
+    only_open = tmp_path / "open.ndjson"
+    only_open.write_bytes(backup.read_bytes().splitlines()[1] + b"\n")
+    persona_io.import_ndjson(data, backup, replace=True)
+    assert [r["answer"] for r in PersonaStore(data, archive=TranscriptArchive(archive_dir)).history("done")] == ["A0"]
+    persona_io.import_ndjson(data, only_open, replace=True)
+    assert TranscriptArchive(archive_dir).ids() == []
+    assert [p["id"] for p in PersonaStore(data).load()] == ["open"]
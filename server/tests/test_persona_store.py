@@ -0,0 +1,194 @@
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from persona_store import PersonaStore  # noqa: E402
+from transcript_archive import TranscriptArchive  # noqa: E402
+
+
+def make_persona(pid, answers=()):
+    return {
+        "id": pid,
+        "lastName": pid.title(),
+        "interviewHistory": [{"question": f"Q{i}", "answer": a} for i, a in enumerate(answers)],
+    }
+
+
+def test_version_only_changes_on_real_updates(tmp_path):
+    store = PersonaStore(tmp_path / "personas.json")
+    v0 = store.version
+    v1 = store.save(make_persona("an"))
+    assert v1 == v0 + 1
+    assert store.save(make_persona("an")) == v1
+    assert store.etag() != PersonaStore(tmp_path / "other.json").etag()
+
+
+def test_changes_since_returns_only_new_records(tmp_path):
+    store = PersonaStore(tmp_path / "personas.json")
+    store.save_many([make_persona("an", ["a0"]), make_persona("binh", ["b0"])])
+    since = store.version
+
+    store.save(make_persona("an", ["a0", "a1"]))
+    delta = store.changes_since(since)
+
+    assert delta["full"] is False
+    assert [p["id"] for p in delta["personas"]] == ["an"]
+    assert delta["personas"][0]["historyLength"] == 2
+    assert "interviewHistory" not in delta["personas"][0]
+    assert delta["interviewRecords"] == [
+        {"personaId": "an", "index": 1, "record": {"question": "Q1", "answer": "a1"}}
+    ]
+    assert store.changes_since(store.version)["personas"] == []
+
+
+def test_delete_and_stale_since(tmp_path):
+    store = PersonaStore(tmp_path / "personas.json")
+    store.save_many([make_persona("an"), make_persona("binh")])
+    since = store.version
+    store.delete("binh")
+
+    delta = store.changes_since(since)
+    assert delta["deleted"] == ["binh"]
+    assert store.changes_since(store.version + 5)["full"] is True
+
+
+def test_versions_survive_restart_and_detect_external_edits(tmp_path):
+    path = tmp_path / "personas.json"
+    store = PersonaStore(path)
+    store.save(make_persona("an", ["a0"]))
+    version = store.version
+
+    reopened = PersonaStore(path)
+    assert reopened.version == version
+    assert reopened.changes_since(version)["full"] is False
+
+    data = json.loads(path.read_text(encoding="utf-8"))
+    data[0]["interviewHistory"].append({"question": "Q1", "answer": "外部新增"})
+    path.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+    os.utime(path, ns=(time.time_ns(), time.time_ns() + 1_000_000))
+
+    delta = reopened.changes_since(version)
+    assert reopened.version == version + 1
+    assert [r["index"] for r in delta["interviewRecords"]] == [1]
+
+
+def test_encoded_body_matches_load(tmp_path):
+    store = PersonaStore(tmp_path / "personas.json")
+    store.save_many([make_persona("an", ["越南"]), make_persona("binh")])
+    assert json.loads(store.encoded_body()) == store.load()
+
+    loaded = store.get("an")
+    loaded["lastName"] = "changed"
+    assert store.get("an")["lastName"] == "An"
+
+
+def test_completed_transcripts_move_to_archive(tmp_path):
+    store = PersonaStore(tmp_path / "personas.json", archive=TranscriptArchive(tmp_path / "archive"))
+    done = dict(make_persona("an", ["a0", "a1"]), isCompleted=True)
+    store.save_many([done, make_persona("binh", ["b0"])])
+
+    assert store.archive_completed() == ["an"]
+    on_disk = {p["id"]: p for p in json.loads(store.path.read_text(encoding="utf-8"))}
+    assert on_disk["an"]["interviewHistory"] == []
+    assert on_disk["an"]["archivedHistoryCount"] == 2
+    assert on_disk["binh"]["interviewHistory"] == [{"question": "Q0", "answer": "b0"}]
+
+    reopened = PersonaStore(store.path, archive=TranscriptArchive(tmp_path / "archive"))
+    assert [r["answer"] for r in reopened.history("an")] == ["a0", "a1"]
+    full = {p["id"]: p for p in json.loads(reopened.encoded_body(include_archived=True))}
+    assert len(full["an"]["interviewHistory"]) == 2
+
+
+def test_saving_archived_persona_keeps_or_extends_archive(tmp_path):
+    store = PersonaStore(tmp_path / "personas.json", archive=TranscriptArchive(tmp_path / "archive"))
+    store.save(dict(make_persona("an", ["a0"]), isCompleted=True))
+    store.archive_completed()
+
+    # 原樣存回（hot 資料、或讀回完整記錄後存回）不會動到封存
+    version = store.save(store.get("an"))
+    assert store.save(store.get("an", include_archived=True)) == version
+
+    # 未讀回封存就追加新記錄：接在封存內容之後
+    persona = store.get("an")
+    persona["interviewHistory"].append({"question": "Q1", "answer": "a1"})
+    store.save(persona)
+    assert [r["answer"] for r in store.history("an")] == ["a0", "a1"]
+    assert store.get("an")["interviewHistory"] == []
+
+    # append_history 以目前的內容為基礎（保留其他欄位的修改），同樣接在封存內容之後
+    edited = store.get("an")
+    edited["note"] = "edited"
+    store.save(edited)
+    assert store.append_history("an", [{"question": "Q2", "answer": "a2"}], {"updatedAt": "t"}) is not None
+    assert [r["answer"] for r in store.history("an")] == ["a0", "a1", "a2"]
+    assert store.get("an")["note"] == "edited" and store.get("an")["updatedAt"] == "t"
+    assert store.append_history("missing", [{"answer": "x"}]) is None
+
+    # 明確取消封存（例如刪除題目後送回完整記錄）：以送回的內容為準，即使為空
+    cleared = store.get("an", include_archived=True)
+    cleared.update({"interviewHistory": [], "historyArchived": False})
+    store.save(cleared)
+    assert store.archive.entry("an") is None and store.history("an") == []
+
+    store.delete("an")
+    assert store.archive.entry("an") is None
+
+
+def test_changes_since_indexes_archived_history(tmp_path):
+    store = PersonaStore(tmp_path / "personas.json", archive=TranscriptArchive(tmp_path / "archive"))
+    store.save_many([dict(make_persona("an", ["a0", "a1"]), isCompleted=True), make_persona("binh", ["b0"])])
+    store.archive_completed()
+    since = store.version
+
+    # 封存本身不產生新的訪談記錄
+    delta = store.changes_since(since - 1)
+    an = next(p for p in delta["personas"] if p["id"] == "an")
+    assert (an["historyLength"], an["archivedCount"]) == (2, 2)
+    assert [r for r in delta["interviewRecords"] if r["personaId"] == "an"] == []
+
+    # 已封存受訪者的新答案寫入封存，仍以完整記錄的索引出現在增量中
+    store.append_history("an", [{"question": "Q2", "answer": "a2"}])
+    delta = store.changes_since(since)
+    assert delta["personas"][0]["historyLength"] == 3
+    assert delta["interviewRecords"] == [
+        {"personaId": "an", "index": 2, "record": {"question": "Q2", "answer": "a2"}}
+    ]
+
+    # 重啟後（封存部分的簽章未知）原樣存回不會產生變更
+    reopened = PersonaStore(store.path, archive=TranscriptArchive(tmp_path / "archive"))
+    version = reopened.version
+    assert reopened.save(reopened.get("an", include_archived=True)) == version
+    reopened.append_history("an", [{"question": "Q3", "answer": "a3"}])
+    assert [r["index"] for r in reopened.changes_since(version)["interviewRecords"]] == [3]
+
+    # 完整同步只送 hot 資料，並列出訪談記錄不完整的 persona
+    full = reopened.changes_since(reopened.version + 1)
+    assert full["full"] is True and full["archived"] == ["an"]
+
+
+def test_append_history_many_merges_into_latest_personas(tmp_path):
+    store = PersonaStore(tmp_path / "personas.json")
+    store.save_many([make_persona("an", ["a0"]), make_persona("binh")])
+    stale = store.get("an")
+
+    # 訪談期間其他地方修改了 persona
+    edited = store.get("an")
+    edited["note"] = "edited"
+    edited["interviewHistory"].append({"question": "Q1", "answer": "a1"})
+    store.save(edited)
+
+    version = store.version
+    saved = store.append_history_many([
+        (stale["id"], [{"question": "Q2", "answer": "a2"}], {"updatedAt": "t"}),
+        ("binh", [{"question": "Q0", "answer": "b0"}], None),
+        ("missing", [{"answer": "x"}], None),
+    ])
+    assert saved == ["an", "binh"]
+    assert store.version == version + 1
+    an = store.get("an")
+    assert [r["answer"] for r in an["interviewHistory"]] == ["a0", "a1", "a2"]
+    assert an["note"] == "edited" and an["updatedAt"] == "t"
@@ -0,0 +1,115 @@
+import json
+import sys
+import threading
+from pathlib import Path
+
+import httpx
+import pytest
+from openai import InternalServerError, OpenAI
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import vietnam_semantic_matcher as matcher  # noqa: E402
+from embedding_store import EmbeddingStore, set_embedding_store  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def _store(tmp_path):
+    store = EmbeddingStore(str(tmp_path / "embeddings.sqlite3"))
+    set_embedding_store(store)
+    yield store
+    set_embedding_store(None)
+    store.close()
+
+
+def _vector(text):
+    # 同一主題的問題落在同一個方向（含「旅遊習慣」→ x 軸，「旅遊險」→ y 軸，其他 → z 軸）
+    if "旅遊習慣" in text:
+        return [1.0, 0.05, 0.0]
+    if "旅遊險" in text or "旅遊保險" in text:
+        return [0.0, 1.0, 0.05]
+    return [0.05, 0.0, 1.0]
+
+
+def _fake_client(requests):
+    lock = threading.Lock()
+
+    def handler(request):
+        texts = json.loads(request.content)["input"]
+        texts = [texts] if isinstance(texts, str) else texts
+        with lock:
+            requests.append(texts)
+        data = [{"object": "embedding", "index": i, "embedding": _vector(t)} for i, t in enumerate(texts)]
+        return httpx.Response(200, json={
+            "object": "list", "model": "text-embedding-3-small", "data": list(reversed(data)),
+            "usage": {"prompt_tokens": len(texts), "total_tokens": len(texts)},
+        })
+
+    return OpenAI(api_key="sk-test", base_url="http://llm/v1", max_retries=0,
+                  http_client=httpx.Client(transport=httpx.MockTransport(handler)))
+
+
+def test_grouping_embeds_in_batches_and_reuses_cache(monkeypatch, _store):
+    requests = []
+    monkeypatch.setattr(matcher, "client", _fake_client(requests))
+    monkeypatch.setattr(matcher, "EMBEDDING_BATCH_SIZE", 100)
+    matcher.clear_embedding_cache()
+
+    questions = ["請概述自己的旅遊習慣", "目前你的旅遊習慣是什麼？", "目前你的旅遊習慣是什麼", "你買過旅遊險嗎"]
+    questions += [f"其他問題 {i}" for i in range(296)]
+    groups = matcher.group_similar_questions(questions)
+
+    # 299 個不重複問題 → 3 個分塊請求（並行送出）
+    assert sorted(len(batch) for batch in requests) == [99, 100, 100]
+    assert groups["請概述自己的旅遊習慣"] == questions[:3]
+    assert groups["你買過旅遊險嗎"] == ["你買過旅遊險嗎"]
+
+    # 再次分組與 find_canonical_question：已快取的問題不再請求
+    requests.clear()
+    assert matcher.group_similar_questions(questions) == groups
+    match, score = matcher.find_canonical_question("有沒有購買旅遊保險的經驗", ["你買過旅遊險嗎", "其他問題 1"])
+    assert match == "你買過旅遊險嗎" and score == pytest.approx(1.0)
+    assert requests == [["有沒有購買旅遊保險的經驗"]]
+
+    # 重啟後（新的 EmbeddingStore 讀同一個檔案）同一份問卷不再請求
+    _store.close()
+    set_embedding_store(EmbeddingStore(_store.path, cache_size=16))
+    requests.clear()
+    assert matcher.group_similar_questions(questions) == groups
+    assert requests == []
+    matcher.clear_embedding_cache()
+
+
+def test_get_embedding_cached_raises_on_failure(monkeypatch):
+    requests = []
+    monkeypatch.setattr(matcher, "client", _fake_client(requests))
+    assert matcher.get_embedding_cached("你買過旅遊險嗎") == pytest.approx(_vector("你買過旅遊險嗎"))
+    assert matcher.get_embedding_cached("你買過旅遊險嗎") == pytest.approx(_vector("你買過旅遊險嗎"))
+    assert requests == [["你買過旅遊險嗎"]]
+
+    def fail(request):
+        return httpx.Response(500, json={"error": {"message": "boom"}})
+
+    monkeypatch.setattr(matcher, "client", OpenAI(
+        api_key="sk-test", base_url="http://llm/v1", max_retries=0,
+        http_client=httpx.Client(transport=httpx.MockTransport(fail)),
+    ))
+    # 失敗不會變成空向量（cosine_similarity 會默默得到 0），也不寫入快取
+    with pytest.raises(InternalServerError):
+        matcher.get_embedding_cached("其他問題")
+    assert matcher.get_embedding_store().get_many(matcher.EMBEDDING_MODEL, ["其他問題"]) == {}
+
+
+def test_vectorized_grouping_matches_pairwise_loop():
+    np = pytest.importorskip("numpy")
+    rng = np.random.default_rng(3)
+    centers = rng.normal(size=(20, 64))
+    embeddings = [(centers[i % 20] + rng.normal(scale=0.4, size=64)).tolist() for i in range(400)]
+    embeddings[5] = []  # 取得失敗
+    embeddings[7] = [0.0] * 64
+
+    for threshold in (0.5, 0.72, 0.8):
+        fast = matcher._group_indices(embeddings, threshold)
+        slow = matcher._group_indices_python(embeddings, threshold)
+        assert [(i, [j for j, _ in merged]) for i, merged in fast] == [(i, [j for j, _ in merged]) for i, merged in slow]
+        assert any(merged for _, merged in fast)
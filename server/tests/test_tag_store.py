@@ -0,0 +1,52 @@
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import tag_store  # noqa: E402
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    path = tmp_path / "tag_store.json"
+    path.write_text(json.dumps({"docs": {"k1": ["財報"]}, "custom_tags": ["重要"]}), encoding="utf-8")
+    cached = tag_store._CachedStore(path, stat_interval=0, flush_delay=60)
+    monkeypatch.setattr(tag_store, "_store", cached)
+    yield cached
+    cached.flush()
+
+
+def test_reads_are_served_from_memory(store, monkeypatch):
+    assert tag_store.get_doc_tags("k1") == ["財報"]
+
+    def fail(*_args, **_kwargs):
+        raise AssertionError("disk read after initial load")
+
+    monkeypatch.setattr(tag_store, "_read_store", fail)
+    assert tag_store.get_doc_tags_many(["k1", "missing"]) == {"k1": ["財報"], "missing": []}
+    assert tag_store.get_custom_tags() == ["重要"]
+
+
+def test_writes_are_coalesced_until_flush(store):
+    tag_store.set_doc_tags("k2", ["a", "a", "b"])
+    tag_store.set_custom_tags(["x"])
+    on_disk = json.loads(store.path.read_text(encoding="utf-8"))
+    assert "k2" not in on_disk["docs"]
+    assert tag_store.get_doc_tags("k2") == ["a", "b"]
+
+    tag_store.flush()
+    on_disk = json.loads(store.path.read_text(encoding="utf-8"))
+    assert on_disk["docs"]["k2"] == ["a", "b"]
+    assert on_disk["custom_tags"] == ["x"]
+
+
+def test_external_edit_invalidates_cache(store):
+    assert tag_store.get_doc_tags("k1") == ["財報"]
+    store.path.write_text(json.dumps({"docs": {"k1": ["更新"]}, "custom_tags": []}), encoding="utf-8")
+    os.utime(store.path, ns=(time.time_ns(), time.time_ns() + 1_000_000))
+    assert tag_store.get_doc_tags("k1") == ["更新"]
@@ -0,0 +1,90 @@
+import http.server
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import url_fetcher  # noqa: E402
+from url_cache import URLContentCache, freshness, get_url_cache, normalize_url  # noqa: E402
+
+
+class _Site(http.server.BaseHTTPRequestHandler):
+    hits = {"full": 0, "not_modified": 0}
+    cache_control = "max-age=0"
+
+    def do_GET(self):
+        if self.headers.get("If-None-Match") == '"v1"':
+            _Site.hits["not_modified"] += 1
+            self.send_response(304)
+            self.send_header("ETag", '"v1"')
+            self.end_headers()
+            return
+        _Site.hits["full"] += 1
+        time.sleep(0.1)
+        body = "<html><head><title>旅遊險</title></head><body><main>保費 100 元起</main></body></html>".encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", '"v1"')
+        self.send_header("Cache-Control", _Site.cache_control)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_normalize_url_and_freshness():
+    assert normalize_url("HTTPS://Example.com:443?utm_source=x&a=1#top") == "https://example.com/?a=1"
+    assert normalize_url("http://example.com:8080/p") == "http://example.com:8080/p"
+    assert freshness({"cache-control": "public, max-age=120"}) == 120
+    assert freshness({"cache-control": "no-store"}) is None
+    assert freshness({"cache-control": "no-cache"}) == 0
+    assert freshness({}, default_ttl=42) == 42
+
+
+def test_concurrent_fetches_collapse_and_stale_entries_revalidate():
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _Site)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/travel"
+    get_url_cache().clear()
+    try:
+        with ThreadPoolExecutor(8) as pool:
+            results = list(pool.map(lambda i: url_fetcher.fetch_multiple_urls([f"{url}#{i}"], use_playwright=False)[0], range(8)))
+        assert all(r["success"] and "保費 100 元起" in r["content"] for r in results)
+        assert results[3]["url"] == f"{url}#3"
+        assert _Site.hits == {"full": 1, "not_modified": 0}
+
+        # max-age=0 + ETag：下次使用前先驗證，304 時沿用內容
+        revalidated = get_url_cache().stats()["revalidated"]
+        result = url_fetcher.fetch_multiple_urls([url], use_playwright=False)[0]
+        assert result["title"] == "旅遊險"
+        assert _Site.hits == {"full": 1, "not_modified": 1}
+        assert get_url_cache().stats()["revalidated"] == revalidated + 1
+    finally:
+        server.shutdown()
+        get_url_cache().clear()
+
+
+def test_failures_are_cached_briefly_and_no_store_is_not_cached():
+    calls = []
+
+    def failing():
+        calls.append(1)
+        return {"url": "u", "success": False, "error": "請求超時"}, {}
+
+    cache = URLContentCache(error_ttl=60)
+    cache.get_or_fetch("http://a/", 100, failing)
+    cache.get_or_fetch("http://a/", 100, failing)
+    assert len(calls) == 1
+
+    def no_store():
+        calls.append(1)
+        return {"url": "u", "success": True, "content": "x"}, {"Cache-Control": "no-store"}
+
+    cache.get_or_fetch("http://b/", 100, no_store)
+    cache.get_or_fetch("http://b/", 100, no_store)
+    assert len(calls) == 3
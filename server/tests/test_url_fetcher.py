@@ -0,0 +1,149 @@
+import asyncio
+import http.server
+import sys
+import threading
+import time
+from pathlib import Path
+from urllib.parse import urlsplit
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import url_fetcher  # noqa: E402
+from html_fixture_server import FixtureServer  # noqa: E402
+from url_cache import get_url_cache  # noqa: E402
+
+
+class _SlowSite(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive，共用連線
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        delay = 1.5 if path.startswith("/stuck") else 0.3
+        time.sleep(delay)
+        body = f"<html><head><title>{path}</title></head><body><main>{path} 保障內容 " + "x" * 300 + "</main></body></html>"
+        body = body.encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # 超過時限的抓取在 event loop 結束時被取消
+
+    def log_message(self, *args):
+        pass
+
+
+def _serve():
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _SlowSite)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def test_urls_are_fetched_concurrently_in_input_order():
+    server, base = _serve()
+    get_url_cache().clear()
+    try:
+        urls = [f"{base}/page{i}" for i in range(5)]
+        started = time.perf_counter()
+        results = url_fetcher.fetch_multiple_urls(urls, use_playwright=False)
+        elapsed = time.perf_counter() - started
+        assert [r["url"] for r in results] == urls
+        assert all(r["success"] for r in results)
+        assert results[2]["title"] == "/page2"
+        # 逐一抓取需要 5 × 0.3 秒；同時抓取約等於最慢的一個
+        assert elapsed < 1.0
+    finally:
+        server.shutdown()
+
+
+def test_deadline_returns_partial_results():
+    server, base = _serve()
+    get_url_cache().clear()
+    try:
+        results = url_fetcher.fetch_multiple_urls([f"{base}/fast", f"{base}/stuck"], use_playwright=False, deadline=0.8)
+        assert results[0]["success"]
+        assert not results[1]["success"] and "時限" in results[1]["error"]
+    finally:
+        server.shutdown()
+
+
+def test_js_rendered_heuristic():
+    shell = '<html><body><div id="root"></div><script src="/app.js"></script></body></html>'
+    assert url_fetcher.looks_js_rendered(shell, "")
+    article = "<html><body><main>" + "保費說明 " * 100 + "</main><script>track()</script></body></html>"
+    assert not url_fetcher.looks_js_rendered(article, "保費說明 " * 100)
+    assert not url_fetcher.looks_js_rendered("<html><body><p>短頁面</p></body></html>", "短頁面")
+
+
+def test_async_fetch_matches_sync_results():
+    with FixtureServer() as server:
+        urls = [server.url(page) for page in server.pages]
+        sync_results = [url_fetcher.fetch_url_content(url, 2000) for url in urls]
+
+        async def fetch_all():
+            return await asyncio.gather(*(url_fetcher.afetch_url_content(url, 2000) for url in urls))
+
+        assert asyncio.run(fetch_all()) == sync_results
+
+
+def test_async_urls_overlap_on_one_loop_and_share_the_cache():
+    server, base = _serve()
+    get_url_cache().clear()
+    try:
+        urls = [f"{base}/async{i}" for i in range(5)]
+
+        async def scenario():
+            started = time.perf_counter()
+            # 同一題目被多位受訪者同時問到：每個網址只抓一次
+            batches = await asyncio.gather(*(url_fetcher.afetch_multiple_urls(urls, use_playwright=False) for _ in range(4)))
+            return batches, time.perf_counter() - started
+
+        before = get_url_cache().stats()
+        batches, elapsed = asyncio.run(scenario())
+        after = get_url_cache().stats()
+        assert all([r["url"] for r in batch] == urls and all(r["success"] for r in batch) for batch in batches)
+        assert elapsed < 1.0
+        assert after["misses"] - before["misses"] == 5
+        assert url_fetcher.fetch_multiple_urls(urls[:1], use_playwright=False)[0] == batches[0][0]
+
+        context = asyncio.run(url_fetcher.aextract_and_fetch_urls(f"請看 {urls[0]}", [f"還有 {urls[1]}"]))
+        assert context[0] == urls[:2] and "/async1 保障內容" in context[1]
+        assert asyncio.run(url_fetcher.aextract_and_fetch_urls("沒有網址")) == ([], "")
+    finally:
+        server.shutdown()
+
+
+def test_async_deadline_returns_partial_results():
+    server, base = _serve()
+    get_url_cache().clear()
+    try:
+        results = asyncio.run(url_fetcher.afetch_multiple_urls(
+            [f"{base}/fast", f"{base}/stuck"], use_playwright=False, deadline=0.8,
+        ))
+        assert results[0]["success"]
+        assert not results[1]["success"] and "時限" in results[1]["error"]
+    finally:
+        server.shutdown()
+
+
+def test_async_client_is_closed_with_its_event_loop():
+    with FixtureServer() as server:
+        url = server.url(server.pages[0])
+
+        async def fetch():
+            await url_fetcher.afetch_url_content(url, 500)
+            return url_fetcher._async_state().client
+
+        # asyncio.run 關閉 loop 前會關閉該 loop 的 AsyncClient，不會留下連線
+        clients = [asyncio.run(fetch()) for _ in range(2)]
+        assert clients[0] is not clients[1] and all(client.is_closed for client in clients)
+
+        async def fetch_and_close():
+            client = await fetch()
+            await url_fetcher.aclose_async_clients()
+            return client.is_closed, (await fetch()).is_closed
+
+        assert asyncio.run(fetch_and_close()) == (True, False)
@@ -0,0 +1,144 @@
+"""
+訪談記錄冷儲存
+已完成（isCompleted）受訪者的完整 interviewHistory 會移到壓縮封存檔，
+hot JSON 只保留輕量的 persona 資料，需要時再按需讀回。
+
+目錄結構：
+    <archive_dir>/index.json          # persona_id -> {file, count, codec, archivedAt}
+    <archive_dir>/<hash>.json.zst     # 每位受訪者一個檔案（未安裝 zstandard 時為 .json.gz）
+"""
+import datetime
+import gzip
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from fast_json import dumps, loads
+
+# 嘗試匯入 zstandard（可選依賴）
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    zstandard = None
+    ZSTD_AVAILABLE = False
+
+DEFAULT_CODEC = os.getenv("PERSONA_ARCHIVE_CODEC", "zstd" if ZSTD_AVAILABLE else "gzip")
+CODEC_EXTENSIONS = {"zstd": ".json.zst", "gzip": ".json.gz"}
+
+
+def _compress(data: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=10).compress(data)
+    return gzip.compress(data, compresslevel=6)
+
+
+def _decompress(data: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+class TranscriptArchive:
+    """單一集合的訪談記錄封存區"""
+
+    def __init__(self, directory: Path, codec: str = DEFAULT_CODEC, cache_size: int = 32) -> None:
+        if codec == "zstd" and not ZSTD_AVAILABLE:
+            codec = "gzip"
+        self.directory = Path(directory)
+        self.codec = codec
+        self.index_path = self.directory / "index.json"
+        self._lock = threading.RLock()
+        self._index: Optional[Dict[str, Dict[str, Any]]] = None
+        self._cache: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+        self._cache_size = cache_size
+
+    def _load_index(self) -> Dict[str, Dict[str, Any]]:
+        if self._index is None:
+            try:
+                data = json.loads(self.index_path.read_text(encoding="utf-8"))
+                self._index = data if isinstance(data, dict) else {}
+            except (FileNotFoundError, ValueError):
+                self._index = {}
+        return self._index
+
+    def _write_index(self) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.index_path.with_name(f".index.{os.getpid()}.tmp")
+        tmp_path.write_text(json.dumps(self._index, ensure_ascii=False, indent=2), encoding="utf-8")
+        os.replace(tmp_path, self.index_path)
+
+    def _file_name(self, persona_id: str) -> str:
+        # persona id 可能含越南文 / 中文，檔名改用 hash
+        return hashlib.md5(persona_id.encode("utf-8")).hexdigest()[:16] + CODEC_EXTENSIONS[self.codec]
+
+    def ids(self) -> List[str]:
+        with self._lock:
+            return list(self._load_index().keys())
+
+    def entry(self, persona_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._load_index().get(persona_id)
+            return dict(entry) if entry else None
+
+    def write(self, persona_id: str, history: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """封存一位受訪者的完整訪談記錄（覆蓋舊的封存）"""
+        with self._lock:
+            index = self._load_index()
+            self.directory.mkdir(parents=True, exist_ok=True)
+            file_name = self._file_name(persona_id)
+            tmp_path = self.directory / f".{file_name}.tmp"
+            tmp_path.write_bytes(_compress(dumps(history), self.codec))
+            os.replace(tmp_path, self.directory / file_name)
+
+            old = index.get(persona_id)
+            if old and old.get("file") != file_name:
+                (self.directory / old["file"]).unlink(missing_ok=True)
+            entry = {
+                "file": file_name,
+                "count": len(history),
+                "codec": self.codec,
+                "archivedAt": datetime.datetime.now().isoformat(),
+            }
+            index[persona_id] = entry
+            self._write_index()
+            self._cache.pop(persona_id, None)
+            return dict(entry)
+
+    def read(self, persona_id: str) -> List[Dict[str, Any]]:
+        """讀回封存的訪談記錄；最近讀過的保留在小型 LRU 快取"""
+        with self._lock:
+            if persona_id in self._cache:
+                self._cache.move_to_end(persona_id)
+                return [dict(record) for record in self._cache[persona_id]]
+            entry = self._load_index().get(persona_id)
+            if not entry:
+                return []
+            try:
+                raw = (self.directory / entry["file"]).read_bytes()
+                history = loads(_decompress(raw, entry.get("codec", "gzip")))
+            except Exception as e:
+                print(f"讀取封存記錄失敗 {persona_id}: {e}")
+                return []
+            self._cache[persona_id] = history
+            if len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+            return [dict(record) for record in history]
+
+    def remove(self, persona_id: str) -> None:
+        with self._lock:
+            index = self._load_index()
+            entry = index.pop(persona_id, None)
+            self._cache.pop(persona_id, None)
+            if entry:
+                (self.directory / entry["file"]).unlink(missing_ok=True)
+                self._write_index()
+
+    def clear(self) -> None:
+        with self._lock:
+            for persona_id in list(self._load_index().keys()):
+                self.remove(persona_id)
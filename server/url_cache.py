@@ -0,0 +1,239 @@
+"""
+網址內容快取
+批量訪談時同一題的網址會被每位受訪者各抓一次；抓取並清理後的內容改為程序內共用：
+- key 為正規化後的 URL + max_length（同一頁面不同長度上限的清理結果不同）
+- 依回應的 Cache-Control / Expires 決定新鮮時間（no-store 不快取），沒有時使用 URL_CACHE_TTL
+- 過期後若有 ETag / Last-Modified，先送條件式請求，304 就沿用原內容，不必重新下載與解析
+- 抓取失敗的結果只快取 URL_CACHE_ERROR_TTL 秒，避免同一批受訪者重複等待失效的網址
+- 同一個 key 同時只會有一個抓取在進行，其他呼叫端等待同一份結果（同步與非同步呼叫端共用）
+"""
+import asyncio
+import email.utils
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Mapping, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+DEFAULT_TTL = float(os.getenv("URL_CACHE_TTL", "600"))
+ERROR_TTL = float(os.getenv("URL_CACHE_ERROR_TTL", "30"))
+MAX_ENTRIES = int(os.getenv("URL_CACHE_MAX_ENTRIES", "256"))
+
+# 不影響頁面內容的追蹤參數
+_TRACKING_PARAMS = ("utm_", "fbclid", "gclid")
+
+FetchFn = Callable[[], Tuple[Dict[str, Any], Mapping[str, str]]]
+# 條件式請求：(etag, last_modified) -> 304 時回傳新的 headers，內容已變更或失敗時回傳 None
+RevalidateFn = Callable[[Optional[str], Optional[str]], Optional[Mapping[str, str]]]
+AsyncFetchFn = Callable[[], Awaitable[Tuple[Dict[str, Any], Mapping[str, str]]]]
+AsyncRevalidateFn = Callable[[Optional[str], Optional[str]], Awaitable[Optional[Mapping[str, str]]]]
+
+
+def normalize_url(url: str) -> str:
+    """scheme / host 小寫、去掉預設 port、fragment 與追蹤參數，空 path 補成 /"""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    port = parts.port
+    netloc = host if port is None or (scheme, port) in (("http", 80), ("https", 443)) else f"{host}:{port}"
+    if parts.username:
+        netloc = f"{parts.username}{':' + parts.password if parts.password else ''}@{netloc}"
+    query = urlencode([
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith(_TRACKING_PARAMS)
+    ])
+    return urlunsplit((scheme, netloc, parts.path or "/", query, ""))
+
+
+def _lower_headers(headers: Optional[Mapping[str, str]]) -> Dict[str, str]:
+    return {str(k).lower(): str(v) for k, v in (headers or {}).items()}
+
+
+def freshness(headers: Mapping[str, str], default_ttl: float = DEFAULT_TTL) -> Optional[float]:
+    """
+    依回應 header 計算可直接使用的秒數；None 表示不可儲存（no-store）
+
+    max-age 優先於 Expires；no-cache 視為 0（每次使用前都要重新驗證）
+    """
+    directives: Dict[str, Optional[str]] = {}
+    for part in headers.get("cache-control", "").split(","):
+        name, _, value = part.strip().partition("=")
+        if name:
+            directives[name.lower()] = value.strip('"') or None
+    if "no-store" in directives:
+        return None
+    if "no-cache" in directives:
+        return 0.0
+    for name in ("s-maxage", "max-age"):
+        value = directives.get(name)
+        if value is not None:
+            try:
+                return max(0.0, float(value) - float(headers.get("age", 0) or 0))
+            except ValueError:
+                break
+    if headers.get("expires"):
+        try:
+            expires = email.utils.parsedate_to_datetime(headers["expires"]).timestamp()
+        except (TypeError, ValueError):
+            return 0.0  # 無效的 Expires 視為已過期
+        return max(0.0, expires - time.time())
+    return default_ttl
+
+
+@dataclass
+class _Entry:
+    result: Dict[str, Any]
+    expires_at: float
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+    @property
+    def can_revalidate(self) -> bool:
+        return bool(self.etag or self.last_modified)
+
+
+class URLContentCache:
+    def __init__(self, default_ttl: float = DEFAULT_TTL, error_ttl: float = ERROR_TTL, max_entries: int = MAX_ENTRIES) -> None:
+        self.default_ttl = default_ttl
+        self.error_ttl = error_ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, int], _Entry]" = OrderedDict()
+        self._inflight: Dict[Tuple[str, int], Future] = {}
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "revalidated": 0, "collapsed": 0}
+
+    def _store(self, key: Tuple[str, int], result: Dict[str, Any], headers: Mapping[str, str]) -> None:
+        headers = _lower_headers(headers)
+        if result.get("success"):
+            ttl = freshness(headers, self.default_ttl)
+            if ttl is None:
+                return
+            entry = _Entry(result, time.monotonic() + ttl, headers.get("etag"), headers.get("last-modified"))
+            if ttl <= 0 and not entry.can_revalidate:
+                return
+        else:
+            entry = _Entry(result, time.monotonic() + self.error_ttl)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _load(self, key: Tuple[str, int], fetch: FetchFn, revalidate: Optional[RevalidateFn], stale: Optional[_Entry]) -> Dict[str, Any]:
+        if stale is not None and stale.can_revalidate and revalidate is not None:
+            headers = revalidate(stale.etag, stale.last_modified)
+            if headers is not None:
+                return self._not_modified(key, stale, headers)
+        result, headers = fetch()
+        self._store(key, result, headers)
+        return result
+
+    async def _aload(self, key: Tuple[str, int], fetch: AsyncFetchFn, revalidate: Optional[AsyncRevalidateFn], stale: Optional[_Entry]) -> Dict[str, Any]:
+        if stale is not None and stale.can_revalidate and revalidate is not None:
+            headers = await revalidate(stale.etag, stale.last_modified)
+            if headers is not None:
+                return self._not_modified(key, stale, headers)
+        result, headers = await fetch()
+        self._store(key, result, headers)
+        return result
+
+    def _not_modified(self, key: Tuple[str, int], stale: _Entry, headers: Mapping[str, str]) -> Dict[str, Any]:
+        # 304：內容沒變，沿用原本的 validator（新的 header 有給時以新的為準）
+        headers = {"etag": stale.etag or "", "last-modified": stale.last_modified or "", **_lower_headers(headers)}
+        self._store(key, stale.result, {k: v for k, v in headers.items() if v})
+        with self._lock:
+            self._stats["revalidated"] += 1
+        return stale.result
+
+    def _lookup(self, url: str, max_length: int) -> Tuple[Tuple[str, int], Optional[Dict[str, Any]], Optional[Future], bool, Optional[_Entry]]:
+        """回傳 (key, 快取命中的結果, 進行中的抓取, 是否由這個呼叫端負責抓取, 過期的項目)"""
+        key = (normalize_url(url), max_length)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return key, entry.result, None, False, entry
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+                self._stats["misses"] += 1
+            else:
+                self._stats["collapsed"] += 1
+        return key, None, future, leader, entry
+
+    def _settle(self, key: Tuple[str, int], future: Future, result: Optional[Dict[str, Any]], error: Optional[BaseException]) -> None:
+        if error is None:
+            future.set_result(result)
+        else:
+            future.set_exception(error)
+        with self._lock:
+            self._inflight.pop(key, None)
+
+    def get_or_fetch(
+        self,
+        url: str,
+        max_length: int,
+        fetch: FetchFn,
+        revalidate: Optional[RevalidateFn] = None,
+    ) -> Dict[str, Any]:
+        """
+        取得快取內容，必要時呼叫 fetch()（回傳 (result, response headers)）
+
+        回傳的 result 為副本，url 欄位為呼叫端傳入的原始網址
+        """
+        key, cached, future, leader, entry = self._lookup(url, max_length)
+        if cached is not None:
+            return {**cached, "url": url}
+        if not leader:
+            return {**future.result(), "url": url}
+
+        try:
+            result = self._load(key, fetch, revalidate, entry)
+        except BaseException as e:
+            self._settle(key, future, None, e)
+            raise
+        self._settle(key, future, result, None)
+        return {**result, "url": url}
+
+    async def aget_or_fetch(
+        self,
+        url: str,
+        max_length: int,
+        fetch: AsyncFetchFn,
+        revalidate: Optional[AsyncRevalidateFn] = None,
+    ) -> Dict[str, Any]:
+        """get_or_fetch 的非同步版本（與同步呼叫端共用快取與進行中的抓取）"""
+        key, cached, future, leader, entry = self._lookup(url, max_length)
+        if cached is not None:
+            return {**cached, "url": url}
+        if not leader:
+            return {**await asyncio.wrap_future(future), "url": url}
+
+        try:
+            result = await self._aload(key, fetch, revalidate, entry)
+        except BaseException as e:
+            self._settle(key, future, None, e)
+            raise
+        self._settle(key, future, result, None)
+        return {**result, "url": url}
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self._stats, "entries": len(self._entries)}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+_cache = URLContentCache()
+
+
+def get_url_cache() -> URLContentCache:
+    return _cache
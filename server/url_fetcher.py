@@ -2,21 +2,146 @@
 URL 內容抓取工具
 用於從網頁 URL 抓取內容，讓 AI 可以基於真實網頁內容回答問題
 支援動態網頁（JavaScript 載入）內容抓取 via Playwright
+
+多個 URL 同時抓取（共用連線池的 HTTP client，每個 host 最多 URL_FETCHER_PER_HOST 條連線），
+整組在 URL_FETCHER_DEADLINE 秒內回傳；先用一般 HTTP 抓取，靜態 HTML 看起來需要 JavaScript 渲染時才改用 Playwright
+HTML 轉純文字見 html_extract（有安裝 selectolax / lxml 時使用 C 實作的解析器）
+
+afetch_* / aextract_and_fetch_urls 為非同步版本（httpx.AsyncClient + 瀏覽器池的 playwright.async_api），
+結果格式相同；等待網頁時不佔用執行緒，async endpoint 可以在同一個 event loop 上同時載入大量頁面
 """
+import asyncio
+import os
 import re
-import requests
-from typing import List, Dict, Optional, Tuple
-from bs4 import BeautifulSoup
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Iterator, List, Dict, Optional, Set, Tuple
+
+import httpx
 from urllib.parse import urlparse
 
-# 嘗試匯入 Playwright（可選依賴）
-try:
-    from playwright.sync_api import sync_playwright
-    PLAYWRIGHT_AVAILABLE = True
-except ImportError:
-    PLAYWRIGHT_AVAILABLE = False
+# Playwright 為可選依賴；動態網頁透過常駐的瀏覽器池抓取
+from browser_pool import PLAYWRIGHT_AVAILABLE, PageSnapshot, get_browser_pool
+from html_extract import ExtractedPage, extract_page
+from url_cache import get_url_cache
+
+if not PLAYWRIGHT_AVAILABLE:
     print("⚠️ Playwright 未安裝，將使用基礎 HTTP 抓取（動態網頁內容可能不完整）")
 
+# 模擬瀏覽器的 request headers
+BROWSER_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.5,zh-TW;q=0.3',
+}
+
+PER_HOST_CONNECTIONS = int(os.getenv("URL_FETCHER_PER_HOST", "4"))
+FETCH_DEADLINE = float(os.getenv("URL_FETCHER_DEADLINE", "20"))
+MAX_WORKERS = int(os.getenv("URL_FETCHER_WORKERS", "16"))
+# 靜態 HTML 擷取出的文字少於此字數且頁面有 script 時，視為需要 JavaScript 渲染
+JS_RENDER_MIN_TEXT = int(os.getenv("URL_FETCHER_JS_MIN_TEXT", "200"))
+_JS_APP_MARKERS = ('id="root"', 'id="app"', 'id="__next"', 'ng-app', 'data-reactroot', 'enable javascript', 'bật javascript')
+
+_client: Optional[httpx.Client] = None
+_client_lock = threading.Lock()
+_host_slots: Dict[str, threading.BoundedSemaphore] = {}
+_fetch_pool = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="url-fetch")
+
+
+def _http_client() -> httpx.Client:
+    """程序內共用的 HTTP client（保留連線，同一網站的後續請求不必重新握手）"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = httpx.Client(
+                headers=BROWSER_HEADERS,
+                timeout=httpx.Timeout(5.0),  # 從 10 秒減少到 5 秒
+                follow_redirects=True,
+                limits=httpx.Limits(max_connections=MAX_WORKERS * 2, max_keepalive_connections=MAX_WORKERS),
+            )
+        return _client
+
+
+@contextmanager
+def _host_slot(url: str) -> Iterator[None]:
+    """限制同一 host 同時進行的請求數"""
+    host = urlparse(url).netloc.lower()
+    with _client_lock:
+        slot = _host_slots.setdefault(host, threading.BoundedSemaphore(PER_HOST_CONNECTIONS))
+    with slot:
+        yield
+
+
+class _AsyncState:
+    """
+    每個 event loop 各自的 AsyncClient 與 host 限制（asyncio 物件不能跨 loop 使用）
+
+    loop 關閉前（asyncio.run 結束、伺服器關閉）會對尚未結束的 async generator 呼叫 aclose()，
+    這裡用一個停在 yield 的 generator 接收這個時機，把 client 與連線一併關閉
+    """
+
+    def __init__(self) -> None:
+        self.client = httpx.AsyncClient(
+            headers=BROWSER_HEADERS,
+            timeout=httpx.Timeout(5.0),
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=MAX_WORKERS * 2, max_keepalive_connections=MAX_WORKERS),
+        )
+        self.host_slots: Dict[str, asyncio.Semaphore] = {}
+        self._closer = self._close_on_loop_shutdown()
+        try:
+            # 第一次迭代時 loop 會登記這個 generator（shutdown_asyncgens 的對象）；yield 之前沒有 await
+            self._closer.asend(None).send(None)
+        except StopIteration:
+            pass
+
+    async def _close_on_loop_shutdown(self) -> AsyncIterator[None]:
+        try:
+            yield
+        finally:
+            await self.client.aclose()
+
+    async def aclose(self) -> None:
+        await self._closer.aclose()
+
+    @asynccontextmanager
+    async def host_slot(self, url: str) -> AsyncIterator[None]:
+        host = urlparse(url).netloc.lower()
+        slot = self.host_slots.setdefault(host, asyncio.Semaphore(PER_HOST_CONNECTIONS))
+        async with slot:
+            yield
+
+
+_async_states: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _AsyncState]" = weakref.WeakKeyDictionary()
+# 超過時限仍在背景進行的抓取（保留參照，完成後寫入快取）
+_background_fetches: Set[asyncio.Task] = set()
+
+
+def _async_state() -> _AsyncState:
+    loop = asyncio.get_running_loop()
+    state = _async_states.get(loop)
+    if state is None:
+        state = _async_states[loop] = _AsyncState()
+    return state
+
+
+async def aclose_async_clients() -> None:
+    """關閉目前 event loop 的 AsyncClient（伺服器關閉時呼叫；之後再抓取會建立新的）"""
+    state = _async_states.pop(asyncio.get_running_loop(), None)
+    if state is not None:
+        await state.aclose()
+
+
+def looks_js_rendered(html: str, text: str) -> bool:
+    """靜態 HTML 幾乎沒有文字、但有 script 或前端框架的掛載點時，內容多半要靠 JavaScript 產生"""
+    if len(text) >= JS_RENDER_MIN_TEXT:
+        return False
+    lowered = html.lower()
+    return '<script' in lowered or any(marker in lowered for marker in _JS_APP_MARKERS)
+
+
 # URL 正則表達式
 URL_PATTERN = re.compile(
     r'https?://[^\s<>"{}|\\^`\[\]）】」』\)]+',
@@ -55,12 +180,21 @@ def fetch_url_with_playwright(url: str, max_length: int = 5000, wait_time: int =
     Args:
         url: 要抓取的 URL
         max_length: 內容最大長度（字元數）
-        wait_time: 等待 JavaScript 載入的時間（毫秒）
+        wait_time: DOM 載入後等待網路靜止（JavaScript 渲染）的上限（毫秒）
 
     Returns:
         包含抓取結果的字典
     """
-    result = {
+    return _fetch_rendered(url, max_length, wait_time)[0]
+
+
+async def afetch_url_with_playwright(url: str, max_length: int = 5000, wait_time: int = 3000) -> Dict[str, any]:
+    """fetch_url_with_playwright 的非同步版本"""
+    return (await _afetch_rendered(url, max_length, wait_time))[0]
+
+
+def _empty_result(url: str) -> Dict[str, any]:
+    return {
         "url": url,
         "success": False,
         "title": "",
@@ -68,77 +202,70 @@ def fetch_url_with_playwright(url: str, max_length: int = 5000, wait_time: int =
         "error": None
     }
 
-    if not PLAYWRIGHT_AVAILABLE:
-        result["error"] = "Playwright 未安裝"
-        return result
 
-    try:
-        with sync_playwright() as p:
-            # 啟動無頭瀏覽器
-            browser = p.chromium.launch(headless=True)
-            context = browser.new_context(
-                viewport={'width': 1280, 'height': 800},
-                locale='vi-VN',  # 越南語環境
-                user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-            )
-            page = context.new_page()
+def _page_content(page: ExtractedPage) -> str:
+    if page.truncated:
+        return page.text + "\n\n[... 內容已截斷 ...]"
+    return page.text
 
-            # 設定較長的 timeout
-            page.set_default_timeout(15000)
 
-            # 導航到頁面
-            print(f"  🌐 [Playwright] 正在載入: {url}")
-            page.goto(url, wait_until='networkidle')
+def _fill_rendered(result: Dict[str, any], url: str, snapshot: PageSnapshot, max_length: int) -> None:
+    # 取得標題
+    result["title"] = snapshot.title or urlparse(url).netloc
 
-            # 額外等待 JavaScript 渲染
-            page.wait_for_timeout(wait_time)
+    # 從渲染後的 HTML 取出主要內容（收滿 max_length 就停止）
+    cleaned_content = _page_content(extract_page(snapshot.html, max_length))
 
-            # 取得標題
-            result["title"] = page.title() or urlparse(url).netloc
+    result["content"] = cleaned_content
+    result["success"] = True
 
-            # 取得頁面完整 HTML
-            html_content = page.content()
+    print(f"  ✓ [Playwright] 抓取成功，內容長度: {len(cleaned_content)} 字")
 
-            # 解析 HTML
-            soup = BeautifulSoup(html_content, 'html.parser')
 
-            # 移除不需要的元素
-            for tag in soup(['script', 'style', 'nav', 'footer', 'header', 'aside', 'iframe', 'noscript']):
-                tag.decompose()
+def _fetch_rendered(url: str, max_length: int, wait_time: int = 3000) -> Tuple[Dict[str, any], Dict[str, str]]:
+    """fetch_url_with_playwright 的實作，另外回傳主文件的 response headers（快取用）"""
+    headers: Dict[str, str] = {}
+    result = _empty_result(url)
 
-            # 嘗試找主要內容區
-            main_content = None
-            for selector in ['main', 'article', '[role="main"]', '.main-content', '.content', '#content', '.article-body', '.page-content']:
-                main_content = soup.select_one(selector)
-                if main_content:
-                    break
+    if not PLAYWRIGHT_AVAILABLE:
+        result["error"] = "Playwright 未安裝"
+        return result, headers
 
-            if not main_content:
-                main_content = soup.find('body') or soup
+    try:
+        # 使用常駐瀏覽器池的頁面，不再每次啟動 Chromium
+        print(f"  🌐 [Playwright] 正在載入: {url}")
+        snapshot = get_browser_pool().fetch(url, wait_ms=wait_time)
+        headers = snapshot.headers
+        _fill_rendered(result, url, snapshot, max_length)
 
-            # 提取文字內容
-            text_content = main_content.get_text(separator='\n', strip=True)
+    except Exception as e:
+        result["error"] = f"Playwright 抓取失敗: {str(e)}"
+        print(f"  ✗ [Playwright] 錯誤: {e}")
 
-            # 清理多餘空白行
-            lines = [line.strip() for line in text_content.split('\n') if line.strip()]
-            cleaned_content = '\n'.join(lines)
+    return result, headers
 
-            # 限制長度
-            if len(cleaned_content) > max_length:
-                cleaned_content = cleaned_content[:max_length] + "\n\n[... 內容已截斷 ...]"
 
-            result["content"] = cleaned_content
-            result["success"] = True
+async def _afetch_rendered(url: str, max_length: int, wait_time: int = 3000) -> Tuple[Dict[str, any], Dict[str, str]]:
+    """_fetch_rendered 的非同步版本（頁面在瀏覽器池的 event loop 上載入）"""
+    headers: Dict[str, str] = {}
+    result = _empty_result(url)
 
-            print(f"  ✓ [Playwright] 抓取成功，內容長度: {len(cleaned_content)} 字")
+    if not PLAYWRIGHT_AVAILABLE:
+        result["error"] = "Playwright 未安裝"
+        return result, headers
 
-            browser.close()
+    try:
+        print(f"  🌐 [Playwright] 正在載入: {url}")
+        snapshot = await get_browser_pool().afetch(url, wait_ms=wait_time)
+        headers = snapshot.headers
+        # 解析 HTML 是 CPU 工作，交給執行緒，不卡住 event loop
+        await asyncio.to_thread(_fill_rendered, result, url, snapshot, max_length)
 
     except Exception as e:
         result["error"] = f"Playwright 抓取失敗: {str(e)}"
         print(f"  ✗ [Playwright] 錯誤: {e}")
 
-    return result
+    return result, headers
 
 
 def fetch_url_content(url: str, max_length: int = 3000) -> Dict[str, any]:
@@ -159,113 +286,216 @@ def fetch_url_content(url: str, max_length: int = 3000) -> Dict[str, any]:
             "error": str (if failed)
         }
     """
-    result = {
-        "url": url,
-        "success": False,
-        "title": "",
-        "content": "",
-        "error": None
-    }
+    return _fetch_static(url, max_length)[0]
 
-    try:
-        # 設定 headers 模擬瀏覽器
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-            'Accept-Language': 'en-US,en;q=0.5,zh-TW;q=0.3',
-        }
 
-        # 發送請求 - 減少 timeout 到 5 秒
-        response = requests.get(
-            url,
-            headers=headers,
-            timeout=5,  # 從 10 秒減少到 5 秒
-            allow_redirects=True
-        )
-        response.raise_for_status()
+async def afetch_url_content(url: str, max_length: int = 3000) -> Dict[str, any]:
+    """fetch_url_content 的非同步版本"""
+    return (await _afetch_static(url, max_length))[0]
 
-        # 確保正確處理編碼
-        if response.encoding is None:
-            response.encoding = 'utf-8'
 
-        # 解析 HTML
-        soup = BeautifulSoup(response.text, 'html.parser')
+def _fill_static(result: Dict[str, any], url: str, html: str, max_length: int) -> bool:
+    """取出標題與主要內容（收滿 max_length 就停止），回傳是否看起來需要 JavaScript 渲染"""
+    page = extract_page(html, max_length)
+    result["title"] = page.title or urlparse(url).netloc
+    result["content"] = _page_content(page)
+    result["success"] = True
+    return looks_js_rendered(html, page.text)
 
-        # 取得標題
-        title_tag = soup.find('title')
-        result["title"] = title_tag.get_text(strip=True) if title_tag else urlparse(url).netloc
 
-        # 移除不需要的元素
-        for tag in soup(['script', 'style', 'nav', 'footer', 'header', 'aside', 'iframe', 'noscript']):
-            tag.decompose()
+def _fetch_error(error: Exception) -> str:
+    if isinstance(error, httpx.TimeoutException):
+        return "請求超時"
+    if isinstance(error, httpx.HTTPError):
+        return f"網路請求失敗: {str(error)}"
+    return f"抓取失敗: {str(error)}"
 
-        # 嘗試找主要內容區
-        main_content = None
 
-        # 優先找 main, article 或特定 class
-        for selector in ['main', 'article', '[role="main"]', '.main-content', '.content', '#content', '.article-body']:
-            main_content = soup.select_one(selector)
-            if main_content:
-                break
+def _fetch_static(url: str, max_length: int) -> Tuple[Dict[str, any], Dict[str, str], bool]:
+    """
+    fetch_url_content 的實作
+
+    Returns:
+        (result, response headers（快取用）, 是否看起來需要 JavaScript 渲染)
+    """
+    response_headers: Dict[str, str] = {}
+    needs_render = False
+    result = _empty_result(url)
+
+    try:
+        # 發送請求（共用連線池，timeout 5 秒）
+        with _host_slot(url):
+            response = _http_client().get(url)
+        response.raise_for_status()
+        response_headers = dict(response.headers)
+        needs_render = _fill_static(result, url, response.text, max_length)
 
-        # 如果沒找到，使用 body
-        if not main_content:
-            main_content = soup.find('body') or soup
+    except Exception as e:
+        result["error"] = _fetch_error(e)
 
-        # 提取文字內容
-        text_content = main_content.get_text(separator='\n', strip=True)
+    return result, response_headers, needs_render
 
-        # 清理多餘空白行
-        lines = [line.strip() for line in text_content.split('\n') if line.strip()]
-        cleaned_content = '\n'.join(lines)
 
-        # 限制長度
-        if len(cleaned_content) > max_length:
-            cleaned_content = cleaned_content[:max_length] + "\n\n[... 內容已截斷 ...]"
+async def _afetch_static(url: str, max_length: int) -> Tuple[Dict[str, any], Dict[str, str], bool]:
+    """_fetch_static 的非同步版本"""
+    response_headers: Dict[str, str] = {}
+    needs_render = False
+    result = _empty_result(url)
 
-        result["content"] = cleaned_content
-        result["success"] = True
+    try:
+        state = _async_state()
+        async with state.host_slot(url):
+            response = await state.client.get(url)
+        response.raise_for_status()
+        response_headers = dict(response.headers)
+        # 解析 HTML 是 CPU 工作，交給執行緒，不卡住 event loop
+        needs_render = await asyncio.to_thread(_fill_static, result, url, response.text, max_length)
 
-    except requests.Timeout:
-        result["error"] = "請求超時"
-    except requests.RequestException as e:
-        result["error"] = f"網路請求失敗: {str(e)}"
     except Exception as e:
-        result["error"] = f"抓取失敗: {str(e)}"
+        result["error"] = _fetch_error(e)
+
+    return result, response_headers, needs_render
 
-    return result
 
+def _conditional_headers(etag: Optional[str], last_modified: Optional[str]) -> Dict[str, str]:
+    headers = {}
+    if etag:
+        headers['If-None-Match'] = etag
+    if last_modified:
+        headers['If-Modified-Since'] = last_modified
+    return headers
 
-def fetch_multiple_urls(urls: List[str], max_length_per_url: int = 2000, use_playwright: bool = True) -> List[Dict]:
+
+def _revalidate(url: str, etag: Optional[str], last_modified: Optional[str]) -> Optional[Dict[str, str]]:
+    """條件式請求：頁面沒有變更（304）時回傳新的 headers，否則回傳 None"""
+    try:
+        # 用 stream 只讀 header：內容有變更時交給一般抓取流程重新下載
+        headers = _conditional_headers(etag, last_modified)
+        with _host_slot(url), _http_client().stream("GET", url, headers=headers) as response:
+            if response.status_code == 304:
+                return dict(response.headers)
+    except httpx.HTTPError:
+        pass
+    return None
+
+
+async def _arevalidate(url: str, etag: Optional[str], last_modified: Optional[str]) -> Optional[Dict[str, str]]:
+    """_revalidate 的非同步版本"""
+    try:
+        state = _async_state()
+        headers = _conditional_headers(etag, last_modified)
+        async with state.host_slot(url), state.client.stream("GET", url, headers=headers) as response:
+            if response.status_code == 304:
+                return dict(response.headers)
+    except httpx.HTTPError:
+        pass
+    return None
+
+
+def fetch_multiple_urls(
+    urls: List[str],
+    max_length_per_url: int = 2000,
+    use_playwright: bool = True,
+    deadline: float = FETCH_DEADLINE,
+) -> List[Dict]:
     """
-    抓取多個 URL 的內容
+    同時抓取多個 URL 的內容（總耗時約等於最慢的一個）
 
     Args:
         urls: URL 列表
         max_length_per_url: 每個 URL 內容的最大長度
-        use_playwright: 是否使用 Playwright（預設 True，用於動態網頁）
+        use_playwright: 靜態 HTML 需要 JavaScript 渲染時是否改用 Playwright
+        deadline: 整組的時限（秒）；逾時的 URL 回傳失敗結果，抓取會在背景完成並寫入快取
 
     Returns:
-        抓取結果列表
+        抓取結果列表（與 urls 順序相同）
     """
+    urls = urls[:5]  # 最多抓取 5 個 URL
+    cache = get_url_cache()
+
+    def fetch_cached(url: str) -> Dict:
+        # 同一網址的清理結果在程序內共用（同一批受訪者只會實際抓取一次）
+        return cache.get_or_fetch(
+            url,
+            max_length_per_url,
+            lambda: _fetch_one(url, max_length_per_url, use_playwright),
+            lambda etag, last_modified: _revalidate(url, etag, last_modified),
+        )
+
+    futures = [_fetch_pool.submit(fetch_cached, url) for url in urls]
+    wait(futures, timeout=deadline)
+
     results = []
-    for url in urls[:5]:  # 最多抓取 5 個 URL
-        # 優先使用 Playwright 抓取動態內容
-        if use_playwright and PLAYWRIGHT_AVAILABLE:
-            result = fetch_url_with_playwright(url, max_length_per_url)
-            # 如果 Playwright 失敗，fallback 到基礎 HTTP
-            if not result['success']:
-                print(f"  ⚠️ Playwright 失敗，嘗試基礎 HTTP...")
-                result = fetch_url_content(url, max_length_per_url)
-        else:
-            result = fetch_url_content(url, max_length_per_url)
+    for url, future in zip(urls, futures):
+        result = future.result() if future.done() else _deadline_result(url, deadline)
+        results.append(result)
+        print(f"  {'✓' if result['success'] else '✗'} {url[:60]}...")
+
+    return results
+
 
+async def afetch_multiple_urls(
+    urls: List[str],
+    max_length_per_url: int = 2000,
+    use_playwright: bool = True,
+    deadline: float = FETCH_DEADLINE,
+) -> List[Dict]:
+    """fetch_multiple_urls 的非同步版本（所有頁面在同一個 event loop 上同時載入，與同步版本共用快取）"""
+    urls = urls[:5]  # 最多抓取 5 個 URL
+    cache = get_url_cache()
+
+    async def fetch_cached(url: str) -> Dict:
+        return await cache.aget_or_fetch(
+            url,
+            max_length_per_url,
+            lambda: _afetch_one(url, max_length_per_url, use_playwright),
+            lambda etag, last_modified: _arevalidate(url, etag, last_modified),
+        )
+
+    tasks = [asyncio.ensure_future(fetch_cached(url)) for url in urls]
+    if tasks:
+        await asyncio.wait(tasks, timeout=deadline)
+
+    results = []
+    for url, task in zip(urls, tasks):
+        if task.done():
+            result = task.result()
+        else:
+            result = _deadline_result(url, deadline)
+            _background_fetches.add(task)
+            task.add_done_callback(_background_fetches.discard)
         results.append(result)
         print(f"  {'✓' if result['success'] else '✗'} {url[:60]}...")
 
     return results
 
 
+def _deadline_result(url: str, deadline: float) -> Dict[str, any]:
+    return {**_empty_result(url), "error": f"超過抓取時限（{deadline:.0f} 秒）"}
+
+
+def _fetch_one(url: str, max_length: int, use_playwright: bool) -> Tuple[Dict[str, any], Dict[str, str]]:
+    """抓取單一 URL（不經快取）：先用一般 HTTP，失敗或內容需要 JavaScript 渲染時才改用 Playwright"""
+    result, headers, needs_render = _fetch_static(url, max_length)
+    if use_playwright and PLAYWRIGHT_AVAILABLE and (needs_render or not result['success']):
+        print(f"  🌐 靜態 HTML {'需要 JavaScript 渲染' if result['success'] else '抓取失敗'}，改用 Playwright...")
+        rendered, rendered_headers = _fetch_rendered(url, max_length)
+        if rendered['success']:
+            return rendered, rendered_headers
+    return result, headers
+
+
+async def _afetch_one(url: str, max_length: int, use_playwright: bool) -> Tuple[Dict[str, any], Dict[str, str]]:
+    """_fetch_one 的非同步版本"""
+    result, headers, needs_render = await _afetch_static(url, max_length)
+    if use_playwright and PLAYWRIGHT_AVAILABLE and (needs_render or not result['success']):
+        print(f"  🌐 靜態 HTML {'需要 JavaScript 渲染' if result['success'] else '抓取失敗'}，改用 Playwright...")
+        rendered, rendered_headers = await _afetch_rendered(url, max_length)
+        if rendered['success']:
+            return rendered, rendered_headers
+    return result, headers
+
+
 def format_url_content_for_prompt(fetch_results: List[Dict]) -> str:
     """
     將抓取的網頁內容格式化為 AI prompt
@@ -354,7 +584,11 @@ Describe your browsing journey step by step, as if you're really doing the task.
 """
 
 
-def extract_and_fetch_urls(question: str, sub_questions: List[str] = None) -> Tuple[List[str], str]:
+# (urls, 格式化後的 prompt 區塊)；網址內容只跟題目有關，批量訪談時先算好一次再傳給每位受訪者
+URLContext = Tuple[List[str], str]
+
+
+def extract_and_fetch_urls(question: str, sub_questions: List[str] = None) -> URLContext:
     """
     從問題中提取 URL 並抓取內容的便利函數
 
@@ -365,13 +599,8 @@ def extract_and_fetch_urls(question: str, sub_questions: List[str] = None) -> Tu
     Returns:
         (urls, formatted_content) tuple
     """
-    # 合併所有文字
-    all_text = question
-    if sub_questions:
-        all_text += '\n' + '\n'.join(sub_questions)
-
-    # 提取 URL
-    urls = extract_urls(all_text)
+    # 提取主問題與子問題中的 URL
+    urls = _question_urls(question, sub_questions)
 
     if not urls:
         return [], ""
@@ -387,6 +616,24 @@ def extract_and_fetch_urls(question: str, sub_questions: List[str] = None) -> Tu
     return urls, formatted
 
 
+async def aextract_and_fetch_urls(question: str, sub_questions: List[str] = None) -> URLContext:
+    """extract_and_fetch_urls 的非同步版本（等待網頁時不佔用執行緒）"""
+    urls = _question_urls(question, sub_questions)
+    if not urls:
+        return [], ""
+
+    print(f"🌐 Found {len(urls)} URL(s) in question, fetching content...")
+    results = await afetch_multiple_urls(urls)
+    return urls, format_url_content_for_prompt(results)
+
+
+def _question_urls(question: str, sub_questions: Optional[List[str]]) -> List[str]:
+    all_text = question
+    if sub_questions:
+        all_text += '\n' + '\n'.join(sub_questions)
+    return extract_urls(all_text)
+
+
 # 測試
 if __name__ == "__main__":
     # 測試 URL 提取
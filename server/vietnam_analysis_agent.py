@@ -7,6 +7,7 @@ from typing import List, Dict, Any
 from dotenv import load_dotenv
 from agno.agent import Agent
 from agno.models.openai import OpenAIChat
+from llm_scheduler import SDK_MAX_RETRIES
 
 load_dotenv()
 
@@ -95,7 +96,7 @@ def analyze_interview_responses(
     print(f"📊 [Analysis] Analyzing {len(responses)} responses for question: {question[:50]}...")
 
     agent = Agent(
-        model=OpenAIChat(id="gpt-4o", temperature=0.7),
+        model=OpenAIChat(id="gpt-4o", temperature=0.7, max_retries=SDK_MAX_RETRIES),
         description="Expert market research analyst for consumer insights",
         instructions=instructions,
         markdown=False  # 關閉 markdown 格式
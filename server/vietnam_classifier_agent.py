@@ -8,6 +8,7 @@ from typing import List, Dict, Any, Optional
 from dotenv import load_dotenv
 from agno.agent import Agent
 from agno.models.openai import OpenAIChat
+from llm_scheduler import SDK_MAX_RETRIES
 
 load_dotenv()
 
@@ -157,7 +158,7 @@ Please classify each response and return the JSON result.
     print(f"📊 [Classifier] Classifying {len(responses)} responses...")
 
     agent = Agent(
-        model=OpenAIChat(id="gpt-4o", temperature=0.3),
+        model=OpenAIChat(id="gpt-4o", temperature=0.3, max_retries=SDK_MAX_RETRIES),
         description="Response classifier for market research",
         instructions=instructions,
         markdown=False
@@ -365,7 +366,7 @@ Please identify all dimensions in the question and classify each response for ea
     print(f"📊 [Multi-Classifier] Analyzing {len(responses)} responses for multiple dimensions...")
 
     agent = Agent(
-        model=OpenAIChat(id="gpt-4o", temperature=0.3),
+        model=OpenAIChat(id="gpt-4o", temperature=0.3, max_retries=SDK_MAX_RETRIES),
         description="Multi-dimensional response classifier",
         instructions=instructions,
         markdown=False
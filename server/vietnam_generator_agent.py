@@ -6,10 +6,11 @@ import os
 from typing import List
 from dotenv import load_dotenv
 from openai import OpenAI
+from llm_scheduler import SDK_MAX_RETRIES, llm_http_client
 from pydantic import BaseModel, Field
 
 load_dotenv()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"), http_client=llm_http_client(), max_retries=SDK_MAX_RETRIES)
 
 # --- 越南受訪者 Schema ---
 class VietnamPersona(BaseModel):
@@ -2,35 +2,382 @@
 越南旅遊險訪談 Agent
 用於模擬越南受訪者回答訪談問題
 支援自動抓取問題中的 URL 內容
+
+prompt 中與問題無關的部分（受訪者背景、態度、說話風格）依 persona 內容快取，
+作為 system prompt，同一 persona 每次完全相同，可命中供應商的 prompt cache；
+訪談歷史、網頁內容與問題等每次不同的內容一律放在最後的 user message。
+
+ainterview_vietnam_persona / ainterview_vietnam_persona_observer 為非同步版本，
+等待模型回應時不佔用執行緒池，供 async endpoint 使用。
 """
+import hashlib
+import json
 import os
-from typing import Optional, List, Dict, Any
+import random
+import threading
+from collections import OrderedDict
+from typing import Optional, List, Dict, Any, Callable, NamedTuple, Tuple
 from dotenv import load_dotenv
 from agno.agent import Agent
 from agno.models.openai import OpenAIChat
+from agno.run.base import RunStatus
 
 # 匯入 URL 抓取工具
-from url_fetcher import extract_and_fetch_urls
+from url_fetcher import URLContext, aextract_and_fetch_urls, extract_and_fetch_urls
+from llm_scheduler import SDK_MAX_RETRIES
+from llm_usage import prompt_cache_key, record_usage
+from interview_history import SummarySink, abuild_history_context, build_history_context, format_history_context
 
 load_dotenv()
 
-def interview_vietnam_persona(
-    persona: Dict[str, Any],
-    question: str,
-    sub_questions: List[str] = None
-) -> str:
-    """
-    使用 Agno Agent 模擬越南受訪者回答問題
-
-    Args:
-        persona: 受訪者基本資料
-        question: 當前訪談問題
-        sub_questions: 追問項目列表
-
-    Returns:
-        模擬的回答文字
-    """
-
+# ===== 受訪者特徵選項（模組層級，只建立一次）=====
+
+# 多種可能的瀏覽起點（不基於刻板印象）
+STARTING_POINTS = [
+    "You always scroll to the BOTTOM first to see the footer and company info - it's a habit",
+    "You instinctively look for a SEARCH bar first - you hate navigating menus",
+    "You immediately try to find PRICE information before reading anything else",
+    "You check the URL bar first to make sure it's the official site, not a scam",
+    "You look at the IMAGES and banners first - visuals tell you a lot about a company",
+    "You look for CONTACT INFO or customer service number first - you want to know you can reach someone",
+    "You try to find REVIEWS or testimonials first before trusting any website",
+    "You check if there's an ENGLISH option - sometimes Vietnamese sites have translation errors",
+    "You look for the MOBILE APP download link - you prefer doing things on your phone",
+    "You scroll slowly and READ everything carefully - you don't want to miss important details",
+    "You look for COMPARISON tables immediately - you want to see options side by side",
+    "You check if there's a CHAT button - you prefer asking questions directly",
+]
+
+# 多種可能的關注焦點
+FOCUS_POINTS = [
+    "Coverage for MEDICAL emergencies abroad is your biggest concern",
+    "You care most about FLIGHT delay/cancellation coverage",
+    "BAGGAGE loss protection is what you look for first",
+    "You want to know the CLAIMS PROCESS - how easy is it to get money back?",
+    "You're mainly concerned about COVID-related coverage these days",
+    "You care about whether it covers ADVENTURE activities (diving, hiking)",
+    "Family coverage and whether it includes CHILDREN is your priority",
+    "You want to know if pre-existing CONDITIONS are covered",
+    "The REPUTATION of the insurance company matters most to you",
+    "You focus on whether there's 24/7 HOTLINE support in your destination country",
+    "You want to see ACTUAL EXAMPLES of claim payouts, not just limits",
+    "You're curious about the FINE PRINT and exclusions",
+]
+
+# 多種可能的情緒/反應傾向
+REACTION_STYLES = [
+    "You tend to be SKEPTICAL - you've been burned by hidden fees before",
+    "You're generally OPTIMISTIC and trusting of established brands",
+    "You get IMPATIENT when websites are slow or confusing",
+    "You're THOROUGH - you read everything twice before deciding",
+    "You're INDECISIVE - you always want to compare with other options first",
+    "You make decisions QUICKLY based on gut feeling",
+    "You're PRICE-SENSITIVE - if it seems expensive, you'll look elsewhere",
+    "You value CONVENIENCE over price - you'll pay more for easier processes",
+    "You're CAUTIOUS about online purchases and prefer talking to a person",
+    "You're TECH-SAVVY and expect modern, smooth website experiences",
+    "You get ANNOYED by too much marketing speak and want straight facts",
+    "You appreciate BEAUTIFUL DESIGN and it affects your trust in a company",
+]
+
+# 多種可能的個人情境
+PERSONAL_CONTEXTS = [
+    "You're planning a trip SOON (within 2 weeks) so this is urgent",
+    "You're just RESEARCHING for a future trip, no rush",
+    "Someone RECOMMENDED this website to you",
+    "You're COMPARING this with another insurance site you just visited",
+    "This is your FIRST TIME looking at this company's website",
+    "You've HEARD of this company before but never used their website",
+    "You're looking for insurance for your PARENTS' trip, not yourself",
+    "You're on your LUNCH BREAK so you only have 10 minutes",
+    "You're browsing late at NIGHT, a bit tired but curious",
+    "A FRIEND asked you to help them find travel insurance",
+    "You saw an AD for this company and decided to check it out",
+    "You're on your PHONE, not a computer",
+]
+
+# ===== 新增：回答立場多樣化 =====
+# 對旅遊險的整體態度（不是每個人都正面看待）- 25種
+INSURANCE_ATTITUDES = [
+    # 正面態度
+    "BELIEVER: You genuinely believe travel insurance is essential and worth every penny",
+    "PEACE_OF_MIND: You buy it mainly for psychological comfort, not because you expect to use it",
+    "RESPONSIBLE: You see buying insurance as being a responsible adult/parent/traveler",
+    "CONVERT: You used to not care, but one incident changed your mind completely",
+    "SAVED_ONCE: Insurance saved you before, now you're a strong advocate",
+    # 負面/懷疑態度
+    "SKEPTIC: You think most travel insurance is a waste of money, but buy it 'just in case'",
+    "CYNIC: You believe insurance companies always find ways to deny claims",
+    "BURNED: You had a terrible claim experience and are now very distrustful",
+    "RELUCTANT: You only buy because someone (family/company/visa) requires it",
+    "RESENTFUL: You hate being forced to buy but have no choice",
+    # 無所謂態度
+    "INDIFFERENT: You don't really care, it's just a checkbox to tick",
+    "PASSIVE: You let others (travel agent, family) decide for you",
+    "LAZY: You know you should research but never bother",
+    "FORGETFUL: You often forget to buy until the last minute or not at all",
+    "CHEAP: You always pick the absolute cheapest option without reading details",
+    # 研究型態度
+    "OVERTHINKER: You spend way too much time comparing and end up confused",
+    "RESEARCHER: You read every review and comparison before deciding",
+    "SPREADSHEET: You create detailed comparisons but still can't decide",
+    "PARALYZED: Too many options make you anxious and you delay decisions",
+    # 其他態度
+    "SUPERSTITIOUS: You feel like buying insurance 'jinxes' the trip",
+    "GAMBLER: You'd rather take the risk and save the money",
+    "BRAND_LOYAL: You stick to one brand because switching is too troublesome",
+    "CONVENIENCE: You buy whatever is fastest/easiest regardless of coverage",
+    "SOCIAL_PROOF: You only buy what friends/family recommend",
+    "PREMIUM_BUYER: You always buy the most expensive option assuming it's best",
+]
+
+# 溝通風格（說話方式）- 20種
+SPEAKING_STYLES = [
+    # 長度相關
+    "VERBOSE: You give long, detailed explanations with many tangents and examples",
+    "CONCISE: You prefer short, direct answers - one or two sentences max",
+    "RAMBLING: You start answering, go off on tangents, sometimes forget the original question",
+    "MEASURED: You think carefully before speaking, choose words precisely",
+    # 結構相關
+    "STORYTELLER: You frame everything as stories with setup, conflict, resolution",
+    "ANALYTICAL: You break things into pros/cons, numbers, percentages",
+    "STREAM_OF_CONSCIOUSNESS: Your thoughts come out in whatever order they occur",
+    "STRUCTURED: You naturally organize thoughts into first, second, third",
+    # 情緒相關
+    "EMOTIONAL: You express strong feelings - excitement, frustration, fear",
+    "DEADPAN: You state things matter-of-factly without much emotion",
+    "DRAMATIC: You tend to exaggerate for effect",
+    "UNDERSTATED: You downplay everything, even significant events",
+    # 態度相關
+    "COMPLAINER: You naturally focus on problems and what went wrong",
+    "OPTIMIST: You tend to see the bright side even of bad experiences",
+    "BLUNT: You say exactly what you think without sugarcoating",
+    "DIPLOMATIC: You try to be balanced and not offend anyone",
+    "SELF_DEPRECATING: You make fun of yourself and your mistakes",
+    "HUMBLE_BRAGGER: You complain while subtly showing off",
+    # 其他
+    "TANGENTIAL: You answer but keep adding 'oh and also...' 'that reminds me...'",
+    "CIRCULAR: You sometimes repeat points you already made",
+]
+
+# 過去經驗類型（不是每個人都有正面經驗）- 25種
+PAST_EXPERIENCES = [
+    # 正面經驗
+    "SMOOTH: All your purchases went smoothly, you have good impressions overall",
+    "SAVED_BIG: Insurance once covered a huge expense (hospital, lost luggage worth millions VND)",
+    "QUICK_CLAIM: You filed a claim once and were impressed by how fast it was processed",
+    "GOOD_SERVICE: You had great customer service experience with an insurance company",
+    # 負面經驗
+    "CLAIM_DENIED: You had a claim rejected on a technicality, still angry about it",
+    "ENDLESS_PAPERWORK: The claim process required so many documents you almost gave up",
+    "DELAYED_PAYMENT: You waited months to get reimbursed",
+    "UNDERPAID: Insurance paid much less than you expected/deserved",
+    "SCAMMED: You were tricked by a fake or misleading insurance product",
+    "FINE_PRINT: You discovered important exclusions only when you needed to claim",
+    "RUNAROUND: You got transferred between departments endlessly",
+    "LANGUAGE_BARRIER: You struggled to communicate with customer service",
+    # 沒用過
+    "NEVER_NEEDED: You've bought many times but thankfully never had to use it",
+    "ALMOST_NEEDED: You had a close call but didn't meet the threshold to claim",
+    "FORGOT_TO_CLAIM: Something happened but you forgot/didn't bother to file a claim",
+    # 特殊情況
+    "WORK_HANDLED: Your company always buys insurance, you've never done it yourself",
+    "FAMILY_DOES_IT: Your spouse/parent/child handles all insurance matters",
+    "AGENT_DEPENDENT: You always buy through the same agent who explains everything",
+    "SKIPPED_ONCE_OK: You forgot to buy once and thankfully nothing happened",
+    "SKIPPED_ONCE_BAD: You skipped insurance once and something went wrong - learned hard way",
+    "DOUBLE_COVERAGE: You once accidentally bought two policies for the same trip",
+    "WRONG_DATES: You once bought insurance for wrong dates and couldn't use it",
+    "LOST_DOCUMENTS: You couldn't claim because you lost the required receipts/documents",
+    "COVID_CHAOS: Your pandemic-era claims were a nightmare",
+    "FIRST_TIMER: This is genuinely your first time thinking about travel insurance",
+]
+
+# ===== 新增：敘事風格多樣化 =====
+# 回答開頭風格（打破「嗯，我第一次...」的公式）- 20種
+OPENING_STYLES = [
+    # 場景/記憶型
+    "START with a SPECIFIC MEMORY - '那天下著雨...', '記得那時候在機場...'",
+    "START with a SENSORY detail - '我還記得那個網站的顏色...', '那天手機訊號很差...'",
+    "START with a LOCATION - '那時候我人在日本...', '在旅行社的辦公室裡...'",
+    "START with TIME context - '大概是三年前吧...', '那是疫情之前的事了...'",
+    # 情緒/感受型
+    "START with your FEELING - '說實話當時有點慌...', '其實一開始我是拒絕的...'",
+    "START with FRUSTRATION - '唉，說到這個我就煩...', '這個話題讓我想起一件很氣的事...'",
+    "START with CONFUSION - '老實說我到現在還是搞不太懂...', '那時候真的很困惑...'",
+    "START with EXCITEMENT - '哦這個我很有經驗！', '終於有人問這個了...'",
+    # 對比/意外型
+    "START with a CONTRAST - '本來以為很簡單，結果...', '跟我想的完全不一樣...'",
+    "START with a SURPRISE - '你不會相信發生了什麼事...', '結果出乎我意料...'",
+    "START with IRONY - '說來好笑...', '諷刺的是...'",
+    # 他人影響型
+    "START with SOMEONE ELSE - '是我媽一直唸說...', '我老公每次都會...'",
+    "START with a RECOMMENDATION - '朋友跟我說...', '網路上有人推薦...'",
+    # 質疑/思考型
+    "START by QUESTIONING - '買保險喔...其實我一直在想這值不值得'",
+    "START with HESITATION - '欸...讓我想一下喔...', '這個嘛...有點久了...'",
+    "START with ADMISSION - '說實話我不太懂這些...', '我可能不是最好的例子...'",
+    # 動作/過程型
+    "START in MEDIA RES - '當時我人已經在機場了...', '那時候正在打包行李...'",
+    "START with a TANGENT - '說到這個，我先講個題外話...', '其實這要從我的工作說起...'",
+    "START with CONTEXT - '你要先知道，我是那種...', '我這個人比較...所以...'",
+    "START DIRECTLY - '就是去年的事。', '很簡單，我就是...'",
+]
+
+# 回答結構風格（打破「年齡→情境→品牌→感想」的公式）- 15種
+STRUCTURE_STYLES = [
+    # 情感導向
+    "EMOTION-DRIVEN: Focus on how you FELT at each stage, not just facts",
+    "ANXIETY-FOCUSED: Emphasize your worries, doubts, and how you dealt with them",
+    "RELIEF-CENTERED: Build towards moments of relief or resolution",
+    # 問題解決
+    "PROBLEM-SOLVING: Frame it as obstacles you faced and how you solved them",
+    "TRIAL-AND-ERROR: Describe what you tried, what failed, what finally worked",
+    "LEARNING-CURVE: Show how your understanding evolved over time",
+    # 人際關係
+    "RELATIONSHIP-FOCUSED: Emphasize who was with you, who influenced you",
+    "ADVICE-BASED: Structure around advice you received or would give",
+    # 感官/細節
+    "SENSORY: Describe what you SAW, HEARD, the environment around you",
+    "PROCESS-ORIENTED: Step by step what you actually did, very practical",
+    # 比較/反思
+    "COMPARISON: Compare with other experiences - 'unlike buying phone insurance...'",
+    "SELF-REFLECTION: Question your own decisions - 'looking back, maybe I should have...'",
+    "HINDSIGHT: Use lots of 'if I knew then what I know now...' framing",
+    # 敘事
+    "STORYTELLING: Build up to a climax or turning point",
+    "MEANDERING: Jump between related thoughts without strict structure",
+]
+
+# 回答結尾風格（打破「總之...值得」的套路）- 18種
+ENDING_STYLES = [
+    # 未解決/開放
+    "END with UNRESOLVED question - '但我到現在還是不確定...'",
+    "END with AMBIVALENCE - '說不上好還是不好吧...'",
+    "END with ONGOING ISSUE - '這個問題我還在想...'",
+    # 幽默/自嘲
+    "END with HUMOR - '結果錢花了也沒用到，哈哈'",
+    "END with SELF-DEPRECATION - '早知道就...算了不說了'",
+    "END with IRONY - '所以你看，這就是為什麼...'",
+    # 突然結束
+    "END ABRUPTLY - '大概就這樣吧', '對啊就是這樣'",
+    "END with TRAILING OFF - '然後就...對，就這樣...'",
+    "END with SHRUG - '反正也沒什麼大不了的...'",
+    # 建議/教訓
+    "END with ADVICE - '如果是你的話我建議...'",
+    "END with WARNING - '所以要小心...', '給你一個提醒...'",
+    "END with LESSON - '這件事讓我學到...'（但不要用老套的方式）",
+    # 回顧/展望
+    "END by CIRCLING BACK - reference something you mentioned at the start",
+    "END with LINGERING FEELING - '現在想起來還是有點...'",
+    "END with FUTURE INTENTION - '下次出國我會...', '之後我打算...'",
+    "END with CHANGED PERSPECTIVE - '現在我對這件事的看法...'",
+    # 連接現在
+    "END with CONNECTION to NOW - '所以你現在問我這個...'",
+    "END with QUESTION BACK - '你覺得呢？', '其他人都怎麼做？'",
+]
+
+# ===== Observer Notes 特徵選項 =====
+
+# 保險態度選項
+OBSERVER_INSURANCE_ATTITUDES = [
+    "TRUSTING: Believes insurance is valuable and worth buying",
+    "SKEPTICAL: Thinks insurance companies try to avoid paying claims",
+    "PRAGMATIC: Buys only when required or for high-risk trips",
+    "ANXIOUS: Worried about not having enough coverage",
+    "INDIFFERENT: Doesn't really care about insurance details",
+    "PRICE_SENSITIVE: Mainly looks at the cheapest options",
+    "BRAND_LOYAL: Sticks with one trusted company",
+    "RESEARCH_HEAVY: Compares many options before deciding",
+]
+
+# 過往經驗選項
+OBSERVER_PAST_EXPERIENCES = [
+    "SMOOTH: All purchases went smoothly, good impressions overall",
+    "SAVED_BIG: Insurance once covered a huge expense",
+    "CLAIM_DENIED: Had a claim rejected, still frustrated about it",
+    "NEVER_NEEDED: Bought many times but never had to use it",
+    "BAD_SERVICE: Had poor customer service experience",
+    "GOOD_SERVICE: Had great customer service experience",
+]
+
+# 使用 hash 選擇不同的記錄風格
+NOTE_STYLES = [
+    "DIRECT_QUOTE: 多使用直接引述，如「他說：『...』」",
+    "SUMMARY: 用簡潔的方式總結受訪者的觀點",
+    "BEHAVIORAL: 多描述受訪者的行為和反應，如表情、語氣、猶豫等",
+    "ANALYTICAL: 帶有分析性的觀察，指出受訪者觀點的特點",
+    "NARRATIVE: 用敘事的方式記錄，像在說故事一樣",
+    "FACTUAL: 純粹記錄事實，不加評論",
+]
+
+
+# prompt 只依賴這些欄位；其他欄位（訪談記錄、進度、時間戳記）改變時不需要重建
+PROFILE_FIELDS = (
+    "id", "lastName", "gender", "age", "occupation", "timesOfOverseasTravelInsurance",
+    "purchasedBrand", "purchasedChannels", "personalBackground",
+    "language_style", "big5", "risk_profile",
+)
+
+
+class PromptTemplate(NamedTuple):
+    """單一受訪者與問題無關的 prompt 片段"""
+    instructions: Tuple[str, ...]  # 固定的 system prompt（不含訪談歷史與問題）
+    verbosity: int
+    persona_name: str
+
+
+_MISSING = object()
+_TEMPLATE_CACHE_SIZE = 512
+_template_cache: "OrderedDict[Any, PromptTemplate]" = OrderedDict()
+_template_lock = threading.Lock()
+
+
+def _profile_key(persona: Dict[str, Any]) -> Any:
+    """persona 中影響 prompt 的欄位值，作為快取 key（內容改變即失效）"""
+    values = []
+    for field in PROFILE_FIELDS:
+        value = persona.get(field, _MISSING)
+        if isinstance(value, dict):
+            value = tuple(value.items())
+        elif isinstance(value, list):
+            value = tuple(value)
+        values.append(value)
+    key = tuple(values)
+    try:
+        hash(key)
+    except TypeError:
+        # 欄位內還有巢狀的 dict / list：改用完整序列化
+        key = json.dumps(
+            {field: persona[field] for field in PROFILE_FIELDS if field in persona},
+            ensure_ascii=False, sort_keys=True, default=str,
+        )
+    return key
+
+
+def _cached_template(builder: Callable[[Dict[str, Any]], PromptTemplate], persona: Dict[str, Any]) -> PromptTemplate:
+    """取得 persona 的 prompt 片段；同一 persona 內容只建立一次（LRU）"""
+    key = (builder.__name__, _profile_key(persona))
+    with _template_lock:
+        template = _template_cache.get(key)
+        if template is not None:
+            _template_cache.move_to_end(key)
+            return template
+    template = builder(persona)
+    with _template_lock:
+        _template_cache[key] = template
+        while len(_template_cache) > _TEMPLATE_CACHE_SIZE:
+            _template_cache.popitem(last=False)
+    return template
+
+
+def _question_rng(question: str) -> random.Random:
+    """同一問題產生相同擾動；以 md5 取種子，跨程序穩定且不影響全域 random"""
+    return random.Random(int(hashlib.md5(question.encode("utf-8")).hexdigest(), 16) % 10000)
+
+
+def _build_interview_template(persona: Dict[str, Any]) -> PromptTemplate:
+    """interview_vietnam_persona 的 persona 專屬 prompt"""
     # 建立受訪者背景描述
     background = f"""
 # INTERVIEWEE PROFILE:
@@ -43,291 +390,25 @@ def interview_vietnam_persona(
 - Background: {persona.get('personalBackground', 'No additional background')}
 """
 
-    # 建立訪談歷史摘要
-    history_summary = ""
-    if persona.get('interviewHistory'):
-        history_summary = "\n# PREVIOUS INTERVIEW RESPONSES:\n"
-        for record in persona['interviewHistory'][-5:]:  # 只取最近5筆
-            history_summary += f"Q: {record.get('question', '')}\n"
-            history_summary += f"A: {record.get('answer', '')}\n\n"
-
-    # 建立追問項目
-    sub_q_text = ""
-    if sub_questions:
-        sub_q_text = "\n## Sub-questions to address:\n"
-        for sq in sub_questions:
-            sub_q_text += f"- {sq}\n"
-
-    # 🌐 自動抓取問題中的 URL 內容
-    urls_found, url_content = extract_and_fetch_urls(question, sub_questions)
-    if urls_found:
-        print(f"🌐 [URL Fetcher] Found {len(urls_found)} URL(s), injecting real content into prompt")
-
     # 使用 persona ID 的 hash 來產生穩定但多樣化的個性特徵
-    import hashlib
     persona_id = persona.get('id', str(persona.get('lastName', '')))
     hash_val = int(hashlib.md5(persona_id.encode()).hexdigest(), 16)
 
-    # 多種可能的瀏覽起點（不基於刻板印象）
-    starting_points = [
-        "You always scroll to the BOTTOM first to see the footer and company info - it's a habit",
-        "You instinctively look for a SEARCH bar first - you hate navigating menus",
-        "You immediately try to find PRICE information before reading anything else",
-        "You check the URL bar first to make sure it's the official site, not a scam",
-        "You look at the IMAGES and banners first - visuals tell you a lot about a company",
-        "You look for CONTACT INFO or customer service number first - you want to know you can reach someone",
-        "You try to find REVIEWS or testimonials first before trusting any website",
-        "You check if there's an ENGLISH option - sometimes Vietnamese sites have translation errors",
-        "You look for the MOBILE APP download link - you prefer doing things on your phone",
-        "You scroll slowly and READ everything carefully - you don't want to miss important details",
-        "You look for COMPARISON tables immediately - you want to see options side by side",
-        "You check if there's a CHAT button - you prefer asking questions directly",
-    ]
-
-    # 多種可能的關注焦點
-    focus_points = [
-        "Coverage for MEDICAL emergencies abroad is your biggest concern",
-        "You care most about FLIGHT delay/cancellation coverage",
-        "BAGGAGE loss protection is what you look for first",
-        "You want to know the CLAIMS PROCESS - how easy is it to get money back?",
-        "You're mainly concerned about COVID-related coverage these days",
-        "You care about whether it covers ADVENTURE activities (diving, hiking)",
-        "Family coverage and whether it includes CHILDREN is your priority",
-        "You want to know if pre-existing CONDITIONS are covered",
-        "The REPUTATION of the insurance company matters most to you",
-        "You focus on whether there's 24/7 HOTLINE support in your destination country",
-        "You want to see ACTUAL EXAMPLES of claim payouts, not just limits",
-        "You're curious about the FINE PRINT and exclusions",
-    ]
-
-    # 多種可能的情緒/反應傾向
-    reaction_styles = [
-        "You tend to be SKEPTICAL - you've been burned by hidden fees before",
-        "You're generally OPTIMISTIC and trusting of established brands",
-        "You get IMPATIENT when websites are slow or confusing",
-        "You're THOROUGH - you read everything twice before deciding",
-        "You're INDECISIVE - you always want to compare with other options first",
-        "You make decisions QUICKLY based on gut feeling",
-        "You're PRICE-SENSITIVE - if it seems expensive, you'll look elsewhere",
-        "You value CONVENIENCE over price - you'll pay more for easier processes",
-        "You're CAUTIOUS about online purchases and prefer talking to a person",
-        "You're TECH-SAVVY and expect modern, smooth website experiences",
-        "You get ANNOYED by too much marketing speak and want straight facts",
-        "You appreciate BEAUTIFUL DESIGN and it affects your trust in a company",
-    ]
-
-    # 多種可能的個人情境
-    personal_contexts = [
-        "You're planning a trip SOON (within 2 weeks) so this is urgent",
-        "You're just RESEARCHING for a future trip, no rush",
-        "Someone RECOMMENDED this website to you",
-        "You're COMPARING this with another insurance site you just visited",
-        "This is your FIRST TIME looking at this company's website",
-        "You've HEARD of this company before but never used their website",
-        "You're looking for insurance for your PARENTS' trip, not yourself",
-        "You're on your LUNCH BREAK so you only have 10 minutes",
-        "You're browsing late at NIGHT, a bit tired but curious",
-        "A FRIEND asked you to help them find travel insurance",
-        "You saw an AD for this company and decided to check it out",
-        "You're on your PHONE, not a computer",
-    ]
-
-    # ===== 新增：回答立場多樣化 =====
-    # 對旅遊險的整體態度（不是每個人都正面看待）- 25種
-    insurance_attitudes = [
-        # 正面態度
-        "BELIEVER: You genuinely believe travel insurance is essential and worth every penny",
-        "PEACE_OF_MIND: You buy it mainly for psychological comfort, not because you expect to use it",
-        "RESPONSIBLE: You see buying insurance as being a responsible adult/parent/traveler",
-        "CONVERT: You used to not care, but one incident changed your mind completely",
-        "SAVED_ONCE: Insurance saved you before, now you're a strong advocate",
-        # 負面/懷疑態度
-        "SKEPTIC: You think most travel insurance is a waste of money, but buy it 'just in case'",
-        "CYNIC: You believe insurance companies always find ways to deny claims",
-        "BURNED: You had a terrible claim experience and are now very distrustful",
-        "RELUCTANT: You only buy because someone (family/company/visa) requires it",
-        "RESENTFUL: You hate being forced to buy but have no choice",
-        # 無所謂態度
-        "INDIFFERENT: You don't really care, it's just a checkbox to tick",
-        "PASSIVE: You let others (travel agent, family) decide for you",
-        "LAZY: You know you should research but never bother",
-        "FORGETFUL: You often forget to buy until the last minute or not at all",
-        "CHEAP: You always pick the absolute cheapest option without reading details",
-        # 研究型態度
-        "OVERTHINKER: You spend way too much time comparing and end up confused",
-        "RESEARCHER: You read every review and comparison before deciding",
-        "SPREADSHEET: You create detailed comparisons but still can't decide",
-        "PARALYZED: Too many options make you anxious and you delay decisions",
-        # 其他態度
-        "SUPERSTITIOUS: You feel like buying insurance 'jinxes' the trip",
-        "GAMBLER: You'd rather take the risk and save the money",
-        "BRAND_LOYAL: You stick to one brand because switching is too troublesome",
-        "CONVENIENCE: You buy whatever is fastest/easiest regardless of coverage",
-        "SOCIAL_PROOF: You only buy what friends/family recommend",
-        "PREMIUM_BUYER: You always buy the most expensive option assuming it's best",
-    ]
-
-    # 溝通風格（說話方式）- 20種
-    speaking_styles = [
-        # 長度相關
-        "VERBOSE: You give long, detailed explanations with many tangents and examples",
-        "CONCISE: You prefer short, direct answers - one or two sentences max",
-        "RAMBLING: You start answering, go off on tangents, sometimes forget the original question",
-        "MEASURED: You think carefully before speaking, choose words precisely",
-        # 結構相關
-        "STORYTELLER: You frame everything as stories with setup, conflict, resolution",
-        "ANALYTICAL: You break things into pros/cons, numbers, percentages",
-        "STREAM_OF_CONSCIOUSNESS: Your thoughts come out in whatever order they occur",
-        "STRUCTURED: You naturally organize thoughts into first, second, third",
-        # 情緒相關
-        "EMOTIONAL: You express strong feelings - excitement, frustration, fear",
-        "DEADPAN: You state things matter-of-factly without much emotion",
-        "DRAMATIC: You tend to exaggerate for effect",
-        "UNDERSTATED: You downplay everything, even significant events",
-        # 態度相關
-        "COMPLAINER: You naturally focus on problems and what went wrong",
-        "OPTIMIST: You tend to see the bright side even of bad experiences",
-        "BLUNT: You say exactly what you think without sugarcoating",
-        "DIPLOMATIC: You try to be balanced and not offend anyone",
-        "SELF_DEPRECATING: You make fun of yourself and your mistakes",
-        "HUMBLE_BRAGGER: You complain while subtly showing off",
-        # 其他
-        "TANGENTIAL: You answer but keep adding 'oh and also...' 'that reminds me...'",
-        "CIRCULAR: You sometimes repeat points you already made",
-    ]
-
-    # 過去經驗類型（不是每個人都有正面經驗）- 25種
-    past_experiences = [
-        # 正面經驗
-        "SMOOTH: All your purchases went smoothly, you have good impressions overall",
-        "SAVED_BIG: Insurance once covered a huge expense (hospital, lost luggage worth millions VND)",
-        "QUICK_CLAIM: You filed a claim once and were impressed by how fast it was processed",
-        "GOOD_SERVICE: You had great customer service experience with an insurance company",
-        # 負面經驗
-        "CLAIM_DENIED: You had a claim rejected on a technicality, still angry about it",
-        "ENDLESS_PAPERWORK: The claim process required so many documents you almost gave up",
-        "DELAYED_PAYMENT: You waited months to get reimbursed",
-        "UNDERPAID: Insurance paid much less than you expected/deserved",
-        "SCAMMED: You were tricked by a fake or misleading insurance product",
-        "FINE_PRINT: You discovered important exclusions only when you needed to claim",
-        "RUNAROUND: You got transferred between departments endlessly",
-        "LANGUAGE_BARRIER: You struggled to communicate with customer service",
-        # 沒用過
-        "NEVER_NEEDED: You've bought many times but thankfully never had to use it",
-        "ALMOST_NEEDED: You had a close call but didn't meet the threshold to claim",
-        "FORGOT_TO_CLAIM: Something happened but you forgot/didn't bother to file a claim",
-        # 特殊情況
-        "WORK_HANDLED: Your company always buys insurance, you've never done it yourself",
-        "FAMILY_DOES_IT: Your spouse/parent/child handles all insurance matters",
-        "AGENT_DEPENDENT: You always buy through the same agent who explains everything",
-        "SKIPPED_ONCE_OK: You forgot to buy once and thankfully nothing happened",
-        "SKIPPED_ONCE_BAD: You skipped insurance once and something went wrong - learned hard way",
-        "DOUBLE_COVERAGE: You once accidentally bought two policies for the same trip",
-        "WRONG_DATES: You once bought insurance for wrong dates and couldn't use it",
-        "LOST_DOCUMENTS: You couldn't claim because you lost the required receipts/documents",
-        "COVID_CHAOS: Your pandemic-era claims were a nightmare",
-        "FIRST_TIMER: This is genuinely your first time thinking about travel insurance",
-    ]
-
-    # ===== 新增：敘事風格多樣化 =====
-    # 回答開頭風格（打破「嗯，我第一次...」的公式）- 20種
-    opening_styles = [
-        # 場景/記憶型
-        "START with a SPECIFIC MEMORY - '那天下著雨...', '記得那時候在機場...'",
-        "START with a SENSORY detail - '我還記得那個網站的顏色...', '那天手機訊號很差...'",
-        "START with a LOCATION - '那時候我人在日本...', '在旅行社的辦公室裡...'",
-        "START with TIME context - '大概是三年前吧...', '那是疫情之前的事了...'",
-        # 情緒/感受型
-        "START with your FEELING - '說實話當時有點慌...', '其實一開始我是拒絕的...'",
-        "START with FRUSTRATION - '唉，說到這個我就煩...', '這個話題讓我想起一件很氣的事...'",
-        "START with CONFUSION - '老實說我到現在還是搞不太懂...', '那時候真的很困惑...'",
-        "START with EXCITEMENT - '哦這個我很有經驗！', '終於有人問這個了...'",
-        # 對比/意外型
-        "START with a CONTRAST - '本來以為很簡單，結果...', '跟我想的完全不一樣...'",
-        "START with a SURPRISE - '你不會相信發生了什麼事...', '結果出乎我意料...'",
-        "START with IRONY - '說來好笑...', '諷刺的是...'",
-        # 他人影響型
-        "START with SOMEONE ELSE - '是我媽一直唸說...', '我老公每次都會...'",
-        "START with a RECOMMENDATION - '朋友跟我說...', '網路上有人推薦...'",
-        # 質疑/思考型
-        "START by QUESTIONING - '買保險喔...其實我一直在想這值不值得'",
-        "START with HESITATION - '欸...讓我想一下喔...', '這個嘛...有點久了...'",
-        "START with ADMISSION - '說實話我不太懂這些...', '我可能不是最好的例子...'",
-        # 動作/過程型
-        "START in MEDIA RES - '當時我人已經在機場了...', '那時候正在打包行李...'",
-        "START with a TANGENT - '說到這個，我先講個題外話...', '其實這要從我的工作說起...'",
-        "START with CONTEXT - '你要先知道，我是那種...', '我這個人比較...所以...'",
-        "START DIRECTLY - '就是去年的事。', '很簡單，我就是...'",
-    ]
-
-    # 回答結構風格（打破「年齡→情境→品牌→感想」的公式）- 15種
-    structure_styles = [
-        # 情感導向
-        "EMOTION-DRIVEN: Focus on how you FELT at each stage, not just facts",
-        "ANXIETY-FOCUSED: Emphasize your worries, doubts, and how you dealt with them",
-        "RELIEF-CENTERED: Build towards moments of relief or resolution",
-        # 問題解決
-        "PROBLEM-SOLVING: Frame it as obstacles you faced and how you solved them",
-        "TRIAL-AND-ERROR: Describe what you tried, what failed, what finally worked",
-        "LEARNING-CURVE: Show how your understanding evolved over time",
-        # 人際關係
-        "RELATIONSHIP-FOCUSED: Emphasize who was with you, who influenced you",
-        "ADVICE-BASED: Structure around advice you received or would give",
-        # 感官/細節
-        "SENSORY: Describe what you SAW, HEARD, the environment around you",
-        "PROCESS-ORIENTED: Step by step what you actually did, very practical",
-        # 比較/反思
-        "COMPARISON: Compare with other experiences - 'unlike buying phone insurance...'",
-        "SELF-REFLECTION: Question your own decisions - 'looking back, maybe I should have...'",
-        "HINDSIGHT: Use lots of 'if I knew then what I know now...' framing",
-        # 敘事
-        "STORYTELLING: Build up to a climax or turning point",
-        "MEANDERING: Jump between related thoughts without strict structure",
-    ]
-
-    # 回答結尾風格（打破「總之...值得」的套路）- 18種
-    ending_styles = [
-        # 未解決/開放
-        "END with UNRESOLVED question - '但我到現在還是不確定...'",
-        "END with AMBIVALENCE - '說不上好還是不好吧...'",
-        "END with ONGOING ISSUE - '這個問題我還在想...'",
-        # 幽默/自嘲
-        "END with HUMOR - '結果錢花了也沒用到，哈哈'",
-        "END with SELF-DEPRECATION - '早知道就...算了不說了'",
-        "END with IRONY - '所以你看，這就是為什麼...'",
-        # 突然結束
-        "END ABRUPTLY - '大概就這樣吧', '對啊就是這樣'",
-        "END with TRAILING OFF - '然後就...對，就這樣...'",
-        "END with SHRUG - '反正也沒什麼大不了的...'",
-        # 建議/教訓
-        "END with ADVICE - '如果是你的話我建議...'",
-        "END with WARNING - '所以要小心...', '給你一個提醒...'",
-        "END with LESSON - '這件事讓我學到...'（但不要用老套的方式）",
-        # 回顧/展望
-        "END by CIRCLING BACK - reference something you mentioned at the start",
-        "END with LINGERING FEELING - '現在想起來還是有點...'",
-        "END with FUTURE INTENTION - '下次出國我會...', '之後我打算...'",
-        "END with CHANGED PERSPECTIVE - '現在我對這件事的看法...'",
-        # 連接現在
-        "END with CONNECTION to NOW - '所以你現在問我這個...'",
-        "END with QUESTION BACK - '你覺得呢？', '其他人都怎麼做？'",
-    ]
-
     # 基於 hash 選擇特徵（確保同一 persona 每次得到相同特徵）
-    starting_point = starting_points[hash_val % len(starting_points)]
-    focus_point = focus_points[(hash_val // 100) % len(focus_points)]
-    reaction_style = reaction_styles[(hash_val // 10000) % len(reaction_styles)]
-    personal_context = personal_contexts[(hash_val // 1000000) % len(personal_contexts)]
+    starting_point = STARTING_POINTS[hash_val % len(STARTING_POINTS)]
+    focus_point = FOCUS_POINTS[(hash_val // 100) % len(FOCUS_POINTS)]
+    reaction_style = REACTION_STYLES[(hash_val // 10000) % len(REACTION_STYLES)]
+    personal_context = PERSONAL_CONTEXTS[(hash_val // 1000000) % len(PERSONAL_CONTEXTS)]
 
     # 新增立場/態度選擇
-    insurance_attitude = insurance_attitudes[(hash_val // 3) % len(insurance_attitudes)]
-    speaking_style = speaking_styles[(hash_val // 11) % len(speaking_styles)]
-    past_experience = past_experiences[(hash_val // 19) % len(past_experiences)]
+    insurance_attitude = INSURANCE_ATTITUDES[(hash_val // 3) % len(INSURANCE_ATTITUDES)]
+    speaking_style = SPEAKING_STYLES[(hash_val // 11) % len(SPEAKING_STYLES)]
+    past_experience = PAST_EXPERIENCES[(hash_val // 19) % len(PAST_EXPERIENCES)]
 
     # 新增敘事風格選擇
-    opening_style = opening_styles[(hash_val // 7) % len(opening_styles)]
-    structure_style = structure_styles[(hash_val // 13) % len(structure_styles)]
-    ending_style = ending_styles[(hash_val // 17) % len(ending_styles)]
+    opening_style = OPENING_STYLES[(hash_val // 7) % len(OPENING_STYLES)]
+    structure_style = STRUCTURE_STYLES[(hash_val // 13) % len(STRUCTURE_STYLES)]
+    ending_style = ENDING_STYLES[(hash_val // 17) % len(ENDING_STYLES)]
 
     # ===== PPV 驅動的說話風格 =====
     language_style = persona.get('language_style', {})
@@ -472,7 +553,6 @@ def interview_vietnam_persona(
         "You are participating in a user research interview conducted by a Taiwanese company.",
         "",
         background,
-        history_summary,
         "",
         "# 🎭 YOUR CORE PERSONALITY (MUST STAY IN CHARACTER):",
         "",
@@ -605,13 +685,42 @@ def interview_vietnam_persona(
         "- Instead: Share a MEMORABLE moment, a SPECIFIC confusion, or a UNIQUE discovery",
     ]
 
-    # 如果有抓取到 URL 內容，加入 instructions
-    if url_content:
-        instructions.append("")
-        instructions.append(url_content)
+    persona_name = f"{persona.get('lastName', 'Unknown')} {'先生' if persona.get('gender') == 'Male' else '小姐'}"
+    return PromptTemplate(tuple(instructions), verbosity, persona_name)
+
+
+INTERVIEW_HISTORY_HEADER = "# PREVIOUS INTERVIEW RESPONSES:"
+OBSERVER_HISTORY_HEADER = "# PREVIOUS INTERVIEW RESPONSES (for context):"
+
+
+def _build_interview_call(
+    persona: Dict[str, Any],
+    question: str,
+    sub_questions: Optional[List[str]],
+    history_summary: str,
+    urls_found: List[str],
+    url_content: str,
+) -> Tuple[Agent, str]:
+    """建立受訪者 Agent 與問題 prompt（同步 / 非同步版本共用）"""
+
+    template = _cached_template(_build_interview_template, persona)
+    verbosity = template.verbosity
+
+    # 建立追問項目
+    sub_q_text = ""
+    if sub_questions:
+        sub_q_text = "\n## Sub-questions to address:\n"
+        for sq in sub_questions:
+            sub_q_text += f"- {sq}\n"
+
+    if urls_found:
+        print(f"🌐 [URL Fetcher] Found {len(urls_found)} URL(s), injecting real content into prompt")
+
+    # 訪談歷史與網頁內容每次都不同，放在 user message 的問題前面，system prompt 保持固定
+    context = "".join(part + "\n" for part in (history_summary, url_content) if part)
 
     # 建立問題提示
-    question_prompt = f"""
+    question_prompt = f"""{context}
 Current Interview Question:
 {question}
 {sub_q_text}
@@ -633,9 +742,8 @@ Please respond naturally as a Vietnamese interviewee. Share your genuine experie
     max_tokens = int(min_tokens + (verbosity / 100) * (max_tokens_limit - min_tokens))
 
     # 3. 額外：加入隨機擾動（±15%），增加同一 persona 不同問題的變化
-    import random
-    random.seed(hash(question) % 10000)  # 同一問題產生相同擾動
-    noise = random.uniform(0.85, 1.15)
+    rng = _question_rng(question)  # 同一問題產生相同擾動
+    noise = rng.uniform(0.85, 1.15)
     max_tokens = int(max_tokens * noise)
     max_tokens = max(60, min(900, max_tokens))  # 確保在合理範圍
 
@@ -646,40 +754,100 @@ Please respond naturally as a Vietnamese interviewee. Share your genuine experie
         model=OpenAIChat(
             id="gpt-4o",
             temperature=dynamic_temperature,
-            max_tokens=max_tokens
+            max_tokens=max_tokens,
+            request_params=prompt_cache_key("vietnam_interview", persona.get('id')),
+            max_retries=SDK_MAX_RETRIES,
         ),
         description="You are a Vietnamese person being interviewed about travel insurance experiences.",
-        instructions=instructions,
+        instructions=list(template.instructions),
         markdown=False
     )
+    return agent, question_prompt
 
-    try:
-        response = agent.run(question_prompt, stream=False)
-        return response.content
-    except Exception as e:
-        print(f"❌ Vietnam interview failed: {e}")
-        return "（抱歉，系統發生錯誤，請再試一次）"
 
+class InterviewError(RuntimeError):
+    """模型呼叫失敗（raise_on_error=True 時拋出，讓批量訪談 / 訪談活動標記失敗並重試）"""
 
-def interview_vietnam_persona_observer(
+
+def _run_content(response: Any) -> str:
+    """取出 agent 回答；Agno 會把模型錯誤包成 status=ERROR 的回應而不拋出，這裡轉成例外"""
+    if getattr(response, "status", None) == RunStatus.error:
+        raise InterviewError(str(response.content or "agent run failed"))
+    return response.content
+
+
+def interview_vietnam_persona(
     persona: Dict[str, Any],
     question: str,
-    sub_questions: List[str] = None
+    sub_questions: List[str] = None,
+    url_context: Optional[URLContext] = None,
+    raise_on_error: bool = False,
+    on_summary: Optional[SummarySink] = None,
 ) -> str:
     """
-    使用 Agno Agent 模擬越南受訪者回答問題 - 第三方觀察者視角輸出
-
-    輸出格式：「Nguyễn 先生表示...」而非第一人稱
+    使用 Agno Agent 模擬越南受訪者回答問題
 
     Args:
         persona: 受訪者基本資料
         question: 當前訪談問題
         sub_questions: 追問項目列表
+        url_context: 已抓取好的網址內容（批量訪談時預先抓取一次）；None 時自動抓取問題中的 URL
+        raise_on_error: 模型呼叫失敗時拋出 InterviewError，而不是回傳錯誤訊息文字
+        on_summary: 互動式訪談用；歷史摘要改在背景更新並交給此函式保存（不等待摘要模型）
 
     Returns:
-        以第三方觀察者視角撰寫的記錄
+        模擬的回答文字
     """
+    # 建立訪談歷史：較早的問答用摘要，最近幾筆保留原文（限制 token 預算）
+    history_summary = format_history_context(build_history_context(persona, on_summary=on_summary), INTERVIEW_HISTORY_HEADER)
+    # 🌐 自動抓取問題中的 URL 內容（呼叫端已預先抓取時直接使用）
+    urls_found, url_content = url_context if url_context is not None else extract_and_fetch_urls(question, sub_questions)
+    agent, question_prompt = _build_interview_call(
+        persona, question, sub_questions, history_summary, urls_found, url_content
+    )
+
+    try:
+        response = agent.run(question_prompt, stream=False)
+        record_usage("vietnam_interview", response)
+        return _run_content(response)
+    except Exception as e:
+        print(f"❌ Vietnam interview failed: {e}")
+        if raise_on_error:
+            raise
+        return "（抱歉，系統發生錯誤，請再試一次）"
+
+
+async def ainterview_vietnam_persona(
+    persona: Dict[str, Any],
+    question: str,
+    sub_questions: List[str] = None,
+    url_context: Optional[URLContext] = None,
+    raise_on_error: bool = False,
+    on_summary: Optional[SummarySink] = None,
+) -> str:
+    """
+    interview_vietnam_persona 的非同步版本
+    等待模型回應時不佔用執行緒，適合在 event loop 上大量並行
+    """
+    history_summary = format_history_context(await abuild_history_context(persona, on_summary=on_summary), INTERVIEW_HISTORY_HEADER)
+    urls_found, url_content = url_context if url_context is not None else await aextract_and_fetch_urls(question, sub_questions)
+    agent, question_prompt = _build_interview_call(
+        persona, question, sub_questions, history_summary, urls_found, url_content
+    )
 
+    try:
+        response = await agent.arun(question_prompt, stream=False)
+        record_usage("vietnam_interview", response)
+        return _run_content(response)
+    except Exception as e:
+        print(f"❌ Vietnam interview failed: {e}")
+        if raise_on_error:
+            raise
+        return "（抱歉，系統發生錯誤，請再試一次）"
+
+
+def _build_observer_template(persona: Dict[str, Any]) -> PromptTemplate:
+    """interview_vietnam_persona_observer 的 persona 專屬 prompt"""
     # 建立受訪者名稱
     persona_name = f"{persona.get('lastName', 'Unknown')} {'先生' if persona.get('gender') == 'Male' else '小姐'}"
 
@@ -695,55 +863,12 @@ def interview_vietnam_persona_observer(
 - Background: {persona.get('personalBackground', 'No additional background')}
 """
 
-    # 建立訪談歷史摘要
-    history_summary = ""
-    if persona.get('interviewHistory'):
-        history_summary = "\n# PREVIOUS INTERVIEW RESPONSES (for context):\n"
-        for record in persona['interviewHistory'][-5:]:  # 只取最近5筆
-            history_summary += f"Q: {record.get('question', '')}\n"
-            history_summary += f"A: {record.get('answer', '')}\n\n"
-
-    # 建立追問項目
-    sub_q_text = ""
-    if sub_questions:
-        sub_q_text = "\n## Sub-questions to address:\n"
-        for sq in sub_questions:
-            sub_q_text += f"- {sq}\n"
-
-    # 🌐 自動抓取問題中的 URL 內容
-    urls_found, url_content = extract_and_fetch_urls(question, sub_questions)
-    if urls_found:
-        print(f"🌐 [URL Fetcher] Found {len(urls_found)} URL(s), injecting real content into prompt")
-
     # 使用 persona ID 的 hash 來產生穩定但多樣化的個性特徵
-    import hashlib
     persona_id = persona.get('id', str(persona.get('lastName', '')))
     hash_val = int(hashlib.md5(persona_id.encode()).hexdigest(), 16)
 
-    # 保險態度選項
-    insurance_attitudes = [
-        "TRUSTING: Believes insurance is valuable and worth buying",
-        "SKEPTICAL: Thinks insurance companies try to avoid paying claims",
-        "PRAGMATIC: Buys only when required or for high-risk trips",
-        "ANXIOUS: Worried about not having enough coverage",
-        "INDIFFERENT: Doesn't really care about insurance details",
-        "PRICE_SENSITIVE: Mainly looks at the cheapest options",
-        "BRAND_LOYAL: Sticks with one trusted company",
-        "RESEARCH_HEAVY: Compares many options before deciding",
-    ]
-
-    # 過往經驗選項
-    past_experiences = [
-        "SMOOTH: All purchases went smoothly, good impressions overall",
-        "SAVED_BIG: Insurance once covered a huge expense",
-        "CLAIM_DENIED: Had a claim rejected, still frustrated about it",
-        "NEVER_NEEDED: Bought many times but never had to use it",
-        "BAD_SERVICE: Had poor customer service experience",
-        "GOOD_SERVICE: Had great customer service experience",
-    ]
-
-    insurance_attitude = insurance_attitudes[(hash_val // 3) % len(insurance_attitudes)]
-    past_experience = past_experiences[(hash_val // 19) % len(past_experiences)]
+    insurance_attitude = OBSERVER_INSURANCE_ATTITUDES[(hash_val // 3) % len(OBSERVER_INSURANCE_ATTITUDES)]
+    past_experience = OBSERVER_PAST_EXPERIENCES[(hash_val // 19) % len(OBSERVER_PAST_EXPERIENCES)]
 
     # ===== 回答長度控制（連續縮放）=====
     verbosity = persona.get('language_style', {}).get('verbosity', 50)
@@ -773,17 +898,7 @@ def interview_vietnam_persona_observer(
 - Sentences: {obs_sentences_min}-{obs_sentences_max}
 """
 
-    # 使用 hash 選擇不同的記錄風格
-    note_styles = [
-        "DIRECT_QUOTE: 多使用直接引述，如「他說：『...』」",
-        "SUMMARY: 用簡潔的方式總結受訪者的觀點",
-        "BEHAVIORAL: 多描述受訪者的行為和反應，如表情、語氣、猶豫等",
-        "ANALYTICAL: 帶有分析性的觀察，指出受訪者觀點的特點",
-        "NARRATIVE: 用敘事的方式記錄，像在說故事一樣",
-        "FACTUAL: 純粹記錄事實，不加評論",
-    ]
-
-    note_style = note_styles[(hash_val // 23) % len(note_styles)]
+    note_style = NOTE_STYLES[(hash_val // 23) % len(NOTE_STYLES)]
 
     instructions = [
         "# ROLE: Third-Party Research Observer",
@@ -792,7 +907,6 @@ def interview_vietnam_persona_observer(
         f"The interviewee is '{persona_name}'.",
         "",
         background,
-        history_summary,
         "",
         "# CRITICAL RULES:",
         "",
@@ -826,13 +940,38 @@ def interview_vietnam_persona_observer(
         "- Make it sound like natural field notes, not a form template",
     ]
 
-    # 如果有抓取到 URL 內容，加入 instructions
-    if url_content:
-        instructions.append("")
-        instructions.append(url_content)
+    return PromptTemplate(tuple(instructions), verbosity, persona_name)
+
+
+def _build_observer_call(
+    persona: Dict[str, Any],
+    question: str,
+    sub_questions: Optional[List[str]],
+    history_summary: str,
+    urls_found: List[str],
+    url_content: str,
+) -> Tuple[Agent, str]:
+    """建立觀察者 Agent 與問題 prompt（同步 / 非同步版本共用）"""
+
+    template = _cached_template(_build_observer_template, persona)
+    persona_name = template.persona_name
+    verbosity = template.verbosity
+
+    # 建立追問項目
+    sub_q_text = ""
+    if sub_questions:
+        sub_q_text = "\n## Sub-questions to address:\n"
+        for sq in sub_questions:
+            sub_q_text += f"- {sq}\n"
+
+    if urls_found:
+        print(f"🌐 [URL Fetcher] Found {len(urls_found)} URL(s), injecting real content into prompt")
+
+    # 訪談歷史與網頁內容每次都不同，放在 user message 的問題前面，system prompt 保持固定
+    context = "".join(part + "\n" for part in (history_summary, url_content) if part)
 
     # 建立問題提示
-    question_prompt = f"""
+    question_prompt = f"""{context}
 訪談問題：{question}
 {sub_q_text}
 
@@ -852,9 +991,8 @@ def interview_vietnam_persona_observer(
     max_tokens = int(min_tokens + (verbosity / 100) * (max_tokens_limit - min_tokens))
 
     # 加入隨機擾動
-    import random
-    random.seed(hash(question) % 10000)
-    noise = random.uniform(0.85, 1.15)
+    rng = _question_rng(question)
+    noise = rng.uniform(0.85, 1.15)
     max_tokens = int(max_tokens * noise)
     max_tokens = max(50, min(700, max_tokens))
 
@@ -865,18 +1003,83 @@ def interview_vietnam_persona_observer(
         model=OpenAIChat(
             id="gpt-4o",
             temperature=dynamic_temperature,
-            max_tokens=max_tokens
+            max_tokens=max_tokens,
+            request_params=prompt_cache_key("vietnam_observer", persona.get('id')),
+            max_retries=SDK_MAX_RETRIES,
         ),
         description=f"You are a research observer recording interview notes about {persona_name}.",
-        instructions=instructions,
+        instructions=list(template.instructions),
         markdown=False
     )
+    return agent, question_prompt
+
+
+def interview_vietnam_persona_observer(
+    persona: Dict[str, Any],
+    question: str,
+    sub_questions: List[str] = None,
+    url_context: Optional[URLContext] = None,
+    raise_on_error: bool = False,
+    on_summary: Optional[SummarySink] = None,
+) -> str:
+    """
+    使用 Agno Agent 模擬越南受訪者回答問題 - 第三方觀察者視角輸出
+
+    輸出格式：「Nguyễn 先生表示...」而非第一人稱
+
+    Args:
+        persona: 受訪者基本資料
+        question: 當前訪談問題
+        sub_questions: 追問項目列表
+        url_context: 已抓取好的網址內容（批量訪談時預先抓取一次）；None 時自動抓取問題中的 URL
+        raise_on_error: 模型呼叫失敗時拋出 InterviewError，而不是回傳錯誤訊息文字
+        on_summary: 互動式訪談用；歷史摘要改在背景更新並交給此函式保存（不等待摘要模型）
+
+    Returns:
+        以第三方觀察者視角撰寫的記錄
+    """
+    # 建立訪談歷史：較早的問答用摘要，最近幾筆保留原文（限制 token 預算）
+    history_summary = format_history_context(build_history_context(persona, on_summary=on_summary), OBSERVER_HISTORY_HEADER)
+    # 🌐 自動抓取問題中的 URL 內容（呼叫端已預先抓取時直接使用）
+    urls_found, url_content = url_context if url_context is not None else extract_and_fetch_urls(question, sub_questions)
+    agent, question_prompt = _build_observer_call(
+        persona, question, sub_questions, history_summary, urls_found, url_content
+    )
 
     try:
         response = agent.run(question_prompt, stream=False)
-        return response.content
+        record_usage("vietnam_observer", response)
+        return _run_content(response)
+    except Exception as e:
+        print(f"❌ Observer notes generation failed: {e}")
+        if raise_on_error:
+            raise
+        return f"（記錄失敗：{str(e)}）"
+
+
+async def ainterview_vietnam_persona_observer(
+    persona: Dict[str, Any],
+    question: str,
+    sub_questions: List[str] = None,
+    url_context: Optional[URLContext] = None,
+    raise_on_error: bool = False,
+    on_summary: Optional[SummarySink] = None,
+) -> str:
+    """interview_vietnam_persona_observer 的非同步版本"""
+    history_summary = format_history_context(await abuild_history_context(persona, on_summary=on_summary), OBSERVER_HISTORY_HEADER)
+    urls_found, url_content = url_context if url_context is not None else await aextract_and_fetch_urls(question, sub_questions)
+    agent, question_prompt = _build_observer_call(
+        persona, question, sub_questions, history_summary, urls_found, url_content
+    )
+
+    try:
+        response = await agent.arun(question_prompt, stream=False)
+        record_usage("vietnam_observer", response)
+        return _run_content(response)
     except Exception as e:
         print(f"❌ Observer notes generation failed: {e}")
+        if raise_on_error:
+            raise
         return f"（記錄失敗：{str(e)}）"
 
 
@@ -1,31 +1,91 @@
 """
 語義問題比對器
 使用 OpenAI Embeddings 計算問題之間的語義相似度，自動合併相似問題
+
+embedding 以批次取得：一次請求最多 EMBEDDING_BATCH_SIZE 筆，超過時分塊並行（EMBEDDING_CONCURRENCY），
+已算過的文字直接從 embedding_store 取用（SQLite 持久快取，跨請求與重啟共用，見 embedding_store.py）
+
+分組時的兩兩相似度以 NumPy 一次算出（正規化後的矩陣乘法），未安裝 NumPy 時使用純 Python 計算
 """
 import os
+import re
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Tuple
 from dotenv import load_dotenv
 from openai import OpenAI
+from embedding_store import get_embedding_store
+from llm_scheduler import SDK_MAX_RETRIES, llm_http_client
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 load_dotenv()
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"), http_client=llm_http_client(), max_retries=SDK_MAX_RETRIES)
 
 # 相似度閾值 - 高於此值視為相同問題
 # 0.85 太嚴格（「請概述自己的旅遊習慣」和「目前你的旅遊習慣是什麼」只有 ~0.73）
 # 0.72 能捕捉到語義相似但措辭不同的問題
 SIMILARITY_THRESHOLD = 0.72
 
+EMBEDDING_MODEL = "text-embedding-3-small"
+# embeddings API 單次最多 2048 筆輸入
+EMBEDDING_BATCH_SIZE = min(2048, int(os.getenv("EMBEDDING_BATCH_SIZE", "256")))
+EMBEDDING_CONCURRENCY = int(os.getenv("EMBEDDING_CONCURRENCY", "4"))
+
+# float32 矩陣先篩出候選的容許誤差，候選再以 float64 確認（結果與逐對計算相同）
+_SIMILARITY_MARGIN = 1e-4
+# 每次計算的相似度矩陣列數（限制暫存記憶體）
+_SIMILARITY_BLOCK = 1024
+
+_QUOTES_PATTERN = re.compile(r'["「『"」』"]')
+_QUESTION_MARK_PATTERN = re.compile(r'[？?]')
+_WHITESPACE_PATTERN = re.compile(r'\s+')
+
 
 def get_embedding(text: str) -> List[float]:
     """取得文字的 embedding 向量"""
     response = client.embeddings.create(
-        model="text-embedding-3-small",
+        model=EMBEDDING_MODEL,
         input=text
     )
     return response.data[0].embedding
 
 
+def _embed_batch(texts: List[str]) -> List[List[float]]:
+    """一次請求取得多筆 embedding（依輸入順序）"""
+    response = client.embeddings.create(model=EMBEDDING_MODEL, input=texts)
+    return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+
+def get_embeddings(texts: List[str]) -> List[List[float]]:
+    """
+    批次取得多筆文字的 embedding（與輸入順序相同）
+
+    快取中沒有的文字去重後分塊請求，多個分塊並行送出；
+    失敗的分塊回傳空向量（呼叫端略過），不寫入快取
+    """
+    return get_embedding_store().get_or_embed(EMBEDDING_MODEL, texts, _embed_missing)
+
+
+def _embed_missing(missing: List[str]) -> List[List[float]]:
+    chunks = [missing[i:i + EMBEDDING_BATCH_SIZE] for i in range(0, len(missing), EMBEDDING_BATCH_SIZE)]
+
+    def fetch(chunk: List[str]) -> List[List[float]]:
+        try:
+            return _embed_batch(chunk)
+        except Exception as e:
+            print(f"  ⚠️ Failed to get embeddings for {len(chunk)} texts: {e}")
+            return [[] for _ in chunk]
+
+    if len(chunks) == 1:
+        return fetch(chunks[0])
+    with ThreadPoolExecutor(max_workers=min(EMBEDDING_CONCURRENCY, len(chunks))) as pool:
+        return [vector for vectors in pool.map(fetch, chunks) for vector in vectors]
+
+
 def cosine_similarity(vec1: List[float], vec2: List[float]) -> float:
     """計算兩個向量的餘弦相似度"""
     dot_product = sum(a * b for a, b in zip(vec1, vec2))
@@ -38,16 +98,81 @@ def cosine_similarity(vec1: List[float], vec2: List[float]) -> float:
 
 def normalize_question_basic(question: str) -> str:
     """基礎文字正規化（移除標點、空白等）"""
-    import re
     # 移除引號
-    question = re.sub(r'["「『"」』"]', '', question)
+    question = _QUOTES_PATTERN.sub('', question)
     # 移除問號
-    question = re.sub(r'[？?]', '', question)
+    question = _QUESTION_MARK_PATTERN.sub('', question)
     # 移除多餘空白
-    question = re.sub(r'\s+', '', question)
+    question = _WHITESPACE_PATTERN.sub('', question)
     return question.strip()
 
 
+# (代表問題的 index, [(併入的問題 index, 相似度), ...])
+IndexGroups = List[Tuple[int, List[Tuple[int, float]]]]
+
+
+def _group_indices(embeddings: List[List[float]], threshold: float) -> IndexGroups:
+    """
+    依序以尚未分組的問題為代表，把後面相似度 >= threshold 且尚未分組的問題併入
+    embedding 為空（取得失敗）的問題不參與分組
+    """
+    if np is None:
+        return _group_indices_python(embeddings, threshold)
+
+    n = len(embeddings)
+    valid = np.array([bool(emb) for emb in embeddings])
+    if not valid.any():
+        return []
+    dimensions = len(next(emb for emb in embeddings if emb))
+    vectors = np.zeros((n, dimensions))
+    vectors[valid] = np.array([emb for emb in embeddings if emb], dtype=float)
+    norms = np.linalg.norm(vectors, axis=1)
+    unit = vectors / np.where(norms == 0, 1.0, norms)[:, None]  # 零向量的相似度為 0
+
+    # 兩兩相似度：float32 矩陣乘法分塊計算，只保留可能超過閾值的位置
+    unit32 = unit.astype(np.float32)
+    candidates = np.empty((n, n), dtype=bool)
+    for start in range(0, n, _SIMILARITY_BLOCK):
+        block = unit32[start:start + _SIMILARITY_BLOCK] @ unit32.T
+        candidates[start:start + _SIMILARITY_BLOCK] = block >= threshold - _SIMILARITY_MARGIN
+
+    used = ~valid
+    groups: IndexGroups = []
+    for i in range(n):
+        if used[i]:
+            continue
+        used[i] = True
+        later = np.flatnonzero(candidates[i, i + 1:] & ~used[i + 1:]) + i + 1
+        merged: List[Tuple[int, float]] = []
+        if later.size:
+            similarities = unit[later] @ unit[i]
+            keep = similarities >= threshold
+            used[later[keep]] = True
+            merged = list(zip(later[keep].tolist(), similarities[keep].tolist()))
+        groups.append((i, merged))
+    return groups
+
+
+def _group_indices_python(embeddings: List[List[float]], threshold: float) -> IndexGroups:
+    """_group_indices 的純 Python 版本（未安裝 NumPy 時使用）"""
+    groups: IndexGroups = []
+    used: set = set()
+    for i in range(len(embeddings)):
+        if i in used or not embeddings[i]:
+            continue
+        used.add(i)
+        merged = []
+        for j in range(i + 1, len(embeddings)):
+            if j in used or not embeddings[j]:
+                continue
+            similarity = cosine_similarity(embeddings[i], embeddings[j])
+            if similarity >= threshold:
+                merged.append((j, similarity))
+                used.add(j)
+        groups.append((i, merged))
+    return groups
+
+
 def group_similar_questions(
     questions: List[str],
     threshold: float = SIMILARITY_THRESHOLD
@@ -67,67 +192,37 @@ def group_similar_questions(
     if not questions:
         return {}
 
-    # 先做基礎正規化去重
-    normalized_map: Dict[str, str] = {}  # normalized -> first original
+    # 先做基礎正規化去重（同時記下每個正規化結果對應的所有原始問題）
+    originals_by_normalized: Dict[str, List[str]] = {}
     unique_questions: List[str] = []
 
     for q in questions:
         normalized = normalize_question_basic(q)
-        if normalized not in normalized_map:
-            normalized_map[normalized] = q
+        originals = originals_by_normalized.get(normalized)
+        if originals is None:
+            originals_by_normalized[normalized] = [q]
             unique_questions.append(q)
+        elif q not in originals:
+            originals.append(q)
 
     if len(unique_questions) <= 1:
         return {unique_questions[0]: questions} if unique_questions else {}
 
     print(f"🔍 [Semantic Matcher] Computing embeddings for {len(unique_questions)} unique questions...")
 
-    # 計算所有問題的 embedding
-    embeddings: List[List[float]] = []
-    for q in unique_questions:
-        try:
-            emb = get_embedding(q)
-            embeddings.append(emb)
-        except Exception as e:
-            print(f"  ⚠️ Failed to get embedding for: {q[:30]}... - {e}")
-            embeddings.append([])
-
-    # 分組相似問題
-    groups: Dict[str, List[str]] = {}
-    used: set = set()
-
-    for i, q1 in enumerate(unique_questions):
-        if i in used or not embeddings[i]:
-            continue
-
-        # 建立新群組，以此問題為代表
-        group = [q1]
-        used.add(i)
+    # 批次計算所有問題的 embedding（已快取的不再請求）
+    embeddings = get_embeddings(unique_questions)
 
-        for j, q2 in enumerate(unique_questions):
-            if j in used or j <= i or not embeddings[j]:
-                continue
-
-            similarity = cosine_similarity(embeddings[i], embeddings[j])
-            if similarity >= threshold:
-                group.append(q2)
-                used.add(j)
-                print(f"  ✓ Merged: '{q1[:25]}...' ≈ '{q2[:25]}...' (sim={similarity:.3f})")
-
-        groups[q1] = group
-
-    # 將原始問題（包括基礎正規化後相同的）映射回群組
+    # 分組相似問題，並把原始問題（包括基礎正規化後相同的）映射回群組
     final_groups: Dict[str, List[str]] = {}
-    for canonical, similar_list in groups.items():
-        all_originals = []
-        for similar_q in similar_list:
-            # 找出所有基礎正規化後等於 similar_q 的原始問題
-            similar_normalized = normalize_question_basic(similar_q)
-            for orig_q in questions:
-                if normalize_question_basic(orig_q) == similar_normalized:
-                    if orig_q not in all_originals:
-                        all_originals.append(orig_q)
-        final_groups[canonical] = all_originals if all_originals else similar_list
+    for i, merged in _group_indices(embeddings, threshold):
+        q1 = unique_questions[i]
+        all_originals = list(originals_by_normalized[normalize_question_basic(q1)])
+        for j, similarity in merged:
+            q2 = unique_questions[j]
+            print(f"  ✓ Merged: '{q1[:25]}...' ≈ '{q2[:25]}...' (sim={similarity:.3f})")
+            all_originals.extend(originals_by_normalized[normalize_question_basic(q2)])
+        final_groups[q1] = all_originals
 
     print(f"✓ [Semantic Matcher] Grouped {len(questions)} questions into {len(final_groups)} groups")
 
@@ -154,24 +249,21 @@ def find_canonical_question(
     if not existing_questions:
         return question, 1.0
 
-    try:
-        query_embedding = get_embedding(question)
-    except Exception as e:
-        print(f"⚠️ [Semantic Matcher] Failed to get embedding: {e}")
+    query_embedding, *existing_embeddings = get_embeddings([question, *existing_questions])
+    if not query_embedding:
+        print("⚠️ [Semantic Matcher] Failed to get embedding")
         return question, 1.0
 
     best_match = question
     best_score = 0.0
 
-    for existing_q in existing_questions:
-        try:
-            existing_emb = get_embedding(existing_q)
-            similarity = cosine_similarity(query_embedding, existing_emb)
-            if similarity > best_score:
-                best_score = similarity
-                best_match = existing_q
-        except Exception:
+    for existing_q, existing_emb in zip(existing_questions, existing_embeddings):
+        if not existing_emb:
             continue
+        similarity = cosine_similarity(query_embedding, existing_emb)
+        if similarity > best_score:
+            best_score = similarity
+            best_match = existing_q
 
     if best_score >= threshold:
         return best_match, best_score
@@ -179,21 +271,14 @@ def find_canonical_question(
     return question, 1.0
 
 
-# 快取機制 - 避免重複計算 embedding
-_embedding_cache: Dict[str, List[float]] = {}
-
-
 def get_embedding_cached(text: str) -> List[float]:
-    """帶快取的 embedding 取得"""
-    if text not in _embedding_cache:
-        _embedding_cache[text] = get_embedding(text)
-    return _embedding_cache[text]
+    """帶快取的 embedding 取得；請求失敗時拋出例外（不像 get_embeddings 回傳空向量）"""
+    return get_embedding_store().get_or_embed(EMBEDDING_MODEL, [text], lambda missing: [get_embedding(missing[0])])[0]
 
 
 def clear_embedding_cache():
-    """清除 embedding 快取"""
-    global _embedding_cache
-    _embedding_cache = {}
+    """清除 embedding 快取（本模型的持久快取一併清除）"""
+    get_embedding_store().clear(EMBEDDING_MODEL)
 
 
 # 測試
@@ -15,8 +15,10 @@ export interface VietnamPersona {
   // 個人背景
   personalBackground: string;               // 個人背景描述
 
-  // 訪談記錄
+  // 訪談記錄（已封存的受訪者只含未封存部分，完整記錄需另外讀取 /history）
   interviewHistory: VietnamInterviewRecord[];
+  historyArchived?: boolean;
+  archivedHistoryCount?: number;
 
   // 訪談進度
   currentSectionIndex: number;
@@ -70,6 +72,10 @@ export const INSURANCE_BRANDS = [
   'Other (其他)'
 ];
 
+// 訪談記錄總筆數（含已封存、尚未讀回的部分）
+export const historyCount = (persona: VietnamPersona): number =>
+  (persona.archivedHistoryCount || 0) + (persona.interviewHistory?.length || 0);
+
 // 建立空的 Persona
 export const createEmptyVietnamPersona = (): VietnamPersona => ({
   id: '',
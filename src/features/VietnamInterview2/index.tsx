@@ -12,7 +12,8 @@ import {
 } from '@ant-design/icons';
 import {
   VietnamPersona,
-  VietnamInterviewRecord
+  VietnamInterviewRecord,
+  historyCount
 } from './vietnamPersonaSchema';
 import { PieChart, Pie, Cell, ResponsiveContainer, Tooltip as RechartsTooltip, BarChart, Bar, XAxis, YAxis, CartesianGrid } from 'recharts';
 
@@ -92,6 +93,7 @@ export const VietnamInterview2 = () => {
     loadPersonas();
   }, []);
 
+  // 列表不含已封存的訪談記錄（ETag 未變時瀏覽器直接使用快取）；開啟受訪者時才讀回
   const loadPersonas = async () => {
     try {
       const res = await fetch('http://localhost:8787/api/vietnam2_personas');
@@ -104,6 +106,28 @@ export const VietnamInterview2 = () => {
     }
   };
 
+  // 已讀回的完整訪談記錄（persona id -> 封存 + 未封存），筆數沒變就不重新讀取
+  const fullHistoryRef = useRef<Map<string, VietnamInterviewRecord[]>>(new Map());
+
+  const withArchivedHistory = async (persona: VietnamPersona): Promise<VietnamPersona> => {
+    if (!persona.historyArchived) return persona;
+    const cached = fullHistoryRef.current.get(persona.id);
+    if (cached && cached.length === historyCount(persona)) {
+      return { ...persona, interviewHistory: cached };
+    }
+    try {
+      const res = await fetch(`http://localhost:8787/api/vietnam2_personas/${encodeURIComponent(persona.id)}/history`);
+      if (res.ok) {
+        const data = await res.json();
+        fullHistoryRef.current.set(persona.id, data.interviewHistory);
+        return { ...persona, interviewHistory: data.interviewHistory };
+      }
+    } catch (e) {
+      console.error('Failed to load archived history:', e);
+    }
+    return persona;
+  };
+
   const loadSemanticGroups = async (allQuestions: string[]) => {
     if (allQuestions.length === 0) {
       setSemanticMapping({ questionToCanonical: {}, canonicalQuestions: [] });
@@ -220,16 +244,20 @@ export const VietnamInterview2 = () => {
     const normalizedTarget = normalizeQuestion(question);
 
     try {
-      for (const persona of personas) {
+      for (const listed of personas) {
+        const persona = await withArchivedHistory(listed);
         const originalLength = persona.interviewHistory?.length || 0;
         const filteredHistory = persona.interviewHistory?.filter(
           record => normalizeQuestion(record.question) !== normalizedTarget
         ) || [];
 
         if (filteredHistory.length < originalLength) {
+          // 送回刪除後的完整記錄並取消封存，伺服器以送回的內容為準（不會再接上封存）
           const updatedPersona = {
             ...persona,
             interviewHistory: filteredHistory,
+            historyArchived: false,
+            archivedHistoryCount: undefined,
             updatedAt: new Date().toISOString()
           };
           await savePersona(updatedPersona);
@@ -300,6 +328,12 @@ export const VietnamInterview2 = () => {
 
     setCurrentPersona(persona);
     currentPersonaIdRef.current = persona.id;
+    // 已封存的受訪者：讀回完整訪談記錄後再更新（仍是同一位受訪者時）
+    withArchivedHistory(persona).then(full => {
+      if (currentPersonaIdRef.current === full.id && full !== persona) {
+        setCurrentPersona(full);
+      }
+    });
     setActiveTab('interview');
   };
 
@@ -487,7 +521,8 @@ export const VietnamInterview2 = () => {
 
     for (let i = 0; i < selectedPersonaIds.length; i++) {
       const personaId = selectedPersonaIds[i];
-      const persona = personaMap.get(personaId);
+      const listed = personaMap.get(personaId);
+      const persona = listed && await withArchivedHistory(listed);
 
       setBatchProgress(Math.round((i / total) * 100));
 
@@ -671,9 +706,9 @@ export const VietnamInterview2 = () => {
     }
   };
 
-  const totalResponses = personas.reduce((sum, p) => sum + (p.interviewHistory?.length || 0), 0);
+  const totalResponses = personas.reduce((sum, p) => sum + historyCount(p), 0);
   const totalQuestions = new Set(personas.flatMap(p => p.interviewHistory?.map(h => h.question) || [])).size;
-  const interviewedCount = personas.filter(p => (p.interviewHistory?.length || 0) > 0).length;
+  const interviewedCount = personas.filter(p => historyCount(p) > 0).length;
 
   const tabItems = [
     {
@@ -1264,6 +1299,7 @@ export const VietnamInterview2 = () => {
           onContinueInterview={startInterview}
           onDeletePersona={deletePersona}
           onDeleteQuestion={deleteQuestion}
+          onLoadHistory={withArchivedHistory}
         />
       ),
     },
@@ -1778,15 +1814,26 @@ const HistoryTabContent = ({
   personas,
   onContinueInterview,
   onDeletePersona,
-  onDeleteQuestion
+  onDeleteQuestion,
+  onLoadHistory
 }: {
   personas: VietnamPersona[];
   onContinueInterview: (persona: VietnamPersona) => void;
   onDeletePersona: (personaId: string, personaName: string) => void;
   onDeleteQuestion: (question: string, responseCount: number) => void;
+  onLoadHistory: (persona: VietnamPersona) => Promise<VietnamPersona>;
 }) => {
   const [viewMode, setViewMode] = useState<'by-persona' | 'by-question'>('by-question');
   const [expandedQuestions, setExpandedQuestions] = useState<string[]>([]);
+  // 展開時才讀回的完整訪談記錄（已封存的受訪者）
+  const [loadedHistory, setLoadedHistory] = useState<Record<string, VietnamInterviewRecord[]>>({});
+
+  const loadHistory = (persona: VietnamPersona) => {
+    if (!persona.historyArchived) return;
+    onLoadHistory(persona).then(full => {
+      setLoadedHistory(prev => ({ ...prev, [persona.id]: full.interviewHistory }));
+    });
+  };
 
   const normalizeQuestion = (question: string): string => {
     return question
@@ -1822,7 +1869,7 @@ const HistoryTabContent = ({
   };
 
   const questionGroups = getQuestionGroups();
-  const totalResponses = personas.reduce((sum, p) => sum + (p.interviewHistory?.length || 0), 0);
+  const totalResponses = personas.reduce((sum, p) => sum + historyCount(p), 0);
 
   if (personas.length === 0) {
     return <Empty description="尚無觀察記錄。請先生成受訪者並開始記錄。" />;
@@ -1958,7 +2005,7 @@ const HistoryTabContent = ({
               }
               extra={
                 <Space>
-                  <Text type="secondary">{persona.interviewHistory?.length || 0} records</Text>
+                  <Text type="secondary">{historyCount(persona)} records</Text>
                   {!persona.isCompleted && (
                     <Button
                       type="primary"
@@ -1989,10 +2036,10 @@ const HistoryTabContent = ({
                   style={{ marginBottom: 16, borderLeft: `3px solid ${colors.primary}` }}
                 />
               )}
-              <Collapse ghost>
-                <Panel header={`Show ${persona.interviewHistory?.length || 0} Records`} key="1">
+              <Collapse ghost onChange={() => loadHistory(persona)}>
+                <Panel header={`Show ${historyCount(persona)} Records`} key="1">
                   <Space direction="vertical" style={{ width: '100%' }}>
-                    {persona.interviewHistory?.map((record, idx) => (
+                    {(loadedHistory[persona.id] || persona.interviewHistory)?.map((record, idx) => (
                       <Card key={idx} size="small" style={{ borderLeft: `3px solid ${colors.primary}` }}>
                         <Text strong style={{ color: colors.primary }}>Topic: {record.question}</Text>
                         <Paragraph style={{ marginTop: 8, marginBottom: 0 }}>{record.answer}</Paragraph>